@@ -4,7 +4,7 @@ import argparse
 import cv2
 import mmcv
 
-from mmdet.apis import inference_detector, init_detector
+from mmdet.apis import StreamInference, inference_detector, init_detector
 
 
 def parse_args():
@@ -23,6 +23,15 @@ def parse_args():
         type=float,
         default=1,
         help='The interval of show (s), 0 is block')
+    parser.add_argument(
+        '--pipelined',
+        action='store_true',
+        help='Decode, detect and draw the frames in pipelined stages')
+    parser.add_argument(
+        '--drop',
+        default='none',
+        choices=['none', 'oldest', 'newest'],
+        help='Frames to drop when the model falls behind, with --pipelined')
     args = parser.parse_args()
     return args
 
@@ -43,15 +52,27 @@ def main():
             args.out, fourcc, video_reader.fps,
             (video_reader.width, video_reader.height))
 
-    for frame in mmcv.track_iter_progress(video_reader):
-        result = inference_detector(model, frame)
-        frame = model.show_result(frame, result, score_thr=args.score_thr)
+    def output(frame):
         if args.show:
             cv2.namedWindow('video', 0)
             mmcv.imshow(frame, 'video', args.wait_time)
         if args.out:
             video_writer.write(frame)
 
+    if args.pipelined:
+        stream = StreamInference(
+            model,
+            postprocess=lambda frame, det_results: model.show_result(
+                frame, det_results[0], score_thr=args.score_thr),
+            drop=args.drop)
+        for _, _, frame in stream.run(video_reader):
+            output(frame)
+        print(stream.stats())
+    else:
+        for frame in mmcv.track_iter_progress(video_reader):
+            result = inference_detector(model, frame)
+            output(model.show_result(frame, result, score_thr=args.score_thr))
+
     if video_writer:
         video_writer.release()
     cv2.destroyAllWindows()
@@ -6,8 +6,9 @@ from .optimizer_super import OptimizerHookSuper, Fp16OptimizerHookSuper
 from .epoch_based_runner_super import EpochBasedRunnerSuper
 from .checkpoint_nolog import CheckpointHook_nolog
 from .epoch_based_runner_tfs import EpochBasedRunner_tfs
+from .prefetcher import DataPrefetcher, PinnedBufferPool
 
 __all__ = ['save_checkpoint',  'OptimizerHookSuper',
     'EpochBasedRunnerSuper', 'CheckpointHook_nolog', 'Fp16OptimizerHookSuper',
-           'EpochBasedRunner_tfs'
+           'EpochBasedRunner_tfs', 'DataPrefetcher', 'PinnedBufferPool'
 ]
@@ -13,6 +13,8 @@ import numpy as np
 from random import choice
 import random
 
+from .prefetcher import DataPrefetcher
+
 torch.manual_seed(0)
 torch.cuda.manual_seed_all(0)
 np.random.seed(0)
@@ -24,6 +26,12 @@ class EpochBasedRunnerSuper(EpochBasedRunner):
     """Epoch-based Runner.
 
     This runner train models epoch by epoch.
+
+    Args:
+        prefetch_cfg (dict, optional): Arguments of :obj:`DataPrefetcher`.
+            If set, training batches are fetched and copied to the device
+            in a background thread, e.g. ``dict(num_prefetch=2)``.
+            Default: None.
     """
 
     def __init__(self,
@@ -33,6 +41,7 @@ class EpochBasedRunnerSuper(EpochBasedRunner):
                  search_neck=False,
                  search_head=False,
                  sandwich=False,
+                 prefetch_cfg=None,
                  **kwargs):
         self.widen_factor_range = widen_factor_range,
         self.deepen_factor_range = deepen_factor_range,
@@ -42,6 +51,7 @@ class EpochBasedRunnerSuper(EpochBasedRunner):
         self.sandwich = sandwich
 
         self.arch = None
+        self.prefetch_cfg = prefetch_cfg
 
         super(EpochBasedRunnerSuper, self).__init__(**kwargs)
 
@@ -113,8 +123,11 @@ class EpochBasedRunnerSuper(EpochBasedRunner):
         self._max_iters = self._max_epochs * len(self.data_loader)
         self.call_hook('before_train_epoch')
         time.sleep(2)  # Prevent possible deadlock during epoch transition
+        data_iter = self.data_loader
+        if self.prefetch_cfg is not None:
+            data_iter = DataPrefetcher(self.data_loader, **self.prefetch_cfg)
 
-        for i, data_batch in enumerate(self.data_loader):
+        for i, data_batch in enumerate(data_iter):
             self._inner_iter = i
             self.call_hook('before_train_iter')
 
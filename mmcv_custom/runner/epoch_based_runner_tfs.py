@@ -13,6 +13,8 @@ import numpy as np
 from random import choice
 import random
 
+from .prefetcher import DataPrefetcher
+
 torch.manual_seed(0)
 torch.cuda.manual_seed_all(0)
 np.random.seed(0)
@@ -24,6 +26,12 @@ class EpochBasedRunner_tfs(EpochBasedRunner):
     """Epoch-based Runner.
 
     This runner train models epoch by epoch.
+
+    Args:
+        prefetch_cfg (dict, optional): Arguments of :obj:`DataPrefetcher`.
+            If set, training batches are fetched and copied to the device
+            in a background thread, e.g. ``dict(num_prefetch=2)``.
+            Default: None.
     """
 
     def __init__(self,
@@ -42,6 +50,7 @@ class EpochBasedRunner_tfs(EpochBasedRunner):
                  search_neck=True,
                  search_head=False,
                  sandwich=False,
+                 prefetch_cfg=None,
                  **kwargs):
         self.panas_type = panas_type
         self.step = 0
@@ -62,6 +71,7 @@ class EpochBasedRunner_tfs(EpochBasedRunner):
         self.search_head = search_head
 
         self.arch = None
+        self.prefetch_cfg = prefetch_cfg
 
         super(EpochBasedRunner_tfs, self).__init__(**kwargs)
 
@@ -93,7 +103,10 @@ class EpochBasedRunner_tfs(EpochBasedRunner):
         self._max_iters = self._max_epochs * len(self.data_loader)
         self.call_hook('before_train_epoch')
         time.sleep(2)  # Prevent possible deadlock during epoch transition
-        for i, data_batch in enumerate(self.data_loader):
+        data_iter = self.data_loader
+        if self.prefetch_cfg is not None:
+            data_iter = DataPrefetcher(self.data_loader, **self.prefetch_cfg)
+        for i, data_batch in enumerate(data_iter):
             self._inner_iter = i
             self.call_hook('before_train_iter')
             self.run_iter(data_batch, train_mode=True, **kwargs)
@@ -0,0 +1,187 @@
+# Copyright (c) Open-MMLab. All rights reserved.
+import queue
+import threading
+from collections import defaultdict
+
+import torch
+from mmcv.parallel import DataContainer
+
+
+class PinnedBufferPool(object):
+    """Reusable page-locked host buffers.
+
+    Each (shape, dtype) key owns a ring of ``num_buffers`` pinned tensors. A
+    buffer is handed out again only once the device copy recorded for its
+    previous use has finished, so a batch can be staged while the copy of
+    the previous one is still in flight.
+
+    Args:
+        num_buffers (int): Number of buffers per (shape, dtype).
+    """
+
+    def __init__(self, num_buffers=2):
+        self.num_buffers = num_buffers
+        self._buffers = defaultdict(list)
+        self._next = defaultdict(int)
+
+    def stage(self, tensor):
+        """Copy a cpu tensor into a pinned buffer.
+
+        Returns:
+            tuple[Tensor, tuple]: The pinned buffer and its slot id, to be
+                passed to :meth:`record` after the device copy is issued.
+        """
+        key = (tuple(tensor.shape), tensor.dtype)
+        ring = self._buffers[key]
+        slot = self._next[key]
+        self._next[key] = (slot + 1) % self.num_buffers
+        if slot == len(ring):
+            ring.append([
+                torch.empty(
+                    tensor.shape, dtype=tensor.dtype, pin_memory=True), None
+            ])
+        buffer, event = ring[slot]
+        if event is not None:
+            event.synchronize()
+        buffer.copy_(tensor)
+        return buffer, (key, slot)
+
+    def record(self, slot_id, event):
+        key, slot = slot_id
+        self._buffers[key][slot][1] = event
+
+
+class DataPrefetcher(object):
+    """Iterate a data loader in a background thread.
+
+    The thread fetches (and, with ``num_workers=0``, collates) the next
+    batches while the current step computes. When a GPU is used, the stacked
+    :obj:`DataContainer` s (e.g. ``img``) are staged in reusable pinned
+    buffers and copied to the device on a side stream, the other tensors
+    are copied with ``non_blocking=True``. ``cpu_only`` containers such as
+    ``img_metas`` are left untouched. Batches already on the device are
+    scattered without a copy by ``MMDataParallel`` and
+    ``MMDistributedDataParallel``.
+
+    Args:
+        data_loader (Iterable): The data loader to prefetch from.
+        num_prefetch (int): Maximum number of batches fetched ahead.
+            Default: 2.
+        device (int | str | torch.device, optional): Device to copy the
+            batches to. ``'cpu'`` only overlaps loading with compute.
+            Default: the current cuda device if cuda is available,
+            else ``'cpu'``.
+    """
+
+    def __init__(self, data_loader, num_prefetch=2, device=None):
+        assert num_prefetch >= 1
+        self.data_loader = data_loader
+        self.num_prefetch = num_prefetch
+        if device is None:
+            device = torch.cuda.current_device() \
+                if torch.cuda.is_available() else 'cpu'
+        self.device = torch.device(device) if not isinstance(
+            device, int) else torch.device('cuda', device)
+        self.use_cuda = self.device.type == 'cuda'
+        if self.use_cuda:
+            self._stream = torch.cuda.Stream(self.device)
+            # the batch being copied, the ones queued and the one in use
+            self._pool = PinnedBufferPool(num_prefetch + 2)
+
+    def __len__(self):
+        return len(self.data_loader)
+
+    def _to_device(self, data):
+        if isinstance(data, DataContainer):
+            if data.cpu_only:
+                return data
+            if data.stack:
+                return DataContainer(
+                    [self._stage_to_device(d) for d in data.data],
+                    data.stack, data.padding_value, data.cpu_only,
+                    data.pad_dims)
+            return DataContainer(
+                self._to_device(data.data), data.stack,
+                data.padding_value, data.cpu_only, data.pad_dims)
+        elif isinstance(data, torch.Tensor):
+            return data.to(self.device, non_blocking=True)
+        elif isinstance(data, (list, tuple)):
+            return type(data)(self._to_device(d) for d in data)
+        elif isinstance(data, dict):
+            return {k: self._to_device(v) for k, v in data.items()}
+        return data
+
+    def _stage_to_device(self, tensor):
+        if not isinstance(tensor, torch.Tensor):
+            return self._to_device(tensor)
+        buffer, slot_id = self._pool.stage(tensor)
+        device_tensor = buffer.to(self.device, non_blocking=True)
+        event = torch.cuda.Event()
+        event.record(self._stream)
+        self._pool.record(slot_id, event)
+        return device_tensor
+
+    @staticmethod
+    def _put(batches, item, stop):
+        """Put an item in the queue unless the consumer has stopped."""
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _worker(self, batches, stop):
+        try:
+            if self.use_cuda:
+                torch.cuda.set_device(self.device)
+            for data_batch in self.data_loader:
+                if self.use_cuda:
+                    with torch.cuda.stream(self._stream):
+                        data_batch = self._to_device(data_batch)
+                        done = torch.cuda.Event()
+                        done.record(self._stream)
+                    data_batch = (data_batch, done)
+                if not self._put(batches, data_batch, stop):
+                    return
+            self._put(batches, StopIteration(), stop)
+        except BaseException as e:  # noqa: B902
+            self._put(batches, e, stop)
+
+    def _record_stream(self, data, stream):
+        if isinstance(data, DataContainer):
+            self._record_stream(data.data, stream)
+        elif isinstance(data, torch.Tensor):
+            if data.is_cuda:
+                data.record_stream(stream)
+        elif isinstance(data, (list, tuple)):
+            for d in data:
+                self._record_stream(d, stream)
+        elif isinstance(data, dict):
+            for d in data.values():
+                self._record_stream(d, stream)
+
+    def __iter__(self):
+        batches = queue.Queue(maxsize=self.num_prefetch)
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self._worker, args=(batches, stop), daemon=True)
+        thread.start()
+        try:
+            while True:
+                data_batch = batches.get()
+                if isinstance(data_batch, StopIteration):
+                    break
+                if isinstance(data_batch, BaseException):
+                    raise data_batch
+                if self.use_cuda:
+                    data_batch, done = data_batch
+                    stream = torch.cuda.current_stream(self.device)
+                    stream.wait_event(done)
+                    # tensors were allocated on the side stream
+                    self._record_stream(data_batch, stream)
+                yield data_batch
+        finally:
+            stop.set()
+            thread.join()
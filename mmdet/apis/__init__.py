@@ -1,12 +1,23 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+from .compiled import CompiledYOLOX
+from .controller import ArchController
 from .inference import (async_inference_detector, inference_detector,
                         init_detector, show_result_pyplot)
-from .test import multi_gpu_test, single_gpu_test
+from .server import InferenceServer, MicroBatcher, build_server
+from .session import InferenceSession
+from .stream import StreamInference
+from .subnets import SubnetSession
+from .test import (collect_results_flat, merge_evaluators, multi_gpu_test,
+                   single_gpu_test)
+from .tiled import TiledInference
 from .train import (get_root_logger, init_random_seed, set_random_seed,
                     train_detector)
 
 __all__ = [
     'get_root_logger', 'set_random_seed', 'train_detector', 'init_detector',
     'async_inference_detector', 'inference_detector', 'show_result_pyplot',
-    'multi_gpu_test', 'single_gpu_test', 'init_random_seed'
+    'multi_gpu_test', 'single_gpu_test', 'init_random_seed',
+    'merge_evaluators', 'collect_results_flat', 'InferenceSession',
+    'MicroBatcher', 'InferenceServer', 'build_server', 'SubnetSession',
+    'ArchController', 'CompiledYOLOX', 'TiledInference', 'StreamInference'
 ]
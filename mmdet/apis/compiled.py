@@ -0,0 +1,259 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from typing import List, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+from mmcv.cnn import fuse_conv_bn
+from torch import Tensor
+
+from mmdet.core import bbox2result
+
+try:
+    from torchvision.ops import batched_nms
+except ImportError:
+    batched_nms = None
+
+
+class _YOLOXPostProcess(nn.Module):
+    """The post-processing of :meth:`YOLOXHead.get_bboxes` on tensors, which
+    TorchScript compiles.
+
+    The priors are decoded for a whole batch at once, the NMS is done image
+    by image and the dets are padded to the largest number of dets of the
+    batch, with a score of 0 and a label of -1.
+    """
+
+    def __init__(self,
+                 strides: List[int],
+                 score_thr: float,
+                 iou_threshold: float,
+                 max_per_img: int = -1):
+        super(_YOLOXPostProcess, self).__init__()
+        self.strides = strides
+        self.score_thr = score_thr
+        self.iou_threshold = iou_threshold
+        self.max_per_img = max_per_img
+
+    def forward(self, cls_scores: List[Tensor], bbox_preds: List[Tensor],
+                objectnesses: List[Tensor],
+                scale_factors: Tensor) -> Tuple[Tensor, Tensor]:
+        num_imgs = cls_scores[0].size(0)
+        flatten_cls_scores = []
+        flatten_bbox_preds = []
+        flatten_objectness = []
+        flatten_priors = []
+        for i in range(len(cls_scores)):
+            cls_score = cls_scores[i]
+            height, width = cls_score.size(2), cls_score.size(3)
+            shift_y, shift_x = torch.meshgrid(
+                torch.arange(height, device=cls_score.device),
+                torch.arange(width, device=cls_score.device),
+                indexing='ij')
+            stride = torch.full((height * width, 1),
+                                float(self.strides[i]),
+                                dtype=cls_score.dtype,
+                                device=cls_score.device)
+            flatten_priors.append(
+                torch.cat([
+                    torch.stack([shift_x.reshape(-1),
+                                 shift_y.reshape(-1)], 1).to(stride) * stride,
+                    stride
+                ], 1))
+            flatten_cls_scores.append(
+                cls_score.permute(0, 2, 3, 1).reshape(num_imgs, height * width,
+                                                      -1))
+            flatten_bbox_preds.append(bbox_preds[i].permute(
+                0, 2, 3, 1).reshape(num_imgs, height * width, 4))
+            flatten_objectness.append(objectnesses[i].reshape(num_imgs, -1))
+        priors = torch.cat(flatten_priors)
+        max_scores, labels = torch.cat(flatten_cls_scores, 1).sigmoid().max(2)
+        scores = max_scores * torch.cat(flatten_objectness, 1).sigmoid()
+        bbox_preds = torch.cat(flatten_bbox_preds, 1)
+        xys = bbox_preds[..., :2] * priors[:, 2:] + priors[:, :2]
+        whs = bbox_preds[..., 2:].exp() * priors[:, 2:]
+        bboxes = torch.cat([xys - whs / 2, xys + whs / 2], -1)
+        bboxes = bboxes / scale_factors.reshape(num_imgs, 1, 4)
+
+        img_dets: List[Tensor] = []
+        img_labels: List[Tensor] = []
+        max_num = 0
+        for i in range(num_imgs):
+            valid = scores[i] >= self.score_thr
+            valid_bboxes = bboxes[i][valid]
+            valid_scores = scores[i][valid]
+            valid_labels = labels[i][valid]
+            keep = batched_nms(valid_bboxes, valid_scores, valid_labels,
+                               self.iou_threshold)
+            if self.max_per_img > 0:
+                keep = keep[:self.max_per_img]
+            img_dets.append(
+                torch.cat(
+                    [valid_bboxes[keep], valid_scores[keep].unsqueeze(1)], 1))
+            img_labels.append(valid_labels[keep])
+            max_num = max(max_num, keep.size(0))
+
+        dets = scores.new_zeros((num_imgs, max_num, 5))
+        padded_labels = labels.new_full((num_imgs, max_num), -1)
+        for i in range(num_imgs):
+            num = img_dets[i].size(0)
+            dets[i, :num] = img_dets[i]
+            padded_labels[i, :num] = img_labels[i]
+        return dets, padded_labels
+
+
+class _YOLOXNetwork(nn.Module):
+    """The network of a detector, from the images to the outputs of its
+    head, in tuples for the tracer."""
+
+    def __init__(self, detector):
+        super(_YOLOXNetwork, self).__init__()
+        self.detector = detector
+
+    def forward(self, img):
+        return tuple(tuple(outs) for outs in self.detector.forward_dummy(img))
+
+
+class CompiledYOLOX(nn.Module):
+    """A YOLOX detector compiled for inference.
+
+    The eager test path of the detector runs the head and its
+    post-processing level by level and image by image in Python, with the
+    metas of the images in dicts. Here the network, from the images to the
+    outputs of the head, is traced with TorchScript and frozen, with its
+    BNs folded into the convs. It is traced once per input shape. The
+    post-processing is compiled with TorchScript and runs on the tensors of
+    the whole batch. :meth:`detect` maps a batch of images and their scale
+    factors to padded tensors of dets, :meth:`forward` is the test forward
+    of the detector, so the compiled detector replaces the eager one in
+    :func:`inference_detector`, :class:`InferenceSession` or
+    :func:`single_gpu_test`.
+
+    The detector is fused and frozen in place, so it must be loaded before.
+    The NMS is the one of ``torchvision``, it has the ``iou_threshold`` of
+    the ``nms`` of the test config. Supernets are not supported, materialize
+    their subnets first, see :func:`mmdet.core.export.materialize_subnet`.
+
+    Args:
+        detector (nn.Module): The loaded YOLOX detector, with a dense
+            ``YOLOXHead`` or ``YOLOXHead_tfs``.
+        max_per_img (int, optional): Max number of dets of an image, the
+            ``max_per_img`` of the test config if None, all of them if it is
+            not set. Default: None.
+
+    Example:
+        >>> model = init_detector(config_file, checkpoint_file, 'cpu',
+        ...                       fast=True)
+        >>> dets, labels = model.detect(imgs, scale_factors)
+    """
+
+    def __init__(self, detector, max_per_img=None):
+        super(CompiledYOLOX, self).__init__()
+        from mmdet.models.utils import USConv2d
+        assert batched_nms is not None, \
+            'Please install torchvision to compile a detector'
+        assert not any(
+            isinstance(m, USConv2d) for m in detector.modules()), \
+            'Materialize the subnet of a supernet before compiling it'
+        test_cfg = detector.bbox_head.test_cfg
+        if max_per_img is None:
+            max_per_img = test_cfg.get('max_per_img', -1)
+        self.detector = fuse_conv_bn(detector.eval())
+        strides = [
+            stride[0] for stride in detector.bbox_head.prior_generator.strides
+        ]
+        self.post_process = torch.jit.script(
+            _YOLOXPostProcess(strides, test_cfg.score_thr,
+                              test_cfg.nms.iou_threshold, max_per_img))
+        # the traced networks, by input shape and device
+        self._networks = {}
+
+    @property
+    def cfg(self):
+        return self.detector.cfg
+
+    @property
+    def CLASSES(self):
+        return self.detector.CLASSES
+
+    @property
+    def bbox_head(self):
+        return self.detector.bbox_head
+
+    def train(self, mode=True):
+        assert not mode, 'A compiled detector only runs inference'
+        return super(CompiledYOLOX, self).train(mode)
+
+    def network(self, img):
+        """Run the traced network, from the images to the outputs of the
+        head, tracing it for a new input shape."""
+        key = (tuple(img.shape), img.device)
+        if key not in self._networks:
+            with torch.no_grad():
+                traced = torch.jit.trace(
+                    _YOLOXNetwork(self.detector).eval(), img)
+            self._networks[key] = torch.jit.freeze(traced)
+        return self._networks[key](img)
+
+    def detect(self, img, scale_factors=None):
+        """Detect the objects of a batch of images.
+
+        Args:
+            img (Tensor): The preprocessed images of shape (N, C, H, W).
+            scale_factors (Tensor, optional): The scale factors (w, h, w, h)
+                of the images of shape (N, 4), the dets are divided by them.
+                The dets are the ones of the input images if None.
+                Default: None.
+
+        Returns:
+            tuple[Tensor, Tensor]: The dets (x1, y1, x2, y2, score) of shape
+                (N, K, 5), sorted by score, and their labels of shape (N, K),
+                where K is the largest number of dets of the images. The dets
+                of an image are padded with a score of 0 and a label of -1.
+        """
+        if scale_factors is None:
+            scale_factors = img.new_ones((img.size(0), 4))
+        with torch.no_grad():
+            cls_scores, bbox_preds, objectnesses = self.network(img)
+            return self.post_process(
+                list(cls_scores), list(bbox_preds), list(objectnesses),
+                scale_factors.to(img))
+
+    def forward(self, img, img_metas, return_loss=False, rescale=True):
+        """Test forward of the detector, without test time augmentation.
+
+        Args:
+            img (list[Tensor]): The batch of images, in a list of a single
+                element like the test data.
+            img_metas (list[list[dict]]): The metas of the images, in a list
+                of a single element.
+            return_loss (bool): Must be False.
+            rescale (bool): Whether to rescale the dets to the original
+                images. Default: True.
+
+        Returns:
+            list[list[np.ndarray]]: The dets of each class of each image.
+        """
+        assert not return_loss, 'A compiled detector only runs inference'
+        assert len(img) == 1, 'Test time augmentation is not supported'
+        img, img_metas = img[0], img_metas[0]
+        scale_factors = None
+        if rescale:
+            scale_factors = img.new_tensor(
+                np.stack([
+                    np.broadcast_to(img_meta['scale_factor'], 4)
+                    for img_meta in img_metas
+                ]))
+        dets, labels = self.detect(img, scale_factors)
+        num_classes = self.detector.bbox_head.num_classes
+        results = []
+        for img_dets, img_labels in zip(dets, labels):
+            valid = img_labels >= 0
+            results.append(
+                bbox2result(img_dets[valid], img_labels[valid], num_classes))
+        return results
+
+    def show_result(self, *args, **kwargs):
+        """Draw the results of an image, see
+        :meth:`BaseDetector.show_result`."""
+        return self.detector.show_result(*args, **kwargs)
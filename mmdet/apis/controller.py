@@ -0,0 +1,264 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from collections import deque
+
+import numpy as np
+
+
+class ArchController(object):
+    """Switch the tier of a :class:`SubnetSession` to keep a latency target.
+
+    The tiers are a Pareto list of archs, ordered from the most accurate to
+    the fastest. After each batch, the controller gets the latencies of its
+    requests and the number of queued requests. It steps down to the next
+    faster tier when the percentile of the latencies of the last ``window``
+    requests, or the projected latency of the queued requests, exceeds the
+    target. It steps back up when both are below ``low_ratio`` times the
+    target on the more accurate tier, and at least ``up_dwell`` batches ran
+    since the last switch. The gap between the two thresholds and the dwell
+    time are the hysteresis, which keeps the controller from flapping and
+    amortizes the cost of the switches.
+
+    The projected latency of the queued requests is their number times the
+    latency per image of the tier, a moving average over the batches which
+    ran on it. The window is cleared on a switch, the latencies of the old
+    tier do not count for the new one.
+
+    Args:
+        tiers (list[str]): The tiers, from the most accurate to the fastest.
+        target_ms (float): The latency target, in ms.
+        quantile (float): The percentile of the latencies kept under the
+            target. Default: 95.
+        window (int): Number of the last request latencies the percentile is
+            computed on. Default: 64.
+        low_ratio (float): Ratio of the target the latencies are below
+            before stepping up. Default: 0.5.
+        up_dwell (int): Min number of batches between a switch and a step
+            up. Default: 20.
+        down_dwell (int): Min number of batches between a switch and a step
+            down. Default: 2.
+        momentum (float): Weight of a new measure in the moving average of
+            the latency per image. Default: 0.2.
+
+    Example:
+        >>> controller = ArchController(session.tiers, target_ms=100)
+        >>> batcher = MicroBatcher(session, controller=controller)
+    """
+
+    def __init__(self,
+                 tiers,
+                 target_ms,
+                 quantile=95,
+                 window=64,
+                 low_ratio=0.5,
+                 up_dwell=20,
+                 down_dwell=2,
+                 momentum=0.2):
+        assert len(tiers) > 0, 'at least one tier is required'
+        assert 0 < low_ratio < 1
+        self.tiers = list(tiers)
+        self.target_ms = target_ms
+        self.quantile = quantile
+        self.low_ratio = low_ratio
+        self.up_dwell = up_dwell
+        self.down_dwell = down_dwell
+        self.momentum = momentum
+        self.level = 0
+        self.latency_per_img = {}
+        self.num_switches = 0
+        self.switch_ms = 0.
+        self.num_batches = {tier: 0 for tier in self.tiers}
+        self._latencies = deque(maxlen=window)
+        self._since_switch = 0
+
+    @property
+    def tier(self):
+        return self.tiers[self.level]
+
+    def percentile(self):
+        """Get the percentile of the latencies of the window, in ms, 0 if it
+        is empty."""
+        if not self._latencies:
+            return 0.
+        return float(np.percentile(self._latencies, self.quantile))
+
+    def _projected(self, level, queue_depth):
+        """The projected latency of the queued requests on a tier, in ms."""
+        return queue_depth * self.latency_per_img.get(self.tiers[level], 0.)
+
+    def update(self, latencies_ms, queue_depth, batch_ms, switch_ms=0.):
+        """Account a batch and switch the tier if needed.
+
+        Args:
+            latencies_ms (list[float]): The latencies of the requests of the
+                batch, from their arrival to their result, in ms.
+            queue_depth (int): The number of queued requests.
+            batch_ms (float): The run time of the batch, in ms.
+            switch_ms (float): The time spent switching the tier before the
+                batch, in ms. Default: 0.
+
+        Returns:
+            str: The tier of the next batch.
+        """
+        tier = self.tier
+        self.num_batches[tier] += 1
+        self.switch_ms += switch_ms
+        if len(latencies_ms):
+            latency = (batch_ms - switch_ms) / len(latencies_ms)
+            if tier in self.latency_per_img:
+                latency = (1 - self.momentum) * self.latency_per_img[tier] + \
+                    self.momentum * latency
+            self.latency_per_img[tier] = latency
+        self._latencies.extend(latencies_ms)
+        self._since_switch += 1
+
+        percentile = self.percentile()
+        projected = self._projected(self.level, queue_depth)
+        low = self.low_ratio * self.target_ms
+        if (percentile > self.target_ms or projected > self.target_ms) \
+                and self.level < len(self.tiers) - 1 \
+                and self._since_switch >= self.down_dwell:
+            self._switch(self.level + 1)
+        elif percentile < low and self.level > 0 \
+                and self._projected(self.level - 1, queue_depth) < low \
+                and self._since_switch >= self.up_dwell:
+            self._switch(self.level - 1)
+        return self.tier
+
+    def _switch(self, level):
+        self.level = level
+        self.num_switches += 1
+        self._latencies.clear()
+        self._since_switch = 0
+
+    def stats(self):
+        """Get the tier, the percentile of the window, the switches and the
+        number of batches of each tier."""
+        return dict(
+            tier=self.tier,
+            percentile_ms=self.percentile(),
+            num_switches=self.num_switches,
+            switch_ms=self.switch_ms,
+            num_batches=dict(self.num_batches))
+
+
+def poisson_arrivals(rate, duration, seed=0):
+    """Get the arrival times of a Poisson process.
+
+    Args:
+        rate (float): Mean number of arrivals per second.
+        duration (float): Duration of the trace, in seconds.
+        seed (int): Random seed. Default: 0.
+
+    Returns:
+        np.ndarray: The sorted arrival times, in seconds.
+    """
+    rng = np.random.RandomState(seed)
+    num = rng.poisson(rate * duration)
+    return np.sort(rng.uniform(0, duration, num))
+
+
+def bursty_arrivals(base_rate,
+                    burst_rate,
+                    period,
+                    burst_duration,
+                    duration,
+                    seed=0):
+    """Get the arrival times of a Poisson process with periodic bursts.
+
+    The rate is ``burst_rate`` during the first ``burst_duration`` seconds
+    of each period and ``base_rate`` during the rest.
+
+    Args:
+        base_rate (float): Mean number of arrivals per second out of the
+            bursts.
+        burst_rate (float): Mean number of arrivals per second during the
+            bursts.
+        period (float): Period of the bursts, in seconds.
+        burst_duration (float): Duration of a burst, in seconds.
+        duration (float): Duration of the trace, in seconds.
+        seed (int): Random seed. Default: 0.
+
+    Returns:
+        np.ndarray: The sorted arrival times, in seconds.
+    """
+    rng = np.random.RandomState(seed)
+    arrivals = []
+    for start in np.arange(0, duration, period):
+        for rate, begin, end in [(burst_rate, start, start + burst_duration),
+                                 (base_rate, start + burst_duration,
+                                  start + period)]:
+            end = min(end, duration)
+            if end > begin:
+                num = rng.poisson(rate * (end - begin))
+                arrivals.append(rng.uniform(begin, end, num))
+    return np.sort(np.concatenate(arrivals))
+
+
+def simulate_serving(arrivals,
+                     service_ms,
+                     tier=None,
+                     controller=None,
+                     max_batch_size=8,
+                     max_wait_ms=10.,
+                     switch_ms=0.):
+    """Simulate a :class:`MicroBatcher` serving a trace on a single worker.
+
+    The requests are batched like the batcher does for images of a single
+    shape: a batch runs when ``max_batch_size`` requests are queued or its
+    oldest request waited ``max_wait_ms``, once the previous batch is done.
+    The run time of a batch is given by ``service_ms``, with ``switch_ms``
+    added when its tier differs from the one of the previous batch.
+
+    Args:
+        arrivals (np.ndarray): The sorted arrival times, in seconds.
+        service_ms (callable): Get the run time in ms of a batch from its
+            tier and its size.
+        tier (str, optional): The tier of all the batches, without a
+            controller. Default: None.
+        controller (:obj:`ArchController`, optional): The controller
+            choosing the tier of each batch. Default: None.
+        max_batch_size (int): Max number of requests of a batch. Default: 8.
+        max_wait_ms (float): Max time a request waits for its batch to fill,
+            in ms. Default: 10.
+        switch_ms (float): The cost of a switch of tier, in ms. Default: 0.
+
+    Returns:
+        dict: The ``latency_ms`` and the ``tiers`` of the requests, the
+            ``num_switches`` and the ``duration`` in seconds.
+    """
+    assert (tier is None) != (controller is None), \
+        'either a tier or a controller is required'
+    num = len(arrivals)
+    latencies = np.zeros(num)
+    tiers = np.empty(num, dtype=object)
+    max_wait = max_wait_ms / 1000
+    now, head, num_switches, last_tier = 0., 0, 0, None
+    while head < num:
+        now = max(now, arrivals[head])
+        # wait for a full batch or the deadline of the oldest request
+        full = head + max_batch_size - 1
+        start = min(arrivals[head] + max_wait,
+                    arrivals[full] if full < num else np.inf)
+        now = max(now, start)
+        end = min(
+            np.searchsorted(arrivals, now, 'right'), head + max_batch_size)
+        batch_tier = controller.tier if controller is not None else tier
+        batch_ms = service_ms(batch_tier, end - head)
+        batch_switch_ms = 0.
+        if last_tier is not None and batch_tier != last_tier:
+            batch_switch_ms = switch_ms
+            num_switches += 1
+        last_tier = batch_tier
+        now += (batch_ms + batch_switch_ms) / 1000
+        latencies[head:end] = (now - arrivals[head:end]) * 1000
+        tiers[head:end] = batch_tier
+        if controller is not None:
+            queue_depth = np.searchsorted(arrivals, now, 'right') - end
+            controller.update(latencies[head:end], queue_depth,
+                              batch_ms + batch_switch_ms, batch_switch_ms)
+        head = end
+    return dict(
+        latency_ms=latencies,
+        tiers=tiers,
+        num_switches=num_switches,
+        duration=max(now - arrivals[0], 0) if num else 0.)
@@ -12,9 +12,15 @@ from mmdet.core import get_classes
 from mmdet.datasets import replace_ImageToTensor
 from mmdet.datasets.pipelines import Compose
 from mmdet.models import build_detector
+from mmdet.models.dense_heads import YOLOXHead, YOLOXHead_tfs
+from .compiled import CompiledYOLOX
 
 
-def init_detector(config, checkpoint=None, device='cuda:0', cfg_options=None):
+def init_detector(config,
+                  checkpoint=None,
+                  device='cuda:0',
+                  cfg_options=None,
+                  fast=False):
     """Initialize a detector from config file.
 
     Args:
@@ -24,6 +30,9 @@ def init_detector(config, checkpoint=None, device='cuda:0', cfg_options=None):
             will not load any weights.
         cfg_options (dict): Options to override some settings in the used
             config.
+        fast (bool): Whether to compile the detector for inference, see
+            :class:`CompiledYOLOX`. Only YOLOX detectors are compiled, the
+            other ones are returned as is with a warning. Default: False.
 
     Returns:
         nn.Module: The constructed detector.
@@ -53,6 +62,14 @@ def init_detector(config, checkpoint=None, device='cuda:0', cfg_options=None):
     model.cfg = config  # save the config in the model for convenience
     model.to(device)
     model.eval()
+    if fast:
+        # two-stage detectors have no bbox_head
+        bbox_head = getattr(model, 'bbox_head', None)
+        if isinstance(bbox_head, (YOLOXHead, YOLOXHead_tfs)):
+            model = CompiledYOLOX(model)
+        else:
+            warnings.warn('Only YOLOX detectors can be compiled, '
+                          f'{type(model).__name__} runs in eager mode.')
     return model
 
 
@@ -0,0 +1,525 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import mmcv
+import numpy as np
+
+from .controller import ArchController
+from .session import InferenceSession
+from .subnets import SubnetSession
+
+
+class LatencyHistogram(object):
+    """Histogram of latencies in log-spaced buckets.
+
+    Args:
+        min_latency (float): Upper bound of the first bucket, in seconds.
+            Default: 1e-4.
+        max_latency (float): Upper bound of the last bucket, the larger
+            latencies are counted in it. Default: 100.
+        buckets_per_decade (int): Number of buckets per power of 10.
+            Default: 20.
+    """
+
+    def __init__(self,
+                 min_latency=1e-4,
+                 max_latency=100.,
+                 buckets_per_decade=20):
+        num_decades = np.log10(max_latency / min_latency)
+        num_buckets = int(num_decades * buckets_per_decade) + 1
+        self.bounds = min_latency * np.logspace(0, num_decades, num_buckets)
+        self.counts = np.zeros(len(self.bounds), dtype=np.int64)
+        self.total = 0.
+        self.max = 0.
+
+    def add(self, latency):
+        """Count a latency, in seconds."""
+        idx = min(
+            np.searchsorted(self.bounds, latency, 'left'),
+            len(self.bounds) - 1)
+        self.counts[idx] += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def percentile(self, q):
+        """Get the upper bound of the bucket of the ``q``-th percentile.
+
+        Args:
+            q (float): Percentile, in [0, 100].
+
+        Returns:
+            float: The latency in seconds, 0 if there are no latencies.
+        """
+        count = self.count
+        if count == 0:
+            return 0.
+        rank = max(int(np.ceil(q / 100 * count)), 1)
+        idx = np.searchsorted(np.cumsum(self.counts), rank, 'left')
+        return min(float(self.bounds[idx]), self.max)
+
+    def summary(self):
+        """Get the count, the mean, the max and the p50/p90/p99 in ms."""
+        count = self.count
+        summary = dict(
+            count=count, mean=self.total / count * 1000 if count else 0.)
+        for q in [50, 90, 99]:
+            summary[f'p{q}'] = self.percentile(q) * 1000
+        summary['max'] = self.max * 1000
+        return summary
+
+
+class _Request(object):
+    """An image waiting for its batch."""
+
+    __slots__ = ('img', 'future', 'arrival', 'deadline')
+
+    def __init__(self, img, future, arrival, deadline=None):
+        self.img = img
+        self.future = future
+        self.arrival = arrival
+        self.deadline = deadline
+
+
+class MicroBatcher(object):
+    """Group concurrent requests into micro-batches for an inference session.
+
+    The requests are queued by input shape, so that a batch is not padded
+    beyond the shape of its images. A batch is run as soon as a queue holds
+    ``max_batch_size`` images, or when its oldest image has waited
+    ``max_wait_ms``. The batches run one at a time in a worker thread,
+    while the event loop keeps accepting requests. When ``max_pending``
+    images are queued, the new requests are rejected with
+    :class:`asyncio.QueueFull`.
+
+    The requests may ask for a tier or a latency SLO of a
+    :class:`SubnetSession`. The requests of different tiers are queued
+    apart. A batch of requests with an SLO is run with the time left
+    before its earliest deadline as SLO, so that the session drops to
+    faster tiers when the requests wait longer. The SLOs are ignored with
+    a session without tiers, which has no faster tier to drop to. With an
+    :class:`ArchController`, the requests which do not ask for a tier run
+    on the tier of the controller instead, which is updated after each
+    batch.
+
+    Args:
+        session (:obj:`InferenceSession`): The session running the model.
+        max_batch_size (int): Max number of images of a batch. Default: 8.
+        max_wait_ms (float): Max time an image waits for its batch to fill,
+            in ms. Default: 10.
+        max_pending (int): Max number of queued images. Default: 64.
+        slo_ms (float, optional): The latency SLO of the requests which do
+            not ask for a tier or an SLO, in ms. Default: None.
+        controller (:obj:`ArchController`, optional): The controller of the
+            tier of the requests which do not ask for one. Default: None.
+
+    Example:
+        >>> batcher = MicroBatcher(InferenceSession(model))
+        >>> # in a coroutine, with the batcher started
+        >>> result = await batcher.submit(img)
+        >>> result['bboxes'], result['scores'], result['labels']
+    """
+
+    def __init__(self,
+                 session,
+                 max_batch_size=8,
+                 max_wait_ms=10.,
+                 max_pending=64,
+                 slo_ms=None,
+                 controller=None):
+        self.session = session
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.slo_ms = slo_ms
+        self.controller = controller
+        self.latency = LatencyHistogram()
+        self.batch_sizes = np.zeros(max_batch_size + 1, dtype=np.int64)
+        self.num_rejected = 0
+        self._queues = OrderedDict()
+        self._num_pending = 0
+        self._executor = ThreadPoolExecutor(1)
+        self._wakeup = None
+        self._task = None
+
+    def start(self):
+        """Start dispatching the batches in the running event loop."""
+        assert self._task is None, 'the batcher is already started'
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._dispatch())
+
+    async def stop(self):
+        """Stop dispatching, the pending requests are cancelled."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for queue in self._queues.values():
+            for request in queue:
+                request.future.cancel()
+        self._queues.clear()
+        self._num_pending = 0
+
+    @property
+    def num_pending(self):
+        return self._num_pending
+
+    async def submit(self, img, tier=None, slo_ms=None):
+        """Detect the objects of an image.
+
+        Args:
+            img (np.ndarray): A loaded image in BGR order.
+            tier (str, optional): The tier of the session to run the image
+                on. Default: None.
+            slo_ms (float, optional): The latency SLO of the request, in ms,
+                ignored if a tier is given. Default: None, ``self.slo_ms``.
+
+        Returns:
+            dict[str, np.ndarray]: The ``bboxes`` (n, 4), ``scores`` (n, )
+                and ``labels`` (n, ) of the image.
+        """
+        assert self._task is not None, 'the batcher is not started'
+        if self._num_pending >= self.max_pending:
+            self.num_rejected += 1
+            raise asyncio.QueueFull
+        key = (self.session.input_shape(img), tier)
+        if tier is None and slo_ms is None:
+            slo_ms = self.slo_ms
+        arrival = time.perf_counter()
+        deadline = None if tier is not None or slo_ms is None else \
+            arrival + slo_ms / 1000
+        future = asyncio.get_event_loop().create_future()
+        self._queues.setdefault(key, []).append(
+            _Request(img, future, arrival, deadline))
+        self._num_pending += 1
+        self._wakeup.set()
+        return await future
+
+    def _next_batch(self):
+        """Pop the next batch to run.
+
+        Returns:
+            tuple[list, float, dict]: The requests of the batch, empty if no
+                batch is ready, the time to wait until the next one is and
+                the tier or the SLO of the batch.
+        """
+        now = time.perf_counter()
+        ready_key, timeout = None, None
+        for key, queue in self._queues.items():
+            if len(queue) >= self.max_batch_size:
+                ready_key = key
+                break
+            # the queues keep their arrival order
+            wait = queue[0].arrival + self.max_wait - now
+            if wait <= 0 and (ready_key is None or wait < timeout):
+                ready_key, timeout = key, wait
+            elif ready_key is None and (timeout is None or wait < timeout):
+                timeout = wait
+        if ready_key is None:
+            return [], timeout, None
+        queue = self._queues.pop(ready_key)
+        batch = queue[:self.max_batch_size]
+        if len(queue) > len(batch):
+            # the rest of the queue goes after the other shapes
+            self._queues[ready_key] = queue[len(batch):]
+        self._num_pending -= len(batch)
+        route = {}
+        tier = ready_key[1]
+        deadlines = [r.deadline for r in batch if r.deadline is not None]
+        if tier is not None:
+            route['tier'] = tier
+        elif deadlines and getattr(self.session, 'tiers', None):
+            route['slo_ms'] = max(min(deadlines) - now, 0) * 1000
+        return batch, 0, route
+
+    def _predict(self, imgs, route):
+        """Run a batch, in the worker thread."""
+        det_results = self.session.predict(imgs, **route)
+        offsets = det_results.img_offsets
+        return [
+            dict(
+                bboxes=det_results.bboxes[start:end],
+                scores=det_results.scores[start:end],
+                labels=det_results.labels[start:end])
+            for start, end in zip(offsets[:-1], offsets[1:])
+        ]
+
+    async def _dispatch(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch, timeout, route = self._next_batch()
+            if not batch:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            controlled = self.controller is not None and 'tier' not in route
+            if controlled:
+                route = dict(tier=self.controller.tier)
+            switch_ms = getattr(self.session, 'switch_ms', 0.)
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self._predict,
+                    [request.img for request in batch], route)
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            now = time.perf_counter()
+            self.batch_sizes[len(batch)] += 1
+            for request, result in zip(batch, results):
+                self.latency.add(now - request.arrival)
+                if not request.future.done():
+                    request.future.set_result(result)
+            if controlled:
+                self.controller.update(
+                    [(now - request.arrival) * 1000 for request in batch],
+                    self._num_pending, (now - start) * 1000,
+                    getattr(self.session, 'switch_ms', 0.) - switch_ms)
+
+    def stats(self):
+        """Get the latency summary, the batch sizes and the queue state, and
+        the stats of the tiers of a :class:`SubnetSession`."""
+        num_batches = int(self.batch_sizes.sum())
+        stats = dict(
+            latency_ms=self.latency.summary(),
+            num_batches=num_batches,
+            mean_batch_size=float(
+                (self.batch_sizes * np.arange(len(self.batch_sizes))).sum() /
+                max(num_batches, 1)),
+            num_pending=self._num_pending,
+            num_rejected=self.num_rejected)
+        if isinstance(self.session, SubnetSession):
+            stats['tiers'] = self.session.stats()
+        if self.controller is not None:
+            stats['controller'] = self.controller.stats()
+        return stats
+
+
+class InferenceServer(object):
+    """A minimal HTTP/1.1 front-end of a :class:`MicroBatcher`.
+
+    Routes:
+
+    - ``POST /predict``: the body is an encoded image, the response is a
+      JSON object of its ``bboxes``, ``scores`` and ``labels``. The
+      ``tier`` and ``slo_ms`` query parameters are passed to
+      :meth:`MicroBatcher.submit`. The response is ``503`` when the batcher
+      queue is full, ``400`` when the image cannot be decoded or the
+      parameters are invalid and ``500`` when the prediction fails.
+    - ``GET /stats``: the JSON stats of the batcher.
+
+    Args:
+        batcher (:obj:`MicroBatcher`): The batcher running the requests.
+        host (str): Host to listen on. Default: '127.0.0.1'.
+        port (int): Port to listen on, 0 for any free port. Default: 8080.
+    """
+
+    def __init__(self, batcher, host='127.0.0.1', port=8080):
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        """Start the batcher and listen, the bound port is set in
+        ``self.port``."""
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle, self.host,
+                                                  self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stop listening and stop the batcher."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.batcher.stop()
+
+    def _parse_route(self, query):
+        """Get the tier and the SLO of a request, None if they are
+        invalid."""
+        params = parse_qs(query)
+        route = {}
+        if 'tier' in params:
+            route['tier'] = params['tier'][0]
+            tiers = getattr(self.batcher.session, 'tiers', [])
+            if route['tier'] not in tiers:
+                return None
+        if 'slo_ms' in params:
+            try:
+                route['slo_ms'] = float(params['slo_ms'][0])
+            except ValueError:
+                return None
+        return route
+
+    async def _handle(self, reader, writer):
+        """Serve the requests of a keep-alive connection."""
+        loop = asyncio.get_event_loop()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, url = request_line.decode('latin-1').split()[:2]
+                url = urlsplit(url)
+                path = url.path
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(
+                    int(headers.get('content-length', 0)))
+
+                if method == 'GET' and path == '/stats':
+                    status, payload = 200, self.batcher.stats()
+                elif method == 'POST' and path == '/predict':
+                    route = self._parse_route(url.query)
+                    img = await loop.run_in_executor(None, _decode, body)
+                    if route is None:
+                        status, payload = 400, dict(error='invalid query')
+                    elif img is None:
+                        status, payload = 400, dict(error='invalid image')
+                    else:
+                        try:
+                            result = await self.batcher.submit(img, **route)
+                        except asyncio.QueueFull:
+                            status, payload = 503, dict(error='server busy')
+                        except Exception as e:
+                            # the batch of the image failed, the connection
+                            # is kept for the next requests
+                            status, payload = 500, dict(
+                                error=f'{type(e).__name__}: {e}')
+                        else:
+                            status = 200
+                            payload = {
+                                key: value.tolist()
+                                for key, value in result.items()
+                            }
+                else:
+                    status, payload = 404, dict(error='not found')
+                _write_response(writer, status, payload)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable'
+}
+
+
+def _decode(body):
+    """Decode an image, None if it is invalid."""
+    try:
+        return mmcv.imfrombytes(body)
+    except Exception:
+        return None
+
+
+def _write_response(writer, status, payload):
+    body = json.dumps(payload).encode()
+    writer.write(f'HTTP/1.1 {status} {_REASONS[status]}\r\n'
+                 'Content-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+
+
+async def http_request(reader, writer, method, path, body=b''):
+    """Send a request on a keep-alive connection and read its response.
+
+    Args:
+        reader (asyncio.StreamReader): Reader of the connection.
+        writer (asyncio.StreamWriter): Writer of the connection.
+        method (str): 'GET' or 'POST'.
+        path (str): Path of the route.
+        body (bytes): Body of the request. Default: b''.
+
+    Returns:
+        tuple[int, dict]: The status and the JSON payload of the response.
+    """
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def build_server(model,
+                 host='127.0.0.1',
+                 port=8080,
+                 max_batch_size=8,
+                 max_wait_ms=10.,
+                 max_pending=64,
+                 archs=None,
+                 slo_ms=None,
+                 target_ms=None):
+    """Build an :class:`InferenceServer` of a detector.
+
+    Args:
+        model (nn.Module): The loaded detector, see :func:`init_detector`.
+        host (str): Host to listen on. Default: '127.0.0.1'.
+        port (int): Port to listen on. Default: 8080.
+        max_batch_size (int): See :class:`MicroBatcher`. Default: 8.
+        max_wait_ms (float): See :class:`MicroBatcher`. Default: 10.
+        max_pending (int): See :class:`MicroBatcher`. Default: 64.
+        archs (dict[str, dict], optional): The arch of each tier, to serve
+            the subnets of a supernet with a :class:`SubnetSession`.
+            Default: None.
+        slo_ms (float, optional): See :class:`MicroBatcher`. Default: None.
+        target_ms (float, optional): The latency target of an
+            :class:`ArchController` switching the tiers. Default: None.
+
+    Returns:
+        :obj:`InferenceServer`: The server, to be started in an event loop.
+    """
+    if archs is None:
+        session = InferenceSession(model)
+    else:
+        session = SubnetSession(model, archs)
+    controller = None
+    if target_ms is not None:
+        assert archs is not None, 'the controller switches between archs'
+        controller = ArchController(session.tiers, target_ms)
+    batcher = MicroBatcher(
+        session,
+        max_batch_size=max_batch_size,
+        max_wait_ms=max_wait_ms,
+        max_pending=max_pending,
+        slo_ms=slo_ms,
+        controller=controller)
+    return InferenceServer(batcher, host=host, port=port)
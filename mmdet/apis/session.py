@@ -0,0 +1,331 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import copy
+
+import mmcv
+import numpy as np
+import torch
+from mmcv.ops import RoIPool
+from mmcv.parallel import collate
+
+from mmdet.core import DetectionResults
+from mmdet.datasets import replace_ImageToTensor
+from mmdet.datasets.pipelines import (Collect, Compose, DefaultFormatBundle,
+                                      LoadImageFromFile, LoadImageFromWebcam,
+                                      MultiScaleFlipAug, Normalize, Pad,
+                                      RandomFlip, Resize)
+from mmdet.models.detectors import SingleStageDetector
+
+# meta keys of the images preprocessed by the compiled pipeline
+_FAST_META_KEYS = ('filename', 'ori_filename', 'ori_shape', 'img_shape',
+                   'pad_shape', 'scale_factor', 'flip', 'flip_direction',
+                   'img_norm_cfg', 'keep_ratio', 'scale', 'pad_fixed_size',
+                   'pad_size_divisor')
+
+
+class InferenceSession(object):
+    """Run a detector on batches of images with a test pipeline built once.
+
+    :func:`inference_detector` copies the config, builds the test pipeline
+    and collates the data containers on every call. A session does it once:
+    the common single scale test pipelines (``Resize``, ``RandomFlip``
+    without flip, ``Normalize``, ``Pad`` and the formatting transforms) are
+    compiled into a single function, which resizes each image and writes it
+    normalized and padded into a preallocated batch buffer. The other
+    pipelines are built once and run as usual. The model is kept in eval
+    mode and run without grad.
+
+    Args:
+        model (nn.Module): The loaded detector, see :func:`init_detector`.
+        fast (bool): Whether to compile the test pipeline if it is
+            supported. Default: True.
+
+    Example:
+        >>> from mmdet.apis import InferenceSession, init_detector
+        >>> model = init_detector(config_file, checkpoint_file, 'cpu')
+        >>> session = InferenceSession(model)
+        >>> det_results = session.predict([img1, img2])
+        >>> bboxes, scores = det_results.bboxes, det_results.scores
+    """
+
+    def __init__(self, model, fast=True):
+        self.model = model.eval()
+        self.device = next(model.parameters()).device
+        if self.device.type == 'cpu':
+            for m in model.modules():
+                assert not isinstance(
+                    m, RoIPool
+                ), 'CPU inference with RoIPool is not supported currently.'
+        pipeline = copy.deepcopy(model.cfg.data.test.pipeline)
+        pipeline[0].type = 'LoadImageFromWebcam'
+        self.pipeline = Compose(replace_ImageToTensor(pipeline))
+        self.compiled = self._compile(self.pipeline) if fast else None
+        self._buffer = None
+
+    @staticmethod
+    def _compile(pipeline):
+        """Get the parameters of the fused preprocessing of a pipeline.
+
+        Returns:
+            dict | None: The parameters, None if the pipeline is not
+                supported.
+        """
+        transforms = pipeline.transforms
+        if len(transforms) != 2 or not isinstance(
+                transforms[0], (LoadImageFromFile, LoadImageFromWebcam)):
+            return None
+        aug = transforms[1]
+        if (not isinstance(aug, MultiScaleFlipAug) or aug.flip
+                or aug.scale_key != 'scale' or len(aug.img_scale) != 1):
+            return None
+
+        compiled = dict(scale=aug.img_scale[0], normalize=None, pad=None)
+        aug_transforms = list(aug.transforms.transforms)
+        resize = aug_transforms.pop(0) if aug_transforms else None
+        if type(resize) is not Resize or resize.ratio_range is not None:
+            return None
+        compiled.update(keep_ratio=resize.keep_ratio, backend=resize.backend)
+        # the transforms must come in this order, each at most once
+        for transform in aug_transforms[:-2]:
+            if type(transform) is RandomFlip:
+                continue
+            elif type(transform) is Normalize and compiled['pad'] is None \
+                    and compiled['normalize'] is None:
+                compiled['normalize'] = transform
+            elif type(transform) is Pad and compiled['pad'] is None:
+                compiled['pad'] = transform
+            else:
+                return None
+        if len(aug_transforms) < 2:
+            return None
+        bundle, collect = aug_transforms[-2:]
+        if type(bundle) is not DefaultFormatBundle or not bundle.img_to_float \
+                or type(collect) is not Collect or collect.keys != ['img'] \
+                or not set(collect.meta_keys) <= set(_FAST_META_KEYS):
+            return None
+        compiled.update(
+            batch_pad_val=bundle.pad_val['img'], meta_keys=collect.meta_keys)
+        return compiled
+
+    def _resize(self, img):
+        """Resize an image like :class:`Resize`."""
+        compiled = self.compiled
+        if compiled['keep_ratio']:
+            resized = mmcv.imrescale(
+                img, compiled['scale'], backend=compiled['backend'])
+            w_scale = resized.shape[1] / img.shape[1]
+            h_scale = resized.shape[0] / img.shape[0]
+        else:
+            resized, w_scale, h_scale = mmcv.imresize(
+                img,
+                compiled['scale'],
+                return_scale=True,
+                backend=compiled['backend'])
+        scale_factor = np.array([w_scale, h_scale, w_scale, h_scale],
+                                dtype=np.float32)
+        return resized, scale_factor
+
+    def _pad_shape(self, img_shape):
+        """The shape of an image padded like :class:`Pad`."""
+        pad = self.compiled['pad']
+        if pad is None:
+            return img_shape
+        elif pad.pad_to_square:
+            max_size = max(img_shape[:2])
+            return (max_size, max_size) + img_shape[2:]
+        elif pad.size is not None:
+            return tuple(pad.size) + img_shape[2:]
+        else:
+            divisor = pad.size_divisor
+            pad_h = int(np.ceil(img_shape[0] / divisor)) * divisor
+            pad_w = int(np.ceil(img_shape[1] / divisor)) * divisor
+            return (pad_h, pad_w) + img_shape[2:]
+
+    def input_shape(self, img):
+        """Get the padded shape of an image once preprocessed.
+
+        Images of the same input shape can be batched without extra padding.
+        It is the shape of the image itself if the pipeline is not compiled.
+
+        Args:
+            img (np.ndarray): A loaded image.
+
+        Returns:
+            tuple[int]: The height and width.
+        """
+        if self.compiled is None:
+            return img.shape[:2]
+        h, w = img.shape[:2]
+        if self.compiled['keep_ratio']:
+            new_w, new_h = mmcv.rescale_size((w, h), self.compiled['scale'])
+        else:
+            new_w, new_h = self.compiled['scale']
+        return self._pad_shape((new_h, new_w))[:2]
+
+    def _get_buffer(self, shape):
+        """Get the batch buffer, reused while the batch shape is the same."""
+        if self._buffer is None or self._buffer.shape != shape:
+            self._buffer = torch.empty(
+                shape,
+                dtype=torch.float32,
+                pin_memory=self.device.type == 'cuda')
+        return self._buffer
+
+    def _fast_preprocess(self, imgs):
+        """Preprocess images with the compiled pipeline."""
+        compiled = self.compiled
+        normalize, pad = compiled['normalize'], compiled['pad']
+        resized, img_metas = [], []
+        for img in imgs:
+            img_resized, scale_factor = self._resize(img)
+            pad_shape = self._pad_shape(img_resized.shape)
+            num_channels = 1 if img_resized.ndim < 3 else img_resized.shape[2]
+            if normalize is not None:
+                img_norm_cfg = dict(
+                    mean=normalize.mean,
+                    std=normalize.std,
+                    to_rgb=normalize.to_rgb)
+            else:
+                img_norm_cfg = dict(
+                    mean=np.zeros(num_channels, dtype=np.float32),
+                    std=np.ones(num_channels, dtype=np.float32),
+                    to_rgb=False)
+            img_meta = dict(
+                filename=None,
+                ori_filename=None,
+                ori_shape=img.shape,
+                img_shape=img_resized.shape,
+                pad_shape=pad_shape,
+                scale_factor=scale_factor,
+                flip=False,
+                flip_direction=None,
+                img_norm_cfg=img_norm_cfg,
+                keep_ratio=compiled['keep_ratio'],
+                scale=compiled['scale'],
+                pad_fixed_size=None if pad is None else
+                (pad_shape[:2] if pad.pad_to_square else pad.size),
+                pad_size_divisor=None if pad is None else pad.size_divisor)
+            resized.append(img_resized)
+            img_metas.append(
+                {key: img_meta[key]
+                 for key in compiled['meta_keys']})
+
+        batch_h = max(img_meta['pad_shape'][0] for img_meta in img_metas)
+        batch_w = max(img_meta['pad_shape'][1] for img_meta in img_metas)
+        buffer = self._get_buffer((len(imgs), num_channels, batch_h, batch_w))
+        batch = buffer.numpy()
+        for i, (img, img_meta) in enumerate(zip(resized, img_metas)):
+            h, w = img.shape[:2]
+            pad_h, pad_w = img_meta['pad_shape'][:2]
+            # the pad of the batch, then the pad of the image
+            batch[i, :, pad_h:] = compiled['batch_pad_val']
+            batch[i, :, :pad_h, pad_w:] = compiled['batch_pad_val']
+            if pad is not None:
+                pad_val = np.reshape(pad.pad_val.get('img', 0), (-1, 1, 1))
+                batch[i, :, h:pad_h, :pad_w] = pad_val
+                batch[i, :, :h, w:pad_w] = pad_val
+            if normalize is not None:
+                # normalized in place like mmcv.imnormalize, to get the same
+                # values
+                img = mmcv.imnormalize_(
+                    img.astype(np.float32), normalize.mean, normalize.std,
+                    normalize.to_rgb)
+            if img.ndim == 3:
+                img = img.transpose(2, 0, 1)
+            batch[i, :, :h, :w] = img
+        img = buffer
+        if self.device.type == 'cuda':
+            img = img.to(self.device, non_blocking=True)
+        return [img], [img_metas]
+
+    def preprocess(self, imgs):
+        """Preprocess a batch of images.
+
+        Args:
+            imgs (list[np.ndarray]): Loaded images in BGR order.
+
+        Returns:
+            tuple[list]: The batch of images of each augmentation, of shape
+                (N, C, H, W) on the device of the model, and their meta
+                info. There is a single augmentation if the pipeline is
+                compiled, and its batch is a buffer reused by the next call.
+        """
+        if self.compiled is not None:
+            return self._fast_preprocess(imgs)
+        data = collate([self.pipeline(dict(img=img)) for img in imgs],
+                       samples_per_gpu=len(imgs))
+        img_metas = [img_metas.data[0] for img_metas in data['img_metas']]
+        imgs = [img.data[0].to(self.device) for img in data['img']]
+        return imgs, img_metas
+
+    def _forward(self, imgs, img_metas):
+        """Run the model.
+
+        Returns:
+            tuple[list, bool]: The results and whether they are the dets and
+                labels of each image rather than the results of
+                :func:`bbox2result`.
+        """
+        model = self.model
+        # single stage detectors skip the per class results of bbox2result
+        if len(imgs) == 1 and isinstance(model, SingleStageDetector) and type(
+                model).simple_test is SingleStageDetector.simple_test:
+            img, img_metas = imgs[0], img_metas[0]
+            for img_meta in img_metas:
+                img_meta['batch_input_shape'] = tuple(img.size()[-2:])
+            feat = model.extract_feat(img)
+            results_list = model.bbox_head.simple_test(
+                feat, img_metas, rescale=True)
+            return [(det_bboxes.cpu().numpy(), det_labels.cpu().numpy())
+                    for det_bboxes, det_labels in results_list], True
+        return model(
+            return_loss=False, rescale=True, img=imgs,
+            img_metas=img_metas), False
+
+    def predict(self, imgs):
+        """Detect the objects of a batch of images.
+
+        Args:
+            imgs (list[np.ndarray]): Loaded images in BGR order.
+
+        Returns:
+            :obj:`DetectionResults`: The bbox results of the images.
+        """
+        if len(imgs) == 0:
+            num_classes = len(self.model.CLASSES)
+            return DetectionResults.from_list([], num_classes=num_classes)
+        return self.run(*self.preprocess(imgs))
+
+    def run(self, imgs, img_metas):
+        """Detect the objects of a batch of preprocessed images.
+
+        Args:
+            imgs (list[Tensor]): The batch of images of each augmentation,
+                see :meth:`preprocess`.
+            img_metas (list[list[dict]]): Their meta info.
+
+        Returns:
+            :obj:`DetectionResults`: The bbox results of the images.
+        """
+        with torch.no_grad():
+            results, flat = self._forward(imgs, img_metas)
+        if not flat:
+            return DetectionResults.from_list(results)
+
+        # sort the dets of each image by class, like bbox2result
+        num_dets = np.array([len(labels) for _, labels in results])
+        img_offsets = np.zeros(len(results) + 1, dtype=np.int64)
+        np.cumsum(num_dets, out=img_offsets[1:])
+        # the dets of an image without any det may have no score column
+        dets = np.concatenate([np.zeros((0, 5), dtype=np.float32)] +
+                              [dets for dets, _ in results if len(dets)])
+        labels = np.concatenate([labels for _, labels in results])
+        img_ids = np.repeat(np.arange(len(results), dtype=np.int32), num_dets)
+        order = np.lexsort((labels, img_ids))
+        dets = dets[order]
+        return DetectionResults(
+            np.ascontiguousarray(dets[:, :4]),
+            np.ascontiguousarray(dets[:, 4]),
+            labels[order].astype(np.int32),
+            img_offsets,
+            self.model.bbox_head.num_classes,
+            img_ids=img_ids)
@@ -0,0 +1,240 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import queue
+import threading
+import time
+
+import mmcv
+import torch
+import torch.nn as nn
+
+from .server import LatencyHistogram
+from .session import InferenceSession
+
+_STAGES = ('decode', 'preprocess', 'model', 'postprocess')
+
+
+class StreamInference(object):
+    """Detect the objects of a video stream with pipelined stages.
+
+    The sequential loop of ``demo/video_demo.py`` decodes, preprocesses,
+    detects and draws a frame before reading the next one. Here the four
+    stages run in their own threads, connected by queues of ``queue_size``
+    frames, so that the decoding and the preprocessing of the next frames
+    and the drawing of the previous ones overlap the model. OpenCV and
+    PyTorch release the GIL in their kernels, so the stages run in parallel
+    on multi-core CPUs and the FPS is the one of the slowest stage.
+
+    When the model falls behind the decoder, the queue of the decoded
+    frames fills up. With ``drop='none'``, the decoder waits and every frame
+    is detected, e.g. for a video file. With ``drop='oldest'``, the oldest
+    queued frame is dropped for the new one, so that the detected frames
+    are the latest ones of a live stream. With ``drop='newest'``, the new
+    frame is dropped.
+
+    The model runs at the current arch of a :class:`SubnetSession`.
+
+    Args:
+        model (nn.Module | :obj:`InferenceSession`): The loaded detector or
+            a session of it.
+        postprocess (callable, optional): Called as
+            ``postprocess(frame, det_results)`` in the postprocess stage,
+            e.g. to draw the dets, its output is yielded instead of the
+            results. Default: None.
+        queue_size (int): Max number of frames queued between two stages.
+            Default: 2.
+        drop (str): What to drop when the queue of the decoded frames is
+            full, 'none', 'oldest' or 'newest'. Default: 'none'.
+        fps (float, optional): Rate the frames are decoded at, e.g. to replay
+            a video file as a live stream, as fast as possible if None.
+            Default: None.
+
+    Example:
+        >>> from mmdet.apis import StreamInference, init_detector
+        >>> model = init_detector(config_file, checkpoint_file, 'cpu')
+        >>> stream = StreamInference(model, drop='oldest')
+        >>> for frame_id, frame, det_results in stream.run('video.mp4'):
+        ...     bboxes, scores = det_results.bboxes, det_results.scores
+        >>> stream.stats()['fps']
+    """
+
+    def __init__(self,
+                 model,
+                 postprocess=None,
+                 queue_size=2,
+                 drop='none',
+                 fps=None):
+        assert queue_size >= 1
+        assert drop in ('none', 'oldest', 'newest')
+        if isinstance(model, nn.Module):
+            model = InferenceSession(model)
+        self.session = model
+        self.postprocess = postprocess
+        self.queue_size = queue_size
+        self.drop = drop
+        self.fps = fps
+        self.latency = LatencyHistogram()
+        self.num_frames = 0
+        self.num_dropped = 0
+        self.elapsed = 0.
+        # the busy time of each stage, in seconds
+        self.busy = dict.fromkeys(_STAGES, 0.)
+
+    @staticmethod
+    def _put(frames, item, stop):
+        """Put an item in the queue unless the consumer has stopped."""
+        while not stop.is_set():
+            try:
+                frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _push(self, frames, item, stop):
+        """Put a decoded frame in the queue, with the drop policy."""
+        if self.drop == 'none':
+            return self._put(frames, item, stop)
+        try:
+            frames.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        self.num_dropped += 1
+        if self.drop == 'oldest':
+            try:
+                frames.get_nowait()
+            except queue.Empty:
+                # the next stage has just taken it
+                self.num_dropped -= 1
+            # the decoder is the only producer, so there is room now
+            frames.put_nowait(item)
+        return True
+
+    def _decode(self, frames, out_frames, stop):
+        try:
+            frames = iter(frames)
+            frame_id = 0
+            next_time = time.perf_counter()
+            while not stop.is_set():
+                if self.fps is not None:
+                    time.sleep(max(next_time - time.perf_counter(), 0))
+                    next_time += 1 / self.fps
+                start = time.perf_counter()
+                frame = next(frames, None)
+                if frame is None:
+                    break
+                self.busy['decode'] += time.perf_counter() - start
+                if not self._push(out_frames,
+                                  (frame_id, start, frame, None), stop):
+                    return
+                frame_id += 1
+            self._put(out_frames, StopIteration(), stop)
+        except BaseException as e:  # noqa: B902
+            self._put(out_frames, e, stop)
+
+    def _stage(self, name, func, in_frames, out_frames, stop):
+        while not stop.is_set():
+            try:
+                item = in_frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if isinstance(item, BaseException):
+                # the end of the stream or an error, passed down
+                self._put(out_frames, item, stop)
+                return
+            frame_id, arrival, frame, data = item
+            start = time.perf_counter()
+            try:
+                data = func(frame, data)
+            except BaseException as e:  # noqa: B902
+                self._put(out_frames, e, stop)
+                return
+            self.busy[name] += time.perf_counter() - start
+            if not self._put(out_frames,
+                             (frame_id, arrival, frame, data), stop):
+                return
+
+    def _preprocess(self, frame, _):
+        imgs, img_metas = self.session.preprocess([frame])
+        if getattr(self.session, 'compiled', None) is not None:
+            # the compiled pipeline writes the next frame into the same
+            # batch buffer while the model runs on this one
+            if imgs[0].is_cuda:
+                torch.cuda.current_stream(imgs[0].device).synchronize()
+            else:
+                imgs = [img.clone() for img in imgs]
+        return imgs, img_metas
+
+    def _detect(self, frame, data):
+        return self.session.run(*data)
+
+    def _postprocess(self, frame, det_results):
+        if self.postprocess is None:
+            return det_results
+        return self.postprocess(frame, det_results)
+
+    def run(self, frames):
+        """Detect the objects of the frames of a stream.
+
+        Args:
+            frames (str | Iterable[np.ndarray]): A video file, read by
+                :class:`mmcv.VideoReader`, or the frames in BGR order, e.g.
+                of a camera.
+
+        Yields:
+            tuple[int, np.ndarray, object]: The index of the frame in the
+                stream, the frame and its :obj:`DetectionResults`, or the
+                output of ``postprocess``.
+        """
+        if isinstance(frames, str):
+            frames = mmcv.VideoReader(frames)
+        stop = threading.Event()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in _STAGES]
+        threads = [
+            threading.Thread(
+                target=self._decode,
+                args=(frames, queues[0], stop),
+                daemon=True)
+        ]
+        funcs = [self._preprocess, self._detect, self._postprocess]
+        for i, (name, func) in enumerate(zip(_STAGES[1:], funcs)):
+            threads.append(
+                threading.Thread(
+                    target=self._stage,
+                    args=(name, func, queues[i], queues[i + 1], stop),
+                    daemon=True))
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = queues[-1].get()
+                if isinstance(item, StopIteration):
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                frame_id, arrival, frame, output = item
+                self.latency.add(time.perf_counter() - arrival)
+                self.num_frames += 1
+                yield frame_id, frame, output
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            self.elapsed += time.perf_counter() - start
+
+    def stats(self):
+        """Get the FPS, the latency summary from the decoding to the end of
+        the postprocessing, the number of dropped frames and the mean busy
+        time of each stage per frame, in ms, the slowest stage bounding the
+        FPS."""
+        num_frames = max(self.num_frames, 1)
+        return dict(
+            num_frames=self.num_frames,
+            num_dropped=self.num_dropped,
+            fps=self.num_frames / self.elapsed if self.elapsed else 0.,
+            latency_ms=self.latency.summary(),
+            stage_ms={
+                name: busy * 1000 / num_frames
+                for name, busy in self.busy.items()
+            })
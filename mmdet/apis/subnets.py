@@ -0,0 +1,205 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from .session import InferenceSession
+
+
+def _arch_state(model):
+    """Get the plain attributes of the modules of a model.
+
+    Returns:
+        dict: The values of the attributes, keyed by module and name.
+    """
+    state = {}
+    for module in model.modules():
+        for name, value in vars(module).items():
+            if not name.startswith('_') and isinstance(
+                    value, (int, float, str, tuple, list, dict)):
+                state[(module, name)] = copy.deepcopy(value)
+    return state
+
+
+class SubnetSession(InferenceSession):
+    """Serve several subnets of a searchable supernet with one model.
+
+    Each tier is an arch of the supernet, as given to its ``set_arch``.
+    ``set_arch`` only sets the widths and depths of the modules:
+    :class:`USConv2d` and :class:`USBatchNorm2d` slice their parameters at
+    forward time and the slices are views, so all the tiers share the
+    weights of the supernet. The attributes written by ``set_arch`` of each
+    tier are recorded once, switching to a tier only writes back the ones
+    which differ between the tiers.
+
+    A batch runs on the tier it is asked for, or on the most accurate tier
+    whose estimated latency meets its latency SLO. The latency of a tier is
+    estimated as the batch size times a moving average of its latency per
+    image, measured on each batch. A tier which has not run yet is assumed
+    to meet any SLO, see :meth:`profile` to measure the tiers beforehand.
+
+    Args:
+        model (nn.Module): The loaded supernet, with a ``set_arch`` method,
+            e.g. :class:`YOLOX_Searchable_Sandwich`.
+        archs (dict[str, dict]): The arch of each tier, ordered from the
+            most accurate to the fastest.
+        fast (bool): Whether to compile the test pipeline, see
+            :class:`InferenceSession`. Default: True.
+        latency_ms (dict[str, float], optional): The initial estimate of
+            the latency per image of the tiers, in ms. Default: None.
+        momentum (float): Weight of a new measure in the moving average of
+            the latency. Default: 0.2.
+
+    Example:
+        >>> archs = dict(large=large_arch, small=small_arch)
+        >>> session = SubnetSession(model, archs)
+        >>> det_results = session.predict(imgs, tier='small')
+        >>> det_results = session.predict(imgs, slo_ms=50)
+        >>> session.tier  # the tier of the last batch
+    """
+
+    def __init__(self, model, archs, fast=True, latency_ms=None, momentum=0.2):
+        super(SubnetSession, self).__init__(model, fast=fast)
+        assert len(archs) > 0, 'at least one arch is required'
+        self.archs = OrderedDict(archs)
+        self.momentum = momentum
+        self.latency_ms = dict(latency_ms or {})
+        self.num_imgs = {tier: 0 for tier in self.archs}
+        self.num_batches = {tier: 0 for tier in self.archs}
+        self.num_switches = 0
+        self.switch_ms = 0.
+        self._lock = threading.Lock()
+
+        # set every arch once, so that the attributes created by set_arch
+        # exist in the state of each tier
+        for arch in self.archs.values():
+            model.set_arch(arch)
+        states = OrderedDict()
+        for tier, arch in self.archs.items():
+            model.set_arch(arch)
+            states[tier] = _arch_state(model)
+        first = next(iter(states.values()))
+        keys = [
+            key for key in first if any(
+                state.get(key, first[key]) != first[key]
+                for state in states.values())
+        ]
+        self._plans = {
+            tier: [(module, name, state[(module, name)])
+                   for module, name in keys if (module, name) in state]
+            for tier, state in states.items()
+        }
+        self.tier = None
+        self.switch(next(iter(self.archs)))
+        self.num_switches, self.switch_ms = 0, 0.
+
+    @property
+    def tiers(self):
+        return list(self.archs)
+
+    def switch(self, tier):
+        """Set the arch of a tier in the supernet.
+
+        The number of switches and their total time in ms are accounted in
+        ``self.num_switches`` and ``self.switch_ms``.
+        """
+        if tier == self.tier:
+            return
+        start = time.perf_counter()
+        for module, name, value in self._plans[tier]:
+            setattr(module, name, copy.copy(value))
+        self.tier = tier
+        self.num_switches += 1
+        self.switch_ms += (time.perf_counter() - start) * 1000
+
+    def route(self, num_imgs, tier=None, slo_ms=None):
+        """Choose the tier of a batch.
+
+        Args:
+            num_imgs (int): The batch size.
+            tier (str, optional): The tier asked for, it has precedence
+                over the SLO. Default: None.
+            slo_ms (float, optional): The latency SLO of the batch, in ms.
+                The fastest tier is chosen if no tier meets it. Default:
+                None, the most accurate tier.
+
+        Returns:
+            str: The tier.
+        """
+        if tier is not None:
+            if tier not in self.archs:
+                raise KeyError(f'unknown tier {tier}, the tiers are '
+                               f'{self.tiers}')
+            return tier
+        tiers = self.tiers
+        if slo_ms is None:
+            return tiers[0]
+        for tier in tiers:
+            if self.latency_ms.get(tier, 0.) * num_imgs <= slo_ms:
+                return tier
+        return tiers[-1]
+
+    def predict(self, imgs, tier=None, slo_ms=None):
+        """Detect the objects of a batch of images with a tier.
+
+        Args:
+            imgs (list[np.ndarray]): Loaded images in BGR order.
+            tier (str, optional): See :meth:`route`. Default: None.
+            slo_ms (float, optional): See :meth:`route`. Default: None.
+
+        Returns:
+            :obj:`DetectionResults`: The bbox results of the images, the
+                tier they ran on is set in ``self.tier``.
+        """
+        with self._lock:
+            tier = self.route(len(imgs), tier, slo_ms)
+            self.switch(tier)
+            start = time.perf_counter()
+            det_results = super(SubnetSession, self).predict(imgs)
+            if len(imgs):
+                latency = (time.perf_counter() - start) * 1000 / len(imgs)
+                if tier in self.latency_ms:
+                    latency = (1 - self.momentum) * self.latency_ms[tier] + \
+                        self.momentum * latency
+                self.latency_ms[tier] = latency
+                self.num_imgs[tier] += len(imgs)
+                self.num_batches[tier] += 1
+        return det_results
+
+    def profile(self, img, batch_size=1, repeat=3):
+        """Measure the latency per image of each tier.
+
+        The first run of a tier is a warmup, the estimate is the mean latency
+        of the next ``repeat`` runs.
+
+        Args:
+            img (np.ndarray): A loaded image.
+            batch_size (int): The batch size of the runs. Default: 1.
+            repeat (int): The number of measured runs. Default: 3.
+
+        Returns:
+            dict[str, float]: The latency per image of each tier, in ms.
+        """
+        imgs = [img] * batch_size
+        for tier in self.archs:
+            with self._lock:
+                self.switch(tier)
+                InferenceSession.predict(self, imgs)
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    InferenceSession.predict(self, imgs)
+                self.latency_ms[tier] = (time.perf_counter() - start) * \
+                    1000 / (repeat * batch_size)
+        return dict(self.latency_ms)
+
+    def stats(self):
+        """Get the number of batches and images and the latency estimate per
+        image of each tier."""
+        return {
+            tier: dict(
+                num_batches=self.num_batches[tier],
+                num_imgs=self.num_imgs[tier],
+                latency_ms=self.latency_ms.get(tier))
+            for tier in self.archs
+        }
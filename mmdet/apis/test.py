@@ -6,22 +6,55 @@ import tempfile
 import time
 
 import mmcv
+import numpy as np
 import torch
 import torch.distributed as dist
 from mmcv.image import tensor2imgs
 from mmcv.runner import get_dist_info
 
 from mmdet.core import encode_mask_results
+from mmdet.datasets.samplers import (ShapeBucketBatchSampler,
+                                     restore_dataset_order)
+
+
+def _sample_indices(data_loader):
+    """Get the dataset index of every sample in iteration order."""
+    if isinstance(data_loader.batch_sampler, ShapeBucketBatchSampler):
+        return data_loader.batch_sampler.indices
+    return list(data_loader.sampler)
 
 
 def single_gpu_test(model,
                     data_loader,
                     show=False,
                     out_dir=None,
-                    show_score_thr=0.3):
+                    show_score_thr=0.3,
+                    evaluator=None):
+    """Test model with a single gpu.
+
+    Args:
+        model (nn.Module): Model to be tested.
+        data_loader (nn.Dataloader): Pytorch data loader.
+        show (bool): Whether to show the results. Default: False.
+        out_dir (str, optional): Directory to save the drawn results.
+            Default: None.
+        show_score_thr (float): Score threshold of the shown bboxes.
+            Default: 0.3.
+        evaluator (:obj:`MeanAPEvaluator` | :obj:`CocoEvaluator`, optional):
+            If given, the results of each batch are folded into it instead
+            of being gathered.
+            Default: None.
+
+    Returns:
+        list | :obj:`MeanAPEvaluator` | :obj:`CocoEvaluator`: The
+            prediction results, or the evaluator updated with them.
+    """
     model.eval()
     results = []
     dataset = data_loader.dataset
+    if evaluator is not None:
+        indices = _sample_indices(data_loader)
+        num_done = 0
     PALETTE = getattr(dataset, 'PALETTE', None)
     prog_bar = mmcv.ProgressBar(len(dataset))
     for i, data in enumerate(data_loader):
@@ -60,18 +93,33 @@ def single_gpu_test(model,
                     out_file=out_file,
                     score_thr=show_score_thr)
 
-        # encode mask results
-        if isinstance(result[0], tuple):
-            result = [(bbox_results, encode_mask_results(mask_results))
-                      for bbox_results, mask_results in result]
-        results.extend(result)
+        if evaluator is not None:
+            evaluator.update(result, indices[num_done:num_done + batch_size])
+            num_done += batch_size
+        else:
+            # encode mask results
+            if isinstance(result[0], tuple):
+                result = [(bbox_results, encode_mask_results(mask_results))
+                          for bbox_results, mask_results in result]
+            results.extend(result)
 
         for _ in range(batch_size):
             prog_bar.update()
+
+    if evaluator is not None:
+        return evaluator
+    if isinstance(data_loader.batch_sampler, ShapeBucketBatchSampler):
+        results = restore_dataset_order(
+            results, data_loader.batch_sampler.indices, len(dataset))
     return results
 
 
-def multi_gpu_test(model, data_loader, tmpdir=None, gpu_collect=False):
+def multi_gpu_test(model,
+                   data_loader,
+                   tmpdir=None,
+                   gpu_collect=False,
+                   evaluator=None,
+                   collect_backend=None):
     """Test model with multiple gpus.
 
     This method tests model with multiple gpus and collects the results
@@ -86,13 +134,26 @@ def multi_gpu_test(model, data_loader, tmpdir=None, gpu_collect=False):
         tmpdir (str): Path of directory to save the temporary results from
             different gpus under cpu mode.
         gpu_collect (bool): Option to use either gpu or cpu to collect results.
+        evaluator (:obj:`MeanAPEvaluator` | :obj:`CocoEvaluator`, optional):
+            If given, the results of each batch are folded into it instead
+            of being gathered, and only the evaluators of the ranks are
+            collected and merged.
+            Default: None.
+        collect_backend (str, optional): If set to 'gloo' or 'shm', bbox
+            results are collected as flat arrays by
+            :func:`collect_results_flat` instead of pickles, and
+            ``tmpdir`` and ``gpu_collect`` are ignored. Default: None.
 
     Returns:
-        list: The prediction results.
+        list | :obj:`MeanAPEvaluator` | :obj:`CocoEvaluator`: The
+            prediction results, or the evaluator updated with them.
     """
     model.eval()
     results = []
     dataset = data_loader.dataset
+    if evaluator is not None:
+        indices = _sample_indices(data_loader)
+        num_done = 0
     rank, world_size = get_dist_info()
     if rank == 0:
         prog_bar = mmcv.ProgressBar(len(dataset))
@@ -100,25 +161,68 @@ def multi_gpu_test(model, data_loader, tmpdir=None, gpu_collect=False):
     for i, data in enumerate(data_loader):
         with torch.no_grad():
             result = model(return_loss=False, rescale=True, **data)
+        batch_size = len(result)
+        if evaluator is not None:
+            evaluator.update(result, indices[num_done:num_done + batch_size])
+            num_done += batch_size
+        else:
             # encode mask results
             if isinstance(result[0], tuple):
                 result = [(bbox_results, encode_mask_results(mask_results))
                           for bbox_results, mask_results in result]
-        results.extend(result)
+            results.extend(result)
 
         if rank == 0:
-            batch_size = len(result)
             for _ in range(batch_size * world_size):
                 prog_bar.update()
 
+    if evaluator is not None:
+        return merge_evaluators(evaluator, tmpdir, gpu_collect)
+    if collect_backend is not None:
+        return collect_results_flat(results, _sample_indices(data_loader),
+                                    len(dataset), collect_backend)
+
+    batch_sampler = data_loader.batch_sampler
+    if isinstance(batch_sampler, ShapeBucketBatchSampler):
+        # ranks hold different numbers of results, so collect one
+        # (indices, results) part per rank and reorder on rank 0
+        results = [(batch_sampler.indices, results)]
+        size = world_size
+    else:
+        size = len(dataset)
+
     # collect results from all ranks
     if gpu_collect:
-        results = collect_results_gpu(results, len(dataset))
+        results = collect_results_gpu(results, size)
     else:
-        results = collect_results_cpu(results, len(dataset), tmpdir)
+        results = collect_results_cpu(results, size, tmpdir)
+
+    if rank == 0 and isinstance(batch_sampler, ShapeBucketBatchSampler):
+        indices = [idx for part_indices, _ in results for idx in part_indices]
+        results = [res for _, part_results in results for res in part_results]
+        results = restore_dataset_order(results, indices, len(dataset))
     return results
 
 
+def merge_evaluators(evaluator, tmpdir=None, gpu_collect=False):
+    """Merge the evaluators of all ranks into the one of rank 0.
+
+    Returns:
+        :obj:`MeanAPEvaluator` | :obj:`CocoEvaluator` | None: The merged
+            evaluator on rank 0, None on the other ranks.
+    """
+    rank, world_size = get_dist_info()
+    if gpu_collect:
+        evaluators = collect_results_gpu([evaluator], world_size)
+    else:
+        evaluators = collect_results_cpu([evaluator], world_size, tmpdir)
+    if rank != 0:
+        return None
+    for other in evaluators[1:]:
+        evaluator.merge(other)
+    return evaluator
+
+
 def collect_results_cpu(result_part, size, tmpdir=None):
     rank, world_size = get_dist_info()
     # create a tmp dir if it is not specified
@@ -193,3 +297,155 @@ def collect_results_gpu(result_part, size):
         # the dataloader may pad some samples
         ordered_results = ordered_results[:size]
         return ordered_results
+
+
+def _encode_bbox_results(results, indices):
+    """Flatten bbox results into an int64 and a float32 array.
+
+    The int64 array holds the number of images and classes, the dataset
+    index of each image and the number of boxes of each image and class.
+    The float32 array holds all the boxes.
+    """
+    num_classes = len(results[0]) if len(results) else 0
+    counts = np.zeros((len(results), num_classes), dtype=np.int64)
+    bboxes = []
+    for i, result in enumerate(results):
+        assert not isinstance(result, tuple), \
+            'only bbox results can be collected as flat arrays'
+        for j, class_bboxes in enumerate(result):
+            counts[i, j] = len(class_bboxes)
+            bboxes.append(class_bboxes.reshape(-1))
+    int_part = np.concatenate([
+        np.array([len(results), num_classes], dtype=np.int64),
+        np.asarray(indices[:len(results)], dtype=np.int64),
+        counts.reshape(-1)
+    ])
+    float_part = np.concatenate(bboxes).astype(
+        np.float32, copy=False) if bboxes else np.zeros(0, np.float32)
+    return int_part, float_part
+
+
+def _decode_bbox_results(int_part, float_part):
+    """Inverse of :func:`_encode_bbox_results`."""
+    num_imgs, num_classes = int_part[:2]
+    indices = int_part[2:2 + num_imgs]
+    counts = int_part[2 + num_imgs:].reshape(num_imgs, num_classes)
+    bboxes = np.split(float_part.reshape(-1, 5), np.cumsum(counts)[:-1])
+    results = [
+        bboxes[i * num_classes:(i + 1) * num_classes] for i in range(num_imgs)
+    ]
+    return indices.tolist(), results
+
+
+_GLOO_GROUP = None
+
+
+def _get_gloo_group():
+    """Get a process group of all ranks on the gloo backend."""
+    global _GLOO_GROUP
+    if dist.get_backend() == 'gloo':
+        return dist.group.WORLD
+    if _GLOO_GROUP is None:
+        _GLOO_GROUP = dist.new_group(backend='gloo')
+    return _GLOO_GROUP
+
+
+def _gather_gloo(int_part, float_part, group):
+    rank, world_size = get_dist_info()
+    parts = []
+    for part in (int_part, float_part):
+        part = torch.from_numpy(part)
+        size = torch.tensor([len(part)])
+        size_list = [size.clone() for _ in range(world_size)]
+        dist.all_gather(size_list, size, group=group)
+        # gather needs tensors of the same size
+        part_send = part.new_zeros(max(size_list).item())
+        part_send[:len(part)] = part
+        part_recv_list = [part_send.clone()
+                          for _ in range(world_size)] if rank == 0 else None
+        dist.gather(part_send, part_recv_list, dst=0, group=group)
+        if rank == 0:
+            parts.append([
+                recv[:size.item()].numpy()
+                for recv, size in zip(part_recv_list, size_list)
+            ])
+    return list(zip(*parts)) if rank == 0 else None
+
+
+def _gather_shm(int_part, float_part, group):
+    from multiprocessing import resource_tracker, shared_memory
+
+    rank, world_size = get_dist_info()
+    token = torch.randint(2**62, (1, )) if rank == 0 else torch.zeros(
+        1, dtype=torch.int64)
+    dist.broadcast(token, 0, group=group)
+    prefix = f'mmdet_results_{token.item():x}'
+
+    header = np.array([len(int_part), len(float_part)], dtype=np.int64)
+    shm = shared_memory.SharedMemory(
+        name=f'{prefix}_{rank}',
+        create=True,
+        size=header.nbytes + int_part.nbytes + float_part.nbytes)
+    offset = 0
+    for array in (header, int_part, float_part):
+        shm.buf[offset:offset + array.nbytes] = array.tobytes()
+        offset += array.nbytes
+    dist.barrier(group=group)
+
+    parts = None
+    if rank == 0:
+        parts = []
+        for i in range(world_size):
+            part_shm = shared_memory.SharedMemory(name=f'{prefix}_{i}')
+            if i != rank:
+                # the segment is unlinked by its owner, do not track it here
+                resource_tracker.unregister(part_shm._name, 'shared_memory')
+            buf = part_shm.buf
+            int_size, float_size = np.frombuffer(buf, np.int64, 2)
+            start = header.nbytes
+            end = start + int(int_size) * 8
+            parts.append((np.frombuffer(buf[start:end], np.int64).copy(),
+                          np.frombuffer(buf[end:end + int(float_size) * 4],
+                                        np.float32).copy()))
+            del buf
+            part_shm.close()
+    dist.barrier(group=group)
+    shm.close()
+    shm.unlink()
+    return parts
+
+
+def collect_results_flat(result_part, indices, size, backend='gloo'):
+    """Collect bbox results of all ranks without pickle or disk.
+
+    The boxes of each rank are serialised as a flat float32 array plus int64
+    offsets, and gathered to rank 0 over a gloo group or, when all the ranks
+    are on a single node, through shared memory.
+
+    Args:
+        result_part (list[list[np.ndarray]]): Bbox results of this rank.
+        indices (list[int]): Dataset index of each result of this rank, may
+            contain more indices than results.
+        size (int): Size of the dataset.
+        backend (str): 'gloo' or 'shm'. Default: 'gloo'.
+
+    Returns:
+        list | None: The results in dataset order on rank 0, None on the
+            other ranks.
+    """
+    assert backend in ('gloo', 'shm'), f'unknown backend {backend}'
+    int_part, float_part = _encode_bbox_results(result_part, indices)
+    group = _get_gloo_group()
+    if backend == 'gloo':
+        parts = _gather_gloo(int_part, float_part, group)
+    else:
+        parts = _gather_shm(int_part, float_part, group)
+    if parts is None:
+        return None
+    ordered_results = [None] * size
+    for int_part, float_part in parts:
+        part_indices, results = _decode_bbox_results(int_part, float_part)
+        # the dataloader may pad some samples
+        for idx, result in zip(part_indices, results):
+            ordered_results[idx] = result
+    return ordered_results
@@ -0,0 +1,196 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import mmcv
+import numpy as np
+import torch
+import torch.nn as nn
+from mmcv.ops import batched_nms
+
+from mmdet.core import DetectionResults
+from .session import InferenceSession
+
+
+def _tile_starts(length, tile_size, stride):
+    """Get the starts of the tiles along an axis, the last tile ending at
+    the end of the axis."""
+    last = max(length - tile_size, 0)
+    starts = list(range(0, last, stride))
+    starts.append(last)
+    return starts
+
+
+class TiledInference(object):
+    """Detect the objects of large images tile by tile.
+
+    A single pass resizes an image to the ``img_scale`` of the test
+    pipeline, which loses the small objects of large images, while a pass
+    at the native resolution takes the memory of the whole image. Here an
+    image is split into overlapping tiles, which are detected by batches
+    of ``batch_size`` at the scale of the test pipeline, then the dets of
+    the tiles are mapped back to the image and merged by a class aware NMS.
+    The tiles are cropped as they are batched, so that the memory is the
+    one of a batch of tiles whatever the size of the image.
+
+    With ``skip_empty``, a coarse pass first detects the objects of the
+    whole image at the scale of the test pipeline, and the tiles which do
+    not intersect any of its dets of score ``coarse_score_thr`` at least
+    are skipped. The dets of the coarse pass are merged with the ones of
+    the tiles, they hold the objects larger than a tile.
+
+    Args:
+        model (nn.Module | :obj:`InferenceSession`): The loaded detector or
+            a session of it, e.g. a :class:`SubnetSession`.
+        tile_size (tuple[int], optional): Height and width of the tiles, the
+            ``img_scale`` of the test pipeline if None. Default: None.
+        overlap (float): Overlap ratio of the adjacent tiles. Default: 0.2.
+        batch_size (int): Number of tiles of a batch. Default: 4.
+        skip_empty (bool): Whether to skip the tiles without any det of the
+            coarse pass. Default: True.
+        coarse_score_thr (float): Min score of the dets of the coarse pass
+            keeping a tile. Default: 0.05.
+        nms_cfg (dict, optional): Config of the NMS merging the dets, see
+            :func:`batched_nms`. Default: ``dict(type='nms',
+            iou_threshold=0.5)``.
+        max_per_img (int): Max number of dets of an image, all of them if
+            -1. Default: -1.
+
+    Example:
+        >>> from mmdet.apis import TiledInference, init_detector
+        >>> model = init_detector(config_file, checkpoint_file, 'cpu')
+        >>> tiled = TiledInference(model, overlap=0.25, batch_size=8)
+        >>> det_results = tiled.predict(large_img)
+        >>> bboxes, scores = det_results.bboxes, det_results.scores
+    """
+
+    def __init__(self,
+                 model,
+                 tile_size=None,
+                 overlap=0.2,
+                 batch_size=4,
+                 skip_empty=True,
+                 coarse_score_thr=0.05,
+                 nms_cfg=None,
+                 max_per_img=-1):
+        assert 0 <= overlap < 1
+        if isinstance(model, nn.Module):
+            model = InferenceSession(model)
+        self.session = model
+        if tile_size is None:
+            # img_scale is (w, h)
+            img_scale = model.model.cfg.data.test.pipeline[1].img_scale
+            if isinstance(img_scale, list):
+                img_scale = img_scale[0]
+            tile_size = img_scale[::-1]
+        self.tile_size = tuple(tile_size)
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self.skip_empty = skip_empty
+        self.coarse_score_thr = coarse_score_thr
+        self.nms_cfg = nms_cfg or dict(type='nms', iou_threshold=0.5)
+        self.max_per_img = max_per_img
+        self.num_tiles = 0
+        self.num_skipped = 0
+
+    def tiles(self, height, width):
+        """Get the tiles of an image.
+
+        Returns:
+            np.ndarray: The tiles (x1, y1, x2, y2) of shape (n, 4).
+        """
+        tile_h, tile_w = self.tile_size
+        stride_h = max(int(tile_h * (1 - self.overlap)), 1)
+        stride_w = max(int(tile_w * (1 - self.overlap)), 1)
+        ys = _tile_starts(height, tile_h, stride_h)
+        xs = _tile_starts(width, tile_w, stride_w)
+        tiles = np.array(
+            [[x, y, min(x + tile_w, width),
+              min(y + tile_h, height)] for y in ys for x in xs],
+            dtype=np.int64)
+        return tiles
+
+    def _predict_batches(self, img, tiles):
+        """Detect the objects of the tiles by batches.
+
+        Yields:
+            tuple[:obj:`DetectionResults`, np.ndarray]: The results of a
+                batch and its tiles.
+        """
+        for start in range(0, len(tiles), self.batch_size):
+            batch_tiles = tiles[start:start + self.batch_size]
+            crops = [img[y1:y2, x1:x2] for x1, y1, x2, y2 in batch_tiles]
+            yield self.session.predict(crops), batch_tiles
+
+    def predict(self, img):
+        """Detect the objects of an image.
+
+        Args:
+            img (str | np.ndarray): The image file or the loaded image in
+                BGR order.
+
+        Returns:
+            :obj:`DetectionResults`: The results of the image.
+        """
+        img = mmcv.imread(img)
+        height, width = img.shape[:2]
+        tiles = self.tiles(height, width)
+        bboxes, scores, labels = [], [], []
+        num_classes = None
+        if self.skip_empty:
+            coarse = self.session.predict([img])
+            num_classes = coarse.num_classes
+            bboxes.append(coarse.bboxes)
+            scores.append(coarse.scores)
+            labels.append(coarse.labels)
+            boxes = coarse.bboxes[coarse.scores >= self.coarse_score_thr]
+            # the tiles intersecting a box of the coarse pass
+            keep = ((tiles[:, None, 0] < boxes[None, :, 2])
+                    & (tiles[:, None, 2] > boxes[None, :, 0])
+                    & (tiles[:, None, 1] < boxes[None, :, 3])
+                    & (tiles[:, None, 3] > boxes[None, :, 1])).any(1)
+            self.num_skipped += int((~keep).sum())
+            tiles = tiles[keep]
+        self.num_tiles += len(tiles)
+
+        for det_results, batch_tiles in self._predict_batches(img, tiles):
+            offsets = batch_tiles[det_results.img_ids, :2]
+            bboxes.append(det_results.bboxes + np.tile(offsets, 2))
+            scores.append(det_results.scores)
+            labels.append(det_results.labels)
+            num_classes = det_results.num_classes
+        return self.merge(bboxes, scores, labels, num_classes)
+
+    def merge(self, bboxes, scores, labels, num_classes):
+        """Merge the dets of the tiles by a class aware NMS.
+
+        Args:
+            bboxes (list[np.ndarray]): The boxes of each batch of tiles in
+                the image, of shape (n, 4).
+            scores (list[np.ndarray]): Their scores, of shape (n, ).
+            labels (list[np.ndarray]): Their labels, of shape (n, ).
+            num_classes (int): Number of classes.
+
+        Returns:
+            :obj:`DetectionResults`: The results of the image.
+        """
+        bboxes = np.concatenate([np.zeros((0, 4), np.float32)] + bboxes)
+        scores = np.concatenate([np.zeros(0, np.float32)] + scores)
+        labels = np.concatenate([np.zeros(0, np.int32)] + labels)
+        if len(bboxes):
+            _, keep = batched_nms(
+                torch.from_numpy(bboxes.astype(np.float32)),
+                torch.from_numpy(scores.astype(np.float32)),
+                torch.from_numpy(labels.astype(np.int64)), self.nms_cfg)
+            keep = keep.numpy()
+            if self.max_per_img > 0:
+                keep = keep[:self.max_per_img]
+            # sorted by class like the other results
+            keep = keep[np.argsort(labels[keep], kind='stable')]
+            bboxes, scores, labels = bboxes[keep], scores[keep], labels[keep]
+        img_offsets = np.array([0, len(labels)], dtype=np.int64)
+        return DetectionResults(
+            np.ascontiguousarray(bboxes, dtype=np.float32),
+            np.ascontiguousarray(scores, dtype=np.float32),
+            labels.astype(np.int32), img_offsets, num_classes)
+
+    def stats(self):
+        """Get the number of tiles detected and skipped so far."""
+        return dict(num_tiles=self.num_tiles, num_skipped=self.num_skipped)
@@ -1,5 +1,8 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+from .detection_results import DetectionResults, load_det_results
 from .general_data import GeneralData
 from .instance_data import InstanceData
 
-__all__ = ['GeneralData', 'InstanceData']
+__all__ = [
+    'GeneralData', 'InstanceData', 'DetectionResults', 'load_det_results'
+]
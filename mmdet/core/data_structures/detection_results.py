@@ -0,0 +1,257 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import zipfile
+
+import mmcv
+import numpy as np
+
+
+def _mmap_npz(file):
+    """Memory-map the arrays of an uncompressed ``.npz`` file.
+
+    ``np.load`` reads the members of an archive into memory. The members
+    written by ``np.savez`` are stored without compression, so each one is
+    a ``.npy`` file at a fixed offset of the archive and can be mapped.
+    """
+    arrays = {}
+    with zipfile.ZipFile(file) as zf, open(file, 'rb') as f:
+        for info in zf.infolist():
+            assert info.compress_type == zipfile.ZIP_STORED, \
+                f'{info.filename} of {file} is compressed'
+            f.seek(info.header_offset)
+            header = f.read(30)
+            name_len = int.from_bytes(header[26:28], 'little')
+            extra_len = int.from_bytes(header[28:30], 'little')
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = \
+                    np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = \
+                    np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-len('.npy')]
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(
+                    file,
+                    dtype=dtype,
+                    mode='r',
+                    offset=f.tell(),
+                    shape=shape,
+                    order='F' if fortran_order else 'C')
+    return arrays
+
+
+class DetectionResults(object):
+    """Columnar bbox results of a dataset.
+
+    The nested ``list[list[np.ndarray]]`` (images x classes) results of
+    :func:`bbox2result` hold one small array per image and class. Here the
+    dets of all the images are stored in a few parallel arrays, sorted by
+    image then class, the dets of an image and a class keeping their
+    original order. ``img_offsets`` is a CSR index: the dets of the
+    ``i``-th image are the rows ``img_offsets[i]:img_offsets[i + 1]``.
+
+    Indexing or iterating gives the results of an image in the legacy
+    format, so code written for the nested lists keeps working, while
+    :meth:`class_dets` gives the dets of a class in all the images at once.
+
+    Args:
+        bboxes (np.ndarray): Boxes in ``xyxy`` order, shape (n, 4).
+        scores (np.ndarray): Scores, shape (n, ).
+        labels (np.ndarray): Class index of each det, shape (n, ).
+        img_offsets (np.ndarray): CSR index of the images, shape
+            (num_imgs + 1, ).
+        num_classes (int): Number of classes.
+        img_ids (np.ndarray, optional): Index of the image of each det,
+            shape (n, ). Computed from ``img_offsets`` if not given.
+
+    Example:
+        >>> import numpy as np
+        >>> results = [[np.array([[0, 0, 4, 4, 0.9]], dtype=np.float32),
+        ...             np.zeros((0, 5), dtype=np.float32)],
+        ...            [np.zeros((0, 5), dtype=np.float32),
+        ...             np.array([[1, 1, 5, 5, 0.8], [2, 2, 6, 6, 0.7]],
+        ...                      dtype=np.float32)]]
+        >>> det_results = DetectionResults.from_list(results)
+        >>> len(det_results), len(det_results.scores)
+        (2, 3)
+        >>> det_results.img_ids.tolist(), det_results.labels.tolist()
+        ([0, 1, 1], [0, 1, 1])
+        >>> det_results[1][1].shape
+        (2, 5)
+        >>> dets, num_dets = det_results.class_dets(1)
+        >>> num_dets.tolist()
+        [0, 2]
+    """
+
+    def __init__(self,
+                 bboxes,
+                 scores,
+                 labels,
+                 img_offsets,
+                 num_classes,
+                 img_ids=None):
+        self.bboxes = bboxes
+        self.scores = scores
+        self.labels = labels
+        self.img_offsets = img_offsets
+        self.num_classes = int(num_classes)
+        if img_ids is None:
+            img_ids = np.repeat(
+                np.arange(len(img_offsets) - 1, dtype=np.int32),
+                np.diff(img_offsets))
+        self.img_ids = img_ids
+        assert len(bboxes) == len(scores) == len(labels) == len(img_ids)
+        assert img_offsets[-1] == len(bboxes)
+        self._class_index = None
+
+    @classmethod
+    def from_list(cls, results, num_classes=None):
+        """Build from the nested results of :func:`bbox2result`.
+
+        Args:
+            results (list[list[np.ndarray] | tuple]): Bbox results of each
+                image, results with masks are accepted and only their bboxes
+                are kept.
+            num_classes (int, optional): Number of classes, required if
+                ``results`` is empty.
+
+        Returns:
+            :obj:`DetectionResults`: The columnar results.
+        """
+        results = [
+            result[0] if isinstance(result, tuple) else result
+            for result in results
+        ]
+        if num_classes is None:
+            num_classes = len(results[0])
+        counts = np.array([[len(dets) for dets in result]
+                           for result in results],
+                          dtype=np.int64).reshape(-1, num_classes)
+        dets = [dets for result in results for dets in result]
+        dets = np.concatenate(dets).astype(
+            np.float32, copy=False).reshape(-1, 5) if dets else np.zeros(
+                (0, 5), dtype=np.float32)
+        img_offsets = np.zeros(len(results) + 1, dtype=np.int64)
+        np.cumsum(counts.sum(axis=1), out=img_offsets[1:])
+        labels = np.repeat(
+            np.tile(np.arange(num_classes, dtype=np.int32), len(results)),
+            counts.reshape(-1))
+        return cls(
+            np.ascontiguousarray(dets[:, :4]),
+            np.ascontiguousarray(dets[:, 4]), labels, img_offsets, num_classes)
+
+    def to_list(self):
+        """Convert to the nested results of :func:`bbox2result`.
+
+        Returns:
+            list[list[np.ndarray]]: The dets of each image and class, of
+                shape (n, 5).
+        """
+        dets = np.hstack([self.bboxes, self.scores[:, None]]).astype(
+            np.float32, copy=False)
+        counts = np.bincount(
+            self.img_ids.astype(np.int64) * self.num_classes + self.labels,
+            minlength=len(self) * self.num_classes)
+        dets = np.split(dets, np.cumsum(counts)[:-1])
+        return [
+            dets[i * self.num_classes:(i + 1) * self.num_classes]
+            for i in range(len(self))
+        ]
+
+    def __len__(self):
+        return len(self.img_offsets) - 1
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f'image index {idx} out of range')
+        start, end = self.img_offsets[idx], self.img_offsets[idx + 1]
+        dets = np.hstack(
+            [self.bboxes[start:end], self.scores[start:end, None]]).astype(
+                np.float32, copy=False)
+        counts = np.bincount(
+            self.labels[start:end], minlength=self.num_classes)
+        return np.split(dets, np.cumsum(counts)[:-1])
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def class_dets(self, class_id):
+        """Get the dets of a class in all the images.
+
+        Returns:
+            tuple[np.ndarray]: The dets sorted by image, of shape (m, 5), and
+                the number of dets in each image.
+        """
+        if self._class_index is None:
+            order = np.argsort(self.labels, kind='stable')
+            offsets = np.zeros(self.num_classes + 1, dtype=np.int64)
+            np.cumsum(
+                np.bincount(self.labels, minlength=self.num_classes),
+                out=offsets[1:])
+            self._class_index = (order, offsets)
+        order, offsets = self._class_index
+        inds = order[offsets[class_id]:offsets[class_id + 1]]
+        dets = np.hstack([self.bboxes[inds], self.scores[inds, None]]).astype(
+            np.float32, copy=False)
+        return dets, np.bincount(self.img_ids[inds], minlength=len(self))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_class_index'] = None
+        return state
+
+    def dump(self, file):
+        """Save to an uncompressed ``.npz`` file, which can be mapped by
+        :meth:`load`."""
+        with open(file, 'wb') as f:
+            np.savez(
+                f,
+                bboxes=self.bboxes,
+                scores=self.scores,
+                labels=self.labels,
+                img_ids=self.img_ids,
+                img_offsets=self.img_offsets,
+                num_classes=np.array(self.num_classes))
+
+    @classmethod
+    def load(cls, file, mmap=False):
+        """Load from a ``.npz`` file written by :meth:`dump`.
+
+        Args:
+            file (str): Path of the file.
+            mmap (bool): Whether to map the arrays instead of reading them.
+                Default: False.
+
+        Returns:
+            :obj:`DetectionResults`: The loaded results.
+        """
+        if mmap:
+            arrays = _mmap_npz(file)
+        else:
+            with np.load(file) as npz:
+                arrays = dict(npz)
+        num_classes = int(arrays.pop('num_classes'))
+        return cls(num_classes=num_classes, **arrays)
+
+
+def load_det_results(file, mmap=False):
+    """Load test results saved as ``.npz`` by :obj:`DetectionResults`, or as
+    a pickle by ``mmcv.dump``.
+
+    Args:
+        file (str): Path of the results.
+        mmap (bool): Whether to map the arrays of a ``.npz`` file.
+            Default: False.
+
+    Returns:
+        :obj:`DetectionResults` | list: The loaded results.
+    """
+    if file.endswith('.npz'):
+        return DetectionResults.load(file, mmap=mmap)
+    return mmcv.load(file)
@@ -1,11 +1,22 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import bisect
+import copy
+import inspect
+import io
 import os.path as osp
+import time
+import warnings
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 import mmcv
+import torch
 import torch.distributed as dist
+import torch.nn as nn
+from mmcv.parallel import is_module_wrapper, scatter_kwargs
 from mmcv.runner import DistEvalHook as BaseDistEvalHook
 from mmcv.runner import EvalHook as BaseEvalHook
+from mmcv.runner import LoggerHook
 from torch.nn.modules.batchnorm import _BatchNorm
 
 
@@ -21,10 +32,259 @@ def _calc_dynamic_intervals(start_interval, dynamic_interval_list):
     return dynamic_milestones, dynamic_intervals
 
 
-class EvalHook(BaseEvalHook):
+def _build_evaluator(dataset, eval_kwargs):
+    """Build the incremental evaluator of a dataset, with the evaluation
+    arguments it takes, if mAP is the metric to evaluate.
 
-    def __init__(self, *args, dynamic_intervals=None, **kwargs):
+    The results of each batch are then folded into the evaluator instead
+    of being kept until the end of the test. None if the metric is another
+    one or the dataset has no ``build_evaluator``.
+    """
+    metric = eval_kwargs.get('metric')
+    if isinstance(metric, (list, tuple)) and len(metric) == 1:
+        metric = metric[0]
+    if metric != 'mAP' or not hasattr(dataset, 'build_evaluator'):
+        return None
+    params = inspect.signature(dataset.build_evaluator).parameters
+    return dataset.build_evaluator(
+        **{k: v
+           for k, v in eval_kwargs.items() if k in params})
+
+
+class _CPUModel(nn.Module):
+    """Run a model on the CPU, scattering the data containers of a batch
+    like :obj:`MMDataParallel` does without GPUs."""
+
+    def __init__(self, module):
+        super(_CPUModel, self).__init__()
+        self.module = module
+
+    def forward(self, *inputs, **kwargs):
+        inputs, kwargs = scatter_kwargs(inputs, kwargs, [-1])
+        return self.module(*inputs[0], **kwargs[0])
+
+
+class _AsyncEvalMixin(object):
+    """Evaluate snapshots of the model off the training critical path.
+
+    At each evaluation the weights of the model, which are the EMA ones
+    when an EMA hook swapped them in before, are copied to a CPU state dict,
+    along with the arch of a supernet, which ``set_arch`` may change at
+    every iteration. Inference on the CPU and ``dataset.evaluate`` then run
+    in a worker thread while training goes on. Finished evaluations are
+    collected after the training iterations: if the key score is the best
+    one, the snapshot is saved as the best checkpoint, named after the
+    epoch or iteration it was taken at, and their metrics are written to
+    the log buffer at the next logging interval. At most one snapshot waits
+    behind the one being evaluated, training blocks on the oldest
+    evaluation beyond that, and all of them are waited for at the end of
+    training.
+    """
+
+    def _init_async(self, async_eval):
+        self.async_eval = async_eval
+        self._executor = None
+        self._eval_model = None
+        self._eval_dataloader = None
+        self._pending_evals = deque()
+        self._finished_evals = deque()
+        self._logged_keys = []
+
+    def _async_dataloader(self):
+        return self.dataloader
+
+    def _evaluate_snapshot(self, state_dict, arch, logger):
+        from mmdet.apis import single_gpu_test
+        self._eval_model.module.load_state_dict(state_dict)
+        if arch is not None:
+            self._eval_model.module.set_arch(arch)
+        evaluator = _build_evaluator(self._eval_dataloader.dataset,
+                                     self.eval_kwargs)
+        results = single_gpu_test(
+            self._eval_model,
+            self._eval_dataloader,
+            show=False,
+            evaluator=evaluator)
+        return self._eval_dataloader.dataset.evaluate(
+            results, logger=logger, **self.eval_kwargs)
+
+    def _submit_async(self, runner):
+        model = runner.model
+        if is_module_wrapper(model):
+            model = model.module
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            self._eval_model = _CPUModel(copy.deepcopy(model).cpu())
+            self._eval_dataloader = self._async_dataloader()
+        while len(self._pending_evals) > 1:
+            self._finish_async(runner, self._pending_evals.popleft())
+
+        state_dict = OrderedDict((name, value.detach().to('cpu', copy=True))
+                                 for name, value in model.state_dict().items())
+        arch = None
+        if hasattr(model, 'set_arch'):
+            arch = copy.deepcopy(getattr(model, 'arch', None))
+        meta = copy.deepcopy(runner.meta) if runner.meta else dict()
+        if self.by_epoch:
+            meta.update(epoch=runner.epoch + 1, iter=runner.iter)
+            progress = ('epoch', runner.epoch + 1)
+        else:
+            meta.update(epoch=runner.epoch + 1, iter=runner.iter + 1)
+            progress = ('iter', runner.iter + 1)
+        if getattr(model, 'CLASSES', None) is not None:
+            meta.update(CLASSES=model.CLASSES)
+        future = self._executor.submit(self._evaluate_snapshot, state_dict,
+                                       arch, runner.logger)
+        self._pending_evals.append(
+            dict(
+                future=future,
+                state_dict=state_dict,
+                meta=meta,
+                progress=progress))
+
+    def _finish_async(self, runner, job):
+        eval_res = job['future'].result()
+        self._finished_evals.append((job['progress'], eval_res))
+
+        if self.save_best is None:
+            return
+        if not eval_res:
+            warnings.warn(
+                'Since `eval_res` is an empty dict, the behavior to save '
+                'the best checkpoint will be skipped in this evaluation.')
+            return
+        if self.key_indicator == 'auto':
+            self._init_rule(self.rule, list(eval_res.keys())[0])
+        key_score = eval_res[self.key_indicator]
+        if key_score:
+            self._save_snapshot_ckpt(runner, key_score, job)
+
+    @staticmethod
+    def _is_log_iter(runner):
+        """Whether a logger hook dumps the training log after this
+        iteration."""
+        loggers = [
+            hook for hook in runner._hooks if isinstance(hook, LoggerHook)
+        ]
+        for hook in loggers:
+            if hook.by_epoch:
+                if hook.every_n_inner_iters(runner, hook.interval):
+                    return True
+            elif hook.every_n_iters(runner, hook.interval):
+                return True
+            if hook.end_of_epoch(runner) and not hook.ignore_last:
+                return True
+        return not loggers
+
+    def _log_async(self, runner):
+        """Write the metrics of the oldest finished evaluation to the log
+        buffer."""
+        (cur_type, cur_time), eval_res = self._finished_evals.popleft()
+        # dump the training log first so that the metrics are logged alone,
+        # as ``after_train_iter`` of :obj:`BaseEvalHook` does
+        for hook in runner._hooks:
+            if isinstance(hook, LoggerHook):
+                hook.after_train_iter(runner)
+        runner.log_buffer.clear()
+        runner.log_buffer.output['eval_iter_num'] = len(self._eval_dataloader)
+        runner.log_buffer.output[f'eval_{cur_type}'] = cur_time
+        for name, val in eval_res.items():
+            runner.log_buffer.output[name] = val
+        runner.log_buffer.ready = True
+        self._logged_keys = list(runner.log_buffer.output)
+
+    def _save_snapshot_ckpt(self, runner, key_score, job):
+        """Save the snapshot of an evaluation as the best checkpoint, as
+        :meth:`_save_ckpt` does with the current model."""
+        cur_type, cur_time = job['progress']
+        best_score = runner.meta['hook_msgs'].get(
+            'best_score', self.init_value_map[self.rule])
+        if not self.compare_func(key_score, best_score):
+            return
+        best_score = key_score
+        runner.meta['hook_msgs']['best_score'] = best_score
+
+        if self.best_ckpt_path and self.file_client.isfile(
+                self.best_ckpt_path):
+            self.file_client.remove(self.best_ckpt_path)
+            runner.logger.info(
+                (f'The previous best checkpoint {self.best_ckpt_path} was '
+                 'removed'))
+
+        best_ckpt_name = f'best_{self.key_indicator}_{cur_type}_{cur_time}.pth'
+        self.best_ckpt_path = self.file_client.join_path(
+            self.out_dir, best_ckpt_name)
+        runner.meta['hook_msgs']['best_ckpt'] = self.best_ckpt_path
+
+        meta = job['meta']
+        meta.update(mmcv_version=mmcv.__version__, time=time.asctime())
+        with io.BytesIO() as f:
+            torch.save(dict(meta=meta, state_dict=job['state_dict']), f)
+            self.file_client.put(f.getvalue(), self.best_ckpt_path)
+        runner.logger.info(
+            f'Now best checkpoint is saved as {best_ckpt_name}.')
+        runner.logger.info(f'Best {self.key_indicator} is {best_score:0.4f} '
+                           f'at {cur_time} {cur_type}.')
+
+    def after_train_iter(self, runner):
+        if not self.async_eval:
+            super().after_train_iter(runner)
+            return
+        # the metrics of the last evaluation have been logged
+        for key in self._logged_keys:
+            runner.log_buffer.output.pop(key, None)
+        self._logged_keys = []
+        while self._pending_evals and self._pending_evals[0]['future'].done():
+            self._finish_async(runner, self._pending_evals.popleft())
+        # the log buffer is cleared to log the metrics alone, which would
+        # drop the training history between the logging intervals
+        if self._is_log_iter(runner):
+            while self._finished_evals:
+                self._log_async(runner)
+        # unlike ``BaseEvalHook.after_train_iter``, the training log is not
+        # dumped before submitting a snapshot, nothing is logged until then
+        if not self.by_epoch and self._should_evaluate(runner):
+            self._do_evaluate(runner)
+
+    def after_run(self, runner):
+        if not self.async_eval or self._executor is None:
+            return
+        while self._pending_evals:
+            self._finish_async(runner, self._pending_evals.popleft())
+        while self._finished_evals:
+            self._log_async(runner)
+            for hook in runner._hooks:
+                if isinstance(hook, LoggerHook):
+                    hook.after_train_epoch(runner)
+        self._executor.shutdown()
+        self._executor = None
+
+
+class EvalHook(_AsyncEvalMixin, BaseEvalHook):
+    """Evaluation hook of mmdet.
+
+    With the 'mAP' metric, the results of each batch are folded into the
+    evaluator of the dataset, see ``build_evaluator``, instead of being kept
+    until the end of the test.
+
+    Besides the arguments of :obj:`mmcv.runner.EvalHook`:
+
+    Args:
+        dynamic_intervals (list[tuple[int]], optional): The evaluation
+            interval changes at each ``(milestone, interval)``.
+            Default: None.
+        async_eval (bool): Whether to evaluate snapshots of the model on the
+            CPU in a worker thread while training continues.
+            Default: False.
+    """
+
+    def __init__(self,
+                 *args,
+                 dynamic_intervals=None,
+                 async_eval=False,
+                 **kwargs):
         super(EvalHook, self).__init__(*args, **kwargs)
+        self._init_async(async_eval)
 
         self.use_dynamic_intervals = dynamic_intervals is not None
         if self.use_dynamic_intervals:
@@ -51,9 +311,15 @@ class EvalHook(BaseEvalHook):
         """perform evaluation and save ckpt."""
         if not self._should_evaluate(runner):
             return
+        if self.async_eval:
+            self._submit_async(runner)
+            return
 
         from mmdet.apis import single_gpu_test
-        results = single_gpu_test(runner.model, self.dataloader, show=False)
+        evaluator = _build_evaluator(self.dataloader.dataset,
+                                     self.eval_kwargs)
+        results = single_gpu_test(
+            runner.model, self.dataloader, show=False, evaluator=evaluator)
         runner.log_buffer.output['eval_iter_num'] = len(self.dataloader)
         key_score = self.evaluate(runner, results)
         # the key_score may be `None` so it needs to skip the action to save
@@ -65,10 +331,31 @@ class EvalHook(BaseEvalHook):
 # Note: Considering that MMCV's EvalHook updated its interface in V1.3.16,
 # in order to avoid strong version dependency, we did not directly
 # inherit EvalHook but BaseDistEvalHook.
-class DistEvalHook(BaseDistEvalHook):
+class DistEvalHook(_AsyncEvalMixin, BaseDistEvalHook):
+    """Distributed evaluation hook of mmdet.
 
-    def __init__(self, *args, dynamic_intervals=None, **kwargs):
+    With the 'mAP' metric, the results of each batch are folded into the
+    evaluator of the dataset, see ``build_evaluator``, instead of being kept
+    until the end of the test.
+
+    Besides the arguments of :obj:`mmcv.runner.DistEvalHook`:
+
+    Args:
+        dynamic_intervals (list[tuple[int]], optional): The evaluation
+            interval changes at each ``(milestone, interval)``.
+            Default: None.
+        async_eval (bool): Whether to evaluate snapshots of the model on the
+            CPU in a worker thread while training continues. Only rank 0
+            evaluates, over the whole dataset. Default: False.
+    """
+
+    def __init__(self,
+                 *args,
+                 dynamic_intervals=None,
+                 async_eval=False,
+                 **kwargs):
         super(DistEvalHook, self).__init__(*args, **kwargs)
+        self._init_async(async_eval)
 
         self.use_dynamic_intervals = dynamic_intervals is not None
         if self.use_dynamic_intervals:
@@ -91,6 +378,15 @@ class DistEvalHook(BaseDistEvalHook):
         self._decide_interval(runner)
         super().before_train_iter(runner)
 
+    def _async_dataloader(self):
+        from mmdet.datasets import build_dataloader
+        return build_dataloader(
+            self.dataloader.dataset,
+            samples_per_gpu=self.dataloader.batch_size or 1,
+            workers_per_gpu=self.dataloader.num_workers,
+            dist=False,
+            shuffle=False)
+
     def _do_evaluate(self, runner):
         """perform evaluation and save ckpt."""
         # Synchronization of BatchNorm's buffer (running_mean
@@ -108,17 +404,24 @@ class DistEvalHook(BaseDistEvalHook):
 
         if not self._should_evaluate(runner):
             return
+        if self.async_eval:
+            if runner.rank == 0:
+                self._submit_async(runner)
+            return
 
         tmpdir = self.tmpdir
         if tmpdir is None:
             tmpdir = osp.join(runner.work_dir, '.eval_hook')
 
         from mmdet.apis import multi_gpu_test
+        evaluator = _build_evaluator(self.dataloader.dataset,
+                                     self.eval_kwargs)
         results = multi_gpu_test(
             runner.model,
             self.dataloader,
             tmpdir=tmpdir,
-            gpu_collect=self.gpu_collect)
+            gpu_collect=self.gpu_collect,
+            evaluator=evaluator)
         if runner.rank == 0:
             print('\n')
             runner.log_buffer.output['eval_iter_num'] = len(self.dataloader)
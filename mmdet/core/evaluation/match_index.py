@@ -0,0 +1,332 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import os.path as osp
+import zlib
+
+import numpy as np
+
+from ..data_structures import DetectionResults
+from .mean_ap import (_batch_average_precision, _flatten_gts, _paired_overlaps,
+                      _scan_ranks)
+
+
+def _crc32(*arrays):
+    crc = 0
+    for array in arrays:
+        crc = zlib.crc32(np.ascontiguousarray(array).tobytes(), crc)
+    return crc
+
+
+class MatchIndex(object):
+    """IoUs between the dets and the gts of a dataset, for result analysis.
+
+    Every det is paired with the gts of its image once, whatever their
+    classes, and the pairs overlapping each other are kept as a sparse
+    table. The confusion matrix and the per-image AP are then computed from
+    the table with numpy ops instead of matching each image again, and the
+    table can be cached next to the results file with :meth:`load_or_build`
+    to be queried again with other thresholds.
+
+    The dets are indexed in the order of :obj:`DetectionResults`, the gts in
+    the order of :func:`eval_map`: the gts of each image followed by its
+    ignored gts.
+
+    Args:
+        det_img_ids (np.ndarray): Image index of each det, shape (n, ).
+        det_labels (np.ndarray): Class index of each det, shape (n, ).
+        det_scores (np.ndarray): Score of each det, shape (n, ).
+        gt_img_ids (np.ndarray): Image index of each gt, shape (m, ).
+        gt_labels (np.ndarray): Class index of each gt, shape (m, ).
+        gt_ignore (np.ndarray): Whether each gt is ignored, shape (m, ).
+        pair_dets (np.ndarray): Det of each pair, shape (k, ).
+        pair_gts (np.ndarray): Gt of each pair, shape (k, ).
+        pair_ious (np.ndarray): IoU of each pair, all positive, shape (k, ).
+        num_imgs (int): Number of images.
+        num_classes (int): Number of classes.
+        checksum (int): Checksum of the dets and gts the index is built from.
+            Default: 0.
+    """
+
+    def __init__(self,
+                 det_img_ids,
+                 det_labels,
+                 det_scores,
+                 gt_img_ids,
+                 gt_labels,
+                 gt_ignore,
+                 pair_dets,
+                 pair_gts,
+                 pair_ious,
+                 num_imgs,
+                 num_classes,
+                 checksum=0):
+        self.det_img_ids = det_img_ids
+        self.det_labels = det_labels
+        self.det_scores = det_scores
+        self.gt_img_ids = gt_img_ids
+        self.gt_labels = gt_labels
+        self.gt_ignore = gt_ignore
+        self.pair_dets = pair_dets
+        self.pair_gts = pair_gts
+        self.pair_ious = pair_ious
+        self.num_imgs = int(num_imgs)
+        self.num_classes = int(num_classes)
+        self.checksum = int(checksum)
+
+    @staticmethod
+    def _checksum(det_results, gts, use_legacy_coordinate):
+        return _crc32(det_results.bboxes, det_results.scores,
+                      det_results.labels, det_results.img_offsets, *gts,
+                      np.array(use_legacy_coordinate))
+
+    @classmethod
+    def build(cls,
+              det_results,
+              annotations,
+              use_legacy_coordinate=False,
+              max_pairs=1 << 22):
+        """Build the index of a dataset.
+
+        Args:
+            det_results (:obj:`DetectionResults` | list): Det results of
+                each image, in the format of :func:`eval_map`.
+            annotations (list[dict]): Annotations of each image, in the
+                format of :func:`eval_map`.
+            use_legacy_coordinate (bool): Same as :func:`eval_map`.
+                Default: False.
+            max_pairs (int): Max number of det and gt pairs whose IoUs are
+                computed at once. Default: 4M.
+
+        Returns:
+            :obj:`MatchIndex`: The index.
+        """
+        if not isinstance(det_results, DetectionResults):
+            det_results = DetectionResults.from_list(det_results)
+        assert len(det_results) == len(annotations)
+        gts = _flatten_gts(annotations)
+        return cls._build(det_results, gts, use_legacy_coordinate, max_pairs)
+
+    @classmethod
+    def _build(cls, det_results, gts, use_legacy_coordinate, max_pairs):
+        gt_bboxes, gt_labels, gt_img_ids, gt_ignore = gts
+        num_imgs = len(det_results)
+        extra_length = 1. if use_legacy_coordinate else 0.
+        det_img_ids = np.asarray(det_results.img_ids, dtype=np.int64)
+        num_gts_per_img = np.bincount(gt_img_ids, minlength=num_imgs)
+        gt_starts = np.cumsum(num_gts_per_img) - num_gts_per_img
+        num_pairs = num_gts_per_img[det_img_ids]
+        pair_ends = np.cumsum(num_pairs)
+
+        # pair every det with all the gts of its image, a chunk of dets at
+        # a time, and keep the overlapping pairs
+        pair_dets, pair_gts, pair_ious = [], [], []
+        start = 0
+        while start < len(num_pairs):
+            offset = pair_ends[start] - num_pairs[start]
+            end = max(
+                np.searchsorted(pair_ends, offset + max_pairs, 'right'),
+                start + 1)
+            nums = num_pairs[start:end]
+            dets = np.repeat(np.arange(start, end), nums)
+            gt_inds = np.arange(dets.size) - np.repeat(
+                np.cumsum(nums) - nums, nums) + gt_starts[det_img_ids[dets]]
+            ious = _paired_overlaps(
+                np.asarray(det_results.bboxes[start:end])[dets - start],
+                gt_bboxes[gt_inds], extra_length)
+            overlap = ious > 0
+            pair_dets.append(dets[overlap])
+            pair_gts.append(gt_inds[overlap])
+            pair_ious.append(ious[overlap])
+            start = end
+        if not pair_dets:
+            pair_dets = pair_gts = [np.zeros(0, dtype=np.int64)]
+            pair_ious = [np.zeros(0, dtype=np.float32)]
+
+        return cls(
+            det_img_ids,
+            np.asarray(det_results.labels, dtype=np.int64),
+            np.asarray(det_results.scores, dtype=np.float32),
+            gt_img_ids,
+            gt_labels.astype(np.int64),
+            gt_ignore,
+            np.concatenate(pair_dets),
+            np.concatenate(pair_gts),
+            np.concatenate(pair_ious),
+            num_imgs,
+            det_results.num_classes,
+            checksum=cls._checksum(det_results, gts, use_legacy_coordinate))
+
+    def dump(self, file):
+        """Save to a ``.npz`` file, which can be loaded by :meth:`load`."""
+        with open(file, 'wb') as f:
+            np.savez(f, **self.__dict__)
+
+    @classmethod
+    def load(cls, file):
+        """Load from a ``.npz`` file written by :meth:`dump`."""
+        with np.load(file) as npz:
+            return cls(**dict(npz))
+
+    @classmethod
+    def load_or_build(cls,
+                      file,
+                      det_results,
+                      annotations,
+                      use_legacy_coordinate=False):
+        """Load the index cached in ``file``, or build and cache it if the
+        file is missing or was built from other dets or gts.
+
+        Args:
+            file (str): Path of the cache, e.g. the results file with a
+                ``.match.npz`` extension.
+            det_results (:obj:`DetectionResults` | list): Same as
+                :meth:`build`.
+            annotations (list[dict]): Same as :meth:`build`.
+            use_legacy_coordinate (bool): Same as :meth:`build`.
+
+        Returns:
+            :obj:`MatchIndex`: The index.
+        """
+        if not isinstance(det_results, DetectionResults):
+            det_results = DetectionResults.from_list(det_results)
+        assert len(det_results) == len(annotations)
+        gts = _flatten_gts(annotations)
+        checksum = cls._checksum(det_results, gts, use_legacy_coordinate)
+        if osp.isfile(file):
+            index = cls.load(file)
+            if index.checksum == checksum:
+                return index
+        index = cls._build(det_results, gts, use_legacy_coordinate, 1 << 22)
+        index.dump(file)
+        return index
+
+    def confusion_matrix(self, score_thr=0, tp_iou_thr=0.5):
+        """Confusion matrix of the dets with a score of at least
+        ``score_thr``.
+
+        A det is counted once for each gt it overlaps by ``tp_iou_thr``, in
+        the row of the gt label, or once in the last row (background) if
+        there is none. A gt overlapped by no det of its class is counted in
+        the last column. Ignored gts are not counted.
+
+        Args:
+            score_thr (float): Score threshold of the dets. Default: 0.
+            tp_iou_thr (float): IoU threshold to be considered as matched,
+                must be positive. Default: 0.5.
+
+        Returns:
+            np.ndarray: The confusion matrix of shape (num_classes + 1,
+                num_classes + 1), gt labels in rows and det labels in
+                columns.
+        """
+        assert tp_iou_thr > 0
+        num_classes = self.num_classes
+        det_valid = self.det_scores >= score_thr
+        pairs = np.nonzero(det_valid[self.pair_dets]
+                           & ~self.gt_ignore[self.pair_gts]
+                           & (self.pair_ious >= tp_iou_thr))[0]
+        dets = self.pair_dets[pairs]
+        gts = self.pair_gts[pairs]
+        det_labels = self.det_labels[dets]
+        gt_labels = self.gt_labels[gts]
+
+        cells = gt_labels * (num_classes + 1) + det_labels
+        # BG FP
+        unmatched = det_valid.copy()
+        unmatched[dets] = False
+        cells = np.append(
+            cells,
+            num_classes * (num_classes + 1) + self.det_labels[unmatched])
+        # FN
+        missed = ~self.gt_ignore
+        missed[gts[gt_labels == det_labels]] = False
+        cells = np.append(
+            cells, self.gt_labels[missed] * (num_classes + 1) + num_classes)
+        return np.bincount(
+            cells, minlength=(num_classes + 1)**2).reshape(
+                num_classes + 1, num_classes + 1).astype(np.float64)
+
+    def img_mean_aps(self, iou_thrs=np.linspace(0.5, 0.95, 10)):
+        """mAP of each image alone, averaged over ``iou_thrs``.
+
+        The result of an image is the same as :func:`eval_map` on the image
+        with the default :func:`tpfp_default`, averaged over the IoU
+        thresholds. Images without gts get 0.
+
+        Args:
+            iou_thrs (Sequence[float]): IoU thresholds, must be positive.
+                Default: 0.5:0.05:0.95.
+
+        Returns:
+            np.ndarray: The mAP of each image, shape (num_imgs, ).
+        """
+        num_dets = len(self.det_scores)
+        num_classes = self.num_classes
+        # for each det, the max iou with the gts of its class and the first
+        # gt reaching it, like tpfp_default
+        same_cls = np.nonzero(self.det_labels[self.pair_dets] ==
+                              self.gt_labels[self.pair_gts])[0]
+        same_cls = same_cls[np.lexsort(
+            (self.pair_gts[same_cls], -self.pair_ious[same_cls],
+             self.pair_dets[same_cls]))]
+        first = np.r_[True, np.diff(self.pair_dets[same_cls]) != 0]
+        best = same_cls[first] if same_cls.size > 0 else same_cls
+        ious_max = np.zeros(num_dets, dtype=np.float32)
+        ious_max[self.pair_dets[best]] = self.pair_ious[best]
+        matched_gt = np.zeros(num_dets, dtype=np.int64)
+        matched_gt[self.pair_dets[best]] = self.pair_gts[best]
+
+        # the dets of an (image, class) group are contiguous, group them in
+        # the descending score order of tpfp_default
+        groups = self.det_img_ids * num_classes + self.det_labels
+        num_dets_per_group = np.bincount(
+            groups, minlength=self.num_imgs * num_classes)
+        ranks = _scan_ranks(self.det_scores[:, None], groups,
+                            num_dets_per_group)
+        order = np.empty_like(ranks)
+        order[ranks] = np.arange(num_dets)
+        group_starts = np.cumsum(num_dets_per_group) - num_dets_per_group
+
+        num_gts = np.bincount(
+            (self.gt_img_ids * num_classes + self.gt_labels)[~self.gt_ignore],
+            minlength=self.num_imgs * num_classes)
+        eval_groups = np.nonzero(num_gts > 0)[0]
+        # pad the dets of the evaluated groups to a (groups, max_dets) array
+        max_dets = num_dets_per_group[eval_groups].max(initial=0)
+        cols = np.arange(max_dets)
+        padded = cols < num_dets_per_group[eval_groups, None]
+        det_inds = order[np.minimum(group_starts[eval_groups, None] + cols,
+                                    max(num_dets - 1, 0))]
+
+        aps = np.zeros((len(iou_thrs), len(eval_groups)), dtype=np.float32)
+        for t, iou_thr in enumerate(iou_thrs):
+            assert iou_thr > 0
+            # the first det of each gt in the score order is TP
+            matched = ious_max >= iou_thr
+            matched_inds = np.nonzero(matched)[0]
+            matched_inds = matched_inds[np.lexsort(
+                (ranks[matched_inds], matched_gt[matched_inds]))]
+            tp = np.zeros(num_dets, dtype=np.float32)
+            fp = (~matched).astype(np.float32)
+            if matched_inds.size > 0:
+                new_gt = np.r_[True, np.diff(matched_gt[matched_inds]) != 0]
+                valid = ~self.gt_ignore[matched_gt[matched_inds]]
+                tp[matched_inds[new_gt & valid]] = 1
+                fp[matched_inds[~new_gt & valid]] = 1
+            if max_dets == 0:
+                continue
+            tp = np.cumsum(np.where(padded, tp[det_inds], 0), axis=1)
+            fp = np.cumsum(np.where(padded, fp[det_inds], 0), axis=1)
+            eps = np.finfo(np.float32).eps
+            recalls = tp / np.maximum(num_gts[eval_groups, None], eps)
+            precisions = np.where(padded, tp / np.maximum(tp + fp, eps), 0)
+            aps[t] = _batch_average_precision(recalls, precisions)
+
+        # mean over the classes with gts, then over the thresholds
+        img_ids = eval_groups // num_classes
+        num_cls = np.bincount(img_ids, minlength=self.num_imgs)
+        mean_aps = np.zeros((len(iou_thrs), self.num_imgs))
+        for t in range(len(iou_thrs)):
+            mean_aps[t] = np.bincount(
+                img_ids, aps[t], minlength=self.num_imgs) / np.maximum(
+                    num_cls, 1)
+        return mean_aps.mean(axis=0)
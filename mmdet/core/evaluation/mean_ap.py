@@ -6,6 +6,7 @@ import numpy as np
 from mmcv.utils import print_log
 from terminaltables import AsciiTable
 
+from ..data_structures import DetectionResults
 from .bbox_overlaps import bbox_overlaps
 from .class_names import get_classes
 
@@ -519,6 +520,71 @@ def get_cls_group_ofs(annotations, class_id):
     return gt_group_ofs
 
 
+def _cls_eval_result(tp, fp, cls_dets, num_gts, scale_ranges, dataset):
+    """Compute the recall, precision and AP of a class.
+
+    Args:
+        tp (ndarray): TP of all the dets of the class, of shape
+            (num_scales, m).
+        fp (ndarray): FP of all the dets of the class, of shape
+            (num_scales, m).
+        cls_dets (ndarray): All the dets of the class, of shape (m, 5).
+        num_gts (ndarray): Number of gts of each scale.
+        scale_ranges (list[tuple] | None): Same as `eval_map()`.
+        dataset (list[str] | str | None): Same as `eval_map()`.
+
+    Returns:
+        dict: The evaluation result of the class.
+    """
+    num_dets = cls_dets.shape[0]
+    # sort all det bboxes by score, also sort tp and fp
+    sort_inds = np.argsort(-cls_dets[:, -1])
+    tp = tp[:, sort_inds]
+    fp = fp[:, sort_inds]
+    # calculate recall and precision with tp and fp
+    tp = np.cumsum(tp, axis=1)
+    fp = np.cumsum(fp, axis=1)
+    eps = np.finfo(np.float32).eps
+    recalls = tp / np.maximum(num_gts[:, np.newaxis], eps)
+    precisions = tp / np.maximum((tp + fp), eps)
+    # calculate AP
+    if scale_ranges is None:
+        recalls = recalls[0, :]
+        precisions = precisions[0, :]
+        num_gts = num_gts.item()
+    mode = 'area' if dataset != 'voc07' else '11points'
+    ap = average_precision(recalls, precisions, mode)
+    return {
+        'num_gts': num_gts,
+        'num_dets': num_dets,
+        'recall': recalls,
+        'precision': precisions,
+        'ap': ap
+    }
+
+
+def _mean_ap(eval_results, num_scales, scale_ranges):
+    """Average the AP of the classes with gts."""
+    if scale_ranges is not None:
+        # shape (num_classes, num_scales)
+        all_ap = np.vstack([cls_result['ap'] for cls_result in eval_results])
+        all_num_gts = np.vstack(
+            [cls_result['num_gts'] for cls_result in eval_results])
+        mean_ap = []
+        for i in range(num_scales):
+            if np.any(all_num_gts[:, i] > 0):
+                mean_ap.append(all_ap[all_num_gts[:, i] > 0, i].mean())
+            else:
+                mean_ap.append(0.0)
+    else:
+        aps = []
+        for cls_result in eval_results:
+            if cls_result['num_gts'] > 0:
+                aps.append(cls_result['ap'])
+        mean_ap = np.array(aps).mean().item() if aps else 0.0
+    return mean_ap
+
+
 def eval_map(det_results,
              annotations,
              scale_ranges=None,
@@ -533,9 +599,9 @@ def eval_map(det_results,
     """Evaluate mAP of a dataset.
 
     Args:
-        det_results (list[list]): [[cls1_det, cls2_det, ...], ...].
-            The outer list indicates images, and the inner list indicates
-            per-class detected bboxes.
+        det_results (list[list] | :obj:`DetectionResults`):
+            [[cls1_det, cls2_det, ...], ...]. The outer list indicates
+            images, and the inner list indicates per-class detected bboxes.
         annotations (list[dict]): Ground truth annotations where each item of
             the list indicates an image. Keys of annotations are:
 
@@ -574,6 +640,8 @@ def eval_map(det_results,
         tuple: (mAP, [dict, dict, ...])
     """
     assert len(det_results) == len(annotations)
+    if isinstance(det_results, DetectionResults):
+        det_results = det_results.to_list()
     if not use_legacy_coordinate:
         extra_length = 0.
     else:
@@ -634,50 +702,12 @@ def eval_map(det_results,
                 for k, (min_area, max_area) in enumerate(area_ranges):
                     num_gts[k] += np.sum((gt_areas >= min_area)
                                          & (gt_areas < max_area))
-        # sort all det bboxes by score, also sort tp and fp
-        cls_dets = np.vstack(cls_dets)
-        num_dets = cls_dets.shape[0]
-        sort_inds = np.argsort(-cls_dets[:, -1])
-        tp = np.hstack(tp)[:, sort_inds]
-        fp = np.hstack(fp)[:, sort_inds]
-        # calculate recall and precision with tp and fp
-        tp = np.cumsum(tp, axis=1)
-        fp = np.cumsum(fp, axis=1)
-        eps = np.finfo(np.float32).eps
-        recalls = tp / np.maximum(num_gts[:, np.newaxis], eps)
-        precisions = tp / np.maximum((tp + fp), eps)
-        # calculate AP
-        if scale_ranges is None:
-            recalls = recalls[0, :]
-            precisions = precisions[0, :]
-            num_gts = num_gts.item()
-        mode = 'area' if dataset != 'voc07' else '11points'
-        ap = average_precision(recalls, precisions, mode)
-        eval_results.append({
-            'num_gts': num_gts,
-            'num_dets': num_dets,
-            'recall': recalls,
-            'precision': precisions,
-            'ap': ap
-        })
+        eval_results.append(
+            _cls_eval_result(
+                np.hstack(tp), np.hstack(fp), np.vstack(cls_dets), num_gts,
+                scale_ranges, dataset))
     pool.close()
-    if scale_ranges is not None:
-        # shape (num_classes, num_scales)
-        all_ap = np.vstack([cls_result['ap'] for cls_result in eval_results])
-        all_num_gts = np.vstack(
-            [cls_result['num_gts'] for cls_result in eval_results])
-        mean_ap = []
-        for i in range(num_scales):
-            if np.any(all_num_gts[:, i] > 0):
-                mean_ap.append(all_ap[all_num_gts[:, i] > 0, i].mean())
-            else:
-                mean_ap.append(0.0)
-    else:
-        aps = []
-        for cls_result in eval_results:
-            if cls_result['num_gts'] > 0:
-                aps.append(cls_result['ap'])
-        mean_ap = np.array(aps).mean().item() if aps else 0.0
+    mean_ap = _mean_ap(eval_results, num_scales, scale_ranges)
 
     print_map_summary(
         mean_ap, eval_results, dataset, area_ranges, logger=logger)
@@ -685,6 +715,522 @@ def eval_map(det_results,
     return mean_ap, eval_results
 
 
+def _paired_overlaps(bboxes1, bboxes2, extra_length, eps=1e-6):
+    """IoUs of paired bboxes, computed exactly like :func:`bbox_overlaps`."""
+    bboxes1 = bboxes1.astype(np.float32)
+    bboxes2 = bboxes2.astype(np.float32)
+    area1 = (bboxes1[:, 2] - bboxes1[:, 0] + extra_length) * (
+        bboxes1[:, 3] - bboxes1[:, 1] + extra_length)
+    area2 = (bboxes2[:, 2] - bboxes2[:, 0] + extra_length) * (
+        bboxes2[:, 3] - bboxes2[:, 1] + extra_length)
+    x_start = np.maximum(bboxes1[:, 0], bboxes2[:, 0])
+    y_start = np.maximum(bboxes1[:, 1], bboxes2[:, 1])
+    x_end = np.minimum(bboxes1[:, 2], bboxes2[:, 2])
+    y_end = np.minimum(bboxes1[:, 3], bboxes2[:, 3])
+    overlap = np.maximum(x_end - x_start + extra_length, 0) * np.maximum(
+        y_end - y_start + extra_length, 0)
+    union = np.maximum(area1 + area2 - overlap, eps)
+    return overlap / union
+
+
+def _flatten_gts(annotations):
+    """Concatenate the gts of all images.
+
+    The gts of an image are followed by its ignored gts, which is the order
+    :func:`tpfp_default` stacks them in.
+
+    Returns:
+        tuple[ndarray]: bboxes, labels, image ids and ignore flags.
+    """
+    bboxes, labels, img_ids, ignore = [], [], [], []
+    for i, ann in enumerate(annotations):
+        gt_sets = [(ann['bboxes'], ann['labels'], False)]
+        if ann.get('labels_ignore', None) is not None:
+            gt_sets.append((ann['bboxes_ignore'], ann['labels_ignore'], True))
+        for gt_bboxes, gt_labels, is_ignore in gt_sets:
+            bboxes.append(gt_bboxes.reshape(-1, 4))
+            labels.append(gt_labels)
+            img_ids.append(np.full(len(gt_labels), i, dtype=np.int64))
+            ignore.append(np.full(len(gt_labels), is_ignore))
+    return (np.concatenate(bboxes), np.concatenate(labels),
+            np.concatenate(img_ids), np.concatenate(ignore))
+
+
+def _scan_ranks(dets, det_img_ids, num_dets_per_img):
+    """Rank of every det in the descending score order of its image.
+
+    The ranks reproduce the ``np.argsort(-det_bboxes[:, -1])`` of
+    :func:`tpfp_default`, which is not stable, so the images with tied
+    scores are sorted again the same way.
+    """
+    det_scores = dets[:, -1]
+    order = np.lexsort((-det_scores, det_img_ids))
+    sorted_scores = det_scores[order]
+    sorted_imgs = det_img_ids[order]
+    tied = (sorted_scores[1:] == sorted_scores[:-1]) & (
+        sorted_imgs[1:] == sorted_imgs[:-1])
+    starts = np.cumsum(num_dets_per_img) - num_dets_per_img
+    for i in np.unique(sorted_imgs[1:][tied]):
+        end = starts[i] + num_dets_per_img[i]
+        order[starts[i]:end] = starts[i] + np.argsort(-dets[starts[i]:end, -1])
+    ranks = np.empty_like(order)
+    ranks[order] = np.arange(len(order))
+    return ranks
+
+
+def _valid_gts(gts, gt_ignore, area_ranges, extra_length):
+    """Whether each gt is counted in each area range.
+
+    Returns:
+        ndarray: Boolean array of shape (num_scales, num_gts).
+    """
+    valid = np.empty((len(area_ranges), len(gts)), dtype=bool)
+    areas = (gts[:, 2] - gts[:, 0] + extra_length) * (
+        gts[:, 3] - gts[:, 1] + extra_length)
+    for k, (min_area, max_area) in enumerate(area_ranges):
+        if min_area is None:
+            valid[k] = ~gt_ignore
+        else:
+            valid[k] = ~gt_ignore & (areas >= min_area) & (areas < max_area)
+    return valid
+
+
+def _fast_tpfp(dets, num_dets_per_img, gts, gt_ignore, num_gts_per_img,
+               iou_thrs, area_ranges, extra_length):
+    """Vectorised :func:`tpfp_default` of a class over several images.
+
+    Args:
+        dets (ndarray): Dets of the class, the dets of an image are
+            contiguous and in the order of the image results.
+        num_dets_per_img (ndarray): Number of dets of each image.
+        gts (ndarray): Gts of the class, the gts of an image are contiguous
+            and followed by its ignored gts.
+        gt_ignore (ndarray): Whether each gt is ignored.
+        num_gts_per_img (ndarray): Number of gts of each image, ignored gts
+            included.
+        iou_thrs (list[float]): IoU thresholds to be considered as matched.
+        area_ranges (list[tuple]): Range of bbox areas to be evaluated,
+            ``[(None, None)]`` for all areas.
+        extra_length (float): 1 in the legacy coordinate system, else 0.
+
+    Returns:
+        tuple[ndarray]: The stacked dets, tp and fp of shape (num_thrs,
+        num_scales, num_dets) and the number of valid gts of each scale.
+    """
+    num_imgs = len(num_dets_per_img)
+    num_scales = len(area_ranges)
+    num_dets = dets.shape[0]
+    det_img_ids = np.repeat(np.arange(num_imgs), num_dets_per_img)
+    gt_starts = np.cumsum(num_gts_per_img) - num_gts_per_img
+
+    # pair every det with all the gts of its image
+    num_pairs = num_gts_per_img[det_img_ids]
+    pair_det_inds = np.repeat(np.arange(num_dets), num_pairs)
+    pair_starts = np.cumsum(num_pairs) - num_pairs
+    pair_gt_inds = np.arange(pair_det_inds.size) - pair_starts[pair_det_inds]
+    ious = _paired_overlaps(
+        dets[pair_det_inds],
+        gts[gt_starts[det_img_ids[pair_det_inds]] + pair_gt_inds],
+        extra_length)
+    # for each det, the max iou with all gts and the first gt reaching it
+    has_gt = num_pairs > 0
+    ious_max = np.full(num_dets, -1, dtype=np.float32)
+    ious_argmax = np.zeros(num_dets, dtype=np.int64)
+    if ious.size > 0:
+        ious_max[has_gt] = np.maximum.reduceat(ious, pair_starts[has_gt])
+        is_max = ious == ious_max[pair_det_inds]
+        ious_argmax[has_gt] = np.minimum.reduceat(
+            np.where(is_max, pair_gt_inds, ious.size), pair_starts[has_gt])
+    matched_gt = gt_starts[det_img_ids] + ious_argmax
+    ranks = _scan_ranks(dets, det_img_ids, num_dets_per_img)
+
+    gt_valid = _valid_gts(gts, gt_ignore, area_ranges, extra_length)
+    det_in_range = _valid_gts(dets, np.zeros(num_dets, dtype=bool),
+                              area_ranges, extra_length)
+    num_gts = gt_valid.sum(axis=1).astype(int)
+
+    tp = np.zeros((len(iou_thrs), num_scales, num_dets), dtype=np.float32)
+    fp = np.zeros((len(iou_thrs), num_scales, num_dets), dtype=np.float32)
+    for t, iou_thr in enumerate(iou_thrs):
+        # the first det of each gt in the score order of its image is TP
+        matched = ious_max >= iou_thr
+        matched_inds = np.flatnonzero(matched)
+        matched_inds = matched_inds[np.lexsort(
+            (ranks[matched_inds], matched_gt[matched_inds]))]
+        first = np.zeros(num_dets, dtype=bool)
+        if matched_inds.size > 0:
+            new_gt = np.r_[True, np.diff(matched_gt[matched_inds]) != 0]
+            first[matched_inds[new_gt]] = True
+        for k in range(num_scales):
+            # dets matched to an ignored gt are neither TP nor FP
+            valid = np.zeros(num_dets, dtype=bool)
+            valid[matched] = gt_valid[k, matched_gt[matched]]
+            tp[t, k, valid & first] = 1
+            fp[t, k, valid & ~first] = 1
+            fp[t, k, ~matched & det_in_range[k]] = 1
+    return dets, tp, fp, num_gts
+
+
+def fast_eval_map(det_results,
+                  annotations,
+                  scale_ranges=None,
+                  iou_thr=0.5,
+                  dataset=None,
+                  logger=None,
+                  use_legacy_coordinate=False):
+    """Evaluate mAP of a dataset without a process pool.
+
+    Gives the same results as :func:`eval_map` with the default
+    :func:`tpfp_default`, bit for bit, in a few vectorised steps per class
+    instead of a Python loop over the images and dets:
+
+    - the dets and gts of all images are concatenated and the IoU of every
+      (det, gt) pair of the same image is computed at once,
+    - every det keeps its best gt, and the greedy matching of
+      :func:`tpfp_default` reduces to: a det is TP if its best gt is not
+      ignored and it is the first det of that gt in the score order of the
+      image.
+
+    Args:
+        det_results (list[list] | :obj:`DetectionResults`): Same as
+            `eval_map()`. The columnar results are evaluated without being
+            split into arrays per image.
+        annotations (list[dict]): Same as `eval_map()`.
+        scale_ranges (list[tuple] | None): Same as `eval_map()`.
+        iou_thr (float): IoU threshold to be considered as matched.
+            Default: 0.5.
+        dataset (list[str] | str | None): Same as `eval_map()`. ImageNet and
+            Open Images evaluations are not supported.
+        logger (logging.Logger | str | None): Same as `eval_map()`.
+        use_legacy_coordinate (bool): Same as `eval_map()`.
+
+    Returns:
+        tuple: (mAP, [dict, dict, ...])
+    """
+    assert len(det_results) == len(annotations)
+    assert dataset not in ['det', 'vid', 'oid_challenge', 'oid_v6'], \
+        f'fast_eval_map does not support {dataset}, please use eval_map'
+    if not use_legacy_coordinate:
+        extra_length = 0.
+    else:
+        extra_length = 1.
+
+    num_imgs = len(det_results)
+    num_scales = len(scale_ranges) if scale_ranges is not None else 1
+    if isinstance(det_results, DetectionResults):
+        num_classes = det_results.num_classes
+    else:
+        num_classes = len(det_results[0])  # positive class num
+    area_ranges = ([(rg[0]**2, rg[1]**2) for rg in scale_ranges]
+                   if scale_ranges is not None else [(None, None)])
+
+    all_gts, all_gt_labels, all_gt_img_ids, all_gt_ignore = _flatten_gts(
+        annotations)
+
+    eval_results = []
+    for i in range(num_classes):
+        gt_inds = all_gt_labels == i
+        if isinstance(det_results, DetectionResults):
+            cls_dets, num_dets_per_img = det_results.class_dets(i)
+        else:
+            cls_dets = [img_res[i] for img_res in det_results]
+            num_dets_per_img = np.array([len(dets) for dets in cls_dets])
+            cls_dets = np.vstack(cls_dets)
+        dets, tp, fp, num_gts = _fast_tpfp(
+            cls_dets, num_dets_per_img, all_gts[gt_inds],
+            all_gt_ignore[gt_inds],
+            np.bincount(all_gt_img_ids[gt_inds], minlength=num_imgs),
+            [iou_thr], area_ranges, extra_length)
+        eval_results.append(
+            _cls_eval_result(tp[0], fp[0], dets, num_gts, scale_ranges,
+                             dataset))
+    mean_ap = _mean_ap(eval_results, num_scales, scale_ranges)
+
+    print_map_summary(
+        mean_ap,
+        eval_results,
+        dataset,
+        area_ranges if scale_ranges is not None else None,
+        logger=logger)
+
+    return mean_ap, eval_results
+
+
+def _batch_average_precision(recalls, precisions, mode='area'):
+    """Same as :func:`average_precision` with the rows of ``recalls`` and
+    ``precisions``, of shape (n, num_dets), vectorised."""
+    if mode == 'area':
+        zeros = np.zeros((len(recalls), 1), dtype=recalls.dtype)
+        ones = np.ones((len(recalls), 1), dtype=recalls.dtype)
+        mrec = np.hstack((zeros, recalls, ones))
+        mpre = np.hstack((zeros, precisions, zeros))
+        mpre = np.maximum.accumulate(mpre[:, ::-1], axis=1)[:, ::-1]
+        return np.sum((mrec[:, 1:] - mrec[:, :-1]) * mpre[:, 1:], axis=1)
+    elif mode == '11points':
+        ap = np.zeros(len(recalls), dtype=recalls.dtype)
+        for thr in np.arange(0, 1 + 1e-3, 0.1):
+            ap += np.where(recalls >= thr, precisions, 0).max(
+                axis=1, initial=0)
+        return ap / 11
+    raise ValueError(
+        'Unrecognized mode, only "area" and "11points" are supported')
+
+
+class MeanAPEvaluator(object):
+    """Evaluate mAP incrementally, as the results of the images arrive.
+
+    The results of every batch are matched against their gts right away and
+    only the score, image id and TP/FP flags of each det are kept, so the
+    results of the whole dataset are never held in memory. The evaluators
+    of several ranks can be merged, images seen by more than one of them
+    (e.g. padded by the sampler) are only counted once. :meth:`compute`
+    gives the same results as :func:`eval_map` with the default
+    :func:`tpfp_default`.
+
+    Args:
+        get_ann_info (callable): Function mapping the index of an image to
+            its annotation, in the format of `eval_map()`.
+        iou_thrs (Sequence[float]): IoU thresholds to be evaluated.
+            Default: (0.5, ).
+        scale_ranges (list[tuple] | None): Same as `eval_map()`.
+        dataset (list[str] | str | None): Same as `eval_map()`.
+        use_legacy_coordinate (bool): Same as `eval_map()`.
+
+    Example:
+        >>> import numpy as np
+        >>> anns = [dict(bboxes=np.array([[0., 0., 10., 10.]]),
+        ...              labels=np.array([0]))]
+        >>> evaluator = MeanAPEvaluator(anns.__getitem__)
+        >>> evaluator.update([[np.array([[0., 0., 10., 10., 0.9]])]], [0])
+        >>> mean_ap, _ = evaluator.compute(logger='silent')
+        >>> assert mean_ap == 1.0
+    """
+
+    def __init__(self,
+                 get_ann_info,
+                 iou_thrs=(0.5, ),
+                 scale_ranges=None,
+                 dataset=None,
+                 use_legacy_coordinate=False):
+        self.get_ann_info = get_ann_info
+        self.iou_thrs = list(iou_thrs)
+        self.scale_ranges = scale_ranges
+        self.dataset = dataset
+        self.use_legacy_coordinate = use_legacy_coordinate
+        self.area_ranges = ([(rg[0]**2, rg[1]**2) for rg in scale_ranges]
+                            if scale_ranges is not None else [(None, None)])
+        self.reset()
+
+    def reset(self):
+        """Drop all the results seen so far."""
+        # each part holds the image ids of a batch, their number of gts of
+        # shape (num_imgs, num_classes, num_scales) and for each class the
+        # (img_ids, scores, tp, fp) of the dets, tp and fp being boolean
+        # arrays of shape (num_thrs, num_scales, num_dets)
+        self._parts = []
+        self._img_ids = set()
+
+    def __len__(self):
+        return len(self._img_ids)
+
+    def __getstate__(self):
+        # get_ann_info is often a bound method of the dataset
+        state = self.__dict__.copy()
+        state['get_ann_info'] = None
+        return state
+
+    def update(self, batch_results, img_ids):
+        """Match the results of a batch of images.
+
+        Args:
+            batch_results (list[list | tuple]): Results of the images, in
+                the format of `eval_map()` ``det_results``. Results with
+                masks are accepted, only their bboxes are evaluated.
+            img_ids (Sequence[int]): Indices of the images.
+        """
+        assert len(batch_results) == len(img_ids)
+        det_results, ids = [], []
+        for result, img_id in zip(batch_results, img_ids):
+            img_id = int(img_id)
+            if img_id in self._img_ids or img_id in ids:
+                continue
+            det_results.append(
+                result[0] if isinstance(result, tuple) else result)
+            ids.append(img_id)
+        if not ids:
+            return
+        extra_length = 1. if self.use_legacy_coordinate else 0.
+        num_imgs = len(ids)
+        num_classes = len(det_results[0])
+        all_gts, all_gt_labels, all_gt_img_ids, all_gt_ignore = _flatten_gts(
+            [self.get_ann_info(img_id) for img_id in ids])
+
+        # number of valid gts of each image, class and scale
+        gt_valid = _valid_gts(all_gts, all_gt_ignore, self.area_ranges,
+                              extra_length)
+        num_gts = np.zeros((num_imgs, num_classes, len(self.area_ranges)),
+                           dtype=np.int64)
+        for k in range(len(self.area_ranges)):
+            np.add.at(num_gts[..., k], (all_gt_img_ids, all_gt_labels),
+                      gt_valid[k].astype(np.int64))
+        cls_parts = []
+        for i in range(num_classes):
+            gt_inds = all_gt_labels == i
+            cls_dets = [img_res[i] for img_res in det_results]
+            num_dets_per_img = np.array([len(dets) for dets in cls_dets])
+            dets, tp, fp, _ = _fast_tpfp(
+                np.vstack(cls_dets), num_dets_per_img, all_gts[gt_inds],
+                all_gt_ignore[gt_inds],
+                np.bincount(all_gt_img_ids[gt_inds], minlength=num_imgs),
+                self.iou_thrs, self.area_ranges, extra_length)
+            det_img_ids = np.repeat(ids, num_dets_per_img)
+            cls_parts.append((det_img_ids, dets[:, -1].copy(),
+                              tp.astype(bool), fp.astype(bool)))
+        self._parts.append((np.array(ids), num_gts, cls_parts))
+        self._img_ids.update(ids)
+
+    def merge(self, other):
+        """Add the results seen by another evaluator, e.g. of another rank.
+
+        Args:
+            other (:obj:`MeanAPEvaluator`): The evaluator to merge.
+        """
+        for img_ids, num_gts, cls_parts in other._parts:
+            new = np.array([img_id not in self._img_ids for img_id in img_ids],
+                           dtype=bool)
+            if new.all():
+                self._parts.append((img_ids, num_gts, cls_parts))
+            elif new.any():
+                new_ids = set(img_ids[new].tolist())
+                filtered = []
+                for det_img_ids, scores, tp, fp in cls_parts:
+                    keep = np.array([i in new_ids for i in det_img_ids],
+                                    dtype=bool)
+                    filtered.append((det_img_ids[keep], scores[keep],
+                                     tp[..., keep], fp[..., keep]))
+                self._parts.append((img_ids[new], num_gts[new], filtered))
+            self._img_ids.update(img_ids[new].tolist())
+
+    def compute(self, thr_ind=0, logger=None):
+        """Compute the mAP of the images seen so far.
+
+        Args:
+            thr_ind (int): Index of the IoU threshold in ``iou_thrs``.
+                Default: 0.
+            logger (logging.Logger | str | None): Same as `eval_map()`.
+
+        Returns:
+            tuple: (mAP, [dict, dict, ...]), same as `eval_map()`.
+        """
+        assert self._parts, 'no results to evaluate'
+        num_scales = len(self.area_ranges)
+        num_classes = len(self._parts[0][2])
+        num_gts = sum(part[1].sum(axis=0) for part in self._parts)
+        eval_results = []
+        for i in range(num_classes):
+            det_img_ids, scores, tp, fp = [
+                np.concatenate(arrays, axis=-1)
+                for arrays in zip(*[part[2][i] for part in self._parts])
+            ]
+            # put the dets in image order, as eval_map stacks them
+            order = np.argsort(det_img_ids, kind='stable')
+            eval_results.append(
+                _cls_eval_result(tp[thr_ind][:, order].astype(np.float32),
+                                 fp[thr_ind][:, order].astype(np.float32),
+                                 scores[order, None], num_gts[i],
+                                 self.scale_ranges, self.dataset))
+        mean_ap = _mean_ap(eval_results, num_scales, self.scale_ranges)
+
+        print_map_summary(
+            mean_ap,
+            eval_results,
+            self.dataset,
+            self.area_ranges if self.scale_ranges is not None else None,
+            logger=logger)
+
+        return mean_ap, eval_results
+
+    def bootstrap(self, num_samples=1000, thr_ind=0, img_ids=None, seed=0):
+        """Bootstrap the mAP over the images.
+
+        The images are resampled with replacement ``num_samples`` times and
+        the mAP of every resample is computed from the kept TP/FP flags,
+        vectorised over the resamples: each det is weighted by the number
+        of times its image is drawn. With the same ``img_ids`` and ``seed``
+        the evaluators of different models draw the same images, so their
+        mAPs can be compared resample by resample.
+
+        Args:
+            num_samples (int): Number of resamples. Default: 1000.
+            thr_ind (int): Index of the IoU threshold in ``iou_thrs``.
+                Default: 0.
+            img_ids (Sequence[int], optional): Images to resample, all the
+                images seen if not specified. Default: None.
+            seed (int): Seed of the resampling. Default: 0.
+
+        Returns:
+            np.ndarray: The mAP of each resample, of shape (num_samples, ),
+                or (num_samples, num_scales) with ``scale_ranges``.
+        """
+        assert self._parts, 'no results to evaluate'
+        seen_ids = np.concatenate([part[0] for part in self._parts])
+        num_gts = np.concatenate([part[1] for part in self._parts])
+        img_ids = np.unique(seen_ids if img_ids is None else img_ids)
+        assert np.isin(img_ids, seen_ids).all(), \
+            'only the images seen by the evaluator can be resampled'
+        # position of every seen image in img_ids, -1 if not resampled
+        pos = np.searchsorted(img_ids, seen_ids)
+        pos[pos == len(img_ids)] = 0
+        pos[img_ids[pos] != seen_ids] = -1
+        num_gts = num_gts[pos >= 0][np.argsort(pos[pos >= 0])]
+
+        num_imgs = len(img_ids)
+        rng = np.random.RandomState(seed)
+        draws = rng.randint(0, num_imgs, size=(num_samples, num_imgs))
+        draws += np.arange(num_samples)[:, None] * num_imgs
+        weights = np.bincount(
+            draws.ravel(), minlength=num_samples * num_imgs).reshape(
+                num_samples, num_imgs).astype(np.float32)
+
+        eps = np.finfo(np.float32).eps
+        mode = 'area' if self.dataset != 'voc07' else '11points'
+        num_scales = len(self.area_ranges)
+        ap_sum = np.zeros((num_samples, num_scales))
+        num_valid = np.zeros((num_samples, num_scales))
+        for i in range(len(self._parts[0][2])):
+            det_img_ids, scores, tp, fp = [
+                np.concatenate(arrays, axis=-1)
+                for arrays in zip(*[part[2][i] for part in self._parts])
+            ]
+            # same order of the dets as in compute()
+            order = np.argsort(det_img_ids, kind='stable')
+            order = order[np.argsort(-scores[order])]
+            det_pos = np.searchsorted(img_ids, det_img_ids[order])
+            det_pos[det_pos == num_imgs] = 0
+            keep = img_ids[det_pos] == det_img_ids[order]
+            det_pos, order = det_pos[keep], order[keep]
+            # bound the memory of the (resamples, dets) arrays
+            chunk = max(1, (1 << 22) // max(len(order), 1))
+            for k in range(num_scales):
+                cls_num_gts = weights @ num_gts[:, i, k]
+                tp_k = tp[thr_ind, k, order]
+                fp_k = fp[thr_ind, k, order]
+                for start in range(0, num_samples, chunk):
+                    w = weights[start:start + chunk][:, det_pos]
+                    tp_cum = np.cumsum(w * tp_k, axis=1)
+                    fp_cum = np.cumsum(w * fp_k, axis=1)
+                    recalls = tp_cum / np.maximum(
+                        cls_num_gts[start:start + chunk, None], eps)
+                    precisions = tp_cum / np.maximum(tp_cum + fp_cum, eps)
+                    ap = _batch_average_precision(recalls, precisions, mode)
+                    valid = cls_num_gts[start:start + chunk] > 0
+                    ap_sum[start:start + chunk, k] += ap * valid
+                    num_valid[start:start + chunk, k] += valid
+        mean_ap = np.where(num_valid > 0, ap_sum / np.maximum(num_valid, 1),
+                           0.)
+        return mean_ap if self.scale_ranges is not None else mean_ap[:, 0]
+
+
 def print_map_summary(mean_ap,
                       results,
                       dataset=None,
@@ -1,46 +1,177 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 from collections.abc import Sequence
+from multiprocessing import Pool
 
 import numpy as np
 from mmcv.utils import print_log
 from terminaltables import AsciiTable
 
-from .bbox_overlaps import bbox_overlaps
-
-
-def _recalls(all_ious, proposal_nums, thrs):
-
-    img_num = all_ious.shape[0]
-    total_gt_num = sum([ious.shape[0] for ious in all_ious])
-
-    _ious = np.zeros((proposal_nums.size, total_gt_num), dtype=np.float32)
-    for k, proposal_num in enumerate(proposal_nums):
-        tmp_ious = np.zeros(0)
-        for i in range(img_num):
-            ious = all_ious[i][:, :proposal_num].copy()
-            gt_ious = np.zeros((ious.shape[0]))
-            if ious.size == 0:
-                tmp_ious = np.hstack((tmp_ious, gt_ious))
-                continue
-            for j in range(ious.shape[0]):
-                gt_max_overlaps = ious.argmax(axis=1)
-                max_ious = ious[np.arange(0, ious.shape[0]), gt_max_overlaps]
-                gt_idx = max_ious.argmax()
-                gt_ious[j] = max_ious[gt_idx]
-                box_idx = gt_max_overlaps[gt_idx]
-                ious[gt_idx, :] = -1
-                ious[:, box_idx] = -1
-            tmp_ious = np.hstack((tmp_ious, gt_ious))
-        _ious[k, :] = tmp_ious
-
-    _ious = np.fliplr(np.sort(_ious, axis=1))
-    recalls = np.zeros((proposal_nums.size, thrs.size))
-    for i, thr in enumerate(thrs):
-        recalls[:, i] = (_ious >= thr).sum(axis=1) / float(total_gt_num)
 
+def _top_proposals(proposals, max_num):
+    """Boxes of the top ``max_num`` proposals of an image, by score if the
+    proposals have one."""
+    if proposals.ndim == 2 and proposals.shape[1] == 5:
+        scores = proposals[:, 4]
+        sort_idx = np.argsort(scores)[::-1]
+        proposals = proposals[sort_idx, :]
+    return proposals[:max_num, :4].astype(np.float32)
+
+
+def _padded_ious(gts, proposals, extra_length, eps=1e-6):
+    """IoUs of padded gts (B, G, 4) and proposals (B, P, 4), computed like
+    :func:`bbox_overlaps`, of shape (B, G, P)."""
+    gts = gts[:, :, None]
+    proposals = proposals[:, None]
+    area1 = (gts[..., 2] - gts[..., 0] + extra_length) * (
+        gts[..., 3] - gts[..., 1] + extra_length)
+    area2 = (proposals[..., 2] - proposals[..., 0] + extra_length) * (
+        proposals[..., 3] - proposals[..., 1] + extra_length)
+    x_start = np.maximum(gts[..., 0], proposals[..., 0])
+    y_start = np.maximum(gts[..., 1], proposals[..., 1])
+    x_end = np.minimum(gts[..., 2], proposals[..., 2])
+    y_end = np.minimum(gts[..., 3], proposals[..., 3])
+    overlap = np.maximum(x_end - x_start + extra_length, 0) * np.maximum(
+        y_end - y_start + extra_length, 0)
+    union = np.maximum(area1 + area2 - overlap, eps)
+    return overlap / union
+
+
+def _assigned_ious(gts,
+                   proposals,
+                   proposal_nums,
+                   use_legacy_coordinate=False,
+                   max_size=1 << 22):
+    """IoU of the proposal assigned to each gt, for each proposal num.
+
+    For the top ``n`` proposals of an image, the (gt, proposal) pair of the
+    highest IoU is assigned and both are removed, until there are no gts or
+    proposals left, the ties going to the first gt then the first proposal.
+    The images are grouped by their number of gts, and the IoUs of a group
+    are computed as a single padded array, so that each step of the
+    assignment is done for the whole group at once. The best proposal of
+    each gt is kept and only searched again when it is removed.
+
+    Args:
+        gts (list[ndarray]): Gts of each image, of shape (n, 4).
+        proposals (list[ndarray]): Proposals of each image, of shape (k, 4)
+            or (k, 5).
+        proposal_nums (ndarray): Numbers of top proposals, in ascending
+            order.
+        use_legacy_coordinate (bool): Same as :func:`eval_recalls`.
+            Default: False.
+        max_size (int): Max number of IoUs of a group. Default: 4M.
+
+    Returns:
+        ndarray: The assigned IoUs of shape (len(proposal_nums),
+            total_gt_num), -1 for the gts left unassigned and 0 for the gts
+            of an image without proposals.
+    """
+    extra_length = 1. if use_legacy_coordinate else 0.
+    gts = [
+        np.zeros((0, 4), dtype=np.float32)
+        if img_gts is None else img_gts.astype(np.float32) for img_gts in gts
+    ]
+    proposals = [
+        _top_proposals(img_proposals, proposal_nums[-1])
+        for img_proposals in proposals
+    ]
+    num_gts = np.array([len(img_gts) for img_gts in gts], dtype=np.int64)
+    num_props = np.array([len(img_props) for img_props in proposals],
+                         dtype=np.int64)
+    gt_starts = np.cumsum(num_gts) - num_gts
+    assigned = np.zeros((len(proposal_nums), num_gts.sum()), dtype=np.float32)
+
+    img_inds = np.nonzero((num_gts > 0) & (num_props > 0))[0]
+    img_inds = img_inds[np.argsort(num_gts[img_inds], kind='stable')]
+    start = 0
+    while start < len(img_inds):
+        # grow the group while its padded IoUs fit in max_size
+        max_gts = num_gts[img_inds[start]]
+        max_props = num_props[img_inds[start]]
+        end = start + 1
+        while end < len(img_inds):
+            g = max(max_gts, num_gts[img_inds[end]])
+            p = max(max_props, num_props[img_inds[end]])
+            if (end - start + 1) * g * p > max_size:
+                break
+            max_gts, max_props = g, p
+            end += 1
+        group = img_inds[start:end]
+        start = end
+
+        group_gts = np.zeros((len(group), max_gts, 4), dtype=np.float32)
+        group_props = np.zeros((len(group), max_props, 4), dtype=np.float32)
+        for b, i in enumerate(group):
+            group_gts[b, :num_gts[i]] = gts[i]
+            group_props[b, :num_props[i]] = proposals[i]
+        # padded pairs get an IoU of -2, below the -1 of removed pairs
+        valid = (np.arange(max_gts) < num_gts[group, None])[:, :, None] & (
+            np.arange(max_props) < num_props[group, None])[:, None]
+        ious = np.where(valid,
+                        _padded_ious(group_gts, group_props, extra_length),
+                        -2).astype(np.float32)
+
+        group_assigned = np.full((len(proposal_nums), len(group), max_gts),
+                                 -1,
+                                 dtype=np.float32)
+        b_inds = np.arange(len(group))
+        for n, proposal_num in enumerate(proposal_nums):
+            top_ious = ious[:, :, :proposal_num].copy()
+            # the best proposal of each gt, ties to the first one
+            row_best = top_ious.argmax(axis=2)
+            row_max = top_ious.max(axis=2)
+            for _ in range(min(max_gts, top_ious.shape[2])):
+                # the best pair, ties to the first gt
+                g_inds = row_max.argmax(axis=1)
+                best_ious = row_max[b_inds, g_inds]
+                if best_ious.max() < 0:
+                    break
+                p_inds = row_best[b_inds, g_inds]
+                valid = best_ious >= 0
+                group_assigned[n, b_inds[valid],
+                               g_inds[valid]] = best_ious[valid]
+                # remove the gt and the proposal, then update the gts whose
+                # best proposal was removed
+                top_ious[b_inds, g_inds, :] = -1
+                top_ious[b_inds, :, p_inds] = -1
+                row_max[b_inds, g_inds] = -1
+                stale_b, stale_g = np.nonzero(row_best == p_inds[:, None])
+                stale_ious = top_ious[stale_b, stale_g]
+                row_best[stale_b, stale_g] = stale_ious.argmax(axis=1)
+                row_max[stale_b, stale_g] = stale_ious.max(axis=1)
+        for b, i in enumerate(group):
+            assigned[:, gt_starts[i]:gt_starts[i] + num_gts[i]] = \
+                group_assigned[:, b, :num_gts[i]]
+    return assigned
+
+
+def _recalls(assigned_ious, thrs):
+    """Recalls of the assigned IoUs, of shape (num_proposal_nums,
+    num_thrs)."""
+    total_gt_num = assigned_ious.shape[1]
+    # the number of gts of each IoU threshold, searched in the sorted IoUs
+    sorted_ious = np.sort(assigned_ious, axis=1)
+    recalls = np.zeros((assigned_ious.shape[0], thrs.size))
+    for k, ious in enumerate(sorted_ious):
+        num_recalled = total_gt_num - np.searchsorted(ious, thrs, 'left')
+        recalls[k] = num_recalled / float(total_gt_num)
     return recalls
 
 
+_pool = None
+
+
+def _get_pool(nproc):
+    """Pool of ``nproc`` workers, kept alive to be reused by the following
+    calls of :func:`eval_recalls`."""
+    global _pool
+    if _pool is None or _pool[0] != nproc:
+        if _pool is not None:
+            _pool[1].terminate()
+        _pool = (nproc, Pool(nproc))
+    return _pool[1]
+
+
 def set_recall_param(proposal_nums, iou_thrs):
     """Check proposal_nums and iou_thrs and set correct format."""
     if isinstance(proposal_nums, Sequence):
@@ -67,9 +198,16 @@ def eval_recalls(gts,
                  proposal_nums=None,
                  iou_thrs=0.5,
                  logger=None,
-                 use_legacy_coordinate=False):
+                 use_legacy_coordinate=False,
+                 nproc=4,
+                 chunk_size=256):
     """Calculate recalls.
 
+    The IoUs of each image are computed once and the gts are assigned to
+    the proposals for all the proposal nums at once. Chunks of images are
+    evaluated by a pool of processes, which is kept alive for the following
+    calls.
+
     Args:
         gts (list[ndarray]): a list of arrays of shape (n, 4)
         proposals (list[ndarray]): a list of arrays of shape (k, 4) or (k, 5)
@@ -81,7 +219,11 @@ def eval_recalls(gts,
             in mmdet v1.x. "1" was added to both height and width
             which means w, h should be
             computed as 'x2 - x1 + 1` and 'y2 - y1 + 1'. Default: False.
-
+        nproc (int): Processes used for the evaluation. It is serial if
+            nproc is 1 or there are no more than ``chunk_size`` images.
+            Default: 4.
+        chunk_size (int): Number of images evaluated by a task of the pool.
+            Default: 256.
 
     Returns:
         ndarray: recalls of different ious and proposal nums
@@ -90,25 +232,16 @@ def eval_recalls(gts,
     img_num = len(gts)
     assert img_num == len(proposals)
     proposal_nums, iou_thrs = set_recall_param(proposal_nums, iou_thrs)
-    all_ious = []
-    for i in range(img_num):
-        if proposals[i].ndim == 2 and proposals[i].shape[1] == 5:
-            scores = proposals[i][:, 4]
-            sort_idx = np.argsort(scores)[::-1]
-            img_proposal = proposals[i][sort_idx, :]
-        else:
-            img_proposal = proposals[i]
-        prop_num = min(img_proposal.shape[0], proposal_nums[-1])
-        if gts[i] is None or gts[i].shape[0] == 0:
-            ious = np.zeros((0, img_proposal.shape[0]), dtype=np.float32)
-        else:
-            ious = bbox_overlaps(
-                gts[i],
-                img_proposal[:prop_num, :4],
-                use_legacy_coordinate=use_legacy_coordinate)
-        all_ious.append(ious)
-    all_ious = np.array(all_ious)
-    recalls = _recalls(all_ious, proposal_nums, iou_thrs)
+    if nproc > 1 and img_num > chunk_size:
+        chunks = [(gts[i:i + chunk_size], proposals[i:i + chunk_size],
+                   proposal_nums, use_legacy_coordinate)
+                  for i in range(0, img_num, chunk_size)]
+        assigned_ious = np.concatenate(
+            _get_pool(nproc).starmap(_assigned_ious, chunks), axis=1)
+    else:
+        assigned_ious = _assigned_ious(gts, proposals, proposal_nums,
+                                       use_legacy_coordinate)
+    recalls = _recalls(assigned_ious, iou_thrs)
 
     print_recall_summary(recalls, proposal_nums, iou_thrs, logger=logger)
     return recalls
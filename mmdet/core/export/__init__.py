@@ -4,9 +4,17 @@ from .onnx_helper import (add_dummy_nms_for_onnx, dynamic_clip_for_onnx,
 from .pytorch2onnx import (build_model_from_cfg,
                            generate_inputs_and_wrap_model,
                            preprocess_example_input)
+from .quantize import (Int8CostModel, collect_calib_imgs,
+                       export_quantized_torchscript, quantize_detector)
+from .subnet import (build_subnet_from_cfg, export_subnet_to_onnx,
+                     fuse_slimmable_conv_bn, materialize_subnet,
+                     verify_subnet_onnx)
 
 __all__ = [
     'build_model_from_cfg', 'generate_inputs_and_wrap_model',
     'preprocess_example_input', 'get_k_for_topk', 'add_dummy_nms_for_onnx',
-    'dynamic_clip_for_onnx'
+    'dynamic_clip_for_onnx', 'materialize_subnet', 'build_subnet_from_cfg',
+    'export_subnet_to_onnx', 'verify_subnet_onnx', 'collect_calib_imgs',
+    'quantize_detector', 'export_quantized_torchscript', 'Int8CostModel',
+    'fuse_slimmable_conv_bn'
 ]
@@ -0,0 +1,239 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import copy
+import os.path as osp
+import time
+
+import mmcv
+import torch
+import torch.nn as nn
+from mmcv.parallel import DataContainer
+
+from .subnet import materialize_subnet
+
+
+class _FeatureExtractor(nn.Module):
+    """The backbone and the neck of a detector, traced as one graph, since
+    FX cannot trace a module taking the tuple of the backbone outputs."""
+
+    def __init__(self, backbone, neck):
+        super(_FeatureExtractor, self).__init__()
+        self.backbone = backbone
+        self.neck = neck
+
+    def forward(self, img):
+        return self.neck(list(self.backbone(img)))
+
+
+def collect_calib_imgs(data_loader, num_imgs=64):
+    """Cache the first images of a data loader for the calibration.
+
+    Args:
+        data_loader (DataLoader): The data loader, e.g. of the train set.
+        num_imgs (int): Number of images to cache. Default: 64.
+
+    Returns:
+        list[Tensor]: The batches of images, of ``num_imgs`` images in all.
+    """
+    calib_imgs, count = [], 0
+    for data in data_loader:
+        img = data['img']
+        if isinstance(img, list):
+            img = img[0]
+        if isinstance(img, DataContainer):
+            img = img.data[0]
+        img = img[:num_imgs - count]
+        calib_imgs.append(img)
+        count += len(img)
+        if count >= num_imgs:
+            break
+    return calib_imgs
+
+
+def quantize_detector(model,
+                      calib_imgs,
+                      arch=None,
+                      backend='x86',
+                      strict=True):
+    """Quantize a dense single stage detector to int8 after training.
+
+    The backbone and the neck are traced as one graph with FX graph mode
+    quantization, the modules of the per level branches of the head as one
+    graph each. The observers are calibrated on ``calib_imgs``, then the
+    graphs are converted to int8 modules, which take and return float
+    tensors. The backbone of the returned copy is the quantized graph of
+    the backbone and the neck, its neck is an identity, so that the
+    detector keeps its post-processing and is tested like the float one.
+
+    A subnet of a supernet is materialized first, see
+    :func:`materialize_subnet`, the BNs are folded by the quantization.
+
+    Args:
+        model (nn.Module): The detector, e.g. a dense ``_tfs`` model or a
+            supernet.
+        calib_imgs (list[Tensor]): The batches of calibration images, see
+            :func:`collect_calib_imgs`.
+        arch (dict, optional): The arch of the subnet if the model is a
+            supernet, its current arch if None. Default: None.
+        backend (str): The quantized engine, 'x86' or 'fbgemm' on x86 CPUs,
+            'qnnpack' on ARM. It is set as ``torch.backends.quantized.engine``,
+            the quantized model runs with it. Default: 'x86'.
+        strict (bool): Whether to raise if a BN of the supernet normalizes
+            with the statistics of each batch, see
+            :func:`materialize_subnet`. Default: True.
+
+    Returns:
+        nn.Module: The quantized copy of the detector on CPU, in eval mode.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    from mmdet.models.utils import USConv2d
+
+    if any(isinstance(m, USConv2d) for m in model.modules()):
+        qmodel = materialize_subnet(
+            model, arch, fuse_bn=False, strict=strict)
+    else:
+        qmodel = copy.deepcopy(model)
+    qmodel = qmodel.cpu().eval()
+    torch.backends.quantized.engine = backend
+    qconfig_mapping = get_default_qconfig_mapping(backend)
+
+    # the graphs and the modules they replace, as (parent, name, module)
+    targets = [(qmodel, 'backbone',
+                _FeatureExtractor(qmodel.backbone, qmodel.neck))]
+    for name, child in qmodel.bbox_head.named_children():
+        if isinstance(child, nn.ModuleList):
+            targets += [(child, str(i), module)
+                        for i, module in enumerate(child)]
+
+    # the example inputs of each graph, from a forward of the float model
+    example_inputs, handles = {}, []
+    for parent, name, module in targets:
+        handles.append(
+            module.register_forward_pre_hook(
+                lambda m, inputs: example_inputs.setdefault(m, inputs)))
+    with torch.no_grad():
+        targets[0][2](calib_imgs[0][:1].cpu())
+        qmodel.forward_dummy(calib_imgs[0][:1].cpu())
+    for handle in handles:
+        handle.remove()
+
+    with torch.no_grad():
+        for parent, name, module in targets:
+            prepared = prepare_fx(module, qconfig_mapping,
+                                  example_inputs[module])
+            setattr(parent, name, prepared)
+        qmodel.neck = nn.Identity()
+        for img in calib_imgs:
+            qmodel.forward_dummy(img.cpu())
+        for parent, name, _ in targets:
+            setattr(parent, name, convert_fx(getattr(parent, name)))
+    return qmodel
+
+
+def export_quantized_torchscript(model, input_shape, output_file):
+    """Export the network of a quantized detector to TorchScript.
+
+    The traced network maps the images to the raw outputs of the head, the
+    post-processing is left to ``bbox_head.get_bboxes``.
+
+    Args:
+        model (nn.Module): The quantized detector, see
+            :func:`quantize_detector`.
+        input_shape (tuple[int]): The input shape (N, C, H, W) to trace with.
+        output_file (str): The TorchScript file.
+    """
+    img = torch.zeros(input_shape)
+    origin_forward = model.forward
+    model.forward = model.forward_dummy
+    try:
+        with torch.no_grad():
+            traced = torch.jit.trace(model, img)
+    finally:
+        model.forward = origin_forward
+    traced = torch.jit.freeze(traced)
+    torch.jit.save(traced, output_file)
+
+
+class Int8CostModel(object):
+    """Estimate the int8 CPU latency of a dense detector from its convs.
+
+    The latency is the sum of the ones of the convs, measured once for each
+    kind of conv (channels, kernel, stride, groups and input size) as an int8
+    conv on the quantized engine. The elementwise ops and the quantization
+    boundaries are not counted, so it ranks the subnets of a search space
+    rather than predicting their absolute latency.
+
+    Args:
+        input_shape (tuple[int]): The input shape (C, H, W) of the detector.
+        repeat (int): Number of runs each conv is timed on. Default: 10.
+        backend (str): The quantized engine. Default: 'x86'.
+        cache_file (str, optional): Pickle file of the measured latencies,
+            loaded if it exists and updated by :meth:`save`. Default: None.
+    """
+
+    def __init__(self, input_shape, repeat=10, backend='x86', cache_file=None):
+        self.input_shape = tuple(input_shape)
+        self.repeat = repeat
+        self.backend = backend
+        self.cache_file = cache_file
+        self.table = {}
+        if cache_file is not None and osp.isfile(cache_file):
+            self.table = mmcv.load(cache_file)
+
+    def layer_ms(self, key):
+        """Get the int8 latency in ms of a conv from its key."""
+        if key not in self.table:
+            self.table[key] = self._measure(*key)
+        return self.table[key]
+
+    def _measure(self, in_channels, out_channels, kernel_size, stride, padding,
+                 dilation, groups, height, width):
+        from torch.ao.nn.quantized import Conv2d
+
+        torch.backends.quantized.engine = self.backend
+        conv = Conv2d(
+            in_channels,
+            out_channels,
+            kernel_size,
+            stride=stride,
+            padding=padding,
+            dilation=dilation,
+            groups=groups)
+        x = torch.quantize_per_tensor(
+            torch.rand(1, in_channels, height, width), 1 / 255, 0,
+            torch.quint8)
+        with torch.no_grad():
+            conv(x)
+            start = time.perf_counter()
+            for _ in range(self.repeat):
+                conv(x)
+        return (time.perf_counter() - start) * 1000 / self.repeat
+
+    def __call__(self, model):
+        """Estimate the int8 latency in ms of a dense detector."""
+        keys, handles = [], []
+
+        def record(module, inputs):
+            height, width = inputs[0].shape[2:]
+            keys.append((module.in_channels, module.out_channels,
+                         module.kernel_size, module.stride, module.padding,
+                         module.dilation, module.groups, height, width))
+
+        for module in model.modules():
+            if isinstance(module, nn.Conv2d):
+                handles.append(module.register_forward_pre_hook(record))
+        param = next(model.parameters())
+        img = param.new_zeros((1, ) + self.input_shape)
+        try:
+            with torch.no_grad():
+                model.forward_dummy(img)
+        finally:
+            for handle in handles:
+                handle.remove()
+        return sum(self.layer_ms(key) for key in keys)
+
+    def save(self):
+        """Save the measured latencies to ``cache_file``."""
+        if self.cache_file is not None:
+            mmcv.dump(self.table, self.cache_file)
@@ -0,0 +1,354 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import copy
+import warnings
+
+import numpy as np
+import torch
+import torch.nn as nn
+from mmcv.cnn import fuse_conv_bn
+
+from .pytorch2onnx import build_model_from_cfg
+
+
+def _dense_module(module):
+    """Get the dense copy of a :class:`USConv2d` or :class:`USBatchNorm2d`
+    at its current width, None for the other modules."""
+    from mmdet.models.utils import USBatchNorm2d, USConv2d
+
+    if isinstance(module, USConv2d):
+        dense = nn.Conv2d(
+            module.in_channels,
+            module.out_channels,
+            module.kernel_size,
+            stride=module.stride,
+            padding=module.padding,
+            dilation=module.dilation,
+            groups=module.in_channels if module.depthwise else 1,
+            bias=module.bias is not None)
+        dense.weight.data.copy_(
+            module.weight.data[:module.out_channels, :module.in_channels])
+        if module.bias is not None:
+            dense.bias.data.copy_(module.bias.data[:module.out_channels])
+    elif isinstance(module, USBatchNorm2d):
+        num_features = module.num_features
+        dense = nn.BatchNorm2d(
+            num_features, eps=module.eps, momentum=module.momentum)
+        for name in ['weight', 'bias']:
+            getattr(dense, name).data.copy_(
+                getattr(module, name).data[:num_features])
+        for name in ['running_mean', 'running_var']:
+            getattr(dense, name).copy_(getattr(module, name)[:num_features])
+        dense.num_batches_tracked.copy_(module.num_batches_tracked)
+    else:
+        return None
+    return dense.to(module.weight.device)
+
+
+def _has_batch_stat_bns(module):
+    """Whether some BNs of a module normalize with the statistics of each
+    batch even in eval mode, i.e. have ``bn_training_mode``."""
+    return any(
+        getattr(m, 'bn_training_mode', False) for m in module.modules())
+
+
+def materialize_subnet(model, arch=None, fuse_bn=True, strict=True):
+    """Get a dense copy of a subnet of a searchable supernet.
+
+    The :class:`USConv2d` and :class:`USBatchNorm2d` of the supernet slice
+    their parameters at forward time. In the copy, they are replaced with
+    plain convs and BNs holding the slices of the arch, optionally with the
+    BNs folded into the convs, so that the traced graph only holds the
+    weights of the subnet. The blocks skipped by the depth of the arch are
+    not run, so they are not traced either. The copy keeps the arch it was
+    materialized with, ``set_arch`` must not be called on it.
+
+    Note:
+        The dense BNs normalize with the running statistics of the
+        supernet, sliced to the arch, while :class:`USBatchNorm2d` with
+        ``bn_training_mode``, the default of the searchable models,
+        normalizes with the statistics of each batch, even in eval mode.
+        The subnet of such a supernet would not compute what the supernet
+        does, so its BNs must be built with ``bn_training_mode=False`` and
+        hold running statistics of the arch to be materialized.
+
+    Args:
+        model (nn.Module): The supernet, with a ``set_arch`` method.
+        arch (dict, optional): The arch of the subnet, the current arch of
+            the supernet if None. Default: None.
+        fuse_bn (bool): Whether to fold the BNs into the convs.
+            Default: True.
+        strict (bool): Whether to raise if a BN of the supernet has
+            ``bn_training_mode``, otherwise the running statistics are used
+            anyway, with a warning. Default: True.
+
+    Returns:
+        nn.Module: The dense subnet in eval mode.
+
+    Raises:
+        RuntimeError: If a :class:`USBatchNorm2d` has ``bn_training_mode``
+            and ``strict`` is True.
+    """
+    if _has_batch_stat_bns(model):
+        msg = ('the BNs of the supernet normalize with the statistics of '
+               'each batch (bn_training_mode=True), the dense BNs would use '
+               'the running statistics')
+        if strict:
+            raise RuntimeError(msg)
+        warnings.warn(f'{msg}, the subnet differs from the supernet')
+    subnet = copy.deepcopy(model)
+    if arch is not None:
+        subnet.set_arch(arch)
+    for module in list(subnet.modules()):
+        for name, child in module.named_children():
+            dense = _dense_module(child)
+            if dense is not None:
+                module._modules[name] = dense
+    subnet.eval()
+    if fuse_bn:
+        subnet = fuse_conv_bn(subnet)
+    return subnet
+
+
+def _fold_bn(conv, bn):
+    """Fold the running statistics and the affine parameters of a BN into
+    the conv before it, in place."""
+    factor = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    bias = bn.running_mean.new_zeros(bn.num_features) \
+        if conv.bias is None else conv.bias
+    conv.weight = nn.Parameter(
+        (conv.weight * factor.reshape(-1, 1, 1, 1)).detach())
+    conv.bias = nn.Parameter(
+        ((bias - bn.running_mean) * factor + bn.bias).detach())
+    return conv
+
+
+def _fuse_conv_bn(module):
+    """Recursively fuse the pairs of a conv and a BN of a module, see
+    :func:`fuse_slimmable_conv_bn`."""
+    last_conv = None
+    last_conv_name = None
+    for name, child in module.named_children():
+        if isinstance(child,
+                      (nn.modules.batchnorm._BatchNorm, nn.SyncBatchNorm)):
+            if last_conv is None:  # only fuse BN that is after Conv
+                continue
+            conv, bn = _dense_module(last_conv), _dense_module(child)
+            module._modules[last_conv_name] = _fold_bn(
+                last_conv if conv is None else conv,
+                child if bn is None else bn)
+            module._modules[name] = nn.Identity()
+            last_conv = None
+        elif isinstance(child, nn.Conv2d):
+            last_conv = child
+            last_conv_name = name
+        else:
+            _fuse_conv_bn(child)
+    return module
+
+
+def fuse_slimmable_conv_bn(module, arch=None, strict=True):
+    """Recursively fuse the convs and the BNs of a module, including the
+    slimmable ones.
+
+    :func:`mmcv.cnn.fuse_conv_bn` folds the whole parameters of a BN into
+    the whole weight of its conv, which fails on a :class:`USConv2d`
+    narrower than its weight. Here a :class:`USConv2d` followed by a
+    :class:`USBatchNorm2d` is replaced with a dense conv holding the slice
+    of the conv at its current width, with the slice of the BN folded into
+    it. The other pairs of a conv and a BN are fused like
+    :func:`mmcv.cnn.fuse_conv_bn` does. The fused module keeps its arch,
+    ``set_arch`` must not be called on it.
+
+    A :class:`USBatchNorm2d` with ``bn_training_mode``, the default of the
+    searchable models, normalizes with the statistics of each batch, even
+    in eval mode, rather than with the running statistics which are
+    folded, so such a module cannot be fused. Its BNs must be built with
+    ``bn_training_mode=False`` and hold running statistics of the arch to
+    be fused.
+
+    Args:
+        module (nn.Module): The module to fuse in place, e.g. a supernet or
+            a dense detector, then run in eval mode.
+        arch (dict, optional): The arch set on the supernet before fusing,
+            its current arch if None. Default: None.
+        strict (bool): Whether to raise if the module cannot be fused,
+            otherwise it is returned unfused with a warning. Default: True.
+
+    Returns:
+        nn.Module: The fused module.
+
+    Raises:
+        RuntimeError: If a :class:`USBatchNorm2d` has ``bn_training_mode``
+            and ``strict`` is True. The module is left unchanged.
+    """
+    if arch is not None:
+        module.set_arch(arch)
+    if _has_batch_stat_bns(module):
+        msg = ('the BNs normalize with the statistics of each batch '
+               '(bn_training_mode=True), they cannot be fused')
+        if strict:
+            raise RuntimeError(msg)
+        warnings.warn(f'{msg}, the convs and BNs are left unfused')
+        return module
+    return _fuse_conv_bn(module)
+
+
+def build_subnet_from_cfg(config_path,
+                          checkpoint_path,
+                          arch,
+                          cfg_options=None,
+                          fuse_bn=True,
+                          strict=True):
+    """Build a supernet from config, load its checkpoint and materialize a
+    subnet of it, see :func:`materialize_subnet`.
+
+    Args:
+        config_path (str): The config of the supernet.
+        checkpoint_path (str): Path to the checkpoint of the supernet.
+        arch (dict): The arch of the subnet.
+        cfg_options (dict, optional): Override some settings of the config.
+            Default: None.
+        fuse_bn (bool): Whether to fold the BNs into the convs.
+            Default: True.
+        strict (bool): Whether to raise if a BN of the supernet normalizes
+            with the statistics of each batch. Default: True.
+
+    Returns:
+        nn.Module: The dense subnet in eval mode.
+    """
+    model = build_model_from_cfg(config_path, checkpoint_path, cfg_options)
+    subnet = materialize_subnet(model, arch, fuse_bn=fuse_bn, strict=strict)
+    subnet.CLASSES = model.CLASSES
+    return subnet
+
+
+def export_subnet_to_onnx(model,
+                          input_shape,
+                          output_file,
+                          with_nms=True,
+                          dynamic_batch=False,
+                          opset_version=11):
+    """Export a dense subnet to ONNX.
+
+    Args:
+        model (nn.Module): The subnet, see :func:`materialize_subnet`.
+        input_shape (tuple[int]): The input shape (N, C, H, W) of the graph.
+        output_file (str): The ONNX file.
+        with_nms (bool): Whether to export the NMS, in which case the
+            outputs are the ``dets`` and ``labels`` of
+            :func:`add_dummy_nms_for_onnx`. Otherwise the outputs are the
+            decoded ``bboxes`` and the ``scores`` of all the priors.
+            Default: True.
+        dynamic_batch (bool): Whether the batch size of the graph is
+            dynamic. Default: False.
+        opset_version (int): The ONNX opset version. Default: 11.
+    """
+    img = torch.zeros(input_shape, device=next(model.parameters()).device)
+    _, C, H, W = input_shape
+    img_meta = {
+        'img_shape': (H, W, C),
+        'ori_shape': (H, W, C),
+        'pad_shape': (H, W, C),
+        'scale_factor': np.ones(4, dtype=np.float32),
+        'flip': False,
+        'flip_direction': None
+    }
+    output_names = ['dets', 'labels'] if with_nms else ['bboxes', 'scores']
+    dynamic_axes = None
+    if dynamic_batch:
+        dynamic_axes = {
+            name: {
+                0: 'batch'
+            }
+            for name in ['input'] + output_names
+        }
+
+    def forward(img):
+        return origin_forward_onnx(img, [img_meta], with_nms=with_nms)
+
+    origin_forward, origin_forward_onnx = model.forward, model.onnx_export
+    model.forward = forward
+    try:
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                img,
+                output_file,
+                input_names=['input'],
+                output_names=output_names,
+                export_params=True,
+                keep_initializers_as_inputs=False,
+                do_constant_folding=True,
+                opset_version=opset_version,
+                dynamic_axes=dynamic_axes)
+    finally:
+        model.forward = origin_forward
+
+
+def verify_subnet_onnx(onnx_file, model, img, rtol=1e-3, atol=1e-4):
+    """Check the outputs of an exported subnet with ONNXRuntime on CPU
+    against the ones of PyTorch.
+
+    The bboxes and scores of a graph without NMS are compared with the ones
+    of ``model.onnx_export``. The dets of a graph with NMS are compared
+    with the ones of :func:`multiclass_nms` on these bboxes and scores,
+    sorted by score.
+
+    Args:
+        onnx_file (str): The ONNX file, see :func:`export_subnet_to_onnx`.
+        model (nn.Module): The PyTorch model, either the dense subnet or the
+            supernet with its arch set.
+        img (Tensor): The input images of shape (N, C, H, W).
+        rtol (float): Relative tolerance. Default: 1e-3.
+        atol (float): Absolute tolerance. Default: 1e-4.
+
+    Raises:
+        AssertionError: If the outputs differ.
+    """
+    import onnxruntime as ort
+
+    from mmdet.core import multiclass_nms
+
+    sess = ort.InferenceSession(onnx_file, providers=['CPUExecutionProvider'])
+    output_names = [output.name for output in sess.get_outputs()]
+    ort_outputs = sess.run(None, {'input': img.cpu().numpy()})
+    with torch.no_grad():
+        feats = model.extract_feat(img)
+        bboxes, scores = model.bbox_head.onnx_export(
+            *model.bbox_head(feats), with_nms=False)
+
+    if 'dets' not in output_names:
+        for name, ort_output, output in zip(output_names, ort_outputs,
+                                            [bboxes, scores]):
+            np.testing.assert_allclose(
+                ort_output,
+                output.cpu().numpy(),
+                rtol=rtol,
+                atol=atol,
+                err_msg=f'{name} differ between PyTorch and ONNX')
+        return
+
+    cfg = model.bbox_head.test_cfg
+    nms_cfg = dict(type='nms', iou_threshold=cfg.nms.get('iou_threshold', 0.5))
+    for i, (ort_dets, ort_labels) in enumerate(zip(*ort_outputs)):
+        # the dets of the graph are padded with empty ones
+        keep = ort_dets[:, 4] > 0
+        ort_dets, ort_labels = ort_dets[keep], ort_labels[keep]
+        # multiclass_nms expects a background score column
+        img_scores = torch.cat(
+            [scores[i], scores[i].new_zeros((len(scores[i]), 1))], 1)
+        dets, labels = multiclass_nms(bboxes[i], img_scores, cfg.score_thr,
+                                      nms_cfg, cfg.get('max_per_img', 100))
+        dets, labels = dets.cpu().numpy(), labels.cpu().numpy()
+        assert len(dets) == len(ort_dets), \
+            f'{len(ort_dets)} dets with ONNX instead of {len(dets)}'
+        ort_order = np.argsort(-ort_dets[:, 4], kind='stable')
+        order = np.argsort(-dets[:, 4], kind='stable')
+        np.testing.assert_allclose(
+            ort_dets[ort_order],
+            dets[order],
+            rtol=rtol,
+            atol=atol,
+            err_msg='dets differ between PyTorch and ONNX')
+        assert np.array_equal(ort_labels[ort_order], labels[order]), \
+            'labels differ between PyTorch and ONNX'
@@ -1,7 +1,9 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 from .coco_api import COCO, COCOeval
+from .fast_coco_eval import CocoEvaluator, FastCOCOeval
 from .panoptic_evaluation import pq_compute_multi_core, pq_compute_single_core
 
 __all__ = [
-    'COCO', 'COCOeval', 'pq_compute_multi_core', 'pq_compute_single_core'
+    'COCO', 'COCOeval', 'FastCOCOeval', 'CocoEvaluator',
+    'pq_compute_multi_core', 'pq_compute_single_core'
 ]
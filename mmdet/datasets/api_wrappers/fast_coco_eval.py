@@ -0,0 +1,505 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import contextlib
+import copy
+import datetime
+import io
+import time
+
+import numpy as np
+
+from .coco_api import COCOeval
+
+
+def _bbox_ious(dets, gts, iscrowd):
+    """Element-wise IoU of xywh box pairs, computed as ``maskUtils.iou``.
+
+    The operations are done in the same order as ``bbIou`` of the COCO api
+    so that the results are bit-identical.
+    """
+    gt_areas = gts[:, 2] * gts[:, 3]
+    det_areas = dets[:, 2] * dets[:, 3]
+    w = np.minimum(dets[:, 2] + dets[:, 0], gts[:, 2] + gts[:, 0]) - \
+        np.maximum(dets[:, 0], gts[:, 0])
+    h = np.minimum(dets[:, 3] + dets[:, 1], gts[:, 3] + gts[:, 1]) - \
+        np.maximum(dets[:, 1], gts[:, 1])
+    overlap = (w > 0) & (h > 0)
+    inters = w * h
+    unions = np.where(iscrowd, det_areas, det_areas + gt_areas - inters)
+    ious = np.zeros(len(dets))
+    np.divide(inters, unions, out=ious, where=overlap)
+    return ious
+
+
+class FastCOCOeval(COCOeval):
+    """Vectorised ``COCOeval`` of in-memory bbox detections.
+
+    ``COCOeval`` needs the detections as a COCO api object (usually loaded
+    back from the json file of the results) and matches them in python
+    loops over every image, category, area range and IoU threshold. This
+    class takes the detections as arrays and matches the ``k``-th ranked
+    detection of all the (image, category) pairs at once, for all the area
+    ranges and IoU thresholds, then accumulates every category with numpy
+    ops. The matching rules, the sort orders and the float operations follow
+    the COCO api, so ``eval`` and ``stats`` are identical to those of
+    ``COCOeval`` on the json results. Only ``iouType='bbox'`` with
+    ``useCats=1`` is supported, and ``evalImgs`` is not filled.
+
+    Args:
+        cocoGt (:obj:`COCO`): Ground truth COCO api.
+        det_bboxes (np.ndarray): Detected boxes in ``xywh`` order, shape
+            (n, 4).
+        det_scores (np.ndarray): Detection scores, shape (n, ).
+        det_img_ids (np.ndarray): Image id of each detection, shape (n, ).
+        det_cat_ids (np.ndarray): Category id of each detection, shape
+            (n, ).
+        iouType (str): Only 'bbox' is supported. Default: 'bbox'.
+
+    Example:
+        >>> from mmdet.datasets.api_wrappers import COCO
+        >>> coco = COCO()
+        >>> coco.dataset = dict(
+        ...     images=[dict(id=1)], categories=[dict(id=1)],
+        ...     annotations=[dict(id=1, image_id=1, category_id=1,
+        ...                       bbox=[0, 0, 10, 10], area=100, iscrowd=0)])
+        >>> coco.createIndex()  # doctest: +ELLIPSIS
+        ...
+        >>> coco_eval = FastCOCOeval(
+        ...     coco, [[0, 0, 10, 10]], [0.9], [1], [1])
+        >>> coco_eval.evaluate()  # doctest: +ELLIPSIS
+        ...
+        >>> coco_eval.accumulate()  # doctest: +ELLIPSIS
+        ...
+        >>> round(float(coco_eval.eval['precision'][0, 0, 0, 0, -1]), 3)
+        1.0
+    """
+
+    def __init__(self,
+                 cocoGt,
+                 det_bboxes,
+                 det_scores,
+                 det_img_ids,
+                 det_cat_ids,
+                 iouType='bbox'):
+        assert iouType == 'bbox', 'FastCOCOeval only supports bbox'
+        super().__init__(cocoGt, None, iouType)
+        self.det_bboxes = np.asarray(
+            det_bboxes, dtype=np.float64).reshape(-1, 4)
+        self.det_scores = np.asarray(det_scores, dtype=np.float64)
+        self.det_img_ids = np.asarray(det_img_ids)
+        self.det_cat_ids = np.asarray(det_cat_ids)
+        assert len(self.det_bboxes) == len(self.det_scores) == len(
+            self.det_img_ids) == len(self.det_cat_ids)
+
+    def _group_index(self, img_ids, cat_ids):
+        """Index of the (category, image) pair, or -1 if not evaluated."""
+        p = self.params
+        all_img_ids = np.asarray(p.imgIds)
+        all_cat_ids = np.asarray(p.catIds)
+        img_inds = np.searchsorted(all_img_ids, img_ids)
+        cat_inds = np.searchsorted(all_cat_ids, cat_ids)
+        valid = (img_inds < len(all_img_ids)) & (cat_inds < len(all_cat_ids))
+        img_inds[~valid] = 0
+        cat_inds[~valid] = 0
+        valid &= (all_img_ids[img_inds] == img_ids) & (
+            all_cat_ids[cat_inds] == cat_ids)
+        return np.where(valid, cat_inds * len(all_img_ids) + img_inds, -1)
+
+    def _load_gts(self):
+        """Load the gts of the evaluated images and categories.
+
+        Returns:
+            tuple[np.ndarray]: The image id, category id, ``xywh`` bbox,
+                area, crowd flag and id of each gt, in the order of the
+                annotations of each image.
+        """
+        p = self.params
+        gts = self.cocoGt.loadAnns(
+            self.cocoGt.getAnnIds(imgIds=p.imgIds, catIds=p.catIds))
+        return (np.array([gt['image_id'] for gt in gts]),
+                np.array([gt['category_id'] for gt in gts]),
+                np.array([gt['bbox'] for gt in gts],
+                         dtype=np.float64).reshape(-1, 4),
+                np.array([gt['area'] for gt in gts], dtype=np.float64),
+                np.array([int(gt['iscrowd']) for gt in gts], dtype=bool),
+                np.array([gt['id'] for gt in gts], dtype=np.int64))
+
+    def _prepare(self):
+        """Gather the gts and the top ``maxDets[-1]`` dets of each (category,
+        image) pair, both sorted by pair."""
+        p = self.params
+        img_ids, cat_ids, bboxes, areas, crowd, ids = self._load_gts()
+        gt_groups = self._group_index(img_ids, cat_ids)
+        # a stable sort keeps the annotation order in each pair
+        order = np.argsort(gt_groups, kind='mergesort')
+        self._gt_groups = gt_groups[order]
+        self._gt_bboxes = bboxes[order]
+        self._gt_areas = areas[order]
+        self._gt_crowd = crowd[order]
+        self._gt_ids = ids[order]
+
+        det_groups = self._group_index(self.det_img_ids, self.det_cat_ids)
+        keep = np.nonzero(det_groups >= 0)[0]
+        # highest score first in each pair, ties in detection order
+        order = keep[np.lexsort((-self.det_scores[keep], det_groups[keep]))]
+        det_groups = det_groups[order]
+        starts = np.searchsorted(det_groups, det_groups)
+        ranks = np.arange(len(order)) - starts
+        keep = ranks < p.maxDets[-1]
+        order = order[keep]
+        self._det_groups = det_groups[keep]
+        self._det_ranks = ranks[keep]
+        self._det_bboxes = self.det_bboxes[order]
+        self._det_scores = self.det_scores[order]
+        # loadRes sets the area of a bbox result to w * h
+        self._det_areas = self._det_bboxes[:, 2] * self._det_bboxes[:, 3]
+        self.eval = {}
+
+    def _match(self):
+        """Greedily match the dets to the gts as ``COCOeval.evaluateImg``.
+
+        Returns:
+            tuple[np.ndarray]: Index of the gt matched to each det, -1 if
+                unmatched, shape (A, T, D), and the ignore flag of each gt in
+                each area range, shape (A, G).
+        """
+        p = self.params
+        area_rngs = np.array(p.areaRng, dtype=np.float64)
+        iou_thrs = np.minimum(np.asarray(p.iouThrs), 1 - 1e-10)
+        A, T = len(area_rngs), len(iou_thrs)
+        gt_ignore = self._gt_crowd[None] | (
+            self._gt_areas[None] < area_rngs[:, :1]) | (
+                self._gt_areas[None] > area_rngs[:, 1:])
+        gt_matched = np.zeros((A, T, len(self._gt_ids)), dtype=bool)
+        det_matches = np.full((A, T, len(self._det_groups)), -1, np.int64)
+
+        gt_starts = np.searchsorted(self._gt_groups, self._det_groups, 'left')
+        gt_nums = np.searchsorted(self._gt_groups, self._det_groups,
+                                  'right') - gt_starts
+        for rank in np.unique(self._det_ranks):
+            # the dets of this rank, at most one in each pair
+            dets = np.nonzero((self._det_ranks == rank) & (gt_nums > 0))[0]
+            if len(dets) == 0:
+                continue
+            nums = gt_nums[dets]
+            offsets = np.cumsum(nums) - nums
+            pair_dets = np.repeat(np.arange(len(dets)), nums)
+            pair_gts = np.arange(len(pair_dets)) - offsets[pair_dets] + \
+                gt_starts[dets][pair_dets]
+            ious = _bbox_ious(self._det_bboxes[dets][pair_dets],
+                              self._gt_bboxes[pair_gts],
+                              self._gt_crowd[pair_gts])
+            valid = ~(gt_matched[:, :, pair_gts] & ~self._gt_crowd[pair_gts])
+            valid &= ious >= iou_thrs[:, None]
+            ignored = np.broadcast_to(gt_ignore[:, None, pair_gts],
+                                      valid.shape)
+            # the best regular gt, or if there is none, the best ignored gt
+            best_regular = np.maximum.reduceat(
+                np.where(valid & ~ignored, ious, -1), offsets, axis=2)
+            best_ignored = np.maximum.reduceat(
+                np.where(valid & ignored, ious, -1), offsets, axis=2)
+            use_ignored = best_regular < 0
+            best_ious = np.where(use_ignored, best_ignored, best_regular)
+            candidates = valid & (ignored == np.repeat(
+                use_ignored, nums, axis=2)) & (
+                    ious == np.repeat(best_ious, nums, axis=2))
+            # ties go to the last gt, as in the loop of COCOeval
+            pairs = np.maximum.reduceat(
+                np.where(candidates, np.arange(len(pair_dets)), -1),
+                offsets,
+                axis=2)
+            a_inds, t_inds, d_inds = np.nonzero(pairs >= 0)
+            matched_gts = pair_gts[pairs[a_inds, t_inds, d_inds]]
+            gt_matched[a_inds, t_inds, matched_gts] = True
+            det_matches[a_inds, t_inds, dets[d_inds]] = matched_gts
+        return det_matches, gt_ignore
+
+    def evaluate(self):
+        """Match the detections of every image and category."""
+        tic = time.time()
+        print('Running per image evaluation...')
+        p = self.params
+        assert p.iouType == 'bbox' and p.useCats, \
+            'FastCOCOeval only supports bbox evaluation with useCats=1'
+        print(f'Evaluate annotation type *{p.iouType}*')
+        p.imgIds = list(np.unique(p.imgIds))
+        p.catIds = list(np.unique(p.catIds))
+        p.maxDets = sorted(p.maxDets)
+        self.params = p
+
+        self._prepare()
+        det_matches, gt_ignore = self._match()
+        area_rngs = np.array(p.areaRng, dtype=np.float64)
+        det_outside = (self._det_areas[None] < area_rngs[:, :1]) | (
+            self._det_areas[None] > area_rngs[:, 1:])
+        a_inds, t_inds, d_inds = np.nonzero(det_matches >= 0)
+        matched_gts = det_matches[a_inds, t_inds, d_inds]
+        # COCOeval stores the matched gt id, so a gt with id 0 never counts
+        self._det_tp = np.zeros(det_matches.shape, dtype=bool)
+        self._det_tp[a_inds, t_inds, d_inds] = self._gt_ids[matched_gts] != 0
+        self._det_ignore = np.zeros(det_matches.shape, dtype=bool)
+        self._det_ignore[a_inds, t_inds, d_inds] = gt_ignore[a_inds,
+                                                             matched_gts]
+        self._det_ignore |= ~self._det_tp & det_outside[:, None]
+        self._gt_ignore = gt_ignore
+        self._paramsEval = copy.deepcopy(self.params)
+        toc = time.time()
+        print(f'DONE (t={toc - tic:0.2f}s).')
+
+    def accumulate(self):
+        """Accumulate the matches into precision and recall as
+        ``COCOeval.accumulate``."""
+        print('Accumulating evaluation results...')
+        tic = time.time()
+        p = self.params
+        T = len(p.iouThrs)
+        R = len(p.recThrs)
+        K = len(p.catIds)
+        A = len(p.areaRng)
+        M = len(p.maxDets)
+        precision = -np.ones((T, R, K, A, M))
+        recall = -np.ones((T, K, A, M))
+        scores = -np.ones((T, R, K, A, M))
+
+        num_imgs = len(p.imgIds)
+        cat_bounds = np.arange(K + 1) * num_imgs
+        gt_bounds = np.searchsorted(self._gt_groups, cat_bounds)
+        det_bounds = np.searchsorted(self._det_groups, cat_bounds)
+        for k in range(K):
+            gt_slice = slice(gt_bounds[k], gt_bounds[k + 1])
+            det_slice = slice(det_bounds[k], det_bounds[k + 1])
+            for m, max_det in enumerate(p.maxDets):
+                dets = np.arange(det_slice.start, det_slice.stop)
+                dets = dets[self._det_ranks[dets] < max_det]
+                # different sorting method generates slightly different
+                # results, mergesort is used to be consistent with COCOeval.
+                dets = dets[np.argsort(
+                    -self._det_scores[dets], kind='mergesort')]
+                det_scores = self._det_scores[dets]
+                nd = len(dets)
+                for a in range(A):
+                    npig = np.count_nonzero(~self._gt_ignore[a, gt_slice])
+                    if npig == 0:
+                        continue
+                    det_tp = self._det_tp[a][:, dets]
+                    det_ignore = self._det_ignore[a][:, dets]
+                    tps = det_tp & ~det_ignore
+                    fps = ~det_tp & ~det_ignore
+                    tp_sum = np.cumsum(tps, axis=1).astype(dtype=float)
+                    fp_sum = np.cumsum(fps, axis=1).astype(dtype=float)
+                    rc = tp_sum / npig
+                    pr = tp_sum / (fp_sum + tp_sum + np.spacing(1))
+                    recall[:, k, a, m] = rc[:, -1] if nd else 0
+                    # make the precision monotonically decreasing
+                    pr = np.maximum.accumulate(pr[:, ::-1], axis=1)[:, ::-1]
+                    for t in range(T):
+                        inds = np.searchsorted(rc[t], p.recThrs, side='left')
+                        valid = inds < nd
+                        q = np.zeros((R, ))
+                        ss = np.zeros((R, ))
+                        q[valid] = pr[t, inds[valid]]
+                        ss[valid] = det_scores[inds[valid]]
+                        precision[t, :, k, a, m] = q
+                        scores[t, :, k, a, m] = ss
+        self.eval = {
+            'params': p,
+            'counts': [T, R, K, A, M],
+            'date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'precision': precision,
+            'recall': recall,
+            'scores': scores,
+        }
+        toc = time.time()
+        print(f'DONE (t={toc - tic:0.2f}s).')
+
+
+class CocoEvaluator(object):
+    """Evaluate the COCO bbox metrics incrementally, as the results of the
+    images arrive.
+
+    The results of every batch are matched against their gts right away by
+    :obj:`FastCOCOeval`, and only the category, image, rank, score and
+    TP/ignore flags of each det and the category, image and ignore flags of
+    each gt are kept, so the results of the whole dataset are never held in
+    memory. The evaluators of several ranks can be merged, images seen by
+    more than one of them (e.g. padded by the sampler) are only counted
+    once. The matching of the dets of an image and a category does not
+    depend on the other images, so :meth:`compute` gives the same ``eval``
+    and ``stats`` as :obj:`FastCOCOeval` on the results of all the images.
+
+    Args:
+        cocoGt (:obj:`COCO`): Ground truth COCO api.
+        img_ids (Sequence[int]): COCO image id of each index of the dataset.
+        cat_ids (Sequence[int]): COCO category id of each label.
+        iou_thrs (Sequence[float], optional): IoU thresholds, the COCO ones
+            (0.50:0.05:0.95) if None. Default: None.
+        max_dets (Sequence[int]): Max numbers of dets per image.
+            Default: (100, 300, 1000).
+
+    Example:
+        >>> import numpy as np
+        >>> from mmdet.datasets.api_wrappers import COCO
+        >>> coco = COCO()
+        >>> coco.dataset = dict(
+        ...     images=[dict(id=1)], categories=[dict(id=1)],
+        ...     annotations=[dict(id=1, image_id=1, category_id=1,
+        ...                       bbox=[0, 0, 10, 10], area=100, iscrowd=0)])
+        >>> coco.createIndex()  # doctest: +ELLIPSIS
+        ...
+        >>> evaluator = CocoEvaluator(coco, [1], [1])
+        >>> evaluator.update([[np.array([[0., 0., 10., 10., 0.9]])]], [0])
+        >>> coco_eval = evaluator.compute()  # doctest: +ELLIPSIS
+        ...
+        >>> round(float(coco_eval.eval['precision'][0, 0, 0, 0, -1]), 3)
+        1.0
+    """
+
+    def __init__(self,
+                 cocoGt,
+                 img_ids,
+                 cat_ids,
+                 iou_thrs=None,
+                 max_dets=(100, 300, 1000)):
+        self.cocoGt = cocoGt
+        self.img_ids = list(img_ids)
+        self.cat_ids = list(cat_ids)
+        if iou_thrs is None:
+            iou_thrs = np.linspace(
+                .5, 0.95, int(np.round((0.95 - .5) / .05)) + 1, endpoint=True)
+        self.iou_thrs = iou_thrs
+        self.max_dets = list(max_dets)
+        self.reset()
+
+    def reset(self):
+        """Drop all the results seen so far."""
+        # each part holds the image ids of a batch, the (category index,
+        # image id, ignore flags of shape (A, num_gts)) of its gts and the
+        # (category index, image id, rank, score, tp, ignore) of its dets,
+        # tp and ignore being boolean arrays of shape (A, T, num_dets)
+        self._parts = []
+        self._seen_ids = set()
+
+    def __len__(self):
+        return len(self._seen_ids)
+
+    def __getstate__(self):
+        # only the evaluator the others are merged into needs the gts
+        state = self.__dict__.copy()
+        state['cocoGt'] = None
+        return state
+
+    def _build_eval(self, img_ids, det_arrays=None):
+        if det_arrays is None:
+            det_arrays = (np.zeros((0, 4)), [], [], [])
+        coco_eval = FastCOCOeval(self.cocoGt, *det_arrays)
+        p = coco_eval.params
+        p.imgIds = sorted(img_ids)
+        p.catIds = sorted(set(self.cat_ids))
+        p.maxDets = sorted(self.max_dets)
+        p.iouThrs = self.iou_thrs
+        return coco_eval
+
+    def update(self, batch_results, img_ids):
+        """Match the results of a batch of images.
+
+        Args:
+            batch_results (list[list | tuple]): Results of the images, the
+                bboxes of each class in ``xyxy`` order with their scores.
+                Results with masks are accepted, only their bboxes are
+                evaluated.
+            img_ids (Sequence[int]): Indices of the images in the dataset.
+        """
+        assert len(batch_results) == len(img_ids)
+        bboxes, det_img_ids, det_cat_ids, ids = [], [], [], []
+        for result, idx in zip(batch_results, img_ids):
+            img_id = self.img_ids[int(idx)]
+            if img_id in self._seen_ids or img_id in ids:
+                continue
+            ids.append(img_id)
+            if isinstance(result, tuple):
+                result = result[0]
+            for label, dets in enumerate(result):
+                bboxes.append(dets)
+                det_img_ids.append(np.full(len(dets), img_id))
+                det_cat_ids.append(np.full(len(dets), self.cat_ids[label]))
+        if not ids:
+            return
+        # the same conversion as CocoDataset._det2arrays
+        if len(bboxes) == 0:
+            bboxes = [np.zeros((0, 5))]
+        bboxes = np.concatenate(bboxes).astype(np.float64)
+        bboxes[:, 2:4] -= bboxes[:, :2]
+        det_arrays = (bboxes[:, :4], bboxes[:, 4],
+                      np.concatenate(det_img_ids or [[]]),
+                      np.concatenate(det_cat_ids or [[]]))
+        coco_eval = self._build_eval(ids, det_arrays)
+        with contextlib.redirect_stdout(io.StringIO()):
+            coco_eval.evaluate()
+        batch_ids = np.asarray(coco_eval.params.imgIds)
+        num_imgs = len(batch_ids)
+        gt_groups = coco_eval._gt_groups.astype(np.int64)
+        det_groups = coco_eval._det_groups.astype(np.int64)
+        gts = (gt_groups // num_imgs, batch_ids[gt_groups % num_imgs],
+               coco_eval._gt_ignore)
+        dets = (det_groups // num_imgs, batch_ids[det_groups % num_imgs],
+                coco_eval._det_ranks, coco_eval._det_scores, coco_eval._det_tp,
+                coco_eval._det_ignore)
+        self._parts.append((batch_ids, gts, dets))
+        self._seen_ids.update(ids)
+
+    def merge(self, other):
+        """Add the results seen by another evaluator, e.g. of another rank.
+
+        Args:
+            other (:obj:`CocoEvaluator`): The evaluator to merge.
+        """
+        for img_ids, gts, dets in other._parts:
+            new = np.array(
+                [img_id not in self._seen_ids for img_id in img_ids],
+                dtype=bool)
+            if new.all():
+                self._parts.append((img_ids, gts, dets))
+            elif new.any():
+                new_ids = img_ids[new]
+                gt_keep = np.isin(gts[1], new_ids)
+                det_keep = np.isin(dets[1], new_ids)
+                self._parts.append(
+                    (new_ids, tuple(array[..., gt_keep] for array in gts),
+                     tuple(array[..., det_keep] for array in dets)))
+            self._seen_ids.update(img_ids[new].tolist())
+
+    def compute(self):
+        """Accumulate the matches of the images seen so far.
+
+        Returns:
+            :obj:`FastCOCOeval`: The accumulated evaluation of the images
+                seen, to be summarized.
+        """
+        assert self._parts, 'no results to evaluate'
+        coco_eval = self._build_eval(self._seen_ids)
+        img_ids = np.asarray(coco_eval.params.imgIds)
+        num_imgs = len(img_ids)
+        gt_cats, gt_img_ids, gt_ignore = [
+            np.concatenate(arrays, axis=-1)
+            for arrays in zip(*[part[1] for part in self._parts])
+        ]
+        det_cats, det_img_ids, ranks, scores, tp, ignore = [
+            np.concatenate(arrays, axis=-1)
+            for arrays in zip(*[part[2] for part in self._parts])
+        ]
+        # sort the gts and dets by pair, then the dets by rank, as
+        # FastCOCOeval does on the results of all the images
+        gt_groups = gt_cats * num_imgs + np.searchsorted(img_ids, gt_img_ids)
+        order = np.argsort(gt_groups, kind='mergesort')
+        coco_eval._gt_groups = gt_groups[order]
+        coco_eval._gt_ignore = gt_ignore[:, order]
+        det_groups = det_cats * num_imgs + np.searchsorted(
+            img_ids, det_img_ids)
+        order = np.lexsort((ranks, det_groups))
+        coco_eval._det_groups = det_groups[order]
+        coco_eval._det_ranks = ranks[order]
+        coco_eval._det_scores = scores[order]
+        coco_eval._det_tp = tp[..., order]
+        coco_eval._det_ignore = ignore[..., order]
+        coco_eval._paramsEval = copy.deepcopy(coco_eval.params)
+        coco_eval.accumulate()
+        return coco_eval
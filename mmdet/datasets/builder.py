@@ -13,7 +13,7 @@ from torch.utils.data import DataLoader
 
 from .samplers import (DistributedGroupSampler, DistributedSampler,
                        GroupSampler, InfiniteBatchSampler,
-                       InfiniteGroupBatchSampler)
+                       InfiniteGroupBatchSampler, ShapeBucketBatchSampler)
 
 if platform.system() != 'Windows':
     # https://github.com/pytorch/pytorch/issues/973
@@ -57,7 +57,8 @@ def _concat_dataset(cfg, default_args=None):
 
 def build_dataset(cfg, default_args=None):
     from .dataset_wrappers import (ClassBalancedDataset, ConcatDataset,
-                                   MultiImageMixDataset, RepeatDataset)
+                                   MultiImageMixDataset, RepeatDataset,
+                                   ReplayDataset)
     if isinstance(cfg, (list, tuple)):
         dataset = ConcatDataset([build_dataset(c, default_args) for c in cfg])
     elif cfg['type'] == 'ConcatDataset':
@@ -75,6 +76,11 @@ def build_dataset(cfg, default_args=None):
         cp_cfg['dataset'] = build_dataset(cp_cfg['dataset'])
         cp_cfg.pop('type')
         dataset = MultiImageMixDataset(**cp_cfg)
+    elif cfg['type'] == 'ReplayDataset':
+        cp_cfg = copy.deepcopy(cfg)
+        cp_cfg['dataset'] = build_dataset(cp_cfg['dataset'], default_args)
+        cp_cfg.pop('type')
+        dataset = ReplayDataset(**cp_cfg)
     elif isinstance(cfg.get('ann_file'), (list, tuple)):
         dataset = _concat_dataset(cfg, default_args)
     else:
@@ -92,6 +98,7 @@ def build_dataloader(dataset,
                      seed=None,
                      runner_type='EpochBasedRunner',
                      persistent_workers=False,
+                     shape_bucketing=False,
                      **kwargs):
     """Build PyTorch DataLoader.
 
@@ -114,6 +121,10 @@ def build_dataloader(dataset,
             the worker processes after a dataset has been consumed once.
             This allows to maintain the workers `Dataset` instances alive.
             This argument is only valid when PyTorch>=1.7.0. Default: False.
+        shape_bucketing (bool): Whether to batch test images by padded shape
+            with :obj:`ShapeBucketBatchSampler`. Only valid when
+            ``shuffle=False``, results come in bucket order and have to be
+            restored with ``batch_sampler.indices``. Default: False.
         kwargs: any keyword argument to be used to initialize DataLoader
 
     Returns:
@@ -133,7 +144,14 @@ def build_dataloader(dataset,
         batch_size = num_gpus * samples_per_gpu
         num_workers = num_gpus * workers_per_gpu
 
-    if runner_type == 'IterBasedRunner':
+    if shape_bucketing:
+        assert not shuffle, 'shape_bucketing is only valid for testing'
+        batch_sampler = ShapeBucketBatchSampler(dataset, batch_size,
+                                                world_size if dist else 1,
+                                                rank if dist else 0)
+        batch_size = 1
+        sampler = None
+    elif runner_type == 'IterBasedRunner':
         # this is a batch sampler, which can yield
         # a mini-batch indices each time.
         # it can be used in both `DataParallel` and
@@ -13,8 +13,8 @@ import numpy as np
 from mmcv.utils import print_log
 from terminaltables import AsciiTable
 
-from mmdet.core import eval_recalls
-from .api_wrappers import COCO, COCOeval
+from mmdet.core import DetectionResults, eval_recalls
+from .api_wrappers import COCO, COCOeval, CocoEvaluator, FastCOCOeval
 from .builder import DATASETS
 from .custom import CustomDataset
 
@@ -254,6 +254,40 @@ class CocoDataset(CustomDataset):
                     json_results.append(data)
         return json_results
 
+    def _det2arrays(self, results):
+        """Convert detection results to the arrays of :obj:`FastCOCOeval`.
+
+        The boxes are converted to ``xywh`` in float64 as in
+        :meth:`xyxy2xywh`, so the arrays hold the same values as the
+        results of :meth:`_det2json`, in the same order.
+
+        Returns:
+            tuple[np.ndarray]: Boxes in ``xywh`` order, scores, image ids
+                and category ids of all the detections.
+        """
+        if isinstance(results, DetectionResults):
+            bboxes = results.bboxes.astype(np.float64)
+            bboxes[:, 2:4] -= bboxes[:, :2]
+            return bboxes, results.scores.astype(np.float64), np.asarray(
+                self.img_ids)[results.img_ids], np.asarray(
+                    self.cat_ids)[results.labels]
+        bboxes, img_ids, cat_ids = [], [], []
+        for idx in range(len(self)):
+            result = results[idx]
+            if isinstance(result, tuple):
+                result = result[0]
+            for label in range(len(result)):
+                bboxes.append(result[label])
+                img_ids.append(np.full(len(result[label]), self.img_ids[idx]))
+                cat_ids.append(
+                    np.full(len(result[label]), self.cat_ids[label]))
+        if len(bboxes) == 0:
+            bboxes = [np.zeros((0, 5), dtype=np.float32)]
+        bboxes = np.concatenate(bboxes).astype(np.float64)
+        bboxes[:, 2:4] -= bboxes[:, :2]
+        return bboxes[:, :4], bboxes[:, 4], np.concatenate(
+            img_ids or [[]]), np.concatenate(cat_ids or [[]])
+
     def _segm2json(self, results):
         """Convert instance segmentation results to COCO json style."""
         bbox_json_results = []
@@ -360,8 +394,8 @@ class CocoDataset(CustomDataset):
         """Format the results to json (standard format for COCO evaluation).
 
         Args:
-            results (list[tuple | numpy.ndarray]): Testing results of the
-                dataset.
+            results (list[tuple | numpy.ndarray] | :obj:`DetectionResults`):
+                Testing results of the dataset.
             jsonfile_prefix (str | None): The prefix of json files. It includes
                 the file path and the prefix of filename, e.g., "a/b/prefix".
                 If not specified, a temp file will be created. Default: None.
@@ -371,6 +405,8 @@ class CocoDataset(CustomDataset):
                 the json filepaths, tmp_dir is the temporal directory created \
                 for saving json files when jsonfile_prefix is not specified.
         """
+        if isinstance(results, DetectionResults):
+            results = results.to_list()
         assert isinstance(results, list), 'results must be a list'
         assert len(results) == len(self), (
             'The length of results is not equal to the dataset len: {} != {}'.
@@ -384,6 +420,29 @@ class CocoDataset(CustomDataset):
         result_files = self.results2json(results, jsonfile_prefix)
         return result_files, tmp_dir
 
+    def build_evaluator(self, iou_thrs=None, proposal_nums=(100, 300, 1000)):
+        """Build an evaluator computing the bbox metrics as the results
+        arrive.
+
+        The evaluator is updated with the results of each batch and passed
+        to :meth:`evaluate` in place of the results.
+
+        Args:
+            iou_thrs (Sequence[float], optional): Same as :meth:`evaluate`.
+                Default: None.
+            proposal_nums (Sequence[int]): Same as :meth:`evaluate`.
+                Default: (100, 300, 1000).
+
+        Returns:
+            :obj:`CocoEvaluator`: The evaluator.
+        """
+        return CocoEvaluator(
+            self.coco,
+            self.img_ids,
+            self.cat_ids,
+            iou_thrs=iou_thrs,
+            max_dets=proposal_nums)
+
     def evaluate(self,
                  results,
                  metric='bbox',
@@ -392,11 +451,16 @@ class CocoDataset(CustomDataset):
                  classwise=False,
                  proposal_nums=(100, 300, 1000),
                  iou_thrs=None,
-                 metric_items=None):
+                 metric_items=None,
+                 in_memory=True):
         """Evaluation in COCO protocol.
 
         Args:
-            results (list[list | tuple]): Testing results of the dataset.
+            results (list[list | tuple] | :obj:`CocoEvaluator`): Testing
+                results of the dataset, or the evaluator built by
+                :meth:`build_evaluator` and updated with them, in which case
+                only the 'bbox' metric is evaluated, with the IoU thresholds
+                and proposal numbers of the evaluator.
             metric (str | list[str]): Metrics to be evaluated. Options are
                 'bbox', 'segm', 'proposal', 'proposal_fast'.
             logger (logging.Logger | str | None): Logger used for printing
@@ -419,6 +483,10 @@ class CocoDataset(CustomDataset):
                 used when ``metric=='proposal'``, ``['mAP', 'mAP_50', 'mAP_75',
                 'mAP_s', 'mAP_m', 'mAP_l']`` will be used when
                 ``metric=='bbox' or metric=='segm'``.
+            in_memory (bool): Whether to evaluate the 'bbox' metric with
+                :obj:`FastCOCOeval` on arrays built from the results, instead
+                of loading the json results back into ``COCOeval``. The
+                metrics are the same. Default: True.
 
         Returns:
             dict[str, float]: COCO style evaluation metric.
@@ -436,7 +504,21 @@ class CocoDataset(CustomDataset):
             if not isinstance(metric_items, list):
                 metric_items = [metric_items]
 
-        result_files, tmp_dir = self.format_results(results, jsonfile_prefix)
+        incremental = isinstance(results, CocoEvaluator)
+        if incremental:
+            assert metrics == ['bbox'] and jsonfile_prefix is None, \
+                'an evaluator can only be used to evaluate bbox'
+            result_files, tmp_dir = None, None
+        elif jsonfile_prefix is not None or any(
+                metric not in ('bbox', 'proposal_fast') or not in_memory
+                for metric in metrics):
+            result_files, tmp_dir = self.format_results(
+                results, jsonfile_prefix)
+        else:
+            assert len(results) == len(self), (
+                'The length of results is not equal to the dataset len: '
+                f'{len(results)} != {len(self)}')
+            result_files, tmp_dir = None, None
 
         eval_results = OrderedDict()
         cocoGt = self.coco
@@ -458,38 +540,52 @@ class CocoDataset(CustomDataset):
                 continue
 
             iou_type = 'bbox' if metric == 'proposal' else metric
-            if metric not in result_files:
+            if incremental:
+                cocoEval = results.compute()
+            elif metric == 'bbox' and in_memory:
+                det_arrays = self._det2arrays(results)
+                if len(det_arrays[1]) == 0:
+                    print_log(
+                        'The testing results of the whole dataset is empty.',
+                        logger=logger,
+                        level=logging.ERROR)
+                    break
+                cocoEval = FastCOCOeval(cocoGt, *det_arrays)
+            elif metric not in result_files:
                 raise KeyError(f'{metric} is not in results')
-            try:
-                predictions = mmcv.load(result_files[metric])
-                if iou_type == 'segm':
-                    # Refer to https://github.com/cocodataset/cocoapi/blob/master/PythonAPI/pycocotools/coco.py#L331  # noqa
-                    # When evaluating mask AP, if the results contain bbox,
-                    # cocoapi will use the box area instead of the mask area
-                    # for calculating the instance area. Though the overall AP
-                    # is not affected, this leads to different
-                    # small/medium/large mask AP results.
-                    for x in predictions:
-                        x.pop('bbox')
-                    warnings.simplefilter('once')
-                    warnings.warn(
-                        'The key "bbox" is deleted for more accurate mask AP '
-                        'of small/medium/large instances since v2.12.0. This '
-                        'does not change the overall mAP calculation.',
-                        UserWarning)
-                cocoDt = cocoGt.loadRes(predictions)
-            except IndexError:
-                print_log(
-                    'The testing results of the whole dataset is empty.',
-                    logger=logger,
-                    level=logging.ERROR)
-                break
-
-            cocoEval = COCOeval(cocoGt, cocoDt, iou_type)
-            cocoEval.params.catIds = self.cat_ids
-            cocoEval.params.imgIds = self.img_ids
-            cocoEval.params.maxDets = list(proposal_nums)
-            cocoEval.params.iouThrs = iou_thrs
+            else:
+                try:
+                    predictions = mmcv.load(result_files[metric])
+                    if iou_type == 'segm':
+                        # Refer to https://github.com/cocodataset/cocoapi/blob/master/PythonAPI/pycocotools/coco.py#L331  # noqa
+                        # When evaluating mask AP, if the results contain
+                        # bbox, cocoapi will use the box area instead of the
+                        # mask area for calculating the instance area. Though
+                        # the overall AP is not affected, this leads to
+                        # different small/medium/large mask AP results.
+                        for x in predictions:
+                            x.pop('bbox')
+                        warnings.simplefilter('once')
+                        warnings.warn(
+                            'The key "bbox" is deleted for more accurate '
+                            'mask AP of small/medium/large instances since '
+                            'v2.12.0. This does not change the overall mAP '
+                            'calculation.',
+                            UserWarning)
+                    cocoDt = cocoGt.loadRes(predictions)
+                except IndexError:
+                    print_log(
+                        'The testing results of the whole dataset is empty.',
+                        logger=logger,
+                        level=logging.ERROR)
+                    break
+                cocoEval = COCOeval(cocoGt, cocoDt, iou_type)
+
+            if not incremental:
+                cocoEval.params.catIds = self.cat_ids
+                cocoEval.params.imgIds = self.img_ids
+                cocoEval.params.maxDets = list(proposal_nums)
+                cocoEval.params.iouThrs = iou_thrs
             # mapping of cocoEval.stats
             coco_metric_names = {
                 'mAP': 0,
@@ -533,8 +629,9 @@ class CocoDataset(CustomDataset):
                         f'{cocoEval.stats[coco_metric_names[item]]:.3f}')
                     eval_results[item] = val
             else:
-                cocoEval.evaluate()
-                cocoEval.accumulate()
+                if not incremental:
+                    cocoEval.evaluate()
+                    cocoEval.accumulate()
 
                 # Save coco summarize print information to logger
                 redirect_string = io.StringIO()
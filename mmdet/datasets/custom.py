@@ -9,7 +9,7 @@ from mmcv.utils import print_log
 from terminaltables import AsciiTable
 from torch.utils.data import Dataset
 
-from mmdet.core import eval_map, eval_recalls
+from mmdet.core import MeanAPEvaluator, eval_map, eval_recalls
 from .builder import DATASETS
 from .pipelines import Compose
 
@@ -288,6 +288,27 @@ class CustomDataset(Dataset):
     def format_results(self, results, **kwargs):
         """Place holder to format result to dataset specific output."""
 
+    def build_evaluator(self, iou_thr=0.5, scale_ranges=None):
+        """Build an evaluator computing mAP as the results arrive.
+
+        The evaluator is updated with the results of each batch and passed
+        to :meth:`evaluate` in place of the results.
+
+        Args:
+            iou_thr (float | list[float]): IoU threshold. Default: 0.5.
+            scale_ranges (list[tuple] | None): Scale ranges for evaluating mAP.
+                Default: None.
+
+        Returns:
+            :obj:`MeanAPEvaluator`: The evaluator.
+        """
+        iou_thrs = [iou_thr] if isinstance(iou_thr, float) else iou_thr
+        return MeanAPEvaluator(
+            self.get_ann_info,
+            iou_thrs,
+            scale_ranges=scale_ranges,
+            dataset=self.CLASSES)
+
     def evaluate(self,
                  results,
                  metric='mAP',
@@ -298,7 +319,10 @@ class CustomDataset(Dataset):
         """Evaluate the dataset.
 
         Args:
-            results (list): Testing results of the dataset.
+            results (list | :obj:`MeanAPEvaluator`): Testing results of the
+                dataset, or the evaluator built by :meth:`build_evaluator`
+                and updated with them, with the same ``iou_thr`` and
+                ``scale_ranges``.
             metric (str | list[str]): Metrics to be evaluated.
             logger (logging.Logger | None | str): Logger used for printing
                 related information during evaluation. Default: None.
@@ -316,21 +340,34 @@ class CustomDataset(Dataset):
         allowed_metrics = ['mAP', 'recall']
         if metric not in allowed_metrics:
             raise KeyError(f'metric {metric} is not supported')
-        annotations = [self.get_ann_info(i) for i in range(len(self))]
+        incremental = isinstance(results, MeanAPEvaluator)
+        if incremental:
+            assert metric == 'mAP', \
+                'an evaluator can only be used to evaluate mAP'
+            iou_thrs = [iou_thr] if isinstance(iou_thr, float) else iou_thr
+            assert list(iou_thrs) == results.iou_thrs and \
+                scale_ranges == results.scale_ranges, \
+                'iou_thr and scale_ranges must be the ones of the evaluator'
+            iou_thr = results.iou_thrs
+        else:
+            annotations = [self.get_ann_info(i) for i in range(len(self))]
         eval_results = OrderedDict()
         iou_thrs = [iou_thr] if isinstance(iou_thr, float) else iou_thr
         if metric == 'mAP':
             assert isinstance(iou_thrs, list)
             mean_aps = []
-            for iou_thr in iou_thrs:
+            for i, iou_thr in enumerate(iou_thrs):
                 print_log(f'\n{"-" * 15}iou_thr: {iou_thr}{"-" * 15}')
-                mean_ap, _ = eval_map(
-                    results,
-                    annotations,
-                    scale_ranges=scale_ranges,
-                    iou_thr=iou_thr,
-                    dataset=self.CLASSES,
-                    logger=logger)
+                if incremental:
+                    mean_ap, _ = results.compute(i, logger=logger)
+                else:
+                    mean_ap, _ = eval_map(
+                        results,
+                        annotations,
+                        scale_ranges=scale_ranges,
+                        iou_thr=iou_thr,
+                        dataset=self.CLASSES,
+                        logger=logger)
                 mean_aps.append(mean_ap)
                 eval_results[f'AP{int(iou_thr * 100):02d}'] = round(mean_ap, 3)
             eval_results['mAP'] = sum(mean_aps) / len(mean_aps)
@@ -2,15 +2,22 @@
 import bisect
 import collections
 import copy
+import hashlib
 import math
+import os
+import os.path as osp
+import random
+import re
 from collections import defaultdict
 
+import mmcv
 import numpy as np
 from mmcv.utils import build_from_cfg, print_log
 from torch.utils.data.dataset import ConcatDataset as _ConcatDataset
 
 from .builder import DATASETS, PIPELINES
 from .coco import CocoDataset
+from .pipelines import Compose
 
 
 @DATASETS.register_module()
@@ -46,6 +53,13 @@ class ConcatDataset(_ConcatDataset):
             for i in range(0, len(datasets)):
                 flags.append(datasets[i].flag)
             self.flag = np.concatenate(flags)
+        if all(hasattr(ds, 'shard_ids') for ds in datasets):
+            # keep the shards of different datasets apart
+            shard_ids, num_shards = [], 0
+            for ds in datasets:
+                shard_ids.append(ds.shard_ids + num_shards)
+                num_shards += int(ds.shard_ids.max(initial=-1)) + 1
+            self.shard_ids = np.concatenate(shard_ids)
 
     def get_cat_ids(self, idx):
         """Get category ids of concatenated dataset by index.
@@ -171,6 +185,8 @@ class RepeatDataset:
         self.PALETTE = getattr(dataset, 'PALETTE', None)
         if hasattr(self.dataset, 'flag'):
             self.flag = np.tile(self.dataset.flag, times)
+        if hasattr(self.dataset, 'shard_ids'):
+            self.shard_ids = np.tile(self.dataset.shard_ids, times)
 
         self._ori_len = len(self.dataset)
 
@@ -387,6 +403,8 @@ class MultiImageMixDataset:
         self.PALETTE = getattr(dataset, 'PALETTE', None)
         if hasattr(self.dataset, 'flag'):
             self.flag = dataset.flag
+        if hasattr(self.dataset, 'shard_ids'):
+            self.shard_ids = dataset.shard_ids
         self.num_samples = len(dataset)
 
     def __len__(self):
@@ -427,3 +445,153 @@ class MultiImageMixDataset:
             isinstance(skip_type_key, str) for skip_type_key in skip_type_keys
         ])
         self._skip_type_keys = skip_type_keys
+
+
+@DATASETS.register_module()
+class ReplayDataset:
+    """A wrapper replaying the random augmentation of every sample.
+
+    Mosaic, MixUp, RandomAffine, YOLOXHSVRandomAug, RandomFlip, etc. draw
+    their parameters (mosaic center, partner indexes, affine matrix, HSV
+    gains, flip direction, ...) from the global random states. This wrapper
+    produces sample ``idx`` with the global states of ``numpy.random`` and
+    ``random`` seeded by a seed recorded for that sample, so all those
+    parameters, and hence the sample, only depend on ``(seed, idx)``. The
+    same batches are then produced for any number of passes, workers and
+    processes, e.g. to rank the subnets of a supernet, without seeding the
+    whole program. The global states are restored after each sample, so the
+    wrapped dataset should not be read from a thread while another one
+    draws random numbers.
+
+    With ``cache_dir``, every sample is also written to this directory the
+    first time it is produced and read back afterwards, so the random
+    pipeline is only run once per sample across passes and runs. The cache
+    is taken before the trailing deterministic transforms of the pipeline
+    (``Pad``, ``Normalize``, ``DefaultFormatBundle``, ``Collect``, ...),
+    which are run on each read. It holds the augmented uint8 image and its
+    annotations rather than the padded float tensors, a quarter of their
+    size or less. The cache is tied to the seed, the length and the cached
+    head of the pipeline of the dataset, and the samples produced with the
+    ``skip_type_keys`` of a :obj:`MultiImageMixDataset` (e.g. after the
+    mode switch of YOLOX) are cached apart from the other ones.
+
+    Args:
+        dataset (:obj:`CustomDataset` | :obj:`MultiImageMixDataset`): The
+            dataset to be replayed.
+        seed (int): Seed of the per-sample seeds. Default: 0.
+        cache_dir (str, optional): Directory of the augmented samples.
+            Default: None.
+    """
+
+    # the transforms which do not draw random numbers, run after the cache
+    DETERMINISTIC_TRANSFORMS = ('Pad', 'Normalize', 'FilterAnnotations',
+                                'DefaultFormatBundle', 'Collect', 'ToTensor',
+                                'ImageToTensor', 'Transpose',
+                                'ToDataContainer')
+
+    def __init__(self, dataset, seed=0, cache_dir=None):
+        self.dataset = dataset
+        self.seed = seed
+        self.CLASSES = dataset.CLASSES
+        self.PALETTE = getattr(dataset, 'PALETTE', None)
+        if hasattr(self.dataset, 'flag'):
+            self.flag = dataset.flag
+        if hasattr(self.dataset, 'shard_ids'):
+            self.shard_ids = dataset.shard_ids
+        self.sample_seeds = np.random.RandomState(seed).randint(
+            2**31, size=len(dataset), dtype=np.int64)
+
+        self.cache_dir = cache_dir
+        self.tail = None
+        self._skip_type_keys = getattr(dataset, '_skip_type_keys', None)
+        if cache_dir is not None:
+            self._split_pipeline()
+            mmcv.mkdir_or_exist(cache_dir)
+            meta = dict(
+                seed=seed,
+                num_samples=len(dataset),
+                pipeline=self._pipeline_hash())
+            meta_file = osp.join(cache_dir, 'meta.json')
+            if not osp.isfile(meta_file):
+                mmcv.dump(meta, meta_file)
+            elif mmcv.load(meta_file) != meta:
+                raise ValueError(
+                    f'{cache_dir} caches the samples of another dataset, '
+                    f'pipeline or seed: {mmcv.load(meta_file)}, expect {meta}')
+
+    def __len__(self):
+        return len(self.sample_seeds)
+
+    def _split_pipeline(self):
+        """Split the trailing deterministic transforms off the pipeline of
+        a shallow copy of the wrapped dataset, into ``self.tail``."""
+        pipeline = self.dataset.pipeline
+        transforms = pipeline if isinstance(pipeline, list) else \
+            pipeline.transforms
+        num_head = len(transforms)
+        while num_head > 0 and type(transforms[num_head - 1]).__name__ in \
+                self.DETERMINISTIC_TRANSFORMS:
+            num_head -= 1
+        self.tail = Compose(transforms[num_head:])
+        self.dataset = copy.copy(self.dataset)
+        if isinstance(pipeline, list):
+            # MultiImageMixDataset
+            self.dataset.pipeline = transforms[:num_head]
+            self.dataset.pipeline_types = \
+                self.dataset.pipeline_types[:num_head]
+        else:
+            self.dataset.pipeline = Compose(transforms[:num_head])
+
+    def _pipeline_hash(self):
+        """The md5 of the cached head of the pipeline, i.e. of the types
+        and arguments of its transforms."""
+        pipeline_repr = repr(self.dataset.pipeline)
+        # drop the addresses of the objects without a __repr__
+        pipeline_repr = re.sub(r' at 0x[0-9a-fA-F]+', '', pipeline_repr)
+        return hashlib.md5(pipeline_repr.encode()).hexdigest()
+
+    def update_skip_type_keys(self, skip_type_keys):
+        """Update skip_type_keys of the wrapped
+        :obj:`MultiImageMixDataset`. It is called by an external hook.
+
+        Args:
+            skip_type_keys (list[str], optional): Sequence of type
+                string to be skip pipeline.
+        """
+        self.dataset.update_skip_type_keys(skip_type_keys)
+        self._skip_type_keys = skip_type_keys
+
+    def _cache_file(self, idx):
+        if self._skip_type_keys:
+            # samples without the skipped transforms are cached apart
+            sub_dir = 'skip_' + '_'.join(sorted(self._skip_type_keys))
+            cache_dir = osp.join(self.cache_dir, sub_dir)
+            mmcv.mkdir_or_exist(cache_dir)
+        else:
+            cache_dir = self.cache_dir
+        return osp.join(cache_dir, f'{idx:08d}.pkl')
+
+    def _replay(self, idx):
+        sample_seed = int(self.sample_seeds[idx])
+        np_state = np.random.get_state()
+        py_state = random.getstate()
+        np.random.seed(sample_seed)
+        random.seed(sample_seed)
+        try:
+            return self.dataset[idx]
+        finally:
+            np.random.set_state(np_state)
+            random.setstate(py_state)
+
+    def __getitem__(self, idx):
+        if self.cache_dir is None:
+            return self._replay(idx)
+        cache_file = self._cache_file(idx)
+        if osp.isfile(cache_file):
+            return self.tail(mmcv.load(cache_file))
+        results = self._replay(idx)
+        # workers of other ranks may write the same sample concurrently
+        tmp_file = f'{cache_file}.{os.getpid()}'
+        mmcv.dump(results, tmp_file, file_format='pkl')
+        os.replace(tmp_file, cache_file)
+        return self.tail(results)
@@ -0,0 +1,192 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import os.path as osp
+
+import mmcv
+import numpy as np
+
+from .builder import DATASETS
+from .custom import CustomDataset
+
+
+class PackWriter:
+    """Write encoded images into large sharded files with an offset index.
+
+    Images are appended as raw encoded bytes to ``{out_prefix}-{i:05d}.bin``
+    files, a new shard being started once ``shard_size`` bytes are written.
+    The index ``{out_prefix}.pkl`` stores the data infos of all records (with
+    their parsed annotations) and the location of each image in the shards.
+
+    Args:
+        out_prefix (str): Output path prefix of the shards and the index.
+        shard_size (int): Maximum number of bytes in a shard. A single image
+            larger than it still gets its own shard. Default: 1 GiB.
+    """
+
+    def __init__(self, out_prefix, shard_size=1 << 30):
+        assert shard_size > 0
+        self.out_prefix = out_prefix
+        self.shard_size = shard_size
+        self.shards = []
+        self.data_infos = []
+        self._file = None
+        self._offset = 0
+        mmcv.mkdir_or_exist(osp.dirname(osp.abspath(out_prefix)))
+
+    def _new_shard(self):
+        if self._file is not None:
+            self._file.close()
+        shard = f'{osp.basename(self.out_prefix)}-{len(self.shards):05d}.bin'
+        self._file = open(
+            osp.join(osp.dirname(osp.abspath(self.out_prefix)), shard), 'wb')
+        self._offset = 0
+        self.shards.append(shard)
+
+    def add(self, img_bytes, data_info):
+        """Append an encoded image and its data info to the pack.
+
+        Args:
+            img_bytes (bytes): Encoded image content.
+            data_info (dict): Image info, e.g. filename, width, height and
+                ann. A ``pack`` field with the shard id, byte offset and
+                length of the image is added to a copy of it.
+
+        Returns:
+            dict: The data info stored in the index.
+        """
+        if self._file is None or (self._offset > 0 and self._offset +
+                                  len(img_bytes) > self.shard_size):
+            self._new_shard()
+        self._file.write(img_bytes)
+        data_info = dict(
+            data_info,
+            pack=dict(
+                shard=len(self.shards) - 1,
+                offset=self._offset,
+                length=len(img_bytes)))
+        self._offset += len(img_bytes)
+        self.data_infos.append(data_info)
+        return data_info
+
+    def close(self, classes=None):
+        """Flush the last shard and dump the index.
+
+        Args:
+            classes (Sequence[str], optional): Class names stored in the
+                index. Default: None.
+
+        Returns:
+            str: Path of the index file.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        index_file = f'{self.out_prefix}.pkl'
+        mmcv.dump(
+            dict(
+                classes=None if classes is None else list(classes),
+                shards=self.shards,
+                data_infos=self.data_infos), index_file)
+        return index_file
+
+
+def pack_dataset(dataset, out_prefix, shard_size=1 << 30):
+    """Pack the images and annotations of a dataset into shard files.
+
+    Annotations are taken from ``dataset.get_ann_info`` so that e.g. XML
+    files are parsed only once, at packing time.
+
+    Args:
+        dataset (:obj:`CustomDataset` | :obj:`ConcatDataset`): Dataset to
+            pack. The images of all the datasets of a
+            :obj:`ConcatDataset` are written into the same pack.
+        out_prefix (str): Output path prefix of the shards and the index.
+        shard_size (int): Maximum number of bytes in a shard.
+            Default: 1 GiB.
+
+    Returns:
+        str: Path of the index file.
+    """
+    datasets = getattr(dataset, 'datasets', [dataset])
+    writer = PackWriter(out_prefix, shard_size)
+    prog_bar = mmcv.ProgressBar(sum(len(ds) for ds in datasets))
+    for ds in datasets:
+        for idx, img_info in enumerate(ds.data_infos):
+            if ds.img_prefix is not None:
+                filename = osp.join(ds.img_prefix, img_info['filename'])
+            else:
+                filename = img_info['filename']
+            data_info = dict(img_info, ann=ds.get_ann_info(idx))
+            writer.add(ds.file_client.get(filename), data_info)
+            prog_bar.update()
+    return writer.close(dataset.CLASSES)
+
+
+@DATASETS.register_module()
+class PackedDataset(CustomDataset):
+    """Dataset read from the sharded files written by :func:`pack_dataset`.
+
+    The ``ann_file`` is the index of the pack, the shards are looked up in
+    the same directory. Images should be loaded with
+    :obj:`LoadImageFromPack`, which reads the encoded bytes of a record from
+    its shard with a single mmap slice or sequential read.
+
+    ``shard_ids`` holds the shard of every image, it is used by
+    :obj:`DistributedGroupSampler` and :obj:`InfiniteGroupBatchSampler` to
+    shuffle shard by shard instead of over the whole dataset.
+
+    Args:
+        ann_file (str): Path of the pack index.
+        img_prefix (str, optional): Prefix joined to the original filenames
+            to fill ``results['filename']``. Images are never read from it.
+            Default: None.
+        **kwargs: Other arguments of :obj:`CustomDataset`.
+    """
+
+    def __init__(self, ann_file, pipeline, img_prefix=None, **kwargs):
+        super(PackedDataset, self).__init__(
+            ann_file, pipeline, img_prefix=img_prefix, **kwargs)
+        self.shard_ids = np.array(
+            [info['pack']['shard'] for info in self.data_infos],
+            dtype=np.int64)
+
+    def load_annotations(self, ann_file):
+        """Load data infos and shard paths from the pack index."""
+        index = mmcv.load(ann_file)
+        pack_root = osp.dirname(self.ann_file)
+        self.pack_files = [
+            osp.join(pack_root, shard) for shard in index['shards']
+        ]
+        for pack_file in self.pack_files:
+            if not osp.isfile(pack_file):
+                raise FileNotFoundError(f'{pack_file} does not exist')
+        if self.CLASSES is None:
+            self.CLASSES = index['classes']
+        return index['data_infos']
+
+    def pre_pipeline(self, results):
+        """Prepare results dict for pipeline."""
+        super(PackedDataset, self).pre_pipeline(results)
+        results['pack_files'] = self.pack_files
+
+    def _filter_imgs(self, min_size=32):
+        """Filter images too small or without annotation."""
+        valid_inds = []
+        for i, img_info in enumerate(self.data_infos):
+            if min(img_info['width'], img_info['height']) < min_size:
+                continue
+            if self.filter_empty_gt and img_info['ann']['labels'].size == 0:
+                continue
+            valid_inds.append(i)
+        return valid_inds
+
+    def get_cat_ids(self, idx):
+        """Get category ids by index.
+
+        Args:
+            idx (int): Index of data.
+
+        Returns:
+            list[int]: All categories in the image of specified index.
+        """
+
+        return self.data_infos[idx]['ann']['labels'].astype(np.int64).tolist()
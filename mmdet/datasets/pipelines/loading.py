@@ -1,4 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import mmap
 import os.path as osp
 
 import mmcv
@@ -83,6 +84,105 @@ class LoadImageFromFile:
         return repr_str
 
 
+@PIPELINES.register_module()
+class LoadImageFromPack(LoadImageFromFile):
+    """Load an image from the shard files of a :obj:`PackedDataset`.
+
+    Required keys are "pack_files" (the shard paths of the pack), "img_prefix"
+    and "img_info" (a dict that must contain the keys "filename" and "pack",
+    the shard id, byte offset and length of the encoded image). Added or
+    updated keys are the same as :obj:`LoadImageFromFile`.
+
+    Shards are opened lazily, so that every dataloader worker holds its own
+    handles, and kept open for the following reads until :meth:`close`.
+
+    Args:
+        to_float32 (bool): Whether to convert the loaded image to a float32
+            numpy array. If set to False, the loaded image is an uint8 array.
+            Defaults to False.
+        color_type (str): The flag argument for :func:`mmcv.imfrombytes`.
+            Defaults to 'color'.
+        use_mmap (bool): Whether to memory-map the shards. If set to False,
+            each image is read with a seek and a single sequential read.
+            Defaults to True.
+    """
+
+    def __init__(self, to_float32=False, color_type='color', use_mmap=True):
+        super(LoadImageFromPack, self).__init__(
+            to_float32=to_float32, color_type=color_type)
+        self.use_mmap = use_mmap
+        self._shards = {}
+
+    def _get_bytes(self, pack_file, offset, length):
+        shard = self._shards.get(pack_file)
+        if shard is None:
+            shard = open(pack_file, 'rb')
+            if self.use_mmap:
+                with shard:
+                    shard = mmap.mmap(
+                        shard.fileno(), 0, access=mmap.ACCESS_READ)
+            self._shards[pack_file] = shard
+        if self.use_mmap:
+            return shard[offset:offset + length]
+        shard.seek(offset)
+        return shard.read(length)
+
+    def __call__(self, results):
+        """Call functions to load image and get image meta information.
+
+        Args:
+            results (dict): Result dict from :obj:`mmdet.PackedDataset`.
+
+        Returns:
+            dict: The dict contains loaded image and meta information.
+        """
+
+        pack = results['img_info']['pack']
+        img_bytes = self._get_bytes(results['pack_files'][pack['shard']],
+                                    pack['offset'], pack['length'])
+        img = mmcv.imfrombytes(img_bytes, flag=self.color_type)
+        if self.to_float32:
+            img = img.astype(np.float32)
+
+        if results['img_prefix'] is not None:
+            filename = osp.join(results['img_prefix'],
+                                results['img_info']['filename'])
+        else:
+            filename = results['img_info']['filename']
+
+        results['filename'] = filename
+        results['ori_filename'] = results['img_info']['filename']
+        results['img'] = img
+        results['img_shape'] = img.shape
+        results['ori_shape'] = img.shape
+        results['img_fields'] = ['img']
+        return results
+
+    def __getstate__(self):
+        # open shards can not be pickled into dataloader workers
+        state = self.__dict__.copy()
+        state['_shards'] = {}
+        return state
+
+    def close(self):
+        """Close the open shards, they are reopened by the next read."""
+        for shard in self._shards.values():
+            shard.close()
+        self._shards = {}
+
+    def __del__(self):
+        # the shards are missing if __init__ failed
+        if getattr(self, '_shards', None):
+            self.close()
+
+    def __repr__(self):
+        repr_str = (f'{self.__class__.__name__}('
+                    f'to_float32={self.to_float32}, '
+                    f"color_type='{self.color_type}', "
+                    f'use_mmap={self.use_mmap})')
+        return repr_str
+
+
 @PIPELINES.register_module()
 class LoadImageFromWebcam(LoadImageFromFile):
     """Load an image from webcam.
@@ -2719,16 +2719,44 @@ class YOLOXHSVRandomAug:
         hsv_gains *= np.random.randint(0, 2, 3)
         # prevent overflow
         hsv_gains = hsv_gains.astype(np.int16)
-        img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV).astype(np.int16)
 
-        img_hsv[..., 0] = (img_hsv[..., 0] + hsv_gains[0]) % 180
-        img_hsv[..., 1] = np.clip(img_hsv[..., 1] + hsv_gains[1], 0, 255)
-        img_hsv[..., 2] = np.clip(img_hsv[..., 2] + hsv_gains[2], 0, 255)
-        cv2.cvtColor(img_hsv.astype(img.dtype), cv2.COLOR_HSV2BGR, dst=img)
+        if img.dtype == np.uint8:
+            # For uint8 images every channel has only 256 possible values,
+            # so the per-channel arithmetic collapses into a lookup table
+            # that is applied in place without int16 temporaries.
+            img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+            cv2.LUT(img_hsv, self._build_lut(hsv_gains), dst=img_hsv)
+            cv2.cvtColor(img_hsv, cv2.COLOR_HSV2BGR, dst=img)
+        else:
+            img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV).astype(np.int16)
+
+            img_hsv[..., 0] = (img_hsv[..., 0] + hsv_gains[0]) % 180
+            img_hsv[..., 1] = np.clip(img_hsv[..., 1] + hsv_gains[1], 0, 255)
+            img_hsv[..., 2] = np.clip(img_hsv[..., 2] + hsv_gains[2], 0, 255)
+            cv2.cvtColor(
+                img_hsv.astype(img.dtype), cv2.COLOR_HSV2BGR, dst=img)
 
         results['img'] = img
         return results
 
+    @staticmethod
+    def _build_lut(hsv_gains):
+        """Build a (256, 1, 3) uint8 lookup table for ``cv2.LUT``.
+
+        Args:
+            hsv_gains (ndarray): Integer gains of h, s and v, shape (3, ).
+
+        Returns:
+            ndarray: Lookup table mapping every uint8 value of each HSV
+                channel to its augmented value.
+        """
+        values = np.arange(256, dtype=np.int16)
+        lut = np.empty((256, 1, 3), dtype=np.uint8)
+        lut[:, 0, 0] = (values + hsv_gains[0]) % 180
+        lut[:, 0, 1] = np.clip(values + hsv_gains[1], 0, 255)
+        lut[:, 0, 2] = np.clip(values + hsv_gains[2], 0, 255)
+        return lut
+
     def __repr__(self):
         repr_str = self.__class__.__name__
         repr_str += f'(hue_delta={self.hue_delta}, '
@@ -1,9 +1,13 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+from .bucket_sampler import (ShapeBucketBatchSampler, get_padded_shapes,
+                             restore_dataset_order)
 from .distributed_sampler import DistributedSampler
-from .group_sampler import DistributedGroupSampler, GroupSampler
+from .group_sampler import (DistributedGroupSampler, GroupSampler,
+                            shard_aware_shuffle)
 from .infinite_sampler import InfiniteBatchSampler, InfiniteGroupBatchSampler
 
 __all__ = [
     'DistributedSampler', 'DistributedGroupSampler', 'GroupSampler',
-    'InfiniteGroupBatchSampler', 'InfiniteBatchSampler'
+    'InfiniteGroupBatchSampler', 'InfiniteBatchSampler', 'shard_aware_shuffle',
+    'ShapeBucketBatchSampler', 'get_padded_shapes', 'restore_dataset_order'
 ]
@@ -0,0 +1,145 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import math
+from collections import defaultdict
+
+import mmcv
+from mmcv.runner import get_dist_info
+from torch.utils.data.sampler import Sampler
+
+
+def _padded_shape_fn(pipeline):
+    """Get a function mapping an original (h, w) to the padded test shape.
+
+    The shape is predicted from the ``Resize`` and ``Pad`` transforms in the
+    first scale of ``MultiScaleFlipAug``. If the pipeline can not be
+    interpreted, the original shape is used, which is still a valid key as
+    the test pipeline is deterministic.
+    """
+    aug = None
+    for transform in getattr(pipeline, 'transforms', []):
+        if hasattr(transform, 'img_scale') and hasattr(
+                transform, 'transforms'):
+            aug = transform
+    if aug is None or getattr(aug, 'scale_key', 'scale') != 'scale':
+        return lambda h, w: (h, w)
+    scale = aug.img_scale[0]
+    resize = pad = None
+    for transform in aug.transforms.transforms:
+        if type(transform).__name__ == 'Resize':
+            resize = transform
+        elif type(transform).__name__ == 'Pad':
+            pad = transform
+
+    def padded_shape(h, w):
+        if resize is not None:
+            if resize.keep_ratio:
+                w, h = mmcv.rescale_size((w, h), scale)
+            else:
+                w, h = scale
+        if pad is None:
+            return h, w
+        if pad.pad_to_square:
+            return max(h, w), max(h, w)
+        if pad.size is not None:
+            return tuple(pad.size)
+        divisor = pad.size_divisor
+        return (int(math.ceil(h / divisor)) * divisor,
+                int(math.ceil(w / divisor)) * divisor)
+
+    return padded_shape
+
+
+def get_padded_shapes(dataset):
+    """Predict the padded shape of every image of a test dataset.
+
+    Args:
+        dataset (:obj:`CustomDataset` | :obj:`ConcatDataset`): The dataset.
+
+    Returns:
+        list[tuple[int]]: Padded (h, w) of each image.
+    """
+    shapes = []
+    for ds in getattr(dataset, 'datasets', [dataset]):
+        padded_shape = _padded_shape_fn(ds.pipeline)
+        shapes.extend(
+            padded_shape(info['height'], info['width'])
+            for info in ds.data_infos)
+    return shapes
+
+
+class ShapeBucketBatchSampler(Sampler):
+    """Batch sampler grouping test images with the same padded shape.
+
+    ``collate`` pads all the images of a batch to the largest one. Batching
+    images of the same padded shape together removes this extra padding, so
+    larger test batches can be used without wasting computation. Batches are
+    dealt to the ranks in turn and ``indices`` holds the dataset index of
+    every sample of this rank in iteration order, which is used to restore
+    the dataset order of the results.
+
+    Args:
+        dataset (object): The dataset.
+        batch_size (int): Maximum number of images in a batch. Default: 1.
+        world_size (int, optional): Number of processes participating in
+            distributed testing. Default: None.
+        rank (int, optional): Rank of current process. Default: None.
+        indices (Sequence[int], optional): Indices of the images to sample,
+            e.g. a subset of the dataset, all the images if None.
+            Default: None.
+    """
+
+    def __init__(self,
+                 dataset,
+                 batch_size=1,
+                 world_size=None,
+                 rank=None,
+                 indices=None):
+        _rank, _world_size = get_dist_info()
+        if world_size is None:
+            world_size = _world_size
+        if rank is None:
+            rank = _rank
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.world_size = world_size
+        self.rank = rank
+
+        shapes = get_padded_shapes(dataset)
+        if indices is None:
+            indices = range(len(shapes))
+        buckets = defaultdict(list)
+        for idx in indices:
+            buckets[shapes[idx]].append(idx)
+        self.num_buckets = len(buckets)
+        batches = []
+        for shape in sorted(buckets):
+            bucket = buckets[shape]
+            batches.extend(bucket[i:i + batch_size]
+                           for i in range(0, len(bucket), batch_size))
+        self.batches = batches[rank::world_size]
+        self.indices = [idx for batch in self.batches for idx in batch]
+
+    def __iter__(self):
+        for batch in self.batches:
+            yield batch[:]
+
+    def __len__(self):
+        return len(self.batches)
+
+
+def restore_dataset_order(results, indices, size):
+    """Put results produced in sampler order back into dataset order.
+
+    Args:
+        results (list): Results of the samples in ``indices`` order.
+        indices (list[int]): Dataset index of each result.
+        size (int): Size of the dataset.
+
+    Returns:
+        list: Results in dataset order.
+    """
+    assert len(results) == len(indices)
+    ordered_results = [None] * size
+    for idx, result in zip(indices, results):
+        ordered_results[idx] = result
+    return ordered_results
@@ -7,6 +7,33 @@ from mmcv.runner import get_dist_info
 from torch.utils.data import Sampler
 
 
+def shard_aware_shuffle(indices, shard_ids, generator):
+    """Shuffle indices shard by shard.
+
+    The order of the shards is shuffled, then the indices inside each shard,
+    so that consecutive indices keep reading from the same shard file.
+
+    Args:
+        indices (ndarray): Indices of the dataset to shuffle.
+        shard_ids (ndarray): Shard of each image of the dataset.
+        generator (torch.Generator): Generator used for the permutations.
+
+    Returns:
+        list[int]: Shuffled indices.
+    """
+    indices = np.asarray(indices)
+    shards = shard_ids[indices]
+    unique_shards = np.unique(shards)
+    shuffled = []
+    for i in torch.randperm(len(unique_shards), generator=generator).numpy():
+        indice = indices[shards == unique_shards[i]]
+        shuffled.append(indice[torch.randperm(
+            len(indice), generator=generator).numpy()])
+    if not shuffled:
+        return []
+    return np.concatenate(shuffled).tolist()
+
+
 class GroupSampler(Sampler):
 
     def __init__(self, dataset, samples_per_gpu=1):
@@ -59,6 +86,11 @@ class DistributedGroupSampler(Sampler):
     .. note::
         Dataset is assumed to be of constant size.
 
+    If the dataset has ``shard_ids`` (e.g. :obj:`PackedDataset`), the
+    indices are shuffled shard by shard and the batches of the different
+    groups are interleaved without breaking their order, so that every
+    process reads its shards sequentially.
+
     Arguments:
         dataset: Dataset used for sampling.
         num_replicas (optional): Number of processes participating in
@@ -90,6 +122,7 @@ class DistributedGroupSampler(Sampler):
         assert hasattr(self.dataset, 'flag')
         self.flag = self.dataset.flag
         self.group_sizes = np.bincount(self.flag)
+        self.shard_ids = getattr(self.dataset, 'shard_ids', None)
 
         self.num_samples = 0
         for i, j in enumerate(self.group_sizes):
@@ -108,11 +141,16 @@ class DistributedGroupSampler(Sampler):
             if size > 0:
                 indice = np.where(self.flag == i)[0]
                 assert len(indice) == size
-                # add .numpy() to avoid bug when selecting indice in parrots.
-                # TODO: check whether torch.randperm() can be replaced by
-                # numpy.random.permutation().
-                indice = indice[list(
-                    torch.randperm(int(size), generator=g).numpy())].tolist()
+                if self.shard_ids is not None:
+                    indice = shard_aware_shuffle(indice, self.shard_ids, g)
+                else:
+                    # add .numpy() to avoid bug when selecting indice in
+                    # parrots.
+                    # TODO: check whether torch.randperm() can be replaced by
+                    # numpy.random.permutation().
+                    indice = indice[list(
+                        torch.randperm(int(size),
+                                       generator=g).numpy())].tolist()
                 extra = int(
                     math.ceil(
                         size * 1.0 / self.samples_per_gpu / self.num_replicas)
@@ -126,13 +164,16 @@ class DistributedGroupSampler(Sampler):
 
         assert len(indices) == self.total_size
 
-        indices = [
-            indices[j] for i in list(
-                torch.randperm(
-                    len(indices) // self.samples_per_gpu, generator=g))
-            for j in range(i * self.samples_per_gpu, (i + 1) *
-                           self.samples_per_gpu)
-        ]
+        if self.shard_ids is not None:
+            indices = self._interleave_groups(indices, g)
+        else:
+            indices = [
+                indices[j] for i in list(
+                    torch.randperm(
+                        len(indices) // self.samples_per_gpu, generator=g))
+                for j in range(i * self.samples_per_gpu, (i + 1) *
+                               self.samples_per_gpu)
+            ]
 
         # subsample
         offset = self.num_samples * self.rank
@@ -141,6 +182,24 @@ class DistributedGroupSampler(Sampler):
 
         return iter(indices)
 
+    def _interleave_groups(self, indices, g):
+        """Randomly interleave the batches of the groups.
+
+        The batches of a group keep their shard-aware order, only the group
+        each batch is taken from is shuffled.
+        """
+        batches = [
+            indices[i:i + self.samples_per_gpu]
+            for i in range(0, len(indices), self.samples_per_gpu)
+        ]
+        batch_flags = np.array([self.flag[batch[0]] for batch in batches])
+        group_batches = {
+            flag: iter([b for b, f in zip(batches, batch_flags) if f == flag])
+            for flag in np.unique(batch_flags)
+        }
+        order = batch_flags[torch.randperm(len(batches), generator=g).numpy()]
+        return [idx for flag in order for idx in next(group_batches[flag])]
+
     def __len__(self):
         return self.num_samples
 
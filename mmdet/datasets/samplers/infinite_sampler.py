@@ -6,6 +6,8 @@ import torch
 from mmcv.runner import get_dist_info
 from torch.utils.data.sampler import Sampler
 
+from .group_sampler import shard_aware_shuffle
+
 
 class InfiniteGroupBatchSampler(Sampler):
     """Similar to `BatchSampler` warping a `GroupSampler. It is designed for
@@ -29,7 +31,9 @@ class InfiniteGroupBatchSampler(Sampler):
         shuffle (bool): Whether shuffle the indices of a dummy `epoch`, it
             should be noted that `shuffle` can not guarantee that you can
             generate sequential indices because it need to ensure
-            that all indices in a batch is in a group. Default: True.
+            that all indices in a batch is in a group. If the dataset has
+            ``shard_ids`` (e.g. :obj:`PackedDataset`), the indices are
+            shuffled shard by shard. Default: True.
     """  # noqa: W605
 
     def __init__(self,
@@ -54,6 +58,7 @@ class InfiniteGroupBatchSampler(Sampler):
         assert hasattr(self.dataset, 'flag')
         self.flag = self.dataset.flag
         self.group_sizes = np.bincount(self.flag)
+        self.shard_ids = getattr(self.dataset, 'shard_ids', None)
         # buffer used to save indices of each group
         self.buffer_per_group = {k: [] for k in range(len(self.group_sizes))}
 
@@ -65,7 +70,10 @@ class InfiniteGroupBatchSampler(Sampler):
         g = torch.Generator()
         g.manual_seed(self.seed)
         while True:
-            if self.shuffle:
+            if self.shuffle and self.shard_ids is not None:
+                yield from shard_aware_shuffle(
+                    np.arange(self.size), self.shard_ids, g)
+            elif self.shuffle:
                 yield from torch.randperm(self.size, generator=g).tolist()
 
             else:
@@ -3,7 +3,7 @@ from collections import OrderedDict
 
 from mmcv.utils import print_log
 
-from mmdet.core import eval_map, eval_recalls
+from mmdet.core import MeanAPEvaluator, eval_recalls, fast_eval_map
 from .builder import DATASETS
 from .xml_style import XMLDataset
 
@@ -31,6 +31,28 @@ class VOCDataset(XMLDataset):
         else:
             raise ValueError('Cannot infer dataset year from img_prefix')
 
+    def _map_dataset_name(self):
+        return 'voc07' if self.year == 2007 else self.CLASSES
+
+    def build_evaluator(self, iou_thr=0.5):
+        """Build an evaluator computing mAP as the results arrive.
+
+        The evaluator is updated with the results of each batch and passed
+        to :meth:`evaluate` in place of the results.
+
+        Args:
+            iou_thr (float | list[float]): IoU threshold. Default: 0.5.
+
+        Returns:
+            :obj:`MeanAPEvaluator`: The evaluator.
+        """
+        iou_thrs = [iou_thr] if isinstance(iou_thr, float) else iou_thr
+        return MeanAPEvaluator(
+            self.get_ann_info,
+            iou_thrs,
+            dataset=self._map_dataset_name(),
+            use_legacy_coordinate=True)
+
     def evaluate(self,
                  results,
                  metric='mAP',
@@ -41,7 +63,10 @@ class VOCDataset(XMLDataset):
         """Evaluate in VOC protocol.
 
         Args:
-            results (list[list | tuple]): Testing results of the dataset.
+            results (list[list | tuple] | :obj:`MeanAPEvaluator`): Testing
+                results of the dataset, or the evaluator built by
+                :meth:`build_evaluator` and updated with them, with the same
+                ``iou_thr``.
             metric (str | list[str]): Metrics to be evaluated. Options are
                 'mAP', 'recall'.
             logger (logging.Logger | str, optional): Logger used for printing
@@ -64,31 +89,40 @@ class VOCDataset(XMLDataset):
         allowed_metrics = ['mAP', 'recall']
         if metric not in allowed_metrics:
             raise KeyError(f'metric {metric} is not supported')
-        annotations = [self.get_ann_info(i) for i in range(len(self))]
+        incremental = isinstance(results, MeanAPEvaluator)
+        if incremental:
+            assert metric == 'mAP', \
+                'an evaluator can only be used to evaluate mAP'
+            iou_thrs = [iou_thr] if isinstance(iou_thr, float) else iou_thr
+            assert list(iou_thrs) == results.iou_thrs, \
+                'iou_thr must be the one of the evaluator'
+            iou_thr = results.iou_thrs
+        else:
+            annotations = [self.get_ann_info(i) for i in range(len(self))]
         eval_results = OrderedDict()
         iou_thrs = [iou_thr] if isinstance(iou_thr, float) else iou_thr
         if metric == 'mAP':
             assert isinstance(iou_thrs, list)
-            if self.year == 2007:
-                ds_name = 'voc07'
-            else:
-                ds_name = self.CLASSES
+            ds_name = self._map_dataset_name()
             mean_aps = []
-            for iou_thr in iou_thrs:
+            for i, iou_thr in enumerate(iou_thrs):
                 print_log(f'\n{"-" * 15}iou_thr: {iou_thr}{"-" * 15}')
                 # Follow the official implementation,
                 # http://host.robots.ox.ac.uk/pascal/VOC/voc2012/VOCdevkit_18-May-2011.tar
                 # we should use the legacy coordinate system in mmdet 1.x,
                 # which means w, h should be computed as 'x2 - x1 + 1` and
                 # `y2 - y1 + 1`
-                mean_ap, _ = eval_map(
-                    results,
-                    annotations,
-                    scale_ranges=None,
-                    iou_thr=iou_thr,
-                    dataset=ds_name,
-                    logger=logger,
-                    use_legacy_coordinate=True)
+                if incremental:
+                    mean_ap, _ = results.compute(i, logger=logger)
+                else:
+                    mean_ap, _ = fast_eval_map(
+                        results,
+                        annotations,
+                        scale_ranges=None,
+                        iou_thr=iou_thr,
+                        dataset=ds_name,
+                        logger=logger,
+                        use_legacy_coordinate=True)
                 mean_aps.append(mean_ap)
                 eval_results[f'AP{int(iou_thr * 100):02d}'] = round(mean_ap, 3)
             eval_results['mAP'] = sum(mean_aps) / len(mean_aps)
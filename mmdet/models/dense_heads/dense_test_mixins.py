@@ -204,3 +204,83 @@ class BBoxTestMixin(object):
         else:
             scores = torch.cat(aug_scores, dim=0)
             return bboxes, scores
+
+
+class YOLOXExportMixin(object):
+    """Mixin class for the ONNX export of the YOLOX heads.
+
+    The head must hold a ``prior_generator`` with strides, the
+    ``cls_out_channels`` and the ``_bbox_decode`` of the priors of
+    :class:`YOLOXHead`. It must come before :class:`BaseDenseHead` in the
+    bases, whose ``onnx_export`` does not take the objectnesses.
+    """
+
+    def onnx_export(self,
+                    cls_scores,
+                    bbox_preds,
+                    objectnesses,
+                    img_metas=None,
+                    with_nms=True):
+        """Transform network outputs of a batch into bbox predictions for
+        ONNX export.
+
+        Unlike :meth:`get_bboxes`, all the classes of a prior are kept, each
+        scored by its class score times the objectness, and the NMS is done
+        per class by ``onnx::NonMaxSuppression``.
+
+        Args:
+            cls_scores (list[Tensor]): Classification scores for all
+                scale levels, each is a 4D-tensor, has shape
+                (batch_size, num_priors * num_classes, H, W).
+            bbox_preds (list[Tensor]): Box energies / deltas for all
+                scale levels, each is a 4D-tensor, has shape
+                (batch_size, num_priors * 4, H, W).
+            objectnesses (list[Tensor]): Score factor for
+                all scale level, each is a 4D-tensor, has shape
+                (batch_size, 1, H, W).
+            img_metas (list[dict], optional): Image meta info. Default None.
+            with_nms (bool): Whether apply nms to the bboxes. Default: True.
+
+        Returns:
+            tuple[Tensor, Tensor]: When `with_nms` is True, the dets of shape
+                [N, num_det, 5] and their labels of shape [N, num_det].
+                Otherwise, the bboxes of shape [N, num_priors, 4] and
+                their scores of shape [N, num_priors, num_classes].
+        """
+        assert len(cls_scores) == len(bbox_preds) == len(objectnesses)
+        cfg = self.test_cfg
+        num_imgs = cls_scores[0].shape[0]
+        featmap_sizes = [cls_score.shape[2:] for cls_score in cls_scores]
+        mlvl_priors = self.prior_generator.grid_priors(
+            featmap_sizes,
+            dtype=cls_scores[0].dtype,
+            device=cls_scores[0].device,
+            with_stride=True)
+
+        flatten_cls_scores = [
+            cls_score.permute(0, 2, 3, 1).reshape(num_imgs, -1,
+                                                  self.cls_out_channels)
+            for cls_score in cls_scores
+        ]
+        flatten_bbox_preds = [
+            bbox_pred.permute(0, 2, 3, 1).reshape(num_imgs, -1, 4)
+            for bbox_pred in bbox_preds
+        ]
+        flatten_objectness = [
+            objectness.permute(0, 2, 3, 1).reshape(num_imgs, -1)
+            for objectness in objectnesses
+        ]
+        flatten_cls_scores = torch.cat(flatten_cls_scores, dim=1).sigmoid()
+        flatten_bbox_preds = torch.cat(flatten_bbox_preds, dim=1)
+        flatten_objectness = torch.cat(flatten_objectness, dim=1).sigmoid()
+        bboxes = self._bbox_decode(torch.cat(mlvl_priors), flatten_bbox_preds)
+        scores = flatten_cls_scores * flatten_objectness.unsqueeze(2)
+        if not with_nms:
+            return bboxes, scores
+
+        # Replace multiclass_nms with ONNX::NonMaxSuppression in deployment
+        from mmdet.core.export import add_dummy_nms_for_onnx
+        return add_dummy_nms_for_onnx(
+            bboxes, scores, cfg.nms.get('max_output_boxes_per_class', 200),
+            cfg.nms.get('iou_threshold', 0.5), cfg.score_thr,
+            cfg.get('deploy_nms_pre', -1), cfg.get('max_per_img', 100))
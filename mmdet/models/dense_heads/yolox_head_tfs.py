@@ -1,6 +1,7 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import math
 
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -14,11 +15,11 @@ from mmdet.core import (MlvlPointGenerator, bbox_xyxy_to_cxcywh,
                         reduce_mean)
 from ..builder import HEADS, build_loss
 from .base_dense_head import BaseDenseHead
-from .dense_test_mixins import BBoxTestMixin
+from .dense_test_mixins import BBoxTestMixin, YOLOXExportMixin
 
 
 @HEADS.register_module()
-class YOLOXHead_tfs(BaseDenseHead, BBoxTestMixin):
+class YOLOXHead_tfs(YOLOXExportMixin, BaseDenseHead, BBoxTestMixin):
     """YOLOXHead head used in `YOLOX <https://arxiv.org/abs/2107.08430>`_.
 
     Args:
@@ -251,7 +252,8 @@ class YOLOXHead_tfs(BaseDenseHead, BBoxTestMixin):
         """
         assert len(cls_scores) == len(bbox_preds) == len(objectnesses)
         cfg = self.test_cfg if cfg is None else cfg
-        scale_factors = [img_meta['scale_factor'] for img_meta in img_metas]
+        scale_factors = np.array(
+            [img_meta['scale_factor'] for img_meta in img_metas])
 
         num_imgs = len(img_metas)
         featmap_sizes = [cls_score.shape[2:] for cls_score in cls_scores]
@@ -261,12 +263,8 @@ class YOLOXHead_tfs(BaseDenseHead, BBoxTestMixin):
             device=cls_scores[0].device,
             with_stride=True)
 
-        # flatten cls_scores, bbox_preds and objectness
-        flatten_cls_scores = [
-            cls_score.permute(0, 2, 3, 1).reshape(num_imgs, -1,
-                                                  self.cls_out_channels)
-            for cls_score in cls_scores
-        ]
+        # flatten bbox_preds and objectness, the cls_scores are only gathered
+        # for the priors left
         flatten_bbox_preds = [
             bbox_pred.permute(0, 2, 3, 1).reshape(num_imgs, -1, 4)
             for bbox_pred in bbox_preds
@@ -276,25 +274,49 @@ class YOLOXHead_tfs(BaseDenseHead, BBoxTestMixin):
             for objectness in objectnesses
         ]
 
-        flatten_cls_scores = torch.cat(flatten_cls_scores, dim=1).sigmoid()
         flatten_bbox_preds = torch.cat(flatten_bbox_preds, dim=1)
         flatten_objectness = torch.cat(flatten_objectness, dim=1).sigmoid()
         flatten_priors = torch.cat(mlvl_priors)
 
-        flatten_bboxes = self._bbox_decode(flatten_priors, flatten_bbox_preds)
+        # the class scores are at most 1, so only the priors whose objectness
+        # passes score_thr can be kept
+        img_inds, prior_inds = torch.nonzero(
+            flatten_objectness >= cfg.score_thr, as_tuple=True)
+        score_factor = flatten_objectness[img_inds, prior_inds]
+        cls_logits = score_factor.new_empty(
+            (len(img_inds), self.cls_out_channels))
+        start = 0
+        for cls_score in cls_scores:
+            end = start + cls_score.shape[2] * cls_score.shape[3]
+            in_level = (prior_inds >= start) & (prior_inds < end)
+            level_inds = prior_inds[in_level] - start
+            cls_logits[in_level] = cls_score.flatten(2)[img_inds[in_level], :,
+                                                        level_inds]
+            start = end
+        # the sigmoid is monotonic, so the best class score is the sigmoid
+        # of the best logit
+        max_scores = cls_logits.max(1)[0].sigmoid()
+        valid_mask = score_factor * max_scores >= cfg.score_thr
+        img_inds = img_inds[valid_mask]
+        prior_inds = prior_inds[valid_mask]
+        scores = max_scores[valid_mask] * score_factor[valid_mask]
+        labels = torch.max(cls_logits[valid_mask].sigmoid(), 1)[1]
 
+        # only the boxes of the priors left are decoded
+        bboxes = self._bbox_decode(flatten_priors[prior_inds],
+                                   flatten_bbox_preds[img_inds, prior_inds])
         if rescale:
-            flatten_bboxes[..., :4] /= flatten_bboxes.new_tensor(
-                scale_factors).unsqueeze(1)
-
-        result_list = []
-        for img_id in range(len(img_metas)):
-            cls_scores = flatten_cls_scores[img_id]
-            score_factor = flatten_objectness[img_id]
-            bboxes = flatten_bboxes[img_id]
-
-            result_list.append(
-                self._bboxes_nms(cls_scores, bboxes, score_factor, cfg))
+            scale_factors = bboxes.new_tensor(scale_factors)
+            bboxes /= scale_factors.reshape(num_imgs, -1)[img_inds]
+
+        # img_inds are sorted, so the dets of each image are contiguous
+        num_dets = torch.bincount(img_inds, minlength=num_imgs).tolist()
+        result_list = [
+            self._bboxes_nms(img_bboxes, img_scores, img_labels, cfg)
+            for img_bboxes, img_scores, img_labels in zip(
+                bboxes.split(num_dets), scores.split(num_dets),
+                labels.split(num_dets))
+        ]
 
         return result_list
 
@@ -310,20 +332,14 @@ class YOLOXHead_tfs(BaseDenseHead, BBoxTestMixin):
         decoded_bboxes = torch.stack([tl_x, tl_y, br_x, br_y], -1)
         return decoded_bboxes
 
-    def _bboxes_nms(self, cls_scores, bboxes, score_factor, cfg):
-        max_scores, labels = torch.max(cls_scores, 1)
-        valid_mask = score_factor * max_scores >= cfg.score_thr
-
-        bboxes = bboxes[valid_mask]
-        scores = max_scores[valid_mask] * score_factor[valid_mask]
-        labels = labels[valid_mask]
-
+    def _bboxes_nms(self, bboxes, scores, labels, cfg):
         if labels.numel() == 0:
             return bboxes, labels
         else:
             dets, keep = batched_nms(bboxes, scores, labels, cfg.nms)
             return dets, labels[keep]
 
+    @force_fp32(apply_to=('cls_scores', 'bbox_preds', 'objectnesses'))
     @force_fp32(apply_to=('cls_scores', 'bbox_preds', 'objectnesses'))
     def loss(self,
              cls_scores,
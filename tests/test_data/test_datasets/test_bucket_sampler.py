@@ -0,0 +1,83 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from unittest.mock import patch
+
+import numpy as np
+
+from mmdet.datasets import CustomDataset
+from mmdet.datasets.samplers import (ShapeBucketBatchSampler,
+                                     get_padded_shapes, restore_dataset_order)
+
+IMG_SIZES = [(375, 500), (500, 375), (333, 500), (375, 500), (500, 375),
+             (375, 500), (480, 640), (375, 500)]
+
+
+def _build_dataset(pad_cfg):
+    data_infos = [
+        dict(filename=f'{i}.jpg', height=h, width=w)
+        for i, (h, w) in enumerate(IMG_SIZES)
+    ]
+    pipeline = [
+        dict(type='LoadImageFromWebcam'),
+        dict(
+            type='MultiScaleFlipAug',
+            img_scale=(640, 640),
+            flip=False,
+            transforms=[
+                dict(type='Resize', keep_ratio=True),
+                dict(type='RandomFlip'), pad_cfg,
+                dict(type='Collect', keys=['img'], meta_keys=['pad_shape'])
+            ])
+    ]
+    with patch.object(CustomDataset, 'load_annotations',
+                      return_value=data_infos):
+        return CustomDataset(
+            ann_file='fake.pkl', pipeline=pipeline, test_mode=True)
+
+
+def test_get_padded_shapes():
+    for pad_cfg in [
+            dict(type='Pad', size_divisor=32),
+            dict(type='Pad', pad_to_square=True),
+            dict(type='Pad', size=(704, 704))
+    ]:
+        dataset = _build_dataset(pad_cfg)
+        shapes = get_padded_shapes(dataset)
+        for (h, w), shape in zip(IMG_SIZES, shapes):
+            results = dataset.pipeline(
+                dict(img=np.zeros((h, w, 3), dtype=np.uint8)))
+            assert results['img_metas'][0].data['pad_shape'][:2] == shape
+
+
+def test_shape_bucket_batch_sampler():
+    dataset = _build_dataset(dict(type='Pad', size_divisor=32))
+    shapes = get_padded_shapes(dataset)
+
+    sampler = ShapeBucketBatchSampler(
+        dataset, batch_size=2, world_size=1, rank=0)
+    assert sampler.num_buckets == 3
+    batches = list(sampler)
+    assert len(batches) == len(sampler) == 5
+    # every batch has a single padded shape
+    for batch in batches:
+        assert len(set(shapes[i] for i in batch)) == 1
+    assert sorted(sampler.indices) == list(range(len(dataset)))
+
+    # batches are dealt to the ranks and restored to dataset order
+    samplers = [
+        ShapeBucketBatchSampler(dataset, batch_size=2, world_size=2, rank=i)
+        for i in range(2)
+    ]
+    indices = [idx for s in samplers for idx in s.indices]
+    assert sorted(indices) == list(range(len(dataset)))
+    results = [f'result_{idx}' for idx in indices]
+    assert restore_dataset_order(results, indices, len(dataset)) == [
+        f'result_{idx}' for idx in range(len(dataset))
+    ]
+
+    # a subset of the images is bucketed the same way
+    subset = [7, 0, 3, 5, 6]
+    sampler = ShapeBucketBatchSampler(
+        dataset, batch_size=2, world_size=1, rank=0, indices=subset)
+    for batch in sampler:
+        assert len(set(shapes[i] for i in batch)) == 1
+    assert sorted(sampler.indices) == sorted(subset)
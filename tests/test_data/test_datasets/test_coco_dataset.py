@@ -1,11 +1,15 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import os.path as osp
+import pickle
 import tempfile
 
 import mmcv
+import numpy as np
 import pytest
 
+from mmdet.core import DetectionResults
 from mmdet.datasets import CocoDataset
+from mmdet.datasets.api_wrappers import COCOeval, FastCOCOeval
 
 
 def _create_ids_error_coco_json(json_name):
@@ -56,3 +60,135 @@ def test_coco_annotation_ids_unique():
     # test annotation ids not unique error
     with pytest.raises(AssertionError):
         CocoDataset(ann_file=fake_json_file, classes=('car', ), pipeline=[])
+
+
+def _create_random_coco_json(json_name, rng):
+    images = [
+        dict(id=int(i), width=640, height=640, file_name=f'{i}.jpg')
+        for i in rng.permutation(100)[:20]
+    ]
+    categories = [dict(id=i, name=f'cat{i}') for i in (3, 1, 7)]
+    annotations = []
+    for img in images:
+        for _ in range(rng.randint(0, 8)):
+            size = rng.choice([10, 50, 150])
+            x, y = rng.uniform(0, 400, 2)
+            w, h = rng.uniform(0.5, 1.5, 2) * size
+            annotations.append(
+                dict(
+                    id=len(annotations) + 1,
+                    image_id=img['id'],
+                    category_id=categories[rng.randint(3)]['id'],
+                    bbox=[float(x), float(y),
+                          float(w), float(h)],
+                    area=float(w * h * rng.uniform(0.5, 1)),
+                    iscrowd=int(rng.rand() < 0.1)))
+    mmcv.dump(
+        dict(images=images, annotations=annotations, categories=categories),
+        json_name)
+
+
+def _create_random_results(dataset, rng):
+    results = []
+    for idx in range(len(dataset)):
+        anns = dataset.get_ann_info(idx)
+        result = []
+        for label in range(len(dataset.CLASSES)):
+            gts = anns['bboxes'][anns['labels'] == label]
+            # jittered gts and random boxes, with tied scores
+            bboxes = np.concatenate([
+                gts + rng.randn(*gts.shape) * 5,
+                rng.uniform(0, 300, (rng.randint(0, 10), 2)).repeat(2, 1) +
+                np.array([0, 0, 50, 50])
+            ]).reshape(-1, 4)
+            scores = rng.choice([0.25, 0.5, 0.75], len(bboxes))
+            result.append(
+                np.hstack([bboxes, scores[:, None]]).astype(np.float32))
+        results.append(result)
+    return results
+
+
+def test_coco_dataset_in_memory_evaluate():
+    rng = np.random.RandomState(0)
+    tmp_dir = tempfile.TemporaryDirectory()
+    fake_json_file = osp.join(tmp_dir.name, 'fake_data.json')
+    _create_random_coco_json(fake_json_file, rng)
+    dataset = CocoDataset(
+        ann_file=fake_json_file,
+        classes=('cat3', 'cat1', 'cat7'),
+        pipeline=[],
+        test_mode=True)
+    results = _create_random_results(dataset, rng)
+
+    # the vectorised evaluation is identical to COCOeval
+    cocoDt = dataset.coco.loadRes(dataset._det2json(results))
+    det_arrays = dataset._det2arrays(results)
+    for max_dets in ([1, 10, 100], [2, 3, 5]):
+        coco_evals = [
+            COCOeval(dataset.coco, cocoDt, 'bbox'),
+            FastCOCOeval(dataset.coco, *det_arrays)
+        ]
+        for coco_eval in coco_evals:
+            coco_eval.params.imgIds = dataset.img_ids
+            coco_eval.params.maxDets = max_dets
+            coco_eval.evaluate()
+            coco_eval.accumulate()
+            coco_eval.summarize()
+        for key in ('precision', 'recall', 'scores'):
+            assert np.array_equal(coco_evals[0].eval[key],
+                                  coco_evals[1].eval[key])
+        assert np.array_equal(coco_evals[0].stats, coco_evals[1].stats)
+
+    eval_results = dataset.evaluate(results, classwise=True, in_memory=False)
+    assert dataset.evaluate(
+        results, classwise=True, in_memory=True) == eval_results
+    # columnar results give the same arrays and metrics
+    det_results = DetectionResults.from_list(results)
+    for array, expected in zip(
+            dataset._det2arrays(det_results), det_arrays):
+        assert np.array_equal(array, expected)
+    assert dataset.evaluate(
+        det_results, classwise=True, in_memory=True) == eval_results
+    # empty results are reported without raising
+    empty_results = [[np.zeros((0, 5), dtype=np.float32)] * 3] * len(dataset)
+    assert dataset.evaluate(empty_results) == {}
+
+
+def test_coco_dataset_incremental_evaluate():
+    rng = np.random.RandomState(0)
+    tmp_dir = tempfile.TemporaryDirectory()
+    fake_json_file = osp.join(tmp_dir.name, 'fake_data.json')
+    _create_random_coco_json(fake_json_file, rng)
+    dataset = CocoDataset(
+        ann_file=fake_json_file,
+        classes=('cat3', 'cat1', 'cat7'),
+        pipeline=[],
+        test_mode=True)
+    results = _create_random_results(dataset, rng)
+    eval_results = dataset.evaluate(results, classwise=True)
+
+    # two ranks see shuffled batches, one image twice
+    indices = rng.permutation(len(dataset)).tolist()
+    indices.append(indices[0])
+    evaluators = [dataset.build_evaluator() for _ in range(2)]
+    for i in range(0, len(indices), 2):
+        batch = indices[i:i + 2]
+        evaluators[i // 2 % 2].update([results[idx] for idx in batch], batch)
+    evaluator = evaluators[0]
+    evaluator.merge(pickle.loads(pickle.dumps(evaluators[1])))
+    assert len(evaluator) == len(dataset)
+    assert dataset.evaluate(evaluator, classwise=True) == eval_results
+
+    # the metrics of the images seen so far
+    evaluator = dataset.build_evaluator(proposal_nums=(1, 2, 3))
+    evaluator.update(results[:2], [0, 1])
+    coco_eval = FastCOCOeval(dataset.coco, *dataset._det2arrays(results))
+    coco_eval.params.imgIds = dataset.img_ids[:2]
+    coco_eval.params.maxDets = [1, 2, 3]
+    coco_eval.evaluate()
+    coco_eval.accumulate()
+    partial_eval = evaluator.compute()
+    for key in ('precision', 'recall', 'scores'):
+        assert np.array_equal(partial_eval.eval[key], coco_eval.eval[key])
+    with pytest.raises(AssertionError):
+        dataset.evaluate(evaluator, metric='segm')
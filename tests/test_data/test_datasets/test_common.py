@@ -188,6 +188,18 @@ def test_dataset_evaluation():
     eval_results = custom_dataset.evaluate(fake_results)
     assert eval_results['mAP'] == 1
 
+    # test evaluation with an evaluator folding in the results
+    evaluator = custom_dataset.build_evaluator(iou_thr=[0.5, 0.75])
+    evaluator.update(fake_results, [0])
+    eval_results = custom_dataset.evaluate(evaluator, iou_thr=[0.5, 0.75])
+    assert eval_results['mAP'] == 1
+    # the IoU thresholds and scale ranges are the ones of the evaluator
+    with pytest.raises(AssertionError):
+        custom_dataset.evaluate(evaluator)
+    with pytest.raises(AssertionError):
+        custom_dataset.evaluate(
+            evaluator, iou_thr=[0.5, 0.75], scale_ranges=[(0, 32)])
+
     # test concat dataset evaluation
     fake_concat_results = _create_dummy_results() + _create_dummy_results()
 
@@ -1,14 +1,19 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import bisect
+import copy
 import math
+import os.path as osp
+import tempfile
 from collections import defaultdict
 from unittest.mock import MagicMock
 
+import mmcv
 import numpy as np
 import pytest
+import torch
 
 from mmdet.datasets import (ClassBalancedDataset, ConcatDataset, CustomDataset,
-                            MultiImageMixDataset, RepeatDataset)
+                            MultiImageMixDataset, RepeatDataset, ReplayDataset)
 
 
 def test_dataset_wrapper():
@@ -207,3 +212,136 @@ def test_dataset_wrapper():
     multi_image_mix_dataset = MultiImageMixDataset(dataset_a, pipeline)
     assert multi_image_mix_dataset.PALETTE is None
     CustomDataset.PALETTE = palette_backup
+
+
+class ToyMixDataset:
+    CLASSES = ('a', 'b')
+
+    def __init__(self, num_samples=4):
+        rng = np.random.RandomState(0)
+        self.samples = [
+            dict(
+                img=rng.randint(0, 255, (24, 32, 3)).astype(np.uint8),
+                gt_bboxes=np.array([[2, 2, 12, 14], [8, 4, 30, 20]],
+                                   dtype=np.float32),
+                gt_labels=np.array([0, 1]),
+                img_shape=(24, 32, 3),
+                bbox_fields=['gt_bboxes']) for _ in range(num_samples)
+        ]
+        self.flag = np.zeros(num_samples, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, idx):
+        return self.samples[idx]
+
+    def get_ann_info(self, idx):
+        return dict(bboxes=self.samples[idx]['gt_bboxes'])
+
+
+def test_replay_dataset():
+    img_scale = (32, 32)
+    pipeline = [
+        dict(type='Mosaic', img_scale=img_scale, pad_val=114.0),
+        dict(
+            type='RandomAffine',
+            scaling_ratio_range=(0.5, 1.5),
+            border=(-img_scale[0] // 2, -img_scale[1] // 2)),
+        dict(
+            type='MixUp',
+            img_scale=img_scale,
+            ratio_range=(0.8, 1.6),
+            pad_val=114.0),
+        dict(type='YOLOXHSVRandomAug'),
+        dict(type='RandomFlip', flip_ratio=0.5),
+    ]
+    mix_dataset = MultiImageMixDataset(ToyMixDataset(), pipeline)
+
+    def assert_same(results, other):
+        for key in ('img', 'gt_bboxes', 'gt_labels'):
+            assert np.array_equal(results[key], other[key])
+
+    dataset = ReplayDataset(mix_dataset, seed=1)
+    assert len(dataset) == len(mix_dataset)
+    assert dataset.CLASSES == ToyMixDataset.CLASSES
+    assert np.array_equal(dataset.flag, mix_dataset.flag)
+    first_pass = [dataset[idx] for idx in range(len(dataset))]
+
+    # samples do not depend on the global state nor on the read order
+    np.random.seed(123)
+    state = np.random.get_state()
+    for idx in reversed(range(len(dataset))):
+        assert_same(dataset[idx], first_pass[idx])
+    # and the global state is left untouched
+    assert np.array_equal(np.random.get_state()[1], state[1])
+    assert not np.array_equal(first_pass[0]['img'], first_pass[1]['img'])
+
+    # another seed replays other augmentations
+    other = ReplayDataset(mix_dataset, seed=2)
+    assert not all(
+        np.array_equal(other[idx]['img'], first_pass[idx]['img'])
+        for idx in range(len(dataset)))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dataset = ReplayDataset(mix_dataset, seed=1, cache_dir=tmpdir)
+        for idx in range(len(dataset)):
+            assert_same(dataset[idx], first_pass[idx])
+        # cached samples are read back without running the pipeline
+        dataset.dataset = None
+        for idx in range(len(dataset)):
+            assert_same(dataset[idx], first_pass[idx])
+
+        with pytest.raises(ValueError):
+            ReplayDataset(mix_dataset, seed=2, cache_dir=tmpdir)
+        # nor with another pipeline
+        other_pipeline = copy.deepcopy(pipeline)
+        other_pipeline[0]['img_scale'] = (24, 24)
+        with pytest.raises(ValueError):
+            ReplayDataset(
+                MultiImageMixDataset(ToyMixDataset(), other_pipeline),
+                seed=1,
+                cache_dir=tmpdir)
+
+        # the samples produced after the mode switch are cached apart
+        dataset = ReplayDataset(mix_dataset, seed=1, cache_dir=tmpdir)
+        skip_type_keys = ['Mosaic', 'RandomAffine', 'MixUp']
+        dataset.update_skip_type_keys(skip_type_keys)
+        # the wrapped dataset is a copy, left untouched
+        assert mix_dataset._skip_type_keys is None
+        expected = MultiImageMixDataset(
+            ToyMixDataset(), pipeline, skip_type_keys=skip_type_keys)
+        for idx in range(len(dataset)):
+            results = dataset[idx]
+            assert results['img'].shape == (24, 32, 3)
+            assert_same(results, ReplayDataset(expected, seed=1)[idx])
+        assert osp.isfile(
+            osp.join(tmpdir, 'skip_MixUp_Mosaic_RandomAffine',
+                     '00000000.pkl'))
+
+    # the formatting transforms run after the cache, on the uint8 images
+    format_pipeline = pipeline + [
+        dict(type='Pad', size=img_scale, pad_val=dict(img=114.0)),
+        dict(type='DefaultFormatBundle'),
+        dict(
+            type='Collect',
+            keys=['img', 'gt_bboxes', 'gt_labels'],
+            meta_keys=('img_shape', 'pad_shape'))
+    ]
+    mix_dataset = MultiImageMixDataset(ToyMixDataset(), format_pipeline)
+    expected = [
+        ReplayDataset(mix_dataset, seed=1)[idx] for idx in range(len(dataset))
+    ]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dataset = ReplayDataset(mix_dataset, seed=1, cache_dir=tmpdir)
+        assert len(dataset.tail.transforms) == 3
+        # the wrapped dataset keeps its pipeline
+        assert len(mix_dataset.pipeline) == len(format_pipeline)
+        for _ in range(2):
+            for idx in range(len(dataset)):
+                results = dataset[idx]
+                for key in ('img', 'gt_bboxes', 'gt_labels'):
+                    assert torch.equal(results[key].data,
+                                       expected[idx][key].data)
+        cached = mmcv.load(osp.join(tmpdir, '00000000.pkl'))
+        assert cached['img'].dtype == np.uint8
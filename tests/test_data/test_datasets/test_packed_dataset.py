@@ -0,0 +1,119 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import itertools
+import os.path as osp
+import pickle
+import tempfile
+
+import mmcv
+import numpy as np
+import pytest
+
+from mmdet.datasets import PackedDataset, build_dataset, pack_dataset
+from mmdet.datasets.samplers import (DistributedGroupSampler,
+                                     InfiniteGroupBatchSampler)
+
+DATA_ROOT = osp.join(osp.dirname(__file__), '../../data/VOCdevkit/')
+
+
+def _build_voc_dataset():
+    return build_dataset(
+        dict(
+            type='VOCDataset',
+            ann_file=[
+                DATA_ROOT + 'VOC2007/ImageSets/Main/trainval.txt',
+                DATA_ROOT + 'VOC2012/ImageSets/Main/trainval.txt'
+            ],
+            img_prefix=[DATA_ROOT + 'VOC2007/', DATA_ROOT + 'VOC2012/'],
+            pipeline=[],
+            filter_empty_gt=False))
+
+
+@pytest.mark.parametrize('use_mmap', [True, False])
+def test_packed_dataset(use_mmap):
+    voc_dataset = _build_voc_dataset()
+    pipeline = [
+        dict(type='LoadImageFromPack', use_mmap=use_mmap),
+        dict(type='LoadAnnotations', with_bbox=True)
+    ]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # a tiny shard size puts every image in its own shard
+        index_file = pack_dataset(voc_dataset, osp.join(tmpdir, 'voc'), 1)
+        assert index_file == osp.join(tmpdir, 'voc.pkl')
+        assert osp.isfile(osp.join(tmpdir, 'voc-00001.bin'))
+
+        dataset = PackedDataset(
+            ann_file=index_file, pipeline=pipeline, filter_empty_gt=False)
+        assert len(dataset) == len(voc_dataset)
+        assert dataset.CLASSES == list(voc_dataset.CLASSES)
+        assert dataset.shard_ids.tolist() == [0, 1]
+
+        for idx, ori_dataset in enumerate(voc_dataset.datasets):
+            # test_dataset_wrapper.py mocks CustomDataset.__getitem__
+            results = dataset.prepare_train_img(idx)
+            img = mmcv.imread(
+                osp.join(ori_dataset.img_prefix,
+                         ori_dataset.data_infos[0]['filename']))
+            assert np.array_equal(results['img'], img)
+            assert results['img_shape'] == img.shape
+            ann_info = ori_dataset.get_ann_info(0)
+            assert np.array_equal(results['gt_bboxes'], ann_info['bboxes'])
+            assert np.array_equal(results['gt_labels'], ann_info['labels'])
+            assert dataset.get_cat_ids(idx) == ann_info['labels'].tolist()
+
+        # test the loader can be sent to dataloader workers after reading
+        loader = dataset.pipeline.transforms[0]
+        worker_loader = pickle.loads(pickle.dumps(loader))
+        assert worker_loader._shards == {}
+        assert 'use_mmap' in repr(worker_loader)
+
+        # test the shards are closed and reopened by the next read
+        shards = list(loader._shards.values())
+        assert len(shards) == 2
+        loader.close()
+        assert loader._shards == {} and all(shard.closed for shard in shards)
+        dataset.prepare_train_img(0)
+        assert len(loader._shards) == 1
+        loader.close()
+
+        # test missing shards are reported
+        mmcv.dump(
+            dict(classes=None, shards=['missing.bin'], data_infos=[]),
+            osp.join(tmpdir, 'missing.pkl'))
+        with pytest.raises(FileNotFoundError):
+            PackedDataset(
+                ann_file=osp.join(tmpdir, 'missing.pkl'), pipeline=pipeline)
+
+
+class ToyShardedDataset:
+
+    def __init__(self):
+        self.flag = np.array([0, 1] * 8, dtype=np.uint8)
+        self.shard_ids = np.repeat(np.arange(4), 4)
+
+    def __len__(self):
+        return len(self.flag)
+
+
+def test_shard_aware_group_sampler():
+    dataset = ToyShardedDataset()
+    sampler = DistributedGroupSampler(
+        dataset, samples_per_gpu=2, num_replicas=1, rank=0, seed=0)
+    indices = list(sampler)
+    assert sorted(indices) == list(range(len(dataset)))
+    # all batches are in one group
+    for i in range(0, len(indices), 2):
+        assert len(set(dataset.flag[indices[i:i + 2]])) == 1
+    # the indices of a group are read shard by shard
+    for flag in (0, 1):
+        shards = [
+            dataset.shard_ids[idx] for idx in indices
+            if dataset.flag[idx] == flag
+        ]
+        assert len([k for k, _ in itertools.groupby(shards)]) == 4
+
+    sampler = InfiniteGroupBatchSampler(
+        dataset, batch_size=2, world_size=1, rank=0, seed=0)
+    indices = list(itertools.islice(sampler._infinite_indices(), 16))
+    assert sorted(indices) == list(range(len(dataset)))
+    shards = dataset.shard_ids[indices]
+    assert len([k for k, _ in itertools.groupby(shards)]) == 4
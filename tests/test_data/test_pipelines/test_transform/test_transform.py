@@ -2,6 +2,7 @@
 import copy
 import os.path as osp
 
+import cv2
 import mmcv
 import numpy as np
 import pytest
@@ -1020,3 +1021,48 @@ def test_photo_metric_distortion():
     results['img'] = img.astype(np.float32)
     results = distortion_module(results)
     assert results['img'].dtype == np.float32
+
+
+def _yolox_hsv_reference(img, hsv_gains):
+    """Per-channel int16 arithmetic that ``YOLOXHSVRandomAug`` must match."""
+    img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV).astype(np.int16)
+    img_hsv[..., 0] = (img_hsv[..., 0] + hsv_gains[0]) % 180
+    img_hsv[..., 1] = np.clip(img_hsv[..., 1] + hsv_gains[1], 0, 255)
+    img_hsv[..., 2] = np.clip(img_hsv[..., 2] + hsv_gains[2], 0, 255)
+    cv2.cvtColor(img_hsv.astype(img.dtype), cv2.COLOR_HSV2BGR, dst=img)
+    return img
+
+
+def test_yolox_hsv_random_aug():
+    img = mmcv.imread(
+        osp.join(osp.dirname(__file__), '../../../data/color.jpg'), 'color')
+    transform = dict(type='YOLOXHSVRandomAug')
+    hsv_module = build_from_cfg(transform, PIPELINES)
+
+    # test the lookup table path gives the same result as the reference
+    # arithmetic under the same RNG state
+    for seed in range(10):
+        np.random.seed(seed)
+        hsv_gains = np.random.uniform(-1, 1, 3) * [5, 30, 30]
+        hsv_gains *= np.random.randint(0, 2, 3)
+        expected = _yolox_hsv_reference(img.copy(),
+                                        hsv_gains.astype(np.int16))
+
+        np.random.seed(seed)
+        results = hsv_module(dict(img=img.copy()))
+        assert results['img'].dtype == np.uint8
+        assert results['img'].shape == img.shape
+        assert np.array_equal(results['img'], expected)
+
+    # test every hue wraps around and every saturation/value clips
+    lut = hsv_module._build_lut(np.array([-5, 30, -30], dtype=np.int16))
+    assert lut.shape == (256, 1, 3) and lut.dtype == np.uint8
+    assert lut[0, 0, 0] == 175 and lut[5, 0, 0] == 0
+    assert lut[255, 0, 1] == 255 and lut[0, 0, 2] == 0
+
+    # test float32 input falls back to the arithmetic path
+    results = hsv_module(dict(img=img.astype(np.float32)))
+    assert results['img'].dtype == np.float32
+
+    assert repr(hsv_module) == ('YOLOXHSVRandomAug(hue_delta=5, '
+                                'saturation_delta=30, value_delta=30)')
@@ -0,0 +1,116 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import os.path as osp
+import tempfile
+
+import numpy as np
+
+from mmdet.core import DetectionResults
+from mmdet.core.evaluation import MatchIndex, eval_map
+from mmdet.core.evaluation.bbox_overlaps import bbox_overlaps
+
+NUM_CLASSES = 3
+
+
+def _random_data(num_imgs, seed=0):
+    rng = np.random.RandomState(seed)
+
+    def random_bboxes(num):
+        xy = rng.rand(num, 2) * 40
+        wh = rng.rand(num, 2) * 40 + 1
+        return np.hstack([xy, xy + wh]).astype(np.float32)
+
+    results, annotations = [], []
+    for i in range(num_imgs):
+        num_gts = rng.randint(0, 6)
+        num_ignore = rng.randint(0, 2)
+        ann = dict(
+            bboxes=random_bboxes(num_gts),
+            labels=rng.randint(0, NUM_CLASSES, num_gts).astype(np.int64),
+            bboxes_ignore=random_bboxes(num_ignore),
+            labels_ignore=rng.randint(0, NUM_CLASSES,
+                                      num_ignore).astype(np.int64))
+        result = []
+        for _ in range(NUM_CLASSES):
+            # dets around the gts of any class, and tied scores
+            num_dets = rng.randint(0, 8)
+            bboxes = random_bboxes(num_dets)
+            if num_gts > 0:
+                near = rng.rand(num_dets) < 0.7
+                bboxes[near] = ann['bboxes'][rng.randint(
+                    0, num_gts, near.sum())] + rng.rand(near.sum(), 4) * 4
+            scores = np.round(rng.rand(num_dets, 1), 1)
+            result.append(np.hstack([bboxes, scores]).astype(np.float32))
+        if i == 1:
+            result = [np.zeros((0, 5), dtype=np.float32)] * NUM_CLASSES
+        results.append(result)
+        annotations.append(ann)
+    return results, annotations
+
+
+def _confusion_matrix(results, annotations, score_thr, tp_iou_thr):
+    """The loops of ``tools/analysis_tools/confusion_matrix.py``."""
+    confusion_matrix = np.zeros((NUM_CLASSES + 1, NUM_CLASSES + 1))
+    for result, ann in zip(results, annotations):
+        gt_labels = ann['labels']
+        true_positives = np.zeros_like(gt_labels)
+        for det_label, det_bboxes in enumerate(result):
+            ious = bbox_overlaps(det_bboxes[:, :4], ann['bboxes'])
+            for i, det_bbox in enumerate(det_bboxes):
+                if det_bbox[4] < score_thr:
+                    continue
+                det_match = 0
+                for j, gt_label in enumerate(gt_labels):
+                    if ious[i, j] >= tp_iou_thr:
+                        det_match += 1
+                        if gt_label == det_label:
+                            true_positives[j] += 1
+                        confusion_matrix[gt_label, det_label] += 1
+                if det_match == 0:
+                    confusion_matrix[-1, det_label] += 1
+        for num_tp, gt_label in zip(true_positives, gt_labels):
+            if num_tp == 0:
+                confusion_matrix[gt_label, -1] += 1
+    return confusion_matrix
+
+
+def test_match_index():
+    results, annotations = _random_data(20)
+    index = MatchIndex.build(results, annotations, max_pairs=16)
+    assert index.num_imgs == 20 and index.num_classes == NUM_CLASSES
+    assert np.all(index.pair_ious > 0)
+
+    for score_thr, tp_iou_thr in [(0, 0.5), (0.3, 0.5), (0.5, 0.1)]:
+        assert np.array_equal(
+            index.confusion_matrix(score_thr, tp_iou_thr),
+            _confusion_matrix(results, annotations, score_thr, tp_iou_thr))
+
+    iou_thrs = np.linspace(0.5, 0.95, 10)
+    img_mean_aps = index.img_mean_aps(iou_thrs)
+    for i, (result, ann) in enumerate(zip(results, annotations)):
+        expected = np.mean([
+            eval_map([result], [ann], iou_thr=thr, logger='silent')[0]
+            for thr in iou_thrs
+        ])
+        assert abs(img_mean_aps[i] - expected) < 1e-6
+    assert img_mean_aps[1] == 0
+
+
+def test_match_index_cache():
+    results, annotations = _random_data(6)
+    det_results = DetectionResults.from_list(results)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_file = osp.join(tmp_dir, 'results.match.npz')
+        index = MatchIndex.load_or_build(cache_file, det_results, annotations)
+        assert osp.isfile(cache_file)
+        loaded = MatchIndex.load_or_build(cache_file, det_results, annotations)
+        assert loaded.checksum == index.checksum
+        for key, value in index.__dict__.items():
+            assert np.array_equal(getattr(loaded, key), value)
+
+        # the cache is rebuilt for other results
+        num_removed = len(results[0][0])
+        results[0][0] = results[0][0][:0]
+        other = MatchIndex.load_or_build(cache_file, results, annotations)
+        assert other.checksum != index.checksum
+        assert len(other.det_scores) == len(index.det_scores) - num_removed
+        assert MatchIndex.load(cache_file).checksum == other.checksum
@@ -1,6 +1,10 @@
+import pickle
+
 import numpy as np
+import pytest
 
-from mmdet.core.evaluation.mean_ap import (eval_map, tpfp_default,
+from mmdet.core.evaluation.mean_ap import (MeanAPEvaluator, eval_map,
+                                           fast_eval_map, tpfp_default,
                                            tpfp_imagenet, tpfp_openimages)
 
 det_bboxes = np.array([
@@ -88,6 +92,119 @@ def test_eval_map():
     assert 0.291 < mean_ap < 0.293
 
 
+def _random_results(rng, num_imgs=40, num_classes=3, with_ignore=True):
+    det_results, annotations = [], []
+    for _ in range(num_imgs):
+        num_gts = rng.randint(0, 6)
+        xy = rng.rand(num_gts, 2) * 100
+        gts = np.hstack([xy, xy + rng.rand(num_gts, 2) * 60 + 1])
+        labels = rng.randint(0, num_classes, num_gts)
+        ann = dict(bboxes=gts.astype(np.float32), labels=labels)
+        if with_ignore:
+            xy = rng.rand(2, 2) * 100
+            ann['bboxes_ignore'] = np.hstack(
+                [xy, xy + rng.rand(2, 2) * 60 + 1]).astype(np.float32)
+            ann['labels_ignore'] = rng.randint(0, num_classes, 2)
+        annotations.append(ann)
+        img_results = []
+        for i in range(num_classes):
+            num_dets = rng.randint(0, 20)
+            cls_gts = gts[labels == i]
+            if len(cls_gts) > 0:
+                bboxes = cls_gts[rng.randint(0, len(cls_gts), num_dets)] + \
+                    rng.randn(num_dets, 4) * 8
+            else:
+                xy = rng.rand(num_dets, 2) * 100
+                bboxes = np.hstack([xy, xy + rng.rand(num_dets, 2) * 60 + 1])
+            # coarse scores to have ties
+            scores = np.round(rng.rand(num_dets, 1) * 4) / 4
+            img_results.append(np.hstack([bboxes, scores]).astype(np.float32))
+        det_results.append(img_results)
+    return det_results, annotations
+
+
+@pytest.mark.parametrize('kwargs', [
+    dict(),
+    dict(dataset='voc07', use_legacy_coordinate=True),
+    dict(iou_thr=0.7, scale_ranges=[(0, 32), (32, 64), (64, 1e5)]),
+    dict(dataset='voc07', scale_ranges=[(0, 40), (40, 1e5)]),
+])
+def test_fast_eval_map(kwargs):
+    rng = np.random.RandomState(0)
+    for with_ignore in (True, False):
+        det_results, annotations = _random_results(
+            rng, with_ignore=with_ignore)
+        mean_ap, eval_results = eval_map(
+            det_results, annotations, logger='silent', nproc=1, **kwargs)
+        fast_mean_ap, fast_eval_results = fast_eval_map(
+            det_results, annotations, logger='silent', **kwargs)
+        assert np.array_equal(mean_ap, fast_mean_ap)
+        for cls_result, fast_cls_result in zip(eval_results,
+                                               fast_eval_results):
+            for key, value in cls_result.items():
+                assert np.array_equal(value, fast_cls_result[key])
+
+    # the fixed case of test_eval_map
+    labels = np.array([0, 1, 1])
+    labels_ignore = np.array([0, 1])
+    gt_info = dict(
+        bboxes=gt_bboxes,
+        bboxes_ignore=gt_ignore,
+        labels=labels,
+        labels_ignore=labels_ignore)
+    det_results = [[det_bboxes, det_bboxes], [det_bboxes, det_bboxes]]
+    mean_ap, _ = fast_eval_map(
+        det_results, [gt_info, gt_info], use_legacy_coordinate=True)
+    assert 0.291 < mean_ap < 0.293
+
+    with pytest.raises(AssertionError):
+        fast_eval_map(det_results, [gt_info, gt_info], dataset='det')
+
+
+@pytest.mark.parametrize('kwargs', [
+    dict(),
+    dict(dataset='voc07', use_legacy_coordinate=True),
+    dict(scale_ranges=[(0, 32), (32, 64), (64, 1e5)]),
+])
+def test_mean_ap_evaluator(kwargs):
+    rng = np.random.RandomState(0)
+    det_results, annotations = _random_results(rng)
+    iou_thrs = [0.5, 0.75]
+    # two ranks, each padded with the first images of the other one
+    evaluators = [
+        MeanAPEvaluator(annotations.__getitem__, iou_thrs, **kwargs)
+        for _ in range(2)
+    ]
+    img_ids = list(range(len(det_results))) + [0, 1]
+    for rank, evaluator in enumerate(evaluators):
+        rank_ids = img_ids[rank::2]
+        for i in range(0, len(rank_ids), 3):
+            batch_ids = rank_ids[i:i + 3]
+            evaluator.update([det_results[j] for j in batch_ids], batch_ids)
+    evaluator = evaluators[0]
+    evaluator.merge(pickle.loads(pickle.dumps(evaluators[1])))
+    assert len(evaluator) == len(det_results)
+
+    for i, iou_thr in enumerate(iou_thrs):
+        mean_ap, eval_results = eval_map(
+            det_results,
+            annotations,
+            iou_thr=iou_thr,
+            logger='silent',
+            nproc=1,
+            **kwargs)
+        incremental_mean_ap, incremental_results = evaluator.compute(
+            i, logger='silent')
+        assert np.array_equal(mean_ap, incremental_mean_ap)
+        for cls_result, incremental_result in zip(eval_results,
+                                                  incremental_results):
+            for key, value in cls_result.items():
+                assert np.array_equal(value, incremental_result[key])
+
+    evaluator.reset()
+    assert len(evaluator) == 0
+
+
 def test_tpfp_openimages():
 
     det_bboxes = np.array([[10, 10, 15, 15, 1.0], [15, 15, 30, 30, 0.98],
@@ -165,3 +282,38 @@ def test_tpfp_openimages():
         ioa_thr=0.5)
     fp = result[1]
     assert (fp == np.array([[1, 1, 1, 1, 1, 1]])).all()
+
+
+@pytest.mark.parametrize('kwargs', [
+    dict(),
+    dict(dataset='voc07', use_legacy_coordinate=True),
+    dict(scale_ranges=[(0, 32), (32, 64), (64, 1e5)]),
+])
+def test_mean_ap_evaluator_bootstrap(kwargs):
+    rng = np.random.RandomState(0)
+    det_results, annotations = _random_results(rng)
+    # break the ties between the dets of different images
+    for img_results in det_results:
+        for dets in img_results:
+            dets[:, 4] += rng.rand(len(dets)) * 1e-3
+    evaluator = MeanAPEvaluator(annotations.__getitem__, **kwargs)
+    evaluator.update(det_results, list(range(len(det_results))))
+
+    # every resample is the mAP of the images drawn, duplicates included
+    for img_ids in (None, [5, 1, 3, 8, 2]):
+        samples = evaluator.bootstrap(10, img_ids=img_ids, seed=3)
+        assert samples.shape[0] == 10
+        ids = np.unique(
+            np.arange(len(det_results)) if img_ids is None else img_ids)
+        draws = ids[np.random.RandomState(3).randint(
+            0, len(ids), size=(10, len(ids)))]
+        for sample, drawn in zip(samples, draws):
+            mean_ap, _ = eval_map([det_results[i] for i in drawn],
+                                  [annotations[i] for i in drawn],
+                                  logger='silent',
+                                  nproc=1,
+                                  **kwargs)
+            assert np.allclose(sample, mean_ap, atol=1e-6)
+
+    with pytest.raises(AssertionError):
+        evaluator.bootstrap(10, img_ids=[len(det_results)])
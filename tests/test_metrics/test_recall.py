@@ -1,5 +1,7 @@
 import numpy as np
+import pytest
 
+from mmdet.core.evaluation.bbox_overlaps import bbox_overlaps
 from mmdet.core.evaluation.recall import eval_recalls
 
 det_bboxes = np.array([
@@ -44,3 +46,56 @@ def test_eval_recalls():
         use_legacy_coordinate=True)
     assert recall.shape == (1, 2)
     assert recall[0][1] <= recall[0][0]
+
+
+def _reference_recalls(gts, proposals, proposal_nums, thrs):
+    """The greedy assignment of each proposal num done one by one."""
+    all_gt_ious = [[] for _ in proposal_nums]
+    for img_gts, img_proposals in zip(gts, proposals):
+        order = np.argsort(img_proposals[:, 4])[::-1]
+        all_ious = bbox_overlaps(img_gts,
+                                 img_proposals[order[:proposal_nums[-1]], :4])
+        for k, proposal_num in enumerate(proposal_nums):
+            ious = all_ious[:, :proposal_num].copy()
+            gt_ious = np.zeros(ious.shape[0])
+            if ious.size > 0:
+                for j in range(ious.shape[0]):
+                    gt_max_overlaps = ious.argmax(axis=1)
+                    max_ious = ious[np.arange(ious.shape[0]), gt_max_overlaps]
+                    gt_idx = max_ious.argmax()
+                    gt_ious[j] = max_ious[gt_idx]
+                    ious[gt_idx, :] = -1
+                    ious[:, gt_max_overlaps[gt_idx]] = -1
+            all_gt_ious[k].append(gt_ious)
+    all_gt_ious = np.array([np.concatenate(ious) for ious in all_gt_ious])
+    return np.stack([(all_gt_ious >= thr).mean(axis=1) for thr in thrs],
+                    axis=1)
+
+
+@pytest.mark.parametrize('nproc', [1, 2])
+def test_eval_recalls_assignment(nproc):
+    rng = np.random.RandomState(0)
+    gts, proposals = [], []
+    for i in range(30):
+        img_gts = rng.rand(rng.randint(0, 8), 4) * 20
+        img_gts[:, 2:] += img_gts[:, :2] + 5
+        # proposals around the gts, with tied ious and scores
+        img_proposals = np.round(rng.rand(rng.randint(0, 40), 4) * 4)
+        if len(img_gts) > 0:
+            img_proposals += img_gts[rng.randint(0, len(img_gts),
+                                                 len(img_proposals))]
+        scores = np.round(rng.rand(len(img_proposals), 1), 1)
+        gts.append(img_gts.astype(np.float32))
+        proposals.append(np.hstack([img_proposals, scores]).astype(np.float32))
+    proposal_nums = np.array([1, 5, 10, 20])
+    iou_thrs = np.array([0., 0.3, 0.5, 0.7, 0.9])
+    recalls = eval_recalls(
+        gts,
+        proposals,
+        proposal_nums,
+        iou_thrs,
+        logger='silent',
+        nproc=nproc,
+        chunk_size=7)
+    assert np.array_equal(
+        recalls, _reference_recalls(gts, proposals, proposal_nums, iou_thrs))
@@ -673,6 +673,257 @@ def test_inference_detector():
     assert len(result) == 2 and len(result[0]) == num_class
 
 
+def test_inference_session():
+    from mmcv import ConfigDict
+
+    from mmdet.apis import InferenceSession, inference_detector
+    from mmdet.core import DetectionResults
+    from mmdet.models import build_detector
+
+    # small RetinaNet
+    num_class = 3
+    model_dict = dict(
+        type='RetinaNet',
+        backbone=dict(
+            type='ResNet',
+            depth=18,
+            num_stages=4,
+            out_indices=(3, ),
+            norm_cfg=dict(type='BN', requires_grad=False),
+            norm_eval=True,
+            style='pytorch'),
+        neck=None,
+        bbox_head=dict(
+            type='RetinaHead',
+            num_classes=num_class,
+            in_channels=512,
+            stacked_convs=1,
+            feat_channels=256,
+            anchor_generator=dict(
+                type='AnchorGenerator',
+                octave_base_scale=4,
+                scales_per_octave=3,
+                ratios=[0.5],
+                strides=[32]),
+            bbox_coder=dict(
+                type='DeltaXYWHBBoxCoder',
+                target_means=[.0, .0, .0, .0],
+                target_stds=[1.0, 1.0, 1.0, 1.0]),
+        ),
+        test_cfg=dict(
+            nms_pre=1000,
+            min_bbox_size=0,
+            score_thr=0.05,
+            nms=dict(type='nms', iou_threshold=0.5),
+            max_per_img=100))
+
+    rng = np.random.RandomState(0)
+    imgs = [
+        rng.randint(0, 256, (100, 120, 3), dtype=np.uint8),
+        rng.randint(0, 256, (90, 60, 3), dtype=np.uint8)
+    ]
+
+    model = build_detector(ConfigDict(model_dict))
+    model.CLASSES = ('a', 'b', 'c')
+    for config_file in [
+            'retinanet/retinanet_r50_fpn_1x_coco.py',
+            'yolox/yolox_tiny_8x8_300e_coco.py'
+    ]:
+        model.cfg = _get_config_module(config_file)
+        session = InferenceSession(model)
+        assert session.compiled is not None
+        slow_session = InferenceSession(model, fast=False)
+        assert slow_session.compiled is None
+
+        # the compiled pipeline gives the same inputs
+        (img, ), (img_metas, ) = session.preprocess(imgs)
+        (expected_img, ), (expected_metas, ) = slow_session.preprocess(imgs)
+        assert torch.equal(img, expected_img)
+        for img_meta, expected_img_meta in zip(img_metas, expected_metas):
+            assert img_meta.keys() == expected_img_meta.keys()
+            for key in ['ori_shape', 'img_shape', 'pad_shape']:
+                assert img_meta[key] == expected_img_meta[key]
+            assert np.array_equal(img_meta['scale_factor'],
+                                  expected_img_meta['scale_factor'])
+
+        det_results = session.predict(imgs)
+        assert isinstance(det_results, DetectionResults)
+        assert len(det_results) == 2
+        expected = inference_detector(model, imgs)
+        for result, expected_result in zip(det_results, expected):
+            for dets, expected_dets in zip(result, expected_result):
+                assert np.allclose(dets, expected_dets, atol=1e-4)
+        assert len(session.predict([])) == 0
+
+
+def test_subnet_session():
+    from mmdet.apis import InferenceSession, SubnetSession
+    from mmdet.models import build_detector
+
+    config = _get_config_module('yolox/yolox_s_8x8_300e_voc_searchable.py')
+    config.data.test.pipeline[1].img_scale = (128, 128)
+    model = build_detector(config.model)
+    model.cfg = config
+    model.CLASSES = tuple(map(str, range(20)))
+    archs = dict(
+        large=dict(
+            widen_factor_backbone=(0.5, ) * 5,
+            deepen_factor=(0.33, ) * 4,
+            widen_factor_neck=(0.5, ) * 8,
+            widen_factor_neck_out=0.5),
+        small=dict(
+            widen_factor_backbone=(0.25, ) * 5,
+            deepen_factor=(0.33, ) * 4,
+            widen_factor_neck=(0.25, ) * 8,
+            widen_factor_neck_out=0.5))
+    rng = np.random.RandomState(0)
+    imgs = [rng.randint(0, 256, (100, 120, 3), dtype=np.uint8)]
+
+    # the results of each tier are the ones of set_arch
+    expected = {}
+    for tier, arch in archs.items():
+        model.set_arch(arch)
+        expected[tier] = InferenceSession(model).predict(imgs)
+    params = [param.data_ptr() for param in model.parameters()]
+    session = SubnetSession(model, archs)
+    assert session.tiers == ['large', 'small']
+    for tier in ['small', 'large', 'small']:
+        det_results = session.predict(imgs, tier=tier)
+        assert session.tier == tier
+        assert np.array_equal(det_results.bboxes, expected[tier].bboxes)
+        assert np.array_equal(det_results.scores, expected[tier].scores)
+    # the tiers share the weights of the supernet
+    assert [param.data_ptr() for param in model.parameters()] == params
+    stats = session.stats()
+    assert stats['small']['num_batches'] == 2
+    assert stats['large']['num_imgs'] == 1
+
+    # the most accurate tier meeting the SLO
+    session.latency_ms = dict(large=20., small=5.)
+    assert session.route(1) == 'large'
+    assert session.route(1, slo_ms=30) == 'large'
+    assert session.route(2, slo_ms=30) == 'small'
+    assert session.route(8, slo_ms=30) == 'small'
+    assert session.route(8, tier='large', slo_ms=30) == 'large'
+    with pytest.raises(KeyError):
+        session.route(1, tier='medium')
+    latency_ms = session.profile(imgs[0], repeat=1)
+    assert set(latency_ms) == {'large', 'small'}
+
+
+def test_quantize_detector(tmp_path):
+    from mmdet.core.export import (Int8CostModel, export_quantized_torchscript,
+                                   quantize_detector)
+    from mmdet.models import build_detector
+
+    model = build_detector(
+        _get_detector_cfg('yolox/yolox_s_8x8_300e_voc_tfs.py'))
+    model.eval()
+    calib_imgs = [torch.rand(2, 3, 64, 64) for _ in range(2)]
+    qmodel = quantize_detector(model, calib_imgs)
+    # the float model is left as is
+    assert not any('quantized' in type(m).__module__ for m in model.modules())
+    assert any('quantized' in type(m).__module__ for m in qmodel.modules())
+
+    img = torch.rand(1, 3, 64, 64)
+    with torch.no_grad():
+        outs = model.forward_dummy(img)
+        qouts = qmodel.forward_dummy(img)
+    for out, qout in zip(outs, qouts):
+        for level_out, level_qout in zip(out, qout):
+            assert level_qout.dtype == torch.float32
+            assert torch.allclose(level_out, level_qout, atol=0.05)
+    img_metas = [
+        dict(
+            img_shape=(64, 64, 3),
+            ori_shape=(64, 64, 3),
+            pad_shape=(64, 64, 3),
+            scale_factor=np.ones(4, dtype=np.float32),
+            flip=False)
+    ]
+    with torch.no_grad():
+        results = qmodel.simple_test(img, img_metas)
+    assert len(results[0]) == 20
+
+    ts_file = str(tmp_path / 'int8.pt')
+    export_quantized_torchscript(qmodel, (1, 3, 64, 64), ts_file)
+    with torch.no_grad():
+        ts_outs = torch.jit.load(ts_file)(img)
+    for qout, ts_out in zip(qouts, ts_outs):
+        for level_qout, level_ts_out in zip(qout, ts_out):
+            assert torch.allclose(level_qout, level_ts_out)
+
+    cache_file = str(tmp_path / 'int8_ms.pkl')
+    cost_model = Int8CostModel((3, 64, 64), repeat=1, cache_file=cache_file)
+    latency = cost_model(model)
+    assert latency > 0
+    cost_model.save()
+    # the latencies of the convs are measured once and cached
+    assert Int8CostModel((3, 64, 64), cache_file=cache_file).table == \
+        cost_model.table
+
+
+def test_compiled_yolox():
+    from mmdet.apis import CompiledYOLOX, InferenceSession, init_detector
+
+    config = _get_config_module('yolox/yolox_s_8x8_300e_voc_tfs.py')
+    config.data.test.pipeline[1].img_scale = (96, 96)
+    torch.manual_seed(0)
+    model = init_detector(config, device='cpu')
+    model.CLASSES = tuple(map(str, range(20)))
+    img = torch.rand(2, 3, 64, 96)
+    img_metas = [
+        dict(
+            img_shape=(64, 96, 3),
+            ori_shape=(32, 48, 3),
+            pad_shape=(64, 96, 3),
+            scale_factor=np.full(4, 2, dtype=np.float32),
+            flip=False) for _ in range(2)
+    ]
+    with torch.no_grad():
+        expected = model(
+            return_loss=False, rescale=True, img=[img], img_metas=[img_metas])
+
+    compiled = CompiledYOLOX(model)
+    results = compiled(img=[img], img_metas=[img_metas])
+    assert sum(len(dets) for dets in expected[0]) > 0
+    for img_expected, img_results in zip(expected, results):
+        for dets, expected_dets in zip(img_results, img_expected):
+            # the order of the dets of equal scores may differ
+            assert np.allclose(
+                dets[np.lexsort(dets.T[::-1])],
+                expected_dets[np.lexsort(expected_dets.T[::-1])],
+                rtol=1e-4,
+                atol=1e-3)
+
+    # the dets of a batch are padded to the largest number of dets
+    dets, labels = compiled.detect(img)
+    num_dets = [sum(len(dets) for dets in result) for result in results]
+    assert dets.shape == (2, max(num_dets), 5)
+    for img_dets, img_labels, num in zip(dets, labels, num_dets):
+        assert (img_labels[:num] >= 0).all() and (img_labels[num:] == -1).all()
+        assert (img_dets[num:] == 0).all()
+
+    torch.manual_seed(0)
+    fast_model = init_detector(config, device='cpu', fast=True)
+    assert isinstance(fast_model, CompiledYOLOX)
+    fast_model.detector.CLASSES = model.CLASSES
+    imgs = [np.random.RandomState(0).randint(0, 256, (40, 60, 3), np.uint8)]
+    with torch.no_grad():
+        det_results = InferenceSession(model).predict(imgs)
+    fast_results = InferenceSession(fast_model).predict(imgs)
+    assert len(fast_results.bboxes) == len(det_results.bboxes)
+    with pytest.raises(AssertionError):
+        fast_model.train()
+
+    # the other detectors run in eager mode
+    config = _get_config_module('faster_rcnn/faster_rcnn_r50_fpn_1x_coco.py')
+    config.model = _replace_r50_with_r18(config.model)
+    with pytest.warns(UserWarning, match='runs in eager mode'):
+        model = init_detector(config, device='cpu', fast=True)
+    assert not isinstance(model, CompiledYOLOX)
+
+
 @pytest.mark.skipif(
     not torch.cuda.is_available(), reason='requires CUDA support')
 def test_yolox_random_size():
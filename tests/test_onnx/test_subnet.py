@@ -0,0 +1,125 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import copy
+
+import mmcv
+import numpy as np
+import pytest
+import torch
+
+from mmdet import digit_version
+from mmdet.core.export import (export_subnet_to_onnx, fuse_slimmable_conv_bn,
+                               materialize_subnet, verify_subnet_onnx)
+from mmdet.models import build_detector
+from mmdet.models.utils import USBatchNorm2d, USConv2d
+
+if digit_version(torch.__version__) <= digit_version('1.5.0'):
+    pytest.skip(
+        'ort backend does not support version below 1.5.0',
+        allow_module_level=True)
+
+
+def _build_supernet():
+    config_path = './configs/yolox/yolox_s_8x8_300e_voc_searchable.py'
+    cfg = mmcv.Config.fromfile(config_path)
+    model = build_detector(cfg.model)
+    model.bbox_head.test_cfg.score_thr = 0.3
+    model.eval()
+    # normalize with the running statistics, like the dense subnet does
+    for module in model.modules():
+        if isinstance(module, USBatchNorm2d):
+            module.bn_training_mode = False
+            module.training = False
+            torch.nn.init.uniform_(module.running_mean, -0.1, 0.1)
+            torch.nn.init.uniform_(module.running_var, 0.5, 1.5)
+    return model
+
+
+def test_materialize_subnet():
+    model = _build_supernet()
+    arch = dict(
+        widen_factor_backbone=(0.25, 0.5, 0.25, 0.5, 0.25),
+        deepen_factor=(0.33, ) * 4,
+        widen_factor_neck=(0.25, ) * 8,
+        widen_factor_neck_out=0.5)
+    model.set_arch(arch)
+    subnet = materialize_subnet(model)
+    assert not any(
+        isinstance(module, (USConv2d, USBatchNorm2d, torch.nn.BatchNorm2d))
+        for module in subnet.modules())
+    assert sum(param.numel() for param in subnet.parameters()) < \
+        sum(param.numel() for param in model.parameters())
+
+    img = torch.rand(2, 3, 64, 96)
+    with torch.no_grad():
+        outs = model.bbox_head.onnx_export(
+            *model.bbox_head(model.extract_feat(img)), with_nms=False)
+        dense_outs = subnet.bbox_head.onnx_export(
+            *subnet.bbox_head(subnet.extract_feat(img)), with_nms=False)
+    for out, dense_out in zip(outs, dense_outs):
+        assert torch.allclose(out, dense_out, rtol=1e-3, atol=1e-4)
+
+    # the BNs normalize with the statistics of each batch
+    _set_bn_training_mode(model, True)
+    with pytest.raises(RuntimeError):
+        materialize_subnet(model)
+    with pytest.warns(UserWarning, match='differs from the supernet'):
+        materialize_subnet(model, strict=False)
+
+
+def _set_bn_training_mode(model, bn_training_mode):
+    for module in model.modules():
+        if isinstance(module, USBatchNorm2d):
+            module.bn_training_mode = bn_training_mode
+
+
+def test_fuse_slimmable_conv_bn():
+    model = _build_supernet()
+    # the BNs normalize with the statistics of each batch
+    _set_bn_training_mode(model, True)
+    with pytest.raises(RuntimeError):
+        fuse_slimmable_conv_bn(copy.deepcopy(model))
+    with pytest.warns(UserWarning, match='left unfused'):
+        unfused = fuse_slimmable_conv_bn(model, strict=False)
+    assert unfused is model and any(
+        isinstance(module, USBatchNorm2d) for module in model.modules())
+
+    _set_bn_training_mode(model, False)
+    widen_factor_range = [0.125, 0.25, 0.375, 0.5]
+    rng = np.random.RandomState(0)
+    img = torch.rand(2, 3, 64, 96)
+    for _ in range(3):
+        arch = dict(
+            widen_factor_backbone=tuple(rng.choice(widen_factor_range, 5)),
+            deepen_factor=(0.33, ) * 4,
+            widen_factor_neck=tuple(rng.choice(widen_factor_range, 8)),
+            widen_factor_neck_out=0.5)
+        model.set_arch(arch)
+        fused = fuse_slimmable_conv_bn(copy.deepcopy(model)).eval()
+        assert not any(
+            isinstance(module, (USBatchNorm2d, torch.nn.BatchNorm2d))
+            for module in fused.modules())
+        with torch.no_grad():
+            outs = model.bbox_head(model.extract_feat(img))
+            fused_outs = fused.bbox_head(fused.extract_feat(img))
+        for level_outs, fused_level_outs in zip(outs, fused_outs):
+            for out, fused_out in zip(level_outs, fused_level_outs):
+                assert torch.allclose(out, fused_out, rtol=1e-3, atol=1e-4)
+
+
+@pytest.mark.parametrize('with_nms', [True, False])
+def test_export_subnet_to_onnx(tmp_path, with_nms):
+    model = _build_supernet()
+    arch = dict(
+        widen_factor_backbone=(0.25, ) * 5,
+        deepen_factor=(0.33, ) * 4,
+        widen_factor_neck=(0.25, ) * 8,
+        widen_factor_neck_out=0.5)
+    subnet = materialize_subnet(model, arch)
+    onnx_file = str(tmp_path / 'subnet.onnx')
+    export_subnet_to_onnx(
+        subnet, (1, 3, 64, 64),
+        onnx_file,
+        with_nms=with_nms,
+        dynamic_batch=True)
+    # the batch size of the graph is dynamic
+    verify_subnet_onnx(onnx_file, subnet, torch.rand(2, 3, 64, 64))
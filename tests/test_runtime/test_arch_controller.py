@@ -0,0 +1,81 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import numpy as np
+import pytest
+
+from mmdet.apis import ArchController
+from mmdet.apis.controller import (bursty_arrivals, poisson_arrivals,
+                                   simulate_serving)
+
+
+def test_arch_controller():
+    controller = ArchController(['large', 'medium', 'small'],
+                                target_ms=100,
+                                window=4,
+                                up_dwell=3,
+                                down_dwell=2)
+    assert controller.tier == 'large'
+    # a slow batch right after the start does not switch yet
+    assert controller.update([150, 150], 0, batch_ms=40) == 'large'
+    assert controller.update([150, 150], 0, batch_ms=40) == 'medium'
+    assert controller.num_switches == 1
+    assert controller.latency_per_img['large'] == pytest.approx(20)
+    # a long queue steps down, whatever the latencies
+    controller.update([50], 0, batch_ms=10, switch_ms=1)
+    assert controller.update([50], 20, batch_ms=10) == 'small'
+    assert controller.switch_ms == 1
+    # between the thresholds, the tier is kept
+    for _ in range(5):
+        assert controller.update([80], 0, batch_ms=5) == 'small'
+    # the latencies are low but the queue would be too long on medium
+    for _ in range(4):
+        assert controller.update([10], 6, batch_ms=5) == 'small'
+    assert controller.update([10], 0, batch_ms=5) == 'medium'
+    # stepping up again waits for up_dwell batches
+    for _ in range(2):
+        assert controller.update([10], 0, batch_ms=5) == 'medium'
+    assert controller.update([10], 0, batch_ms=5) == 'large'
+    stats = controller.stats()
+    assert stats['tier'] == 'large' and stats['num_switches'] == 4
+    assert sum(stats['num_batches'].values()) == 17
+
+
+def test_arrivals():
+    arrivals = poisson_arrivals(50, 10, seed=1)
+    assert np.all(np.diff(arrivals) >= 0)
+    assert 400 < len(arrivals) < 600
+    arrivals = bursty_arrivals(10, 100, 5, 1, 20, seed=1)
+    assert np.all(np.diff(arrivals) >= 0)
+    in_bursts = np.sum(arrivals % 5 < 1)
+    assert 300 < in_bursts < 500
+    assert 100 < len(arrivals) - in_bursts < 220
+
+
+def test_simulate_serving():
+    latency_ms = dict(large=40., small=10.)
+
+    def service_ms(tier, batch_size):
+        return 5 + latency_ms[tier] * batch_size
+
+    # a batch of 3 when the queue fills, then one at its deadline
+    result = simulate_serving(
+        np.array([0., 0.001, 0.002, 0.5]),
+        service_ms,
+        tier='small',
+        max_batch_size=3)
+    assert np.allclose(result['latency_ms'], [37, 36, 35, 25])
+    assert result['num_switches'] == 0
+
+    arrivals = bursty_arrivals(15, 60, 10, 3, 120, seed=0)
+    large = simulate_serving(arrivals, service_ms, tier='large')
+    small = simulate_serving(arrivals, service_ms, tier='small')
+    controller = ArchController(['large', 'small'], target_ms=300)
+    adaptive = simulate_serving(
+        arrivals, service_ms, controller=controller, switch_ms=1)
+    # the large tier cannot sustain the bursts, the controller keeps the
+    # p95 close to the target with a part of the requests on it
+    p95 = np.percentile(adaptive['latency_ms'], 95)
+    assert np.percentile(large['latency_ms'], 95) > 10 * p95
+    assert np.percentile(small['latency_ms'], 95) < p95 < 1.1 * 300
+    assert 0.2 < np.mean(adaptive['tiers'] == 'large') < 0.8
+    assert adaptive['num_switches'] == controller.num_switches
+    assert controller.switch_ms == adaptive['num_switches']
@@ -0,0 +1,71 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import socket
+
+import numpy as np
+import pytest
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+from mmdet.apis import collect_results_flat
+
+NUM_IMGS = 7
+NUM_CLASSES = 3
+
+
+def _random_results(num_imgs):
+    rng = np.random.RandomState(0)
+    results = []
+    for _ in range(num_imgs):
+        results.append([
+            rng.rand(rng.randint(0, 4), 5).astype(np.float32)
+            for _ in range(NUM_CLASSES)
+        ])
+    return results
+
+
+def _collect_worker(rank, world_size, port, backend, queue):
+    dist.init_process_group(
+        'gloo',
+        init_method=f'tcp://127.0.0.1:{port}',
+        rank=rank,
+        world_size=world_size)
+    results = _random_results(NUM_IMGS)
+    # indices as dealt by DistributedSampler, padded to the same length
+    indices = list(range(NUM_IMGS))
+    indices += indices[:(-NUM_IMGS) % world_size]
+    indices = indices[rank::world_size]
+    part = [results[idx] for idx in indices]
+    collected = collect_results_flat(part, indices, NUM_IMGS, backend)
+    # the backend can be used again
+    collect_results_flat(part, indices, NUM_IMGS, backend)
+    if rank == 0:
+        queue.put(collected)
+    else:
+        assert collected is None
+    dist.destroy_process_group()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.parametrize('backend', ['gloo', 'shm'])
+@pytest.mark.parametrize('world_size', [1, 3])
+def test_collect_results_flat(backend, world_size):
+    ctx = mp.get_context('spawn')
+    queue = ctx.SimpleQueue()
+    mp.start_processes(
+        _collect_worker,
+        args=(world_size, _free_port(), backend, queue),
+        nprocs=world_size,
+        start_method='spawn')
+    collected = queue.get()
+    results = _random_results(NUM_IMGS)
+    assert len(collected) == len(results)
+    for result, expected in zip(collected, results):
+        assert len(result) == NUM_CLASSES
+        for bboxes, expected_bboxes in zip(result, expected):
+            assert bboxes.dtype == np.float32
+            assert np.array_equal(bboxes, expected_bboxes)
@@ -8,7 +8,8 @@ from unittest.mock import MagicMock, patch
 import pytest
 import torch
 import torch.nn as nn
-from mmcv.runner import EpochBasedRunner, build_optimizer
+from mmcv.runner import (EpochBasedRunner, IterBasedRunner, LoggerHook,
+                         build_optimizer)
 from mmcv.utils import get_logger
 from torch.utils.data import DataLoader, Dataset
 
@@ -42,6 +43,31 @@ class EvalDataset(ExampleDataset):
         return output
 
 
+class RecordEvaluator:
+
+    def __init__(self, iou_thr):
+        self.iou_thr = iou_thr
+        self.img_ids = []
+
+    def update(self, batch_results, img_ids):
+        self.img_ids.extend(img_ids)
+
+
+class EvaluatorDataset(ExampleDataset):
+
+    def __len__(self):
+        return 3
+
+    def build_evaluator(self, iou_thr=0.5):
+        return RecordEvaluator(iou_thr)
+
+    def evaluate(self, results, logger=None, metric='mAP', iou_thr=0.5):
+        # the results are folded into the evaluator of the dataset
+        assert isinstance(results, RecordEvaluator)
+        assert results.iou_thr == iou_thr
+        return OrderedDict(mAP=0.1, num_imgs=len(results.img_ids))
+
+
 class ExampleModel(nn.Module):
 
     def __init__(self):
@@ -63,6 +89,47 @@ class ExampleModel(nn.Module):
         return outputs
 
 
+class ArchDataset(ExampleDataset):
+
+    def __init__(self):
+        super().__init__()
+        self.archs = []
+
+    def evaluate(self, results, logger=None):
+        self.archs.append(int(results[0]))
+        return OrderedDict(mAP=0.1)
+
+
+class ArchModel(ExampleModel):
+    """A supernet whose arch changes at every training iteration."""
+
+    def __init__(self):
+        super().__init__()
+        self.arch = 0
+
+    def set_arch(self, arch):
+        self.arch = arch
+
+    def forward(self, imgs, rescale=False, return_loss=False):
+        return imgs * 0 + self.arch
+
+    def train_step(self, data_batch, optimizer, **kwargs):
+        self.set_arch(self.arch + 1)
+        outputs = super().train_step(data_batch, optimizer, **kwargs)
+        outputs['log_vars'] = dict(arch=float(self.arch))
+        return outputs
+
+
+class RecordLoggerHook(LoggerHook):
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.outputs = []
+
+    def log(self, runner):
+        self.outputs.append(dict(runner.log_buffer.output))
+
+
 @pytest.mark.skipif(
     not torch.cuda.is_available(), reason='requires CUDA support')
 @patch('mmdet.apis.single_gpu_test', MagicMock)
@@ -250,3 +317,100 @@ def test_eval_hook(EvalHookCls):
 
         assert runner.meta['hook_msgs']['best_ckpt'] == osp.realpath(real_path)
         assert runner.meta['hook_msgs']['best_score'] == 0.7
+
+
+@pytest.mark.parametrize('EvalHookCls', (EvalHook, DistEvalHook))
+def test_async_eval_hook(EvalHookCls):
+    optimizer_cfg = dict(
+        type='SGD', lr=0.01, momentum=0.9, weight_decay=0.0001)
+    loader = DataLoader(EvalDataset(), batch_size=1)
+    model = ExampleModel()
+    optimizer = build_optimizer(model, optimizer_cfg)
+    data_loader = DataLoader(EvalDataset(), batch_size=1)
+    eval_hook = EvalHookCls(
+        data_loader, interval=1, save_best='mAP', async_eval=True)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        logger = get_logger('test_eval')
+        runner = EpochBasedRunner(
+            model=model,
+            batch_processor=None,
+            optimizer=optimizer,
+            work_dir=tmpdir,
+            logger=logger)
+        runner.register_checkpoint_hook(dict(interval=1))
+        runner.register_hook(eval_hook)
+        runner.run([loader], [('train', 1)], 8)
+
+        # every epoch is evaluated and the best checkpoint is the snapshot
+        # of the epoch with the best score
+        assert data_loader.dataset.index == 8
+        real_path = osp.join(tmpdir, 'best_mAP_epoch_4.pth')
+        assert runner.meta['hook_msgs']['best_ckpt'] == osp.realpath(real_path)
+        assert runner.meta['hook_msgs']['best_score'] == 0.7
+        checkpoint = torch.load(real_path)
+        assert checkpoint['meta']['epoch'] == 4
+        assert torch.equal(checkpoint['state_dict']['conv.weight'],
+                           model.conv.weight)
+        assert runner.log_buffer.output['eval_epoch'] == 8
+        assert runner.log_buffer.output['mAP'] == 0.6
+
+
+@pytest.mark.parametrize('EvalHookCls', (EvalHook, DistEvalHook))
+def test_async_eval_hook_supernet(EvalHookCls):
+    model = ArchModel()
+    optimizer = build_optimizer(model, dict(type='SGD', lr=0.01))
+    loader = DataLoader(ExampleDataset(), batch_size=1)
+    data_loader = DataLoader(ArchDataset(), batch_size=1)
+    eval_hook = EvalHookCls(
+        data_loader, interval=1, by_epoch=False, async_eval=True)
+    logger_hook = RecordLoggerHook(interval=4, by_epoch=False)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        runner = IterBasedRunner(
+            model=model,
+            optimizer=optimizer,
+            work_dir=tmpdir,
+            logger=get_logger('test_eval'),
+            max_iters=8)
+        runner.register_hook(eval_hook)
+        runner.register_hook(logger_hook, priority='VERY_LOW')
+        runner.run([loader], [('train', 1)])
+
+    # each snapshot is evaluated at the arch it was taken at
+    assert data_loader.dataset.archs == list(range(1, 9))
+    # the training log averages all the iterations of each interval
+    train_logs = [
+        output['arch'] for output in logger_hook.outputs if 'arch' in output
+    ]
+    assert train_logs == [2.5, 6.5]
+    eval_iters = [
+        output['eval_iter'] for output in logger_hook.outputs
+        if 'eval_iter' in output
+    ]
+    assert eval_iters == list(range(1, 9))
+
+
+@pytest.mark.parametrize('async_eval', (False, True))
+def test_eval_hook_evaluator(async_eval):
+    model = ExampleModel()
+    optimizer = build_optimizer(model, dict(type='SGD', lr=0.01))
+    loader = DataLoader(ExampleDataset(), batch_size=1)
+    data_loader = DataLoader(EvaluatorDataset(), batch_size=2)
+    eval_hook = EvalHook(
+        data_loader,
+        interval=1,
+        async_eval=async_eval,
+        metric='mAP',
+        iou_thr=0.75)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        runner = EpochBasedRunner(
+            model=model,
+            optimizer=optimizer,
+            work_dir=tmpdir,
+            logger=get_logger('test_eval'))
+        runner.register_hook(eval_hook)
+        runner.run([loader], [('train', 1)], 1)
+
+    assert runner.log_buffer.output['num_imgs'] == 3
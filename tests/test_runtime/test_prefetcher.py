@@ -0,0 +1,84 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from functools import partial
+
+import pytest
+import torch
+from mmcv.parallel import DataContainer, collate
+from torch.utils.data import DataLoader, Dataset
+
+from mmcv_custom.runner import DataPrefetcher, PinnedBufferPool
+
+
+class ToyDataset(Dataset):
+
+    def __init__(self, num_samples=10, fail_at=None):
+        self.num_samples = num_samples
+        self.fail_at = fail_at
+
+    def __len__(self):
+        return self.num_samples
+
+    def __getitem__(self, idx):
+        if idx == self.fail_at:
+            raise ValueError('broken sample')
+        return dict(
+            img=DataContainer(torch.full((3, 8, 8), idx), stack=True),
+            gt_bboxes=DataContainer(torch.rand(idx + 1, 4)),
+            img_metas=DataContainer(dict(idx=idx), cpu_only=True))
+
+
+def _build_loader(dataset):
+    return DataLoader(
+        dataset,
+        batch_size=2,
+        num_workers=0,
+        collate_fn=partial(collate, samples_per_gpu=2))
+
+
+def test_data_prefetcher_cpu():
+    loader = _build_loader(ToyDataset())
+    prefetcher = DataPrefetcher(loader, num_prefetch=2, device='cpu')
+    assert len(prefetcher) == len(loader)
+
+    # run twice, as the runner does for every epoch
+    for _ in range(2):
+        batches = list(prefetcher)
+        assert len(batches) == len(loader)
+        for expected, batch in zip(loader, batches):
+            assert torch.equal(batch['img'].data[0], expected['img'].data[0])
+            assert batch['img_metas'].data == expected['img_metas'].data
+
+    # test breaking out of an epoch stops the background thread
+    for i, _ in enumerate(prefetcher):
+        if i == 1:
+            break
+
+    # test exceptions of the data loader are raised in the main thread
+    prefetcher = DataPrefetcher(
+        _build_loader(ToyDataset(fail_at=5)), device='cpu')
+    with pytest.raises(ValueError):
+        list(prefetcher)
+
+
+@pytest.mark.skipif(
+    not torch.cuda.is_available(), reason='requires CUDA support')
+def test_data_prefetcher_cuda():
+    loader = _build_loader(ToyDataset())
+    prefetcher = DataPrefetcher(loader, num_prefetch=2, device=0)
+    for expected, batch in zip(loader, prefetcher):
+        assert batch['img'].data[0].is_cuda
+        assert torch.equal(batch['img'].data[0].cpu(),
+                           expected['img'].data[0])
+        assert batch['gt_bboxes'].data[0][0].is_cuda
+        assert batch['img_metas'].data == expected['img_metas'].data
+
+    pool = PinnedBufferPool(num_buffers=2)
+    tensor = torch.rand(2, 3)
+    buffer, slot_id = pool.stage(tensor)
+    assert buffer.is_pinned() and torch.equal(buffer, tensor)
+    event = torch.cuda.Event()
+    event.record()
+    pool.record(slot_id, event)
+    pool.stage(tensor)
+    # the first buffer is reused once the ring is full
+    assert pool.stage(tensor)[0] is buffer
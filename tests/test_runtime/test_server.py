@@ -0,0 +1,272 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import asyncio
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from mmdet.apis import ArchController, InferenceServer, MicroBatcher
+from mmdet.apis.server import LatencyHistogram, http_request
+from mmdet.core import DetectionResults
+
+
+class EchoSession:
+    """A session detecting one box of the mean value of each image."""
+
+    def __init__(self, release=None):
+        self.batches = []
+        self.release = release
+
+    def input_shape(self, img):
+        return img.shape[:2]
+
+    def predict(self, imgs):
+        if self.release is not None:
+            self.release.wait()
+        self.batches.append([img.shape[:2] for img in imgs])
+        results = []
+        for img in imgs:
+            h, w = img.shape[:2]
+            dets = np.array([[0, 0, w, h, img.mean()]], dtype=np.float32)
+            results.append([dets])
+        return DetectionResults.from_list(results)
+
+
+class TierSession(EchoSession):
+    """An echo session recording the tier or the SLO of each batch."""
+
+    tiers = ['large', 'small']
+
+    def __init__(self):
+        super().__init__()
+        self.routes = []
+
+    def predict(self, imgs, **route):
+        self.routes.append(route)
+        return super().predict(imgs)
+
+
+class FailingSession(EchoSession):
+    """An echo session failing on the batches of black images."""
+
+    def predict(self, imgs):
+        if any(img.max() == 0 for img in imgs):
+            raise RuntimeError('black image')
+        return super().predict(imgs)
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(99) == 0
+    latencies = np.linspace(0.001, 0.1, 100)
+    for latency in latencies:
+        histogram.add(latency)
+    assert histogram.count == 100
+    # the percentiles are the upper bounds of their bucket
+    for q in [50, 90, 99]:
+        expected = latencies[q - 1]
+        assert expected <= histogram.percentile(q) <= expected * 1.13
+    assert histogram.percentile(100) == pytest.approx(0.1)
+    summary = histogram.summary()
+    assert summary['count'] == 100
+    assert summary['mean'] == pytest.approx(50.5)
+
+
+def test_micro_batcher():
+    session = EchoSession()
+    batcher = MicroBatcher(session, max_batch_size=4, max_wait_ms=20)
+    imgs = [np.full((8, 10, 3), i, dtype=np.uint8) for i in range(6)]
+    imgs += [np.full((6, 6, 3), i, dtype=np.uint8) for i in range(6, 8)]
+
+    async def main():
+        batcher.start()
+        results = await asyncio.gather(*[batcher.submit(img) for img in imgs])
+        await batcher.stop()
+        return results
+
+    results = _run(main())
+    for i, result in enumerate(results):
+        assert result['scores'].tolist() == [i]
+        assert result['bboxes'].shape == (1, 4)
+    # a full batch, then the rest of each shape at their deadline
+    assert session.batches == [[(8, 10)] * 4, [(8, 10)] * 2, [(6, 6)] * 2]
+    stats = batcher.stats()
+    assert stats['num_batches'] == 3
+    assert stats['latency_ms']['count'] == 8
+    assert stats['num_pending'] == 0
+
+
+def test_micro_batcher_backpressure():
+    release = threading.Event()
+    batcher = MicroBatcher(
+        EchoSession(release), max_batch_size=1, max_wait_ms=0, max_pending=2)
+    img = np.zeros((4, 4, 3), dtype=np.uint8)
+
+    async def main():
+        batcher.start()
+        # the first request is running, the next two wait in the queue
+        tasks = [asyncio.ensure_future(batcher.submit(img))]
+        await asyncio.sleep(0.05)
+        tasks += [asyncio.ensure_future(batcher.submit(img)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert batcher.num_pending == 2
+        try:
+            with pytest.raises(asyncio.QueueFull):
+                await batcher.submit(img)
+        finally:
+            release.set()
+        results = await asyncio.gather(*tasks)
+        await batcher.stop()
+        return results
+
+    assert len(_run(main())) == 3
+    assert batcher.num_rejected == 1
+
+
+def test_inference_server():
+    server = InferenceServer(
+        MicroBatcher(EchoSession(), max_wait_ms=1), port=0)
+    img = np.full((8, 10, 3), 100, dtype=np.uint8)
+    body = cv2.imencode('.png', img)[1].tobytes()
+
+    async def main():
+        await server.start()
+        reader, writer = await asyncio.open_connection('127.0.0.1',
+                                                       server.port)
+        responses = []
+        for method, path, request_body in [('POST', '/predict', body),
+                                           ('POST', '/predict', b'abc'),
+                                           ('GET', '/stats', b''),
+                                           ('GET', '/other', b'')]:
+            responses.append(await http_request(reader, writer, method, path,
+                                                request_body))
+        writer.close()
+        await server.stop()
+        return responses
+
+    predict, invalid, stats, other = _run(main())
+    assert predict == (200,
+                       dict(bboxes=[[0, 0, 10, 8]], scores=[100], labels=[0]))
+    assert invalid[0] == 400
+    assert stats[0] == 200 and stats[1]['latency_ms']['count'] == 1
+    assert other[0] == 404
+
+
+def test_inference_server_error():
+    server = InferenceServer(
+        MicroBatcher(FailingSession(), max_batch_size=1, max_wait_ms=1),
+        port=0)
+    imgs = [np.full((8, 10, 3), value, dtype=np.uint8) for value in [0, 100]]
+    bodies = [cv2.imencode('.png', img)[1].tobytes() for img in imgs]
+
+    async def main():
+        await server.start()
+        reader, writer = await asyncio.open_connection('127.0.0.1',
+                                                       server.port)
+        responses = []
+        for body in bodies:
+            responses.append(await http_request(reader, writer, 'POST',
+                                                '/predict', body))
+        writer.close()
+        await server.stop()
+        return responses
+
+    failed, predict = _run(main())
+    assert failed == (500, dict(error='RuntimeError: black image'))
+    # the connection serves the next request
+    assert predict[0] == 200 and predict[1]['scores'] == [100]
+
+
+def test_micro_batcher_routing():
+    session = TierSession()
+    batcher = MicroBatcher(session, max_batch_size=4, max_wait_ms=20)
+    img = np.zeros((8, 10, 3), dtype=np.uint8)
+
+    async def main():
+        batcher.start()
+        await asyncio.gather(
+            batcher.submit(img, tier='small'), batcher.submit(img),
+            batcher.submit(img, tier='small'))
+        await batcher.submit(img, slo_ms=100)
+        await batcher.stop()
+
+    _run(main())
+    # the tiers are batched apart
+    assert session.batches == [[(8, 10)] * 2, [(8, 10)], [(8, 10)]]
+    assert session.routes[:2] == [dict(tier='small'), {}]
+    # the SLO left once the batch waited max_wait_ms
+    assert 0 < session.routes[2]['slo_ms'] <= 80
+
+    server = InferenceServer(
+        MicroBatcher(TierSession(), max_wait_ms=1, slo_ms=50), port=0)
+    body = cv2.imencode('.png', img)[1].tobytes()
+
+    async def serve():
+        await server.start()
+        reader, writer = await asyncio.open_connection('127.0.0.1',
+                                                       server.port)
+        statuses = []
+        for path in [
+                '/predict?tier=small', '/predict', '/predict?tier=medium',
+                '/predict?slo_ms=abc'
+        ]:
+            status, _ = await http_request(reader, writer, 'POST', path, body)
+            statuses.append(status)
+        writer.close()
+        await server.stop()
+        return statuses
+
+    assert _run(serve()) == [200, 200, 400, 400]
+    routes = server.batcher.session.routes
+    assert routes[0] == dict(tier='small')
+    # the default SLO of the batcher
+    assert 0 < routes[1]['slo_ms'] <= 50
+
+    # a session without tiers ignores the SLOs
+    session = EchoSession()
+    batcher = MicroBatcher(session, max_wait_ms=1, slo_ms=50)
+
+    async def main_no_tiers():
+        batcher.start()
+        results = await asyncio.gather(
+            batcher.submit(img), batcher.submit(img, slo_ms=100))
+        await batcher.stop()
+        return results
+
+    assert len(_run(main_no_tiers())) == 2
+    assert session.batches == [[(8, 10)] * 2]
+
+
+def test_micro_batcher_controller():
+    session = TierSession()
+    # any latency is over the target, each batch steps down
+    controller = ArchController(
+        session.tiers, target_ms=0, down_dwell=1, up_dwell=1)
+    batcher = MicroBatcher(
+        session, max_batch_size=1, max_wait_ms=0, controller=controller)
+    img = np.zeros((4, 4, 3), dtype=np.uint8)
+
+    async def main():
+        batcher.start()
+        for tier in [None, None, 'large']:
+            await batcher.submit(img, tier=tier)
+        await batcher.stop()
+
+    _run(main())
+    assert session.routes == [
+        dict(tier='large'),
+        dict(tier='small'),
+        dict(tier='large')
+    ]
+    # the batches asking for a tier are not accounted
+    assert controller.num_batches == dict(large=1, small=1)
+    assert batcher.stats()['controller']['tier'] == 'small'
@@ -0,0 +1,89 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import threading
+import time
+
+import numpy as np
+import pytest
+import torch
+
+from mmdet.apis import StreamInference
+from mmdet.core import DetectionResults
+
+
+class FrameSession:
+    """A session detecting one box of the value of each frame."""
+
+    def __init__(self, delay=0., fail_at=None):
+        self.delay = delay
+        self.fail_at = fail_at
+
+    def preprocess(self, imgs):
+        img = torch.from_numpy(np.stack(imgs)).permute(0, 3, 1, 2).float()
+        return [img], [[dict(ori_shape=img.shape) for img in imgs]]
+
+    def run(self, imgs, img_metas):
+        time.sleep(self.delay)
+        value = float(imgs[0][0, 0, 0, 0])
+        if value == self.fail_at:
+            raise ValueError('broken frame')
+        dets = np.array([[0, 0, 4, 4, value]], dtype=np.float32)
+        return DetectionResults.from_list([[dets]])
+
+
+def _frames(num_frames):
+    for i in range(num_frames):
+        yield np.full((4, 4, 3), i, dtype=np.uint8)
+
+
+def test_stream_inference():
+    stream = StreamInference(
+        FrameSession(),
+        postprocess=lambda frame, det_results: det_results.scores[0])
+    outputs = list(stream.run(_frames(10)))
+    assert [frame_id for frame_id, _, _ in outputs] == list(range(10))
+    assert [score for _, _, score in outputs] == list(range(10))
+    assert outputs[3][1][0, 0, 0] == 3
+    stats = stream.stats()
+    assert stats['num_frames'] == 10 and stats['num_dropped'] == 0
+    assert stats['fps'] > 0
+    assert stats['latency_ms']['count'] == 10
+    assert set(
+        stats['stage_ms']) == {'decode', 'preprocess', 'model', 'postprocess'}
+
+    # the results are yielded without a postprocess
+    stream = StreamInference(FrameSession())
+    _, _, det_results = next(iter(stream.run(_frames(1))))
+    assert isinstance(det_results, DetectionResults)
+
+
+@pytest.mark.parametrize('drop', ['oldest', 'newest'])
+def test_stream_inference_drop(drop):
+    # the model falls behind the decoder
+    stream = StreamInference(FrameSession(delay=0.02), queue_size=1, drop=drop)
+    frame_ids = [frame_id for frame_id, _, _ in stream.run(_frames(30))]
+    stats = stream.stats()
+    assert stats['num_dropped'] > 0
+    assert stats['num_frames'] + stats['num_dropped'] == 30
+    assert frame_ids == sorted(frame_ids)
+    if drop == 'oldest':
+        # the latest frame is kept
+        assert frame_ids[-1] == 29
+    else:
+        assert frame_ids[0] == 0
+
+
+def test_stream_inference_stop():
+    # the errors of the stages are raised to the consumer
+    stream = StreamInference(FrameSession(fail_at=3))
+    with pytest.raises(ValueError):
+        list(stream.run(_frames(10)))
+
+    # the stages stop when the consumer does
+    threads = set(threading.enumerate())
+    stream = StreamInference(FrameSession())
+    for frame_id, _, _ in stream.run(_frames(100)):
+        if frame_id == 2:
+            break
+    # threads of the other tests may have ended meanwhile
+    assert not set(threading.enumerate()) - threads
+    assert stream.stats()['num_frames'] == 3
@@ -0,0 +1,76 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import numpy as np
+
+from mmdet.apis import TiledInference
+from mmdet.core import DetectionResults
+
+
+class BrightSession:
+    """A session detecting the box of the bright pixels of each image, of
+    the score of its area."""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, imgs):
+        self.batches.append([img.shape[:2] for img in imgs])
+        results = []
+        for img in imgs:
+            ys, xs = np.nonzero(img[..., 0])
+            dets = np.zeros((0, 5), dtype=np.float32)
+            if len(xs):
+                x1, y1, x2, y2 = xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+                area = (x2 - x1) * (y2 - y1)
+                dets = np.array([[x1, y1, x2, y2, area / 1e4]],
+                                dtype=np.float32)
+            results.append([dets, np.zeros((0, 5), dtype=np.float32)])
+        return DetectionResults.from_list(results)
+
+
+def test_tiles():
+    tiled = TiledInference(BrightSession(), tile_size=(100, 200), overlap=0.2)
+    tiles = tiled.tiles(250, 500)
+    # strides of 80 and 160, the last tiles end at the borders
+    assert set(tiles[:, 1]) == {0, 80, 150}
+    assert set(tiles[:, 0]) == {0, 160, 300}
+    assert len(tiles) == 9
+    assert (tiles[:, 2] - tiles[:, 0] == 200).all()
+    assert (tiles[:, 3] - tiles[:, 1] == 100).all()
+
+    # an image smaller than a tile is a single tile
+    assert tiled.tiles(50, 120).tolist() == [[0, 0, 120, 50]]
+
+
+def test_tiled_inference():
+    img = np.zeros((250, 500, 3), dtype=np.uint8)
+    img[30:60, 320:360] = 255
+
+    session = BrightSession()
+    tiled = TiledInference(
+        session, tile_size=(100, 200), batch_size=4, skip_empty=False)
+    det_results = tiled.predict(img)
+    assert det_results.num_classes == 2
+    assert tiled.stats() == dict(num_tiles=9, num_skipped=0)
+    # the tiles are cropped by batches
+    assert [len(batch) for batch in session.batches] == [4, 4, 1]
+    # the dets are mapped back to the image, the duplicates of the
+    # overlapping tiles are merged
+    assert len(det_results.bboxes) == 1
+    np.testing.assert_allclose(det_results.bboxes[0], [320, 30, 360, 60])
+    assert det_results.labels.tolist() == [0]
+
+    # the coarse pass keeps the tiles around the object only
+    session = BrightSession()
+    tiled = TiledInference(session, tile_size=(100, 200))
+    det_results = tiled.predict(img)
+    assert tiled.stats() == dict(num_tiles=2, num_skipped=7)
+    assert session.batches[0] == [(250, 500)]
+    np.testing.assert_allclose(det_results.bboxes[0], [320, 30, 360, 60])
+
+    # all the tiles are skipped without any coarse det
+    tiled = TiledInference(
+        BrightSession(), tile_size=(100, 200), coarse_score_thr=1)
+    det_results = tiled.predict(np.zeros((250, 500, 3), dtype=np.uint8))
+    assert tiled.stats() == dict(num_tiles=0, num_skipped=9)
+    assert len(det_results.bboxes) == 0
+    assert det_results.img_ids.tolist() == []
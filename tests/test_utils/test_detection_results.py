@@ -0,0 +1,115 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import os.path as osp
+import pickle
+import tempfile
+
+import mmcv
+import numpy as np
+import pytest
+
+from mmdet.core import DetectionResults, load_det_results
+from mmdet.core.evaluation import eval_map, fast_eval_map
+
+NUM_CLASSES = 3
+
+
+def _random_results(num_imgs, seed=0):
+    rng = np.random.RandomState(seed)
+    results = []
+    for _ in range(num_imgs):
+        result = []
+        for _ in range(NUM_CLASSES):
+            xy = rng.rand(rng.randint(0, 5), 2) * 50
+            wh = rng.rand(len(xy), 2) * 50 + 1
+            score = rng.rand(len(xy), 1)
+            result.append(np.hstack([xy, xy + wh, score]).astype(np.float32))
+        results.append(result)
+    return results
+
+
+def _assert_results_equal(results, expected):
+    assert len(results) == len(expected)
+    for result, expected_result in zip(results, expected):
+        assert len(result) == NUM_CLASSES
+        for dets, expected_dets in zip(result, expected_result):
+            assert dets.dtype == np.float32
+            assert np.array_equal(dets, expected_dets)
+
+
+def test_detection_results():
+    results = _random_results(6)
+    # an image without any det
+    results[2] = [np.zeros((0, 5), dtype=np.float32)] * NUM_CLASSES
+    det_results = DetectionResults.from_list(results)
+    assert len(det_results) == 6
+    assert det_results.num_classes == NUM_CLASSES
+    _assert_results_equal(det_results.to_list(), results)
+    _assert_results_equal(list(det_results), results)
+    _assert_results_equal([det_results[-1]], results[-1:])
+    with pytest.raises(IndexError):
+        det_results[6]
+
+    for class_id in range(NUM_CLASSES):
+        dets, num_dets = det_results.class_dets(class_id)
+        assert np.array_equal(
+            dets, np.concatenate([result[class_id] for result in results]))
+        assert num_dets.tolist() == [
+            len(result[class_id]) for result in results
+        ]
+
+    # results with masks only keep their bboxes
+    _assert_results_equal(
+        DetectionResults.from_list([(result, None)
+                                    for result in results]).to_list(), results)
+    empty = DetectionResults.from_list([], num_classes=NUM_CLASSES)
+    assert len(empty) == 0 and empty.to_list() == []
+
+    _assert_results_equal(
+        pickle.loads(pickle.dumps(det_results)).to_list(), results)
+
+
+@pytest.mark.parametrize('mmap', [False, True])
+def test_load_det_results(mmap):
+    results = _random_results(5)
+    results[0] = [np.zeros((0, 5), dtype=np.float32)] * NUM_CLASSES
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        npz_file = osp.join(tmp_dir, 'results.npz')
+        DetectionResults.from_list(results).dump(npz_file)
+        det_results = load_det_results(npz_file, mmap=mmap)
+        assert isinstance(det_results, DetectionResults)
+        assert isinstance(det_results.bboxes, np.memmap) == mmap
+        _assert_results_equal(det_results.to_list(), results)
+        _assert_results_equal(list(det_results), results)
+        del det_results
+
+        pkl_file = osp.join(tmp_dir, 'results.pkl')
+        mmcv.dump(results, pkl_file)
+        _assert_results_equal(load_det_results(pkl_file), results)
+
+
+def test_eval_map_detection_results():
+    results = _random_results(8)
+    rng = np.random.RandomState(1)
+    annotations = []
+    for result in results:
+        bboxes = np.concatenate(result)[:, :4]
+        bboxes += rng.rand(*bboxes.shape).astype(np.float32) * 10
+        labels = np.concatenate([
+            np.full(len(dets), i) for i, dets in enumerate(result)
+        ]).astype(np.int64)
+        annotations.append(
+            dict(
+                bboxes=bboxes,
+                labels=labels,
+                bboxes_ignore=np.zeros((0, 4), dtype=np.float32),
+                labels_ignore=np.zeros((0, ), dtype=np.int64)))
+    det_results = DetectionResults.from_list(results)
+    for eval_fn in [eval_map, fast_eval_map]:
+        mean_ap, eval_results = eval_fn(
+            results, annotations, iou_thr=0.5, logger='silent')
+        columnar_mean_ap, columnar_eval_results = eval_fn(
+            det_results, annotations, iou_thr=0.5, logger='silent')
+        assert columnar_mean_ap == mean_ap
+        for res, expected in zip(columnar_eval_results, eval_results):
+            assert np.array_equal(res['ap'], expected['ap'])
+            assert np.array_equal(res['recall'], expected['recall'])
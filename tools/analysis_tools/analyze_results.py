@@ -6,7 +6,8 @@ import mmcv
 import numpy as np
 from mmcv import Config, DictAction
 
-from mmdet.core.evaluation import eval_map
+from mmdet.core import load_det_results
+from mmdet.core.evaluation import MatchIndex, eval_map
 from mmdet.core.visualization import imshow_gt_det_bboxes
 from mmdet.datasets import build_dataset, get_loading_pipeline
 
@@ -98,37 +99,51 @@ class ResultVisualizer:
                           results,
                           topk=20,
                           show_dir='work_dir',
-                          eval_fn=None):
+                          eval_fn=None,
+                          cache_file=None):
         """Evaluate and show results.
 
+        Without ``eval_fn``, the images are ranked by the mAP of
+        :func:`bbox_map_eval`, which is computed for all the images at once
+        from the :obj:`MatchIndex` of the results. The index is loaded from
+        ``cache_file`` if it was built from the same results and gts, else
+        built and saved to it.
+
         Args:
             dataset (Dataset): A PyTorch dataset.
-            results (list): Det results from test results pkl file
+            results (list | :obj:`DetectionResults`): Det results from test
+                results pkl or npz file
             topk (int): Number of the highest topk and
                 lowest topk after evaluation index sorting. Default: 20
             show_dir (str, optional): The filename to write the image.
                 Default: 'work_dir'
             eval_fn (callable, optional): Eval function, Default: None
+            cache_file (str, optional): Path where the match index of the
+                results is cached. Default: None
         """
 
         assert topk > 0
         if (topk * 2) > len(dataset):
             topk = len(dataset) // 2
 
+        # self.dataset[i] should not call directly
+        # because there is a risk of mismatch
+        annotations = [dataset.get_ann_info(i) for i in range(len(dataset))]
         if eval_fn is None:
-            eval_fn = bbox_map_eval
+            if cache_file is None:
+                match_index = MatchIndex.build(results, annotations)
+            else:
+                match_index = MatchIndex.load_or_build(cache_file, results,
+                                                       annotations)
+            _mAPs = dict(enumerate(match_index.img_mean_aps().tolist()))
         else:
             assert callable(eval_fn)
-
-        prog_bar = mmcv.ProgressBar(len(results))
-        _mAPs = {}
-        for i, (result, ) in enumerate(zip(results)):
-            # self.dataset[i] should not call directly
-            # because there is a risk of mismatch
-            data_info = dataset.prepare_train_img(i)
-            mAP = eval_fn(result, data_info['ann_info'])
-            _mAPs[i] = mAP
-            prog_bar.update()
+            prog_bar = mmcv.ProgressBar(len(results))
+            _mAPs = {}
+            for i, (result, ) in enumerate(zip(results)):
+                mAP = eval_fn(result, annotations[i])
+                _mAPs[i] = mAP
+                prog_bar.update()
 
         # descending select topk image
         _mAPs = list(sorted(_mAPs.items(), key=lambda kv: kv[1]))
@@ -146,7 +161,7 @@ def parse_args():
         description='MMDet eval image prediction result for each')
     parser.add_argument('config', help='test config file path')
     parser.add_argument(
-        'prediction_path', help='prediction path where test pkl result')
+        'prediction_path', help='prediction path where test pkl or npz result')
     parser.add_argument(
         'show_dir', help='directory where painted images will be saved')
     parser.add_argument('--show', action='store_true', help='show results')
@@ -193,12 +208,16 @@ def main():
     cfg.data.test.pop('samples_per_gpu', 0)
     cfg.data.test.pipeline = get_loading_pipeline(cfg.data.train.pipeline)
     dataset = build_dataset(cfg.data.test)
-    outputs = mmcv.load(args.prediction_path)
+    outputs = load_det_results(args.prediction_path, mmap=True)
 
     result_visualizer = ResultVisualizer(args.show, args.wait_time,
                                          args.show_score_thr)
     result_visualizer.evaluate_and_show(
-        dataset, outputs, topk=args.topk, show_dir=args.show_dir)
+        dataset,
+        outputs,
+        topk=args.topk,
+        show_dir=args.show_dir,
+        cache_file=osp.splitext(args.prediction_path)[0] + '.match.npz')
 
 
 if __name__ == '__main__':
@@ -6,10 +6,10 @@ import time
 
 import torch
 from mmcv import Config, DictAction
-from mmcv.cnn import fuse_conv_bn
 from mmcv.parallel import MMDistributedDataParallel
 from mmcv.runner import init_dist, load_checkpoint, wrap_fp16_model
 
+from mmdet.core.export import fuse_slimmable_conv_bn
 from mmdet.datasets import (build_dataloader, build_dataset,
                             replace_ImageToTensor)
 from mmdet.models import build_detector
@@ -31,8 +31,10 @@ def parse_args():
     parser.add_argument(
         '--fuse-conv-bn',
         action='store_true',
-        help='Whether to fuse conv and bn, this will slightly increase'
-        'the inference speed')
+        help='Whether to fuse conv and bn, this will slightly increase '
+        'the inference speed. Skipped with a warning for the searchable '
+        'models whose BNs normalize with the statistics of each batch '
+        '(bn_training_mode=True, the default)')
     parser.add_argument(
         '--cfg-options',
         nargs='+',
@@ -87,7 +89,7 @@ def measure_inference_speed(cfg, checkpoint, max_iter, log_interval,
         wrap_fp16_model(model)
     load_checkpoint(model, checkpoint, map_location='cpu')
     if is_fuse_conv_bn:
-        model = fuse_conv_bn(model)
+        model = fuse_slimmable_conv_bn(model, strict=False)
 
     model = MMDistributedDataParallel(
         model.cuda(),
@@ -0,0 +1,100 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import argparse
+import time
+
+import numpy as np
+import torch
+from mmcv import DictAction
+
+from mmdet.apis import init_detector
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the compiled YOLOX inference against the '
+        'eager one')
+    parser.add_argument('config', help='test config file path')
+    parser.add_argument(
+        '--checkpoint', help='checkpoint file, random weights if not given')
+    parser.add_argument(
+        '--img-size',
+        type=int,
+        nargs=2,
+        default=[640, 640],
+        help='height and width of the input batch')
+    parser.add_argument(
+        '--batch-size', type=int, default=1, help='number of images')
+    parser.add_argument(
+        '--repeat-num', type=int, default=50, help='number of timed runs')
+    parser.add_argument(
+        '--warmup-num', type=int, default=5, help='number of untimed runs')
+    parser.add_argument('--device', default='cpu', help='device to run on')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file. If the value to '
+        'be overwritten is a list, it should be like key="[a,b]" or key=a,b '
+        'It also allows nested list/tuple values, e.g. key="[(a,b),(c,d)]" '
+        'Note that the quotation marks are necessary and that no white space '
+        'is allowed.')
+    args = parser.parse_args()
+    return args
+
+
+def measure(model, data, repeat_num, warmup_num):
+    """Get the results of a model and its mean time per batch in ms."""
+    with torch.no_grad():
+        for _ in range(warmup_num):
+            results = model(return_loss=False, rescale=True, **data)
+        if data['img'][0].is_cuda:
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        for _ in range(repeat_num):
+            results = model(return_loss=False, rescale=True, **data)
+        if data['img'][0].is_cuda:
+            torch.cuda.synchronize()
+    return results, (time.perf_counter() - start) * 1000 / repeat_num
+
+
+def main():
+    args = parse_args()
+    height, width = args.img_size
+    img = torch.rand(args.batch_size, 3, height, width, device=args.device)
+    img *= 255
+    img_metas = [
+        dict(
+            img_shape=(height, width, 3),
+            ori_shape=(height, width, 3),
+            pad_shape=(height, width, 3),
+            scale_factor=np.ones(4, dtype=np.float32),
+            flip=False,
+            flip_direction=None) for _ in range(args.batch_size)
+    ]
+    data = dict(img=[img], img_metas=[img_metas])
+
+    runs = []
+    for fast in [False, True]:
+        # the same random weights for both without a checkpoint
+        torch.manual_seed(0)
+        model = init_detector(
+            args.config,
+            args.checkpoint,
+            device=args.device,
+            cfg_options=args.cfg_options,
+            fast=fast)
+        runs.append(measure(model, data, args.repeat_num, args.warmup_num))
+    (eager_results, eager_ms), (fast_results, fast_ms) = runs
+
+    num_eager = sum(len(dets) for result in eager_results for dets in result)
+    num_fast = sum(len(dets) for result in fast_results for dets in result)
+    print(f'batch of {args.batch_size} images of {height}x{width} on '
+          f'{args.device}')
+    print(f'eager: {eager_ms:.2f} ms/batch, {num_eager} dets')
+    print(f'compiled: {fast_ms:.2f} ms/batch, {num_fast} dets')
+    print(f'speedup: {eager_ms / fast_ms:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
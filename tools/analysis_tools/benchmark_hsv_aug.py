@@ -0,0 +1,65 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import argparse
+import time
+
+import cv2
+import numpy as np
+from mmcv.utils import build_from_cfg
+
+from mmdet.datasets.builder import PIPELINES
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the lookup table path of YOLOXHSVRandomAug '
+        'against the per-channel arithmetic')
+    parser.add_argument(
+        '--img-size',
+        type=int,
+        nargs=2,
+        default=[640, 640],
+        help='height and width of the random image')
+    parser.add_argument(
+        '--repeat-num', type=int, default=100, help='number of timed runs')
+    args = parser.parse_args()
+    return args
+
+
+def hsv_arithmetic(img, hsv_gains):
+    """The per-channel int16 arithmetic the lookup tables replace."""
+    img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV).astype(np.int16)
+    img_hsv[..., 0] = (img_hsv[..., 0] + hsv_gains[0]) % 180
+    img_hsv[..., 1] = np.clip(img_hsv[..., 1] + hsv_gains[1], 0, 255)
+    img_hsv[..., 2] = np.clip(img_hsv[..., 2] + hsv_gains[2], 0, 255)
+    cv2.cvtColor(img_hsv.astype(img.dtype), cv2.COLOR_HSV2BGR, dst=img)
+    return img
+
+
+def main():
+    args = parse_args()
+    height, width = args.img_size
+    img = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+    hsv_module = build_from_cfg(dict(type='YOLOXHSVRandomAug'), PIPELINES)
+
+    np.random.seed(0)
+    start = time.perf_counter()
+    for _ in range(args.repeat_num):
+        hsv_gains = np.random.uniform(-1, 1, 3) * [5, 30, 30]
+        hsv_gains *= np.random.randint(0, 2, 3)
+        hsv_arithmetic(img.copy(), hsv_gains.astype(np.int16))
+    arithmetic_ms = (time.perf_counter() - start) * 1000 / args.repeat_num
+
+    np.random.seed(0)
+    start = time.perf_counter()
+    for _ in range(args.repeat_num):
+        hsv_module(dict(img=img.copy()))
+    lut_ms = (time.perf_counter() - start) * 1000 / args.repeat_num
+
+    print(f'YOLOXHSVRandomAug on {height}x{width} images')
+    print(f'arithmetic: {arithmetic_ms:.2f} ms/img')
+    print(f'lookup table: {lut_ms:.2f} ms/img')
+    print(f'speedup: {arithmetic_ms / lut_ms:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
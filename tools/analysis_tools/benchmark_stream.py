@@ -0,0 +1,82 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import argparse
+import time
+
+import mmcv
+from mmcv import DictAction
+
+from mmdet.apis import InferenceSession, StreamInference, init_detector
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the pipelined video inference against the '
+        'sequential loop')
+    parser.add_argument('video', help='video file')
+    parser.add_argument('config', help='test config file path')
+    parser.add_argument('checkpoint', help='checkpoint file')
+    parser.add_argument(
+        '--num-frames', type=int, default=100, help='number of frames')
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=2,
+        help='max number of frames queued between two stages')
+    parser.add_argument(
+        '--score-thr', type=float, default=0.3, help='bbox score threshold')
+    parser.add_argument('--device', default='cpu', help='device to run on')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file. If the value to '
+        'be overwritten is a list, it should be like key="[a,b]" or key=a,b '
+        'It also allows nested list/tuple values, e.g. key="[(a,b),(c,d)]" '
+        'Note that the quotation marks are necessary and that no white space '
+        'is allowed.')
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = parse_args()
+    model = init_detector(
+        args.config,
+        args.checkpoint,
+        device=args.device,
+        cfg_options=args.cfg_options)
+    session = InferenceSession(model)
+    video_reader = mmcv.VideoReader(args.video)
+    num_frames = min(args.num_frames, len(video_reader))
+
+    def draw(frame, det_results):
+        return model.show_result(
+            frame, det_results[0], score_thr=args.score_thr)
+
+    # the frames are decoded in both runs
+    start = time.perf_counter()
+    for i in range(num_frames):
+        frame = video_reader[i]
+        draw(frame, session.predict([frame]))
+    sequential_fps = num_frames / (time.perf_counter() - start)
+
+    stream = StreamInference(
+        session, postprocess=draw, queue_size=args.queue_size)
+    for _ in stream.run(video_reader[i] for i in range(num_frames)):
+        pass
+    stats = stream.stats()
+
+    print(f'{num_frames} frames of {video_reader.width}x'
+          f'{video_reader.height} on {args.device}')
+    print(f'sequential: {sequential_fps:.2f} fps')
+    print(f'pipelined: {stats["fps"]:.2f} fps, '
+          f'p50 latency {stats["latency_ms"]["p50"]:.1f} ms')
+    print('stage ms/frame: ' +
+          ', '.join(f'{name} {ms:.1f}'
+                    for name, ms in stats['stage_ms'].items()))
+    print(f'speedup: {stats["fps"] / sequential_fps:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,10 +5,13 @@ from argparse import ArgumentParser
 from multiprocessing import Pool
 
 import matplotlib.pyplot as plt
+import mmcv
 import numpy as np
 from pycocotools.coco import COCO
 from pycocotools.cocoeval import COCOeval
 
+from mmdet.datasets.api_wrappers import FastCOCOeval
+
 
 def makeplot(rs, ps, outDir, class_name, iou_type):
     cs = np.vstack([
@@ -106,6 +109,10 @@ def makebarplot(rs, ps, outDir, class_name, iou_type):
 
 
 def get_gt_area_group_numbers(cocoEval):
+    if isinstance(cocoEval, FastCOCOeval):
+        # evalImgs is not filled, count the gts not ignored in each range
+        numbers = np.count_nonzero(~cocoEval._gt_ignore, axis=1)
+        return dict(zip(cocoEval.params.areaRngLbl, numbers.tolist()))
     areaRng = cocoEval.params.areaRng
     areaRngStr = [str(aRng) for aRng in areaRng]
     areaRngLbl = cocoEval.params.areaRngLbl
@@ -232,6 +239,87 @@ def analyze_individual_category(k,
     return k, ps_
 
 
+class ConfusionIgnoringCOCOeval(FastCOCOeval):
+    """:obj:`FastCOCOeval` of every category, ignoring its confusion with
+    some other categories.
+
+    For the ``k``-th category, the gts of the categories in
+    ``confusable[k]`` are evaluated as crowd gts of the ``k``-th category,
+    so the dets of the category matching them are neither TP nor FP. This
+    is what :func:`analyze_individual_category` does to a copy of the gts
+    for each category, here done for all the categories in one pass.
+
+    Args:
+        cocoGt (:obj:`COCO`): Ground truth COCO api.
+        confusable (np.ndarray): Whether the confusion of the ``i``-th
+            category with the ``j``-th one is ignored, a boolean array of
+            shape (num_cats, num_cats), in the order of ``params.catIds``.
+        *args: Detections, same as :obj:`FastCOCOeval`.
+    """
+
+    def __init__(self, cocoGt, confusable, *args):
+        super().__init__(cocoGt, *args)
+        self.confusable = confusable
+
+    def _load_gts(self):
+        img_ids, cat_ids, bboxes, areas, crowd, ids = super()._load_gts()
+        cat_inds = np.searchsorted(self.params.catIds, cat_ids)
+        # a copy of each gt for every category it is confused with, the
+        # copies of a category keep the annotation order
+        cats, gts = np.nonzero(self.confusable[:, cat_inds])
+        return (img_ids[gts], np.asarray(self.params.catIds)[cats],
+                bboxes[gts], areas[gts], crowd[gts] | (cat_inds[gts] != cats),
+                ids[gts])
+
+
+def fast_error_analysis(cocoGt, res_file, areas=None):
+    """Vectorised error analysis of bbox results.
+
+    Same as the ``COCOeval`` of all the categories followed by
+    :func:`analyze_individual_category` for each category, with
+    :obj:`FastCOCOeval` and :obj:`ConfusionIgnoringCOCOeval` on the
+    detections as arrays.
+
+    Returns:
+        tuple: The evaluator of all the categories and the precisions of
+            the analysis, of shape (7, R, K, A, M), whose last 2 types are
+            left empty.
+    """
+    results = mmcv.load(res_file)
+    dets = (np.array([res['bbox'] for res in results]).reshape(-1, 4),
+            np.array([res['score'] for res in results]),
+            np.array([res['image_id'] for res in results]),
+            np.array([res['category_id'] for res in results]))
+
+    def evaluate(cocoEval, iouThrs):
+        cocoEval.params.iouThrs = iouThrs
+        cocoEval.params.maxDets = [100]
+        if areas:
+            cocoEval.params.areaRng = [[0**2, areas[2]], [0**2, areas[0]],
+                                       [areas[0], areas[1]],
+                                       [areas[1], areas[2]]]
+        cocoEval.evaluate()
+        cocoEval.accumulate()
+        return cocoEval.eval['precision']
+
+    cocoEval = FastCOCOeval(cocoGt, *dets)
+    ps = evaluate(cocoEval, [0.75, 0.5, 0.1])
+    ps = np.vstack([ps, np.zeros((4, *ps.shape[1:]))])
+    catIds = cocoEval.params.catIds
+    supNms = np.array(
+        [cat['supercategory'] for cat in cocoGt.loadCats(catIds)])
+    # compute precision but ignore superclass confusion
+    ps[3] = evaluate(
+        ConfusionIgnoringCOCOeval(cocoGt, supNms[:, None] == supNms, *dets),
+        [0.1])[0]
+    # compute precision but ignore any class confusion
+    ps[4] = evaluate(
+        ConfusionIgnoringCOCOeval(
+            cocoGt, np.ones((len(catIds), len(catIds)), dtype=bool), *dets),
+        [0.1])[0]
+    return cocoEval, ps
+
+
 def analyze_results(res_file,
                     ann_file,
                     res_types,
@@ -250,7 +338,6 @@ def analyze_results(res_file,
         os.makedirs(directory)
 
     cocoGt = COCO(ann_file)
-    cocoDt = cocoGt.loadRes(res_file)
     imgIds = cocoGt.getImgIds()
     for res_type in res_types:
         res_out_dir = out_dir + '/' + res_type + '/'
@@ -259,36 +346,39 @@ def analyze_results(res_file,
             print(f'-------------create {res_out_dir}-----------------')
             os.makedirs(res_directory)
         iou_type = res_type
-        cocoEval = COCOeval(
-            copy.deepcopy(cocoGt), copy.deepcopy(cocoDt), iou_type)
-        cocoEval.params.imgIds = imgIds
-        cocoEval.params.iouThrs = [0.75, 0.5, 0.1]
-        cocoEval.params.maxDets = [100]
-        if areas:
-            cocoEval.params.areaRng = [[0**2, areas[2]], [0**2, areas[0]],
-                                       [areas[0], areas[1]],
-                                       [areas[1], areas[2]]]
-        cocoEval.evaluate()
-        cocoEval.accumulate()
-        ps = cocoEval.eval['precision']
-        ps = np.vstack([ps, np.zeros((4, *ps.shape[1:]))])
         catIds = cocoGt.getCatIds()
+        if iou_type == 'bbox':
+            cocoEval, ps = fast_error_analysis(cocoGt, res_file, areas)
+        else:
+            cocoDt = cocoGt.loadRes(res_file)
+            cocoEval = COCOeval(
+                copy.deepcopy(cocoGt), copy.deepcopy(cocoDt), iou_type)
+            cocoEval.params.imgIds = imgIds
+            cocoEval.params.iouThrs = [0.75, 0.5, 0.1]
+            cocoEval.params.maxDets = [100]
+            if areas:
+                cocoEval.params.areaRng = [[0**2, areas[2]], [0**2, areas[0]],
+                                           [areas[0], areas[1]],
+                                           [areas[1], areas[2]]]
+            cocoEval.evaluate()
+            cocoEval.accumulate()
+            ps = cocoEval.eval['precision']
+            ps = np.vstack([ps, np.zeros((4, *ps.shape[1:]))])
+            with Pool(processes=48) as pool:
+                args = [(k, cocoDt, cocoGt, catId, iou_type, areas)
+                        for k, catId in enumerate(catIds)]
+                analyze_results = pool.starmap(analyze_individual_category,
+                                               args)
+            for k, analyze_result in enumerate(analyze_results):
+                assert k == analyze_result[0]
+                # compute precision but ignore superclass confusion
+                ps[3, :, k, :, :] = analyze_result[1]['ps_supercategory']
+                # compute precision but ignore any class confusion
+                ps[4, :, k, :, :] = analyze_result[1]['ps_allcategory']
         recThrs = cocoEval.params.recThrs
-        with Pool(processes=48) as pool:
-            args = [(k, cocoDt, cocoGt, catId, iou_type, areas)
-                    for k, catId in enumerate(catIds)]
-            analyze_results = pool.starmap(analyze_individual_category, args)
         for k, catId in enumerate(catIds):
             nm = cocoGt.loadCats(catId)[0]
             print(f'--------------saving {k + 1}-{nm["name"]}---------------')
-            analyze_result = analyze_results[k]
-            assert k == analyze_result[0]
-            ps_supercategory = analyze_result[1]['ps_supercategory']
-            ps_allcategory = analyze_result[1]['ps_allcategory']
-            # compute precision but ignore superclass confusion
-            ps[3, :, k, :, :] = ps_supercategory
-            # compute precision but ignore any class confusion
-            ps[4, :, k, :, :] = ps_allcategory
             # fill in background and false negative errors and plot
             ps[ps == -1] = 0
             ps[5, :, k, :, :] = ps[4, :, k, :, :] > 0
@@ -1,5 +1,6 @@
 import argparse
 import os
+import os.path as osp
 
 import matplotlib.pyplot as plt
 import mmcv
@@ -8,6 +9,8 @@ from matplotlib.ticker import MultipleLocator
 from mmcv import Config, DictAction
 from mmcv.ops import nms
 
+from mmdet.core import DetectionResults, load_det_results
+from mmdet.core.evaluation import MatchIndex
 from mmdet.core.evaluation.bbox_overlaps import bbox_overlaps
 from mmdet.datasets import build_dataset
 
@@ -17,7 +20,8 @@ def parse_args():
         description='Generate confusion matrix from detection results')
     parser.add_argument('config', help='test config file path')
     parser.add_argument(
-        'prediction_path', help='prediction path where test .pkl result')
+        'prediction_path',
+        help='prediction path where test .pkl or .npz result')
     parser.add_argument(
         'save_dir', help='directory where confusion matrix will be saved')
     parser.add_argument(
@@ -60,12 +64,19 @@ def calculate_confusion_matrix(dataset,
                                results,
                                score_thr=0,
                                nms_iou_thr=None,
-                               tp_iou_thr=0.5):
+                               tp_iou_thr=0.5,
+                               cache_file=None):
     """Calculate the confusion matrix.
 
+    Without ``nms_iou_thr``, the matrix is a query on the
+    :obj:`MatchIndex` of the results, which is loaded from ``cache_file``
+    if it was built from the same results and gts, else built and saved to
+    it. Otherwise the dets of each image are matched again after the NMS.
+
     Args:
         dataset (Dataset): Test or val dataset.
-        results (list[ndarray]): A list of detection results in each image.
+        results (list[ndarray] | :obj:`DetectionResults`): A list of
+            detection results in each image.
         score_thr (float|optional): Score threshold to filter bboxes.
             Default: 0.
         nms_iou_thr (float|optional): nms IoU threshold, the detection results
@@ -73,10 +84,21 @@ def calculate_confusion_matrix(dataset,
             change the nms IoU threshold. Default: None.
         tp_iou_thr (float|optional): IoU threshold to be considered as matched.
             Default: 0.5.
+        cache_file (str|optional): Path where the match index of the results
+            is cached. Default: None.
     """
+    assert len(dataset) == len(results)
+    if not nms_iou_thr:
+        annotations = [dataset.get_ann_info(i) for i in range(len(dataset))]
+        if cache_file is None:
+            match_index = MatchIndex.build(results, annotations)
+        else:
+            match_index = MatchIndex.load_or_build(cache_file, results,
+                                                   annotations)
+        return match_index.confusion_matrix(score_thr, tp_iou_thr)
+
     num_classes = len(dataset.CLASSES)
     confusion_matrix = np.zeros(shape=[num_classes + 1, num_classes + 1])
-    assert len(dataset) == len(results)
     prog_bar = mmcv.ProgressBar(len(results))
     for idx, per_img_res in enumerate(results):
         if isinstance(per_img_res, tuple):
@@ -233,9 +255,10 @@ def main():
     if args.cfg_options is not None:
         cfg.merge_from_dict(args.cfg_options)
 
-    results = mmcv.load(args.prediction_path)
-    assert isinstance(results, list)
-    if isinstance(results[0], list):
+    results = load_det_results(args.prediction_path, mmap=True)
+    if isinstance(results, DetectionResults):
+        pass
+    elif isinstance(results[0], list):
         pass
     elif isinstance(results[0], tuple):
         results = [result[0] for result in results]
@@ -249,10 +272,13 @@ def main():
             ds_cfg.test_mode = True
     dataset = build_dataset(cfg.data.test)
 
-    confusion_matrix = calculate_confusion_matrix(dataset, results,
-                                                  args.score_thr,
-                                                  args.nms_iou_thr,
-                                                  args.tp_iou_thr)
+    confusion_matrix = calculate_confusion_matrix(
+        dataset,
+        results,
+        args.score_thr,
+        args.nms_iou_thr,
+        args.tp_iou_thr,
+        cache_file=osp.splitext(args.prediction_path)[0] + '.match.npz')
     plot_confusion_matrix(
         confusion_matrix,
         dataset.CLASSES + ('background', ),
@@ -1,9 +1,9 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import argparse
 
-import mmcv
 from mmcv import Config, DictAction
 
+from mmdet.core import load_det_results
 from mmdet.datasets import build_dataset
 
 
@@ -11,7 +11,7 @@ def parse_args():
     parser = argparse.ArgumentParser(description='Evaluate metric of the '
                                      'results saved in pkl format')
     parser.add_argument('config', help='Config of the model')
-    parser.add_argument('pkl_results', help='Results in pickle format')
+    parser.add_argument('pkl_results', help='Results in pickle or npz format')
     parser.add_argument(
         '--format-only',
         action='store_true',
@@ -59,7 +59,7 @@ def main():
     cfg.data.test.test_mode = True
 
     dataset = build_dataset(cfg.data.test)
-    outputs = mmcv.load(args.pkl_results)
+    outputs = load_det_results(args.pkl_results)
 
     kwargs = {} if args.eval_options is None else args.eval_options
     if args.format_only:
@@ -69,7 +69,7 @@ def main():
         # hard-code way to remove EvalHook args
         for key in [
                 'interval', 'tmpdir', 'start', 'gpu_collect', 'save_best',
-                'rule'
+                'rule', 'dynamic_intervals', 'async_eval'
         ]:
             eval_kwargs.pop(key, None)
         eval_kwargs.update(dict(metric=args.eval, **kwargs))
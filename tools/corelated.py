@@ -1,5 +1,6 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import argparse
+import copy
 import os
 import os.path as osp
 import time
@@ -9,12 +10,12 @@ import numpy as np
 import mmcv
 import torch
 from mmcv import Config, DictAction
-from mmcv.cnn import fuse_conv_bn
 from mmcv.parallel import MMDataParallel, MMDistributedDataParallel
 from mmcv.runner import (get_dist_info, init_dist, load_checkpoint,
                          wrap_fp16_model)
 
 from mmdet.apis import multi_gpu_test, single_gpu_test
+from mmdet.core.export import fuse_slimmable_conv_bn
 from mmdet.datasets import (build_dataloader, build_dataset,
                             replace_ImageToTensor)
 from mmdet.models import build_detector
@@ -36,8 +37,10 @@ def parse_args():
     parser.add_argument(
         '--fuse-conv-bn',
         action='store_true',
-        help='Whether to fuse conv and bn, this will slightly increase'
-        'the inference speed')
+        help='Whether to fuse conv and bn, this will slightly increase '
+        'the inference speed. Skipped with a warning for the searchable '
+        'models whose BNs normalize with the statistics of each batch '
+        '(bn_training_mode=True, the default)')
     parser.add_argument(
         '--gpu-ids',
         type=int,
@@ -286,8 +289,6 @@ def main():
     if fp16_cfg is not None:
         wrap_fp16_model(model)
     checkpoint = load_checkpoint(model, args.checkpoint, map_location='cpu')
-    if args.fuse_conv_bn:
-        model = fuse_conv_bn(model)
     # old versions did not save class info in checkpoints, this walkaround is
     # for backward compatibility
     if 'CLASSES' in checkpoint.get('meta', {}):
@@ -324,15 +325,19 @@ def main():
         model.set_arch(arch)
         # print(arch)
         print("set_arch fin! "+str(rank))
+        # a fused model keeps its arch, so a copy is fused for each arch
+        model_k = fuse_slimmable_conv_bn(
+            copy.deepcopy(model),
+            strict=False) if args.fuse_conv_bn else model
 
 
         if not distributed:
-            model_P = MMDataParallel(model, device_ids=cfg.gpu_ids)
+            model_P = MMDataParallel(model_k, device_ids=cfg.gpu_ids)
             outputs = single_gpu_test(model_P, data_loader, args.show, args.show_dir,
                                       args.show_score_thr)
         else:
             model_P = MMDistributedDataParallel(
-                model.cuda(),
+                model_k.cuda(),
                 device_ids=[torch.cuda.current_device()],
                 broadcast_buffers=False)
 
@@ -354,7 +359,7 @@ def main():
                 # hard-code way to remove EvalHook args
                 for key in [
                         'interval', 'tmpdir', 'start', 'gpu_collect', 'save_best',
-                        'rule', 'dynamic_intervals'
+                        'rule', 'dynamic_intervals', 'async_eval'
                 ]:
                     eval_kwargs.pop(key, None)
                 eval_kwargs.update(dict(metric=args.eval, **kwargs))
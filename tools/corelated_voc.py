@@ -362,7 +362,7 @@ def main():
                 # hard-code way to remove EvalHook args
                 for key in [
                         'interval', 'tmpdir', 'start', 'gpu_collect', 'save_best',
-                        'rule', 'dynamic_intervals'
+                        'rule', 'dynamic_intervals', 'async_eval'
                 ]:
                     eval_kwargs.pop(key, None)
                 eval_kwargs.update(dict(metric=args.eval, **kwargs))
@@ -0,0 +1,62 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import argparse
+
+from mmcv import Config, DictAction
+
+from mmdet.datasets import build_dataset, pack_dataset
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Pack the images and annotations of a dataset into large '
+        'sharded files to be read with PackedDataset')
+    parser.add_argument('config', help='config file path')
+    parser.add_argument(
+        'out_prefix',
+        help='output path prefix, the index is written to {out_prefix}.pkl '
+        'and the shards to {out_prefix}-{i:05d}.bin')
+    parser.add_argument(
+        '--split',
+        default='train',
+        choices=['train', 'val', 'test'],
+        help='which dataset of the config to pack')
+    parser.add_argument(
+        '--shard-size',
+        type=int,
+        default=1024,
+        help='maximum size of a shard in MiB')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file. If the value to '
+        'be overwritten is a list, it should be like key="[a,b]" or key=a,b '
+        'It also allows nested list/tuple values, e.g. key="[(a,b),(c,d)]" '
+        'Note that the quotation marks are necessary and that no white space '
+        'is allowed.')
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = parse_args()
+    cfg = Config.fromfile(args.config)
+    if args.cfg_options is not None:
+        cfg.merge_from_dict(args.cfg_options)
+
+    data_cfg = cfg.data[args.split]
+    # unwrap RepeatDataset, MultiImageMixDataset, etc.
+    while 'dataset' in data_cfg:
+        data_cfg = data_cfg['dataset']
+    # images are read as raw bytes, the pipeline is never run
+    data_cfg.pipeline = []
+    dataset = build_dataset(data_cfg)
+
+    index_file = pack_dataset(dataset, args.out_prefix,
+                              args.shard_size * 1024 * 1024)
+    print(f'\nPacked {len(dataset)} images into {index_file}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import asyncio
+import time
+from argparse import ArgumentParser
+
+import cv2
+import numpy as np
+
+from mmdet.apis import build_server, init_detector
+from mmdet.apis.server import LatencyHistogram, http_request
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Load test the micro-batching inference server on '
+        'localhost')
+    parser.add_argument('config', help='Config file')
+    parser.add_argument(
+        '--checkpoint', help='Checkpoint file, random weights if not given')
+    parser.add_argument('--img', help='Image file, random images if not given')
+    parser.add_argument(
+        '--img-size',
+        type=int,
+        nargs=2,
+        default=[480, 640],
+        help='Height and width of the random images')
+    parser.add_argument(
+        '--device', default='cpu', help='Device used for inference')
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=16,
+        help='Number of clients sending requests in a loop')
+    parser.add_argument(
+        '--rate',
+        type=float,
+        help='Send the requests at this rate per second instead, whatever '
+        'the responses (open loop)')
+    parser.add_argument(
+        '--num-requests', type=int, default=200, help='Number of requests')
+    parser.add_argument(
+        '--max-batch-size',
+        type=int,
+        default=8,
+        help='Max number of images of a batch')
+    parser.add_argument(
+        '--max-wait-ms',
+        type=float,
+        default=10.,
+        help='Max time an image waits for its batch to fill')
+    parser.add_argument(
+        '--max-pending', type=int, default=64, help='Max queued images')
+    args = parser.parse_args()
+    return args
+
+
+async def run_clients(port, body, num_requests, concurrency, rate=None):
+    """Send the requests and measure their latency on the client side.
+
+    Returns:
+        tuple[:obj:`LatencyHistogram`, dict, float]: The latencies of the
+            successful requests, the number of responses of each status and
+            the duration.
+    """
+    histogram = LatencyHistogram()
+    statuses = {}
+    connections = asyncio.Queue()
+    for _ in range(concurrency if rate is None else 4 * concurrency):
+        connection = await asyncio.open_connection('127.0.0.1', port)
+        connections.put_nowait(connection)
+
+    async def send():
+        reader, writer = await connections.get()
+        start = time.perf_counter()
+        status, _ = await http_request(reader, writer, 'POST', '/predict',
+                                       body)
+        connections.put_nowait((reader, writer))
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == 200:
+            histogram.add(time.perf_counter() - start)
+
+    async def client(num):
+        for _ in range(num):
+            await send()
+
+    start = time.perf_counter()
+    if rate is None:
+        # closed loop: each client sends a request once the last is done
+        nums = np.full(concurrency, num_requests // concurrency)
+        nums[:num_requests % concurrency] += 1
+        await asyncio.gather(*[client(num) for num in nums])
+    else:
+        tasks = []
+        for i in range(num_requests):
+            await asyncio.sleep(max(start + i / rate - time.perf_counter(), 0))
+            tasks.append(asyncio.ensure_future(send()))
+        await asyncio.gather(*tasks)
+    duration = time.perf_counter() - start
+    while not connections.empty():
+        connections.get_nowait()[1].close()
+    return histogram, statuses, duration
+
+
+async def benchmark(args):
+    model = init_detector(args.config, args.checkpoint, device=args.device)
+    if args.checkpoint is None:
+        model.CLASSES = tuple(map(str, range(model.bbox_head.num_classes)))
+    if args.img is not None:
+        with open(args.img, 'rb') as f:
+            body = f.read()
+    else:
+        rng = np.random.RandomState(0)
+        img = rng.randint(0, 256, tuple(args.img_size) + (3, ), np.uint8)
+        body = cv2.imencode('.jpg', img)[1].tobytes()
+
+    server = build_server(
+        model,
+        port=0,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_pending=args.max_pending)
+    await server.start()
+    try:
+        # warm up
+        await run_clients(server.port, body, 2, 1)
+        histogram, statuses, duration = await run_clients(
+            server.port, body, args.num_requests, args.concurrency, args.rate)
+        stats = server.batcher.stats()
+    finally:
+        await server.stop()
+
+    print(f'{args.num_requests} requests in {duration:.2f} s, '
+          f'{histogram.count / duration:.1f} img/s, statuses {statuses}')
+    summary = histogram.summary()
+    latencies = [
+        f'{key} {summary[key]:.1f}'
+        for key in ['mean', 'p50', 'p90', 'p99', 'max']
+    ]
+    print('client latency (ms): ' + ', '.join(latencies))
+    print(f'server: {stats["num_batches"]} batches, mean batch size '
+          f'{stats["mean_batch_size"]:.2f}, latency p99 '
+          f'{stats["latency_ms"]["p99"]:.1f} ms')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    asyncio.get_event_loop().run_until_complete(benchmark(args))
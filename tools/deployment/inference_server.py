@@ -0,0 +1,82 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import asyncio
+from argparse import ArgumentParser
+
+import mmcv
+
+from mmdet.apis import build_server, init_detector
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Serve a detector over HTTP with micro-batching')
+    parser.add_argument('config', help='Config file')
+    parser.add_argument('checkpoint', help='Checkpoint file')
+    parser.add_argument(
+        '--device', default='cpu', help='Device used for inference')
+    parser.add_argument(
+        '--host', default='127.0.0.1', help='Host to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='Port')
+    parser.add_argument(
+        '--max-batch-size',
+        type=int,
+        default=8,
+        help='Max number of images of a batch')
+    parser.add_argument(
+        '--max-wait-ms',
+        type=float,
+        default=10.,
+        help='Max time an image waits for its batch to fill')
+    parser.add_argument(
+        '--max-pending',
+        type=int,
+        default=64,
+        help='Max number of queued images, the new requests are rejected '
+        'with 503 beyond it')
+    parser.add_argument(
+        '--archs',
+        help='JSON or YAML file of the arch of each tier, to serve the '
+        'subnets of a supernet, ordered from the most accurate to the '
+        'fastest')
+    parser.add_argument(
+        '--slo-ms',
+        type=float,
+        help='Default latency SLO of the requests, the subnet of a request '
+        'is the most accurate one meeting it')
+    parser.add_argument(
+        '--target-ms',
+        type=float,
+        help='p95 latency target of a controller switching the subnet of '
+        'the requests with the load')
+    args = parser.parse_args()
+    return args
+
+
+async def serve(args):
+    model = init_detector(args.config, args.checkpoint, device=args.device)
+    archs = mmcv.load(args.archs) if args.archs is not None else None
+    server = build_server(
+        model,
+        host=args.host,
+        port=args.port,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_pending=args.max_pending,
+        archs=archs,
+        slo_ms=args.slo_ms,
+        target_ms=args.target_ms)
+    await server.start()
+    print(f'Serving on http://{server.host}:{server.port}, '
+          'POST /predict with an encoded image, GET /stats')
+    if archs is not None:
+        print(f'Tiers {list(archs)}, POST /predict?tier=<tier> or '
+              '/predict?slo_ms=<ms> to choose one')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    asyncio.get_event_loop().run_until_complete(serve(args))
@@ -6,7 +6,7 @@ import mmcv
 import torch
 from ts.torch_handler.base_handler import BaseHandler
 
-from mmdet.apis import inference_detector, init_detector
+from mmdet.apis import InferenceSession, init_detector
 
 
 class MMdetHandler(BaseHandler):
@@ -26,6 +26,8 @@ class MMdetHandler(BaseHandler):
         self.config_file = os.path.join(model_dir, 'config.py')
 
         self.model = init_detector(self.config_file, checkpoint, self.device)
+        # the test pipeline is built once for all the batches
+        self.session = InferenceSession(self.model)
         self.initialized = True
 
     def preprocess(self, data):
@@ -41,31 +43,26 @@ class MMdetHandler(BaseHandler):
         return images
 
     def inference(self, data, *args, **kwargs):
-        results = inference_detector(self.model, data)
+        results = self.session.predict(data)
         return results
 
     def postprocess(self, data):
         # Format output following the example ObjectDetectionHandler format
         output = []
-        for image_index, image_result in enumerate(data):
+        for image_index in range(len(data)):
             output.append([])
-            if isinstance(image_result, tuple):
-                bbox_result, segm_result = image_result
-                if isinstance(segm_result, tuple):
-                    segm_result = segm_result[0]  # ms rcnn
-            else:
-                bbox_result, segm_result = image_result, None
-
-            for class_index, class_result in enumerate(bbox_result):
-                class_name = self.model.CLASSES[class_index]
-                for bbox in class_result:
-                    bbox_coords = bbox[:-1].tolist()
-                    score = float(bbox[-1])
-                    if score >= self.threshold:
-                        output[image_index].append({
-                            'class_name': class_name,
-                            'bbox': bbox_coords,
-                            'score': score
-                        })
+            start = data.img_offsets[image_index]
+            end = data.img_offsets[image_index + 1]
+            for bbox, score, label in zip(data.bboxes[start:end],
+                                          data.scores[start:end],
+                                          data.labels[start:end]):
+                class_name = self.model.CLASSES[label]
+                score = float(score)
+                if score >= self.threshold:
+                    output[image_index].append({
+                        'class_name': class_name,
+                        'bbox': bbox.tolist(),
+                        'score': score
+                    })
 
         return output
@@ -0,0 +1,156 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import argparse
+import os.path as osp
+import time
+
+import mmcv
+import torch
+from mmcv import Config, DictAction
+from mmcv.parallel import MMDataParallel
+
+from mmdet.apis import single_gpu_test
+from mmdet.core.export import (build_model_from_cfg, collect_calib_imgs,
+                               export_quantized_torchscript,
+                               materialize_subnet, quantize_detector)
+from mmdet.datasets import (build_dataloader, build_dataset,
+                            replace_ImageToTensor)
+from mmdet.models.utils import USConv2d
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Quantize a dense model or a subnet of a supernet to int8 '
+        'and evaluate the mAP drop')
+    parser.add_argument('config', help='test config file path')
+    parser.add_argument('checkpoint', help='checkpoint file')
+    parser.add_argument(
+        '--arch',
+        help='JSON or YAML file of the arch of the subnet, or of the archs '
+        'of the tiers, if the model is a supernet')
+    parser.add_argument(
+        '--tier', help='tier of the arch, if the arch file has tiers')
+    parser.add_argument(
+        '--calib-imgs',
+        type=int,
+        default=64,
+        help='number of train images to calibrate on')
+    parser.add_argument(
+        '--calib-cache',
+        help='file the calibration images are cached in, loaded if it exists')
+    parser.add_argument(
+        '--backend',
+        default='x86',
+        choices=['x86', 'fbgemm', 'qnnpack'],
+        help='quantized engine')
+    parser.add_argument(
+        '--allow-batch-stat-bn',
+        action='store_true',
+        help='quantize a subnet even if the BNs of the supernet normalize '
+        'with the statistics of each batch (bn_training_mode), with their '
+        'running statistics, so it differs from the supernet')
+    parser.add_argument(
+        '--output-file', help='TorchScript file of the quantized network')
+    parser.add_argument(
+        '--eval',
+        type=str,
+        nargs='+',
+        help='evaluation metrics of the float and the int8 models on the '
+        'test set, e.g., "bbox", "mAP"')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file. If the value to '
+        'be overwritten is a list, it should be like key="[a,b]" or key=a,b '
+        'It also allows nested list/tuple values, e.g. key="[(a,b),(c,d)]" '
+        'Note that the quotation marks are necessary and that no white space '
+        'is allowed.')
+    args = parser.parse_args()
+    return args
+
+
+def get_calib_imgs(cfg, args):
+    if args.calib_cache is not None and osp.isfile(args.calib_cache):
+        return torch.load(args.calib_cache)
+    dataset = build_dataset(cfg.data.train)
+    data_loader = build_dataloader(
+        dataset,
+        samples_per_gpu=min(cfg.data.samples_per_gpu, args.calib_imgs),
+        workers_per_gpu=cfg.data.workers_per_gpu,
+        dist=False,
+        shuffle=True,
+        seed=0)
+    calib_imgs = collect_calib_imgs(data_loader, args.calib_imgs)
+    if args.calib_cache is not None:
+        torch.save(calib_imgs, args.calib_cache)
+    return calib_imgs
+
+
+def evaluate(model, cfg, args):
+    """Test a model on CPU, get its metrics and its time per image."""
+    cfg.data.test.test_mode = True
+    cfg.data.test.pipeline = replace_ImageToTensor(cfg.data.test.pipeline)
+    dataset = build_dataset(cfg.data.test)
+    data_loader = build_dataloader(
+        dataset,
+        samples_per_gpu=1,
+        workers_per_gpu=cfg.data.workers_per_gpu,
+        dist=False,
+        shuffle=False)
+    start = time.perf_counter()
+    outputs = single_gpu_test(MMDataParallel(model), data_loader)
+    ms_per_img = (time.perf_counter() - start) * 1000 / len(dataset)
+
+    eval_kwargs = cfg.get('evaluation', {}).copy()
+    # hard-code way to remove EvalHook args
+    for key in [
+            'interval', 'tmpdir', 'start', 'gpu_collect', 'save_best', 'rule',
+            'dynamic_intervals', 'async_eval'
+    ]:
+        eval_kwargs.pop(key, None)
+    eval_kwargs.update(dict(metric=args.eval))
+    return dataset.evaluate(outputs, **eval_kwargs), ms_per_img
+
+
+def main():
+    args = parse_args()
+    cfg = Config.fromfile(args.config)
+    if args.cfg_options is not None:
+        cfg.merge_from_dict(args.cfg_options)
+
+    model = build_model_from_cfg(args.config, args.checkpoint,
+                                 args.cfg_options)
+    arch = None
+    if args.arch is not None:
+        arch = mmcv.load(args.arch)
+        if args.tier is not None:
+            arch = arch[args.tier]
+    if any(isinstance(m, USConv2d) for m in model.modules()):
+        # the float reference normalizes with the running statistics too
+        model = materialize_subnet(
+            model, arch, fuse_bn=False, strict=not args.allow_batch_stat_bn)
+    model = model.cpu()
+
+    calib_imgs = get_calib_imgs(cfg, args)
+    qmodel = quantize_detector(model, calib_imgs, backend=args.backend)
+    print(f'Calibrated on {sum(len(img) for img in calib_imgs)} images')
+
+    if args.output_file is not None:
+        img_scale = cfg.test_pipeline[1]['img_scale']
+        input_shape = (1, 3, img_scale[1], img_scale[0])
+        export_quantized_torchscript(qmodel, input_shape, args.output_file)
+        print(f'Successfully exported TorchScript model: {args.output_file}')
+
+    if args.eval:
+        float_metric, float_ms = evaluate(model, cfg, args)
+        int8_metric, int8_ms = evaluate(qmodel, cfg, args)
+        print(f'float: {float_ms:.1f} ms/img, {float_metric}')
+        print(f'int8: {int8_ms:.1f} ms/img, {int8_metric}')
+        for key, value in float_metric.items():
+            if isinstance(value, float) and key in int8_metric:
+                print(f'{key} drop: {value - int8_metric[key]:.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from argparse import ArgumentParser
+
+import mmcv
+import numpy as np
+
+from mmdet.apis import SubnetSession, init_detector
+from mmdet.apis.controller import (ArchController, bursty_arrivals,
+                                   poisson_arrivals, simulate_serving)
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Simulate the serving of a synthetic trace with each '
+        'tier and with the load-adaptive arch controller')
+    parser.add_argument(
+        'archs',
+        help='JSON or YAML file of the arch of each tier, from the most '
+        'accurate to the fastest, see tools/search/pareto_archs.py')
+    parser.add_argument(
+        '--latency-ms',
+        type=float,
+        nargs='+',
+        help='Latency per image of each tier, in ms. If not given, they are '
+        'measured on a random image with --config')
+    parser.add_argument(
+        '--config', help='Config file of the supernet to measure the tiers')
+    parser.add_argument(
+        '--checkpoint', help='Checkpoint file, random weights if not given')
+    parser.add_argument(
+        '--img-size',
+        type=int,
+        nargs=2,
+        default=[480, 640],
+        help='Height and width of the random image')
+    parser.add_argument(
+        '--batch-overhead-ms',
+        type=float,
+        default=5.,
+        help='Fixed run time of a batch, in ms')
+    parser.add_argument(
+        '--switch-ms', type=float, default=1., help='Cost of a switch in ms')
+    parser.add_argument(
+        '--target-ms', type=float, default=300., help='p95 latency target')
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=15.,
+        help='Mean number of requests per second')
+    parser.add_argument(
+        '--burst-rate',
+        type=float,
+        help='Mean number of requests per second in the bursts, a Poisson '
+        'trace at --rate if not given')
+    parser.add_argument(
+        '--period', type=float, default=10., help='Period of the bursts')
+    parser.add_argument(
+        '--burst-duration',
+        type=float,
+        default=3.,
+        help='Duration of the bursts, in seconds')
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=120.,
+        help='Duration of the trace, in seconds')
+    parser.add_argument(
+        '--max-batch-size',
+        type=int,
+        default=8,
+        help='Max number of images of a batch')
+    parser.add_argument(
+        '--max-wait-ms',
+        type=float,
+        default=10.,
+        help='Max time an image waits for its batch to fill')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = parse_args()
+    archs = mmcv.load(args.archs)
+    tiers = list(archs)
+    if args.latency_ms is not None:
+        assert len(args.latency_ms) == len(tiers), \
+            'a latency per tier is required'
+        latency_ms = dict(zip(tiers, args.latency_ms))
+    else:
+        assert args.config is not None, '--config or --latency-ms is required'
+        model = init_detector(args.config, args.checkpoint, device='cpu')
+        if args.checkpoint is None:
+            model.CLASSES = tuple(map(str, range(model.bbox_head.num_classes)))
+        img = np.random.RandomState(0).randint(0, 256,
+                                               tuple(args.img_size) + (3, ),
+                                               np.uint8)
+        latency_ms = SubnetSession(model, archs).profile(img)
+
+    if args.burst_rate is None:
+        arrivals = poisson_arrivals(args.rate, args.duration, args.seed)
+    else:
+        arrivals = bursty_arrivals(args.rate, args.burst_rate, args.period,
+                                   args.burst_duration, args.duration,
+                                   args.seed)
+
+    def service_ms(tier, batch_size):
+        return args.batch_overhead_ms + latency_ms[tier] * batch_size
+
+    kwargs = dict(
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        switch_ms=args.switch_ms)
+    runs = [(tier, simulate_serving(arrivals, service_ms, tier=tier, **kwargs))
+            for tier in tiers]
+    controller = ArchController(tiers, args.target_ms)
+    runs.append(('controller',
+                 simulate_serving(
+                     arrivals, service_ms, controller=controller, **kwargs)))
+
+    print(f'{len(arrivals)} requests in {args.duration:.0f} s, '
+          f'target p95 {args.target_ms:.0f} ms')
+    for name, result in runs:
+        latencies = result['latency_ms']
+        shares = ', '.join(f'{tier} {np.mean(result["tiers"] == tier):.0%}'
+                           for tier in tiers)
+        print(f'{name}: p50 {np.percentile(latencies, 50):.1f} ms, '
+              f'p95 {np.percentile(latencies, 95):.1f} ms, '
+              f'{len(latencies) / result["duration"]:.1f} img/s, '
+              f'{result["num_switches"]} switches, {shares}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import argparse
+import os.path as osp
+
+import mmcv
+from mmcv import Config, DictAction
+
+from mmdet.core.export import (build_subnet_from_cfg, export_subnet_to_onnx,
+                               preprocess_example_input, verify_subnet_onnx)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Export a subnet of a searchable supernet to ONNX')
+    parser.add_argument('config', help='config file of the supernet')
+    parser.add_argument('checkpoint', help='checkpoint file of the supernet')
+    parser.add_argument(
+        'arch',
+        help='JSON or YAML file of the arch of the subnet, or of the archs '
+        'of the tiers, see tools/search/pareto_archs.py')
+    parser.add_argument(
+        '--tier', help='tier of the arch, if the arch file has tiers')
+    parser.add_argument('--output-file', type=str, default='subnet.onnx')
+    parser.add_argument('--opset-version', type=int, default=11)
+    parser.add_argument(
+        '--shape',
+        type=int,
+        nargs='+',
+        default=None,
+        help='input image size (height, width), the img_scale of the test '
+        'pipeline if not given')
+    parser.add_argument(
+        '--dynamic-batch',
+        action='store_true',
+        help='Whether the batch size of the graph is dynamic')
+    parser.add_argument(
+        '--skip-nms',
+        action='store_true',
+        help='Whether to export the decoded boxes and scores without NMS')
+    parser.add_argument(
+        '--no-fuse-bn',
+        action='store_true',
+        help='Whether to keep the BNs instead of folding them into the convs')
+    parser.add_argument(
+        '--allow-batch-stat-bn',
+        action='store_true',
+        help='export even if the BNs of the supernet normalize with the '
+        'statistics of each batch (bn_training_mode), with their running '
+        'statistics, so the graph differs from the supernet')
+    parser.add_argument(
+        '--verify',
+        action='store_true',
+        help='verify the onnx model output against pytorch output')
+    parser.add_argument('--input-img', type=str, help='Image to verify on')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        help='Override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file. If the value to '
+        'be overwritten is a list, it should be like key="[a,b]" or key=a,b '
+        'It also allows nested list/tuple values, e.g. key="[(a,b),(c,d)]" '
+        'Note that the quotation marks are necessary and that no white space '
+        'is allowed.')
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = parse_args()
+    assert args.opset_version == 11, 'MMDet only support opset 11 now'
+
+    cfg = Config.fromfile(args.config)
+    if args.cfg_options is not None:
+        cfg.merge_from_dict(args.cfg_options)
+    if args.shape is None:
+        img_scale = cfg.test_pipeline[1]['img_scale']
+        input_shape = (1, 3, img_scale[1], img_scale[0])
+    elif len(args.shape) == 1:
+        input_shape = (1, 3, args.shape[0], args.shape[0])
+    elif len(args.shape) == 2:
+        input_shape = (1, 3) + tuple(args.shape)
+    else:
+        raise ValueError('invalid input shape')
+
+    arch = mmcv.load(args.arch)
+    if args.tier is not None:
+        arch = arch[args.tier]
+    model = build_subnet_from_cfg(
+        args.config,
+        args.checkpoint,
+        arch,
+        cfg_options=args.cfg_options,
+        fuse_bn=not args.no_fuse_bn,
+        strict=not args.allow_batch_stat_bn)
+    export_subnet_to_onnx(
+        model,
+        input_shape,
+        args.output_file,
+        with_nms=not args.skip_nms,
+        dynamic_batch=args.dynamic_batch,
+        opset_version=args.opset_version)
+    print(f'Successfully exported ONNX model: {args.output_file}')
+
+    if args.verify:
+        if not args.input_img:
+            args.input_img = osp.join(
+                osp.dirname(__file__), '../../demo/demo.jpg')
+        # YOLOX takes the images without normalization
+        img, _ = preprocess_example_input(
+            dict(input_shape=input_shape, input_path=args.input_img))
+        verify_subnet_onnx(args.output_file, model, img.detach())
+        print('The numerical values are the same between Pytorch and ONNX')
+
+
+if __name__ == '__main__':
+    main()
@@ -14,7 +14,7 @@ from mmcv.runner import (get_dist_info, init_dist, load_checkpoint,
                          wrap_fp16_model)
 
 from mmdet.apis import multi_gpu_test, single_gpu_test
-from mmdet.datasets import (build_dataloader, build_dataset,
+from mmdet.datasets import (ReplayDataset, build_dataloader, build_dataset,
                             replace_ImageToTensor)
 from mmdet.models import build_detector
 from mmdet.apis import init_random_seed, set_random_seed, train_detector
@@ -157,6 +157,12 @@ class EvolutionSearcher(object):
 
         # dataset
         self.train_dataset = build_dataset(self.cfg.data.train_val)
+        if args.replay_seed is not None or args.replay_cache_dir:
+            # same calibration batches for every candidate
+            self.train_dataset = ReplayDataset(
+                self.train_dataset,
+                seed=args.replay_seed or 0,
+                cache_dir=args.replay_cache_dir)
         self.train_data_loader = build_dataloader(
             self.train_dataset,
             samples_per_gpu=self.cfg.data.samples_per_gpu, # !
@@ -0,0 +1,99 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import argparse
+
+import mmcv
+import numpy as np
+import torch
+from mmcv import Config
+from utils import tuple_to_dict
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Get the Pareto archs of a search, from the most '
+        'accurate to the fastest, as the tiers of SubnetSession')
+    parser.add_argument('config', help='config file of the search')
+    parser.add_argument(
+        'search_checkpoint',
+        help='checkpoint of the search, e.g. summary/ea_checkpoint.pth.tar')
+    parser.add_argument('out', help='output JSON file of the archs')
+    parser.add_argument(
+        '--max-tiers',
+        type=int,
+        help='keep this number of archs, evenly spread over the front')
+    parser.add_argument(
+        '--cost',
+        default='fp',
+        choices=['fp', 'int8_ms'],
+        help='cost of the candidates, their GFLOPs or their int8 latency '
+        'estimated with --int8-latency in the search')
+    args = parser.parse_args()
+    return args
+
+
+def idx_to_arch(cand, widen_factor_range, deepen_factor_range):
+    """Get the arch of a candidate of the search, like
+    ``EvolutionSearcher.idx_to_arch``."""
+    cand = tuple_to_dict(cand)
+    widen_factor_backbone = [
+        widen_factor_range[i] for i in cand['widen_factor_backbone_idx']
+    ]
+    deepen_factor = [deepen_factor_range[i] for i in cand['deepen_factor_idx']]
+    widen_factor_neck = [
+        widen_factor_range[i] for i in cand['widen_factor_neck_idx']
+    ]
+    widen_factor_neck_out = widen_factor_range[
+        cand['widen_factor_neck_out_idx']]
+    return dict(
+        widen_factor_backbone=tuple(widen_factor_backbone),
+        deepen_factor=tuple(deepen_factor),
+        widen_factor_neck=tuple(widen_factor_neck),
+        widen_factor_neck_out=widen_factor_neck_out)
+
+
+def pareto_front(vis_dict, cost='fp'):
+    """Get the candidates which no other one beats in both mAP and cost.
+
+    Args:
+        vis_dict (dict): The info of the candidates of the search.
+        cost (str): The key of the cost in the info, 'fp' for the GFLOPs or
+            'int8_ms' for the int8 latency. Default: 'fp'.
+
+    Returns:
+        list[tuple]: The candidates, from the most accurate to the fastest.
+    """
+    cands = [
+        cand for cand, info in vis_dict.items()
+        if 'map' in info and cost in info
+    ]
+    cands.sort(key=lambda cand: (vis_dict[cand][cost], -vis_dict[cand]['map']))
+    front, best_map = [], -np.inf
+    for cand in cands:
+        if vis_dict[cand]['map'] > best_map:
+            front.append(cand)
+            best_map = vis_dict[cand]['map']
+    return front[::-1]
+
+
+def main():
+    args = parse_args()
+    cfg = Config.fromfile(args.config)
+    vis_dict = torch.load(args.search_checkpoint)['vis_dict']
+    front = pareto_front(vis_dict, args.cost)
+    if args.max_tiers is not None and len(front) > args.max_tiers:
+        keep = np.linspace(0, len(front) - 1, args.max_tiers)
+        front = [front[i] for i in np.unique(np.round(keep).astype(int))]
+
+    archs = {}
+    for i, cand in enumerate(front):
+        info = vis_dict[cand]
+        archs[f'tier{i}'] = idx_to_arch(cand, cfg.widen_factor_range,
+                                        cfg.deepen_factor_range)
+        int8 = f', {info["int8_ms"]} ms int8' if 'int8_ms' in info else ''
+        print(f'tier{i}: mAP {info["map"]:.4f}, {info["fp"]} GFLOPS, '
+              f'{info.get("size")} M params{int8}')
+    mmcv.dump(archs, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -21,7 +21,9 @@ from mmdet.apis import init_random_seed, set_random_seed, train_detector
 
 from utils import get_broadcast_cand, dict_to_tuple, tuple_to_dict, get_test_data, check_cand
 from trainer import parse_args, get_train_data, train_model, get_model, get_cfg
-from tester import get_cand_map, get_cand_map_new, forward_model
+from tester import get_cand_map, get_cand_map_new, forward_model, \
+    build_evaluator, build_subset_loader, update_cand_evaluator
+from mmdet.core.export import Int8CostModel
 import time
 import logging
 import numpy as np
@@ -149,6 +151,11 @@ class EvolutionSearcher(object):
         self.flops_limit = args.flops_limit # None (float) # 17.651 M 122.988 GFLOPS
         self.params_limit = args.params_limit
         self.input_shape = (3,) + tuple(args.shape) # default=[1280, 800]  [3,1280,800] todo?
+        self.int8_latency_limit = args.int8_latency_limit
+        self.int8_cost_model = None
+        if args.int8_latency or args.int8_latency_limit:
+            self.int8_cost_model = Int8CostModel(
+                self.input_shape, cache_file=args.int8_latency_cache)
         self.cfg, self.meta = get_cfg(self.args) # 获取cfg文件所有内容到meta上
         self.cfg = self.cfg.copy()
 
@@ -192,6 +199,20 @@ class EvolutionSearcher(object):
         self.epoch = 0
         self.candidates = []
 
+        # evaluators of the candidates of the top-k, kept on rank 0 for the
+        # paired bootstrap of their mAP
+        self.evaluators = {}
+        if args.bootstrap_samples:
+            assert args.eval == ['mAP'] and build_evaluator(
+                args, self.test_dataset) is not None, \
+                'the bootstrap needs the mAP of a dataset with build_evaluator'
+            # a fixed random subset of the test images decides the pruning
+            num_imgs = len(self.test_dataset)
+            perm = np.random.RandomState(0).permutation(num_imgs)
+            num_prune_imgs = int(num_imgs * args.prune_ratio)
+            self.prune_img_ids = sorted(perm[:num_prune_imgs].tolist())
+            self.rest_img_ids = sorted(perm[num_prune_imgs:].tolist())
+
     def save_checkpoint(self):
         info = {}
         info['memory'] = self.memory
@@ -283,10 +304,19 @@ class EvolutionSearcher(object):
         # todo: params可变，但是flops不变，FLOPs与卷积核通道有无关系？
         flops = round(flops / 10. ** 9, 2)
         params = round(params / 10 ** 6, 2)
+        # int8 latency estimated by the per-conv cost model, on CPU
+        int8_ms = None
+        if self.int8_cost_model is not None:
+            # only rank 0 measures and writes the cache, is_legal
+            # broadcasts its latency to the other ranks
+            int8_ms = 0.
+            if get_dist_info()[0] == 0:
+                int8_ms = round(self.int8_cost_model(model.cpu()), 2)
+                self.int8_cost_model.save()
 
         torch.cuda.empty_cache()
         del model
-        return params, flops, cfg
+        return params, flops, int8_ms, cfg
 
     def is_legal(self, arch, **kwargs):
         rank, world_size = get_dist_info()
@@ -299,35 +329,45 @@ class EvolutionSearcher(object):
         info = self.vis_dict[cand]
         if 'visited' in info:
             return False
-        size, fp, cfg = self.get_param(arch)  # 获得子网的参数量和flops
+        size, fp, int8_ms, cfg = self.get_param(arch)  # 获得子网的参数量和flops
 
         rank, _ = get_dist_info()
         if rank == 0:
-            print(size, fp) # 46.01 50.05 Config # 8.65 49.73
+            print(size, fp, int8_ms) # 46.01 50.05 Config # 8.65 49.73
 
         size = get_broadcast_cand(size, self.distributed, rank)
         fp = get_broadcast_cand(fp, self.distributed, rank)
+        if int8_ms is not None:
+            # only measured on rank 0
+            int8_ms = get_broadcast_cand(int8_ms, self.distributed, rank)
 
         if (self.flops_limit and fp > self.flops_limit)\
-                or (self.params_limit and size > self.params_limit): # 硬件约束筛选
+                or (self.params_limit and size > self.params_limit) \
+                or (self.int8_latency_limit
+                    and int8_ms > self.int8_latency_limit): # 硬件约束筛选
             del size, fp, cfg
             return False
 
         info['fp'] = fp
         info['size'] = size
+        if int8_ms is not None:
+            info['int8_ms'] = int8_ms
         info['cfg'] = cfg
         del size, fp, cfg
         self.model.set_arch(self.idx_to_arch(arch)) # 这里set_ARCH,修改了模型参数
 
         # 获得当前模型的map
-        map = get_cand_map_new(self.model,
-                           self.args,
-                           self.distributed,
-                           self.cfg,
-                           self.train_data_loader,
-                           self.train_dataset,
-                           self.test_data_loader,
-                           self.test_dataset) #  # (0.6599323749542236,)
+        if self.args.bootstrap_samples:
+            map = self.get_cand_map_bootstrap(cand, info)
+        else:
+            map = get_cand_map_new(self.model,
+                               self.args,
+                               self.distributed,
+                               self.cfg,
+                               self.train_data_loader,
+                               self.train_dataset,
+                               self.test_data_loader,
+                               self.test_dataset) #  # (0.6599323749542236,)
 
         # map = []
         # map.append(round(random.uniform(0, 1),2))
@@ -356,6 +396,59 @@ class EvolutionSearcher(object):
 
         return False
 
+    def get_cand_map_bootstrap(self, cand, info):
+        """Evaluate a candidate and bootstrap its mAP over the test images.
+
+        Once the top-k is full, the candidate is first evaluated on
+        ``prune_ratio`` of the images. If its mAP minus the one of the k-th
+        best candidate, bootstrapped on the same resamples of these images,
+        is below 0 with confidence ``1 - bootstrap_alpha``, the candidate is
+        pruned without evaluating the other images and its mAP is estimated
+        as the k-th best one plus the mean difference. Otherwise the
+        confidence interval of its mAP is kept in ``info['map_ci']``.
+        """
+        args = self.args
+        rank, _ = get_dist_info()
+        num_samples, alpha = args.bootstrap_samples, args.bootstrap_alpha
+        evaluator = build_evaluator(args, self.test_dataset)
+        top_k = self.keep_top_k[self.select_num]
+        ref = top_k[-1] if len(top_k) == self.select_num else None
+        # the evaluators are not saved, e.g. after resuming the search
+        staged = int(rank == 0 and ref in self.evaluators)
+        staged = get_broadcast_cand(staged, self.distributed, rank)
+        data_loader = self.test_data_loader
+        if staged:
+            merged = update_cand_evaluator(
+                self.model, args, self.distributed,
+                build_subset_loader(data_loader, self.prune_img_ids,
+                                    self.distributed), evaluator)
+            pruned, map_est = 0, 0.
+            if rank == 0:
+                diff = merged.bootstrap(
+                    num_samples, img_ids=self.prune_img_ids) - \
+                    self.evaluators[ref].bootstrap(
+                        num_samples, img_ids=self.prune_img_ids)
+                pruned = int(np.percentile(diff, 100 * (1 - alpha)) < 0)
+                map_est = self.vis_dict[ref]['map'] + float(diff.mean())
+            pruned = get_broadcast_cand(pruned, self.distributed, rank)
+            if pruned:
+                info['pruned'] = True
+                return (map_est, )
+            data_loader = build_subset_loader(data_loader, self.rest_img_ids,
+                                              self.distributed)
+
+        merged = update_cand_evaluator(self.model, args, self.distributed,
+                                       data_loader, evaluator)
+        map, ci = (0., ), (0., 0.)
+        if rank == 0:
+            self.evaluators[cand] = merged
+            map = (self.test_dataset.evaluate(merged)['mAP'], )
+            samples = merged.bootstrap(num_samples)
+            ci = np.percentile(samples, [50 * alpha, 100 - 50 * alpha])
+            ci = tuple(ci.tolist())
+        info['map_ci'] = get_broadcast_cand(ci, self.distributed, rank)
+        return map
+
     def update_top_k(self, candidates, *, k, key, reverse=True):
         # 筛选key排前k=select_num个结构
         # 对candidates里的结构按照map进行排序，选取前k个
@@ -577,6 +670,12 @@ class EvolutionSearcher(object):
             # {2: [(2, 1, 1, 3, 1, 0, 0, 0, 0), (0, 3, 2, 0, 0, 0, 0, 0, 0)],
             # 50: [(2, 1, 1, 3, 1, 0, 0, 0, 0), (0, 3, 2, 0, 0, 0, 0, 0, 0),
             # (2, 2, 1, 3, 3, 0, 0, 0, 0), (3, 1, 3, 3, 1, 0, 0, 0, 0)]}
+            # only the top-k are compared with in the bootstrap pruning
+            self.evaluators = {
+                cand: evaluator
+                for cand, evaluator in self.evaluators.items()
+                if cand in self.keep_top_k[self.select_num]
+            }
 
             print('epoch = {} : top {} result'.format(
                 self.epoch, len(self.keep_top_k[50])))
@@ -585,6 +684,10 @@ class EvolutionSearcher(object):
             for i, cand in enumerate(self.keep_top_k[50]):
                 print('No.{} {} Top-1 map = {}'.format(
                     i + 1, cand, self.vis_dict[cand]['map']))
+                if 'map_ci' in self.vis_dict[cand]:
+                    logging.info('No.{} map {:.0%} CI: [{:.4f}, {:.4f}]'.format(
+                        i + 1, 1 - self.args.bootstrap_alpha,
+                        *self.vis_dict[cand]['map_ci']))
                 cand_dict = tuple_to_dict(cand)
 
                 arch = [cand]
@@ -1,5 +1,6 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import argparse
+import inspect
 import os
 import os.path as osp
 import time
@@ -17,8 +18,9 @@ from mmcv.parallel import MMDataParallel, MMDistributedDataParallel
 from mmcv.runner import (get_dist_info, init_dist, load_checkpoint,
                          wrap_fp16_model)
 
-from mmdet.apis import single_gpu_test
-from mmdet.datasets import (build_dataloader, build_dataset,
+from mmdet.apis import (collect_results_flat, merge_evaluators,
+                        single_gpu_test)
+from mmdet.datasets import (CocoDataset, build_dataloader, build_dataset,
                             replace_ImageToTensor)
 from mmdet.models import build_detector
 from mmdet.utils import collect_env, get_root_logger
@@ -28,6 +30,9 @@ import logging
 import torch.distributed as dist
 from mmcv.image import tensor2imgs
 from mmdet.core import encode_mask_results
+from mmdet.datasets.samplers import (ShapeBucketBatchSampler,
+                                     restore_dataset_order)
+from torch.utils.data import DataLoader
 
 
 def collect_results_cpu(result_part, size, tmpdir=None):
@@ -104,9 +109,18 @@ def collect_results_gpu(result_part, size):
         ordered_results = ordered_results[:size]
         return ordered_results
 
-def multi_gpu_test(model, data_loader, tmpdir=None, gpu_collect=False):
+def multi_gpu_test(model, data_loader, tmpdir=None, gpu_collect=False,
+                   evaluator=None, collect_backend=None):
     results = []
     dataset = data_loader.dataset
+    batch_sampler = data_loader.batch_sampler
+    if evaluator is not None:
+        # fold the results into the evaluator as they arrive
+        if isinstance(batch_sampler, ShapeBucketBatchSampler):
+            indices = batch_sampler.indices
+        else:
+            indices = list(data_loader.sampler)
+        num_done = 0
     rank, world_size = get_dist_info()
     if rank == 0:
         prog_bar = mmcv.ProgressBar(len(dataset))
@@ -114,24 +128,74 @@ def multi_gpu_test(model, data_loader, tmpdir=None, gpu_collect=False):
     for i, data in enumerate(data_loader):
         with torch.no_grad():
             result = model(return_loss=False, rescale=True, **data)
+        batch_size = len(result)
+        if evaluator is not None:
+            evaluator.update(result, indices[num_done:num_done + batch_size])
+            num_done += batch_size
+        else:
             # encode mask results
             if isinstance(result[0], tuple):
                 result = [(bbox_results, encode_mask_results(mask_results))
                           for bbox_results, mask_results in result]
-        results.extend(result)
+            results.extend(result)
 
         if rank == 0:
-            batch_size = len(result)
             for _ in range(batch_size * world_size):
                 prog_bar.update()
 
+    if evaluator is not None:
+        return merge_evaluators(evaluator, tmpdir, gpu_collect)
+    if collect_backend is not None:
+        if isinstance(batch_sampler, ShapeBucketBatchSampler):
+            indices = batch_sampler.indices
+        else:
+            indices = list(data_loader.sampler)
+        return collect_results_flat(results, indices, len(dataset),
+                                    collect_backend)
+
+    if isinstance(batch_sampler, ShapeBucketBatchSampler):
+        # ranks hold different numbers of results, so collect one
+        # (indices, results) part per rank and reorder on rank 0
+        results = [(batch_sampler.indices, results)]
+        size = world_size
+    else:
+        size = len(dataset)
+
     # collect results from all ranks
     if gpu_collect:
-        results = collect_results_gpu(results, len(dataset))
+        results = collect_results_gpu(results, size)
     else:
-        results = collect_results_cpu(results, len(dataset), tmpdir)
+        results = collect_results_cpu(results, size, tmpdir)
+
+    if rank == 0 and isinstance(batch_sampler, ShapeBucketBatchSampler):
+        indices = [idx for part_indices, _ in results for idx in part_indices]
+        results = [res for _, part_results in results for res in part_results]
+        results = restore_dataset_order(results, indices, len(dataset))
     return results
 
+def build_evaluator(args, dataset):
+    """Build an evaluator folding in the results while testing.
+
+    Only used when the mAP, or the COCO bbox metrics of a
+    :obj:`CocoDataset`, are all that is needed from the results.
+    """
+    if args.out or args.format_only \
+            or not hasattr(dataset, 'build_evaluator'):
+        return None
+    kwargs = {} if args.eval_options is None else args.eval_options
+    if args.eval == ['mAP']:
+        # with the iou_thr and scale_ranges evaluate is called with
+        params = inspect.signature(dataset.build_evaluator).parameters
+        return dataset.build_evaluator(
+            **{k: v for k, v in kwargs.items() if k in params})
+    # the subclasses with their own evaluate, e.g. LVIS, take the results
+    if args.eval == ['bbox'] and isinstance(dataset, CocoDataset) \
+            and type(dataset).evaluate is CocoDataset.evaluate:
+        return dataset.build_evaluator(
+            iou_thrs=kwargs.get('iou_thrs'),
+            proposal_nums=kwargs.get('proposal_nums', (100, 300, 1000)))
+    return None
+
 def no_grad_wrapper(func):
     def new_func(*args, **kwargs):
         with torch.no_grad():
@@ -153,7 +217,8 @@ def get_cand_map(model, args, distributed, cfg, train_data_loader, train_dataset
             broadcast_buffers=False)
 
         outputs = multi_gpu_test(model_P, train_data_loader, args.tmpdir,
-                                 args.gpu_collect)
+                                 args.gpu_collect,
+                                 collect_backend=args.collect_backend)
 
     rank, _ = get_dist_info()
     if rank == 0:
@@ -168,7 +233,7 @@ def get_cand_map(model, args, distributed, cfg, train_data_loader, train_dataset
             # hard-code way to remove EvalHook args
             for key in [
                 'interval', 'tmpdir', 'start', 'gpu_collect', 'save_best',
-                'rule', 'dynamic_intervals'
+                'rule', 'dynamic_intervals', 'async_eval'
             ]:
                 eval_kwargs.pop(key, None)
 
@@ -177,10 +242,11 @@ def get_cand_map(model, args, distributed, cfg, train_data_loader, train_dataset
             print(metric)
 
     model.eval()
+    evaluator = build_evaluator(args, test_dataset)
     if not distributed: # False
         model = MMDataParallel(model, device_ids=[0])
         outputs = single_gpu_test(model, test_data_loader, args.show, args.show_dir,
-                                  args.show_score_thr)
+                                  args.show_score_thr, evaluator=evaluator)
     else:
         model = MMDistributedDataParallel(
             model.cuda(),
@@ -188,7 +254,8 @@ def get_cand_map(model, args, distributed, cfg, train_data_loader, train_dataset
             broadcast_buffers=False)
 
         outputs = multi_gpu_test(model, test_data_loader, args.tmpdir,
-                                 args.gpu_collect)
+                                 args.gpu_collect, evaluator=evaluator,
+                                 collect_backend=args.collect_backend)
 
     rank, _ = get_dist_info() # rank = 0
     if rank == 0:
@@ -203,7 +270,7 @@ def get_cand_map(model, args, distributed, cfg, train_data_loader, train_dataset
             # hard-code way to remove EvalHook args
             for key in [
                     'interval', 'tmpdir', 'start', 'gpu_collect', 'save_best',
-                    'rule', 'dynamic_intervals'
+                    'rule', 'dynamic_intervals', 'async_eval'
             ]:
                 eval_kwargs.pop(key, None)
             eval_kwargs.update(dict(metric=args.eval, **kwargs))
@@ -226,10 +293,11 @@ def get_cand_map_new(model, args, distributed, cfg, train_data_loader, train_dat
 
     # model.eval()
     model.train()
+    evaluator = build_evaluator(args, test_dataset)
     if not distributed: # False
         model1 = MMDataParallel(model, device_ids=[0])
         outputs = single_gpu_test(model1, test_data_loader, args.show, args.show_dir,
-                                  args.show_score_thr)
+                                  args.show_score_thr, evaluator=evaluator)
     else:
         model1 = MMDistributedDataParallel(
             model.cuda(),
@@ -237,7 +305,8 @@ def get_cand_map_new(model, args, distributed, cfg, train_data_loader, train_dat
             broadcast_buffers=False)
 
         outputs = multi_gpu_test(model1, test_data_loader, args.tmpdir,
-                                 args.gpu_collect)
+                                 args.gpu_collect, evaluator=evaluator,
+                                 collect_backend=args.collect_backend)
 
     rank, _ = get_dist_info() # rank = 0
     if rank == 0:
@@ -252,7 +321,7 @@ def get_cand_map_new(model, args, distributed, cfg, train_data_loader, train_dat
             # hard-code way to remove EvalHook args
             for key in [
                     'interval', 'tmpdir', 'start', 'gpu_collect', 'save_best',
-                    'rule', 'dynamic_intervals'
+                    'rule', 'dynamic_intervals', 'async_eval'
             ]:
                 eval_kwargs.pop(key, None)
             eval_kwargs.update(dict(metric=args.eval, **kwargs))
@@ -269,6 +338,59 @@ def get_cand_map_new(model, args, distributed, cfg, train_data_loader, train_dat
 
     return None
 
+def build_subset_loader(data_loader, img_ids, distributed):
+    """Build a test loader over some images of the dataset of a loader.
+
+    The sampler yields the indices of the images in the dataset, so the
+    evaluators are updated with the right images. The images of a loader
+    built with ``shape_bucketing`` are still batched by padded shape.
+    """
+    img_ids = list(img_ids)
+    batch_sampler = data_loader.batch_sampler
+    if isinstance(batch_sampler, ShapeBucketBatchSampler):
+        batch_sampler = ShapeBucketBatchSampler(
+            data_loader.dataset,
+            batch_sampler.batch_size,
+            batch_sampler.world_size,
+            batch_sampler.rank,
+            indices=img_ids)
+        return DataLoader(
+            data_loader.dataset,
+            batch_sampler=batch_sampler,
+            num_workers=data_loader.num_workers,
+            collate_fn=data_loader.collate_fn,
+            pin_memory=False)
+    if distributed:
+        rank, world_size = get_dist_info()
+        img_ids += img_ids[:(-len(img_ids)) % world_size]
+        img_ids = img_ids[rank::world_size]
+    return DataLoader(
+        data_loader.dataset,
+        batch_size=data_loader.batch_size or 1,
+        sampler=img_ids,
+        num_workers=data_loader.num_workers,
+        collate_fn=data_loader.collate_fn,
+        pin_memory=False)
+
+@no_grad_wrapper
+def update_cand_evaluator(model, args, distributed, data_loader, evaluator):
+    """Fold the results of a candidate on a loader into its evaluator.
+
+    Returns the evaluator merged over the ranks on rank 0, None on the other
+    ranks, which keep their own evaluator to be updated again.
+    """
+    # same mode as get_cand_map_new
+    model.train()
+    if not distributed:
+        model1 = MMDataParallel(model, device_ids=[0])
+        return single_gpu_test(model1, data_loader, evaluator=evaluator)
+    model1 = MMDistributedDataParallel(
+        model.cuda(),
+        device_ids=[torch.cuda.current_device()],
+        broadcast_buffers=False)
+    return multi_gpu_test(model1, data_loader, args.tmpdir, args.gpu_collect,
+                          evaluator=evaluator)
+
 @no_grad_wrapper
 def forward_model(model, distributed, data_loader, max_iters=0):
     if not distributed:
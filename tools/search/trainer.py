@@ -108,6 +108,11 @@ def parse_args():
         '--tmpdir',
         help='tmp directory used for collecting results from multiple '
              'workers, available when gpu-collect is not specified')
+    parser.add_argument(
+        '--collect-backend',
+        choices=['gloo', 'shm'],
+        help='collect the bbox results of multiple workers as flat arrays '
+             'over gloo or shared memory (single node) instead of pickles')
     parser.add_argument(
         '--eval-options',
         nargs='+',
@@ -124,6 +129,50 @@ def parse_args():
     parser.add_argument('--mutation-num', type=int, default=25)
     parser.add_argument('--params-limit', type=float, default=205)
     parser.add_argument('--flops-limit', type=float, default=None)  # 17.651 M 122.988 GFLOPS
+    parser.add_argument(
+        '--bootstrap-samples',
+        type=int,
+        default=0,
+        help='number of resamples of the test images used to bootstrap '
+             'the mAP confidence interval of each candidate and to prune '
+             'the candidates statistically dominated by the top-k ones '
+             'before the end of their evaluation, 0 to disable. Only for '
+             'the mAP metric of datasets with build_evaluator (e.g. VOC)')
+    parser.add_argument(
+        '--bootstrap-alpha',
+        type=float,
+        default=0.05,
+        help='significance level of the bootstrap intervals and pruning')
+    parser.add_argument(
+        '--prune-ratio',
+        type=float,
+        default=0.25,
+        help='fraction of the test images evaluated before a candidate can '
+             'be pruned')
+    parser.add_argument(
+        '--int8-latency',
+        action='store_true',
+        help='estimate the int8 CPU latency of each candidate with the '
+             'per-conv cost model, recorded as its int8_ms')
+    parser.add_argument(
+        '--int8-latency-limit',
+        type=float,
+        default=None,
+        help='max int8 latency of a candidate in ms, implies --int8-latency')
+    parser.add_argument(
+        '--int8-latency-cache',
+        help='pickle file of the int8 latency of each kind of conv, reused '
+             'across searches')
+    parser.add_argument(
+        '--replay-seed',
+        type=int,
+        default=None,
+        help='replay the random augmentation of the calibration samples '
+             'from this seed, so every candidate sees the same batches')
+    parser.add_argument(
+        '--replay-cache-dir',
+        help='directory caching the replayed calibration samples across '
+             'candidates and runs, implies --replay-seed 0 if unset')
     parser.add_argument('--shape',
                         type=int,
                         nargs='+',
@@ -64,6 +64,11 @@ def parse_args():
         '--tmpdir',
         help='tmp directory used for collecting results from multiple '
              'workers, available when gpu-collect is not specified')
+    parser.add_argument(
+        '--collect-backend',
+        choices=['gloo', 'shm'],
+        help='collect the bbox results of multiple workers as flat arrays '
+             'over gloo or shared memory (single node) instead of pickles')
     parser.add_argument(
         '--cfg-options',
         nargs='+',
@@ -240,7 +245,8 @@ def get_test_data(data_cfg, distributed, args):
         samples_per_gpu=samples_per_gpu,
         workers_per_gpu=2,
         dist=distributed,
-        shuffle=False)
+        shuffle=False,
+        shape_bucketing=samples_per_gpu > 1)
     return dataset, data_loader
 
 
@@ -8,12 +8,13 @@ import warnings
 import mmcv
 import torch
 from mmcv import Config, DictAction
-from mmcv.cnn import fuse_conv_bn
 from mmcv.parallel import MMDataParallel, MMDistributedDataParallel
 from mmcv.runner import (get_dist_info, init_dist, load_checkpoint,
                          wrap_fp16_model)
 
 from mmdet.apis import multi_gpu_test, single_gpu_test
+from mmdet.core import DetectionResults
+from mmdet.core.export import fuse_slimmable_conv_bn
 from mmdet.datasets import (build_dataloader, build_dataset,
                             replace_ImageToTensor)
 from mmdet.models import build_detector
@@ -28,12 +29,17 @@ def parse_args():
     parser.add_argument(
         '--work-dir',
         help='the directory to save the file containing evaluation metrics')
-    parser.add_argument('--out', help='output result file in pickle format')
+    parser.add_argument(
+        '--out',
+        help='output result file in pickle format, or in the columnar npz '
+        'format of DetectionResults, which only keeps the bboxes')
     parser.add_argument(
         '--fuse-conv-bn',
         action='store_true',
-        help='Whether to fuse conv and bn, this will slightly increase'
-        'the inference speed')
+        help='Whether to fuse conv and bn, this will slightly increase '
+        'the inference speed. Skipped with a warning for the searchable '
+        'models whose BNs normalize with the statistics of each batch '
+        '(bn_training_mode=True, the default)')
     parser.add_argument(
         '--gpu-ids',
         type=int,
@@ -74,6 +80,16 @@ def parse_args():
         '--tmpdir',
         help='tmp directory used for collecting results from multiple '
         'workers, available when gpu-collect is not specified')
+    parser.add_argument(
+        '--collect-backend',
+        choices=['gloo', 'shm'],
+        help='collect the bbox results of multiple workers as flat arrays '
+        'over gloo or shared memory (single node) instead of pickles')
+    parser.add_argument(
+        '--shape-bucketing',
+        action='store_true',
+        help='whether to batch test images of the same padded shape '
+        'together, useful with samples_per_gpu > 1')
     parser.add_argument(
         '--cfg-options',
         nargs='+',
@@ -129,8 +145,9 @@ def main():
     if args.eval and args.format_only:
         raise ValueError('--eval and --format_only cannot be both specified')
 
-    if args.out is not None and not args.out.endswith(('.pkl', '.pickle')):
-        raise ValueError('The output file must be a pkl file.')
+    if args.out is not None and not args.out.endswith(
+            ('.pkl', '.pickle', '.npz')):
+        raise ValueError('The output file must be a pkl or npz file.')
 
     cfg = Config.fromfile(args.config)
     if args.cfg_options is not None:
@@ -202,7 +219,8 @@ def main():
         samples_per_gpu=samples_per_gpu,
         workers_per_gpu=cfg.data.workers_per_gpu,
         dist=distributed,
-        shuffle=False)
+        shuffle=False,
+        shape_bucketing=args.shape_bucketing)
 
     # build the model and load checkpoint
     cfg.model.train_cfg = None
@@ -211,8 +229,6 @@ def main():
     if fp16_cfg is not None:
         wrap_fp16_model(model)
     checkpoint = load_checkpoint(model, args.checkpoint, map_location='cpu')
-    if args.fuse_conv_bn:
-        model = fuse_conv_bn(model)
     # old versions did not save class info in checkpoints, this walkaround is
     # for backward compatibility
     if 'CLASSES' in checkpoint.get('meta', {}):
@@ -226,6 +242,9 @@ def main():
     arch = {'widen_factor': (0.625, 0.625, 0.625, 0.625, 0.625), 'deepen_factor': (0.33, 0.33, 0.33, 0.33)}
     model.set_arch(arch)
     print("set_arch fin!")
+    # fused at the arch, the slimmable layers become dense
+    if args.fuse_conv_bn:
+        model = fuse_slimmable_conv_bn(model, strict=False)
 
     if not distributed:
         model = MMDataParallel(model, device_ids=cfg.gpu_ids)
@@ -237,14 +256,25 @@ def main():
             device_ids=[torch.cuda.current_device()],
             broadcast_buffers=False)
 
-        outputs = multi_gpu_test(model, data_loader, args.tmpdir,
-                                 args.gpu_collect)
+        outputs = multi_gpu_test(
+            model,
+            data_loader,
+            args.tmpdir,
+            args.gpu_collect,
+            collect_backend=args.collect_backend)
 
     rank, _ = get_dist_info()
     if rank == 0:
         if args.out:
             print(f'\nwriting results to {args.out}')
-            mmcv.dump(outputs, args.out)
+            if args.out.endswith('.npz'):
+                if outputs and isinstance(outputs[0], tuple):
+                    warnings.warn('Only the bboxes are saved in a npz file, '
+                                  'use a pkl file to keep the masks.')
+                DetectionResults.from_list(
+                    outputs, num_classes=len(dataset.CLASSES)).dump(args.out)
+            else:
+                mmcv.dump(outputs, args.out)
         kwargs = {} if args.eval_options is None else args.eval_options
         if args.format_only:
             dataset.format_results(outputs, **kwargs)
@@ -253,7 +283,7 @@ def main():
             # hard-code way to remove EvalHook args
             for key in [
                     'interval', 'tmpdir', 'start', 'gpu_collect', 'save_best',
-                    'rule', 'dynamic_intervals'
+                    'rule', 'dynamic_intervals', 'async_eval'
             ]:
                 eval_kwargs.pop(key, None)
             eval_kwargs.update(dict(metric=args.eval, **kwargs))
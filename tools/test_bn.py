@@ -17,7 +17,7 @@ from mmcv.parallel import MMDataParallel, MMDistributedDataParallel
 from mmcv.runner import (get_dist_info, init_dist, load_checkpoint,
                          wrap_fp16_model)
 
-from mmdet.apis import single_gpu_test
+from mmdet.apis import collect_results_flat, single_gpu_test
 # from mmdet.apis import multi_gpu_test
 from mmdet.datasets import (build_dataloader, build_dataset,
                             replace_ImageToTensor)
@@ -79,6 +79,11 @@ def parse_args():
         '--gpu-collect',
         action='store_true',
         help='whether to use gpu to collect results.')
+    parser.add_argument(
+        '--collect-backend',
+        choices=['gloo', 'shm'],
+        help='collect the bbox results of multiple workers as flat arrays '
+        'over gloo or shared memory (single node) instead of pickles')
     parser.add_argument(
         '--tmpdir',
         help='tmp directory used for collecting results from multiple '
@@ -199,7 +204,8 @@ def collect_results_gpu(result_part, size):
         ordered_results = ordered_results[:size]
         return ordered_results
 
-def multi_gpu_test(model, data_loader, tmpdir=None, gpu_collect=False):
+def multi_gpu_test(model, data_loader, tmpdir=None, gpu_collect=False,
+                   collect_backend=None):
     results = []
     dataset = data_loader.dataset
     rank, world_size = get_dist_info()
@@ -221,6 +227,9 @@ def multi_gpu_test(model, data_loader, tmpdir=None, gpu_collect=False):
                 prog_bar.update()
 
     # collect results from all ranks
+    if collect_backend is not None:
+        return collect_results_flat(results, list(data_loader.sampler),
+                                    len(dataset), collect_backend)
     if gpu_collect:
         results = collect_results_gpu(results, len(dataset))
     else:
@@ -432,7 +441,8 @@ def main():
             broadcast_buffers=False)
 
         outputs = multi_gpu_test(model_P, data_loader_train, args.tmpdir,
-                                 args.gpu_collect)
+                                 args.gpu_collect,
+                                 collect_backend=args.collect_backend)
 
     rank, _ = get_dist_info()
     if rank == 0:
@@ -448,7 +458,7 @@ def main():
             # hard-code way to remove EvalHook args
             for key in [
                     'interval', 'tmpdir', 'start', 'gpu_collect', 'save_best',
-                    'rule', 'dynamic_intervals'
+                    'rule', 'dynamic_intervals', 'async_eval'
             ]:
                 eval_kwargs.pop(key, None)
             eval_kwargs.update(dict(metric=args.eval, **kwargs))
@@ -471,7 +481,8 @@ def main():
             broadcast_buffers=False)
 
         outputs = multi_gpu_test(model_P, data_loader_eval, args.tmpdir,
-                                 args.gpu_collect)
+                                 args.gpu_collect,
+                                 collect_backend=args.collect_backend)
 
     rank, _ = get_dist_info()
     if rank == 0:
@@ -487,7 +498,7 @@ def main():
             # hard-code way to remove EvalHook args
             for key in [
                     'interval', 'tmpdir', 'start', 'gpu_collect', 'save_best',
-                    'rule', 'dynamic_intervals'
+                    'rule', 'dynamic_intervals', 'async_eval'
             ]:
                 eval_kwargs.pop(key, None)
             eval_kwargs.update(dict(metric=args.eval, **kwargs))